@@ -1,6 +1,7 @@
 """
 Simplified Flask Application Entry Point
 """
+import hmac
 import os
 import sys
 import logging
@@ -17,14 +18,18 @@ _project_root = Path(__file__).parent.parent
 _env_file = _project_root / '.env'
 load_dotenv(dotenv_path=_env_file, override=True)
 
-from flask import Flask
+from flask import Flask, Response, request
 from flask_cors import CORS
 from models import db
 from config import Config
+from services.usage_tracker import get_usage_tracker
+from services.metrics import instrument_sqlalchemy, render_metrics
+from services.tracing import configure_tracing
 from controllers.material_controller import material_bp, material_global_bp
 from controllers.reference_file_controller import reference_file_bp
 from controllers.settings_controller import settings_bp
 from controllers.video_controller import video_bp
+from controllers.usage_controller import usage_bp
 from controllers import project_bp, page_bp, template_bp, user_template_bp, export_bp, file_bp
 
 
@@ -98,6 +103,11 @@ def create_app():
     CORS(app, origins=cors_origins)
     # Database migrations (Alembic via Flask-Migrate)
     Migrate(app, db)
+    # AI / OCR / 修复调用用量统计
+    get_usage_tracker().init_app(app)
+    # 运行指标与追踪
+    instrument_sqlalchemy()
+    configure_tracing(app.config['TRACING_EXPORTER'], app.config['TRACING_FILE'])
     
     # Register blueprints
     app.register_blueprint(project_bp)
@@ -111,6 +121,7 @@ def create_app():
     app.register_blueprint(reference_file_bp, url_prefix='/api/reference-files')
     app.register_blueprint(settings_bp)
     app.register_blueprint(video_bp)
+    app.register_blueprint(usage_bp)
 
     with app.app_context():
         # Load settings from database and sync to app.config
@@ -121,6 +132,16 @@ def create_app():
     def health_check():
         return {'status': 'ok', 'message': 'Banana Slides API is running'}
     
+    # Prometheus metrics endpoint
+    @app.route('/metrics')
+    def metrics():
+        if not app.config['METRICS_ENABLED']:
+            return {'error': 'metrics disabled'}, 404
+        token = app.config.get('METRICS_TOKEN')
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return {'error': 'unauthorized'}, 401
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+    
     # Output language endpoint
     @app.route('/api/output-language', methods=['GET'])
     def get_output_language():
@@ -145,6 +166,7 @@ def create_app():
             'description': 'AI-powered PPT generation service',
             'endpoints': {
                 'health': '/health',
+                'metrics': '/metrics',
                 'api_docs': '/api',
                 'projects': '/api/projects'
             }
@@ -199,11 +221,12 @@ def _load_settings_to_config(app):
         logging.warning(f"Could not load settings from database: {e}")
 
 
-# Create app instance
-app = create_app()
-
-
 if __name__ == '__main__':
+    # Build the app only when run as a script: spawn-started worker processes (ImageWriter,
+    # SlideRenderer) re-import this module as __mp_main__ and must not create another app.
+    # `flask run` (FLASK_APP=backend/app.py) finds the create_app factory itself.
+    app = create_app()
+    
     # Run development server
     if os.getenv("IN_DOCKER", "0") == "1":
         port = 5000 # 在 docker 内部部署时始终使用 5000 端口.
@@ -55,6 +55,10 @@ class Config:
     # GenAI (Gemini) 格式专用配置
     GENAI_TIMEOUT = float(os.getenv('GENAI_TIMEOUT', '300.0'))  # Gemini 超时时间（秒）
     GENAI_MAX_RETRIES = int(os.getenv('GENAI_MAX_RETRIES', '2'))  # Gemini 最大重试次数（应用层实现）
+    # Gemini 显式上下文缓存：页面描述等共享前缀达到最小 token 数时创建缓存，有效期（秒，0 表示不创建）
+    # 缓存按存储时长计费，默认关闭，需要时显式开启
+    GENAI_CONTEXT_CACHE_TTL = int(os.getenv('GENAI_CONTEXT_CACHE_TTL', '0'))
+    GENAI_CONTEXT_CACHE_MIN_TOKENS = int(os.getenv('GENAI_CONTEXT_CACHE_MIN_TOKENS', '4096'))
     
     # OpenAI 格式专用配置（当 AI_PROVIDER_FORMAT=openai 时使用）
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')  # 当 AI_PROVIDER_FORMAT=openai 时必须设置
@@ -69,18 +73,59 @@ class Config:
     # MinerU 文件解析服务配置
     MINERU_TOKEN = os.getenv('MINERU_TOKEN', '')
     MINERU_API_BASE = os.getenv('MINERU_API_BASE', 'https://mineru.net')
+    MINERU_MAX_ZIP_SIZE = int(os.getenv('MINERU_MAX_ZIP_SIZE', str(1024 * 1024 * 1024)))  # 解析结果ZIP大小上限（字节）
     
     # 图片识别模型配置
     IMAGE_CAPTION_MODEL = os.getenv('IMAGE_CAPTION_MODEL', 'gemini-3-flash-preview')
+    IMAGE_CAPTION_BATCH_SIZE = int(os.getenv('IMAGE_CAPTION_BATCH_SIZE', '6'))  # 单次多图识别请求的图片数（1 表示不合并）
+    
+    # 参考文件上下文配置：参考文件总量超过预算时，prompt 中只放摘要和与当前页最相关的片段（0 表示始终完整内联）
+    REFERENCE_CONTEXT_MAX_TOKENS = int(os.getenv('REFERENCE_CONTEXT_MAX_TOKENS', '8000'))
     
     # 并发配置
     MAX_DESCRIPTION_WORKERS = int(os.getenv('MAX_DESCRIPTION_WORKERS', '5'))
     MAX_IMAGE_WORKERS = int(os.getenv('MAX_IMAGE_WORKERS', '8'))
+    # 异步生成执行器：同时在途的 AI 调用上限，以及没有原生异步客户端时使用的线程数
+    GENERATION_MAX_IN_FLIGHT = int(os.getenv('GENERATION_MAX_IN_FLIGHT', '256'))
+    GENERATION_BLOCKING_WORKERS = int(os.getenv('GENERATION_BLOCKING_WORKERS', '16'))
+    # 流式生成大纲时，页面大纲一完成就提前生成描述（请求体 pipeline_descriptions 可覆盖）
+    PIPELINE_DESCRIPTIONS = os.getenv('PIPELINE_DESCRIPTIONS', 'false').lower() == 'true'
     
     # 图片生成配置
     DEFAULT_ASPECT_RATIO = "16:9"
     DEFAULT_RESOLUTION = "2K"
     
+    # 生成图片的编码配置: 'png'（默认）, 'png-fast', 'webp-lossless', 'jpeg'
+    GENERATED_IMAGE_PROFILE = os.getenv('GENERATED_IMAGE_PROFILE', 'png')
+    IMAGE_WRITE_PROCESSES = int(os.getenv('IMAGE_WRITE_PROCESSES', '2'))  # 图片编码进程数（0 表示在当前线程编码）
+    
+    # 图像处理后端: 'auto'（安装了 pyvips 时优先使用）, 'pyvips', 'pillow'
+    IMAGE_OPS_BACKEND = os.getenv('IMAGE_OPS_BACKEND', 'auto')
+    
+    # 导出 PPTX 时把像素上几乎相同的图片（重新编码的背景、Logo 裁剪）合并为同一份媒体
+    PPTX_MERGE_SIMILAR_IMAGES = os.getenv('PPTX_MERGE_SIMILAR_IMAGES', 'false').lower() == 'true'
+    # 可编辑 PPTX 文本框排版进程数（0 表示在当前线程排版，默认 CPU 核数 - 1，最多 4 个）
+    PPTX_LAYOUT_PROCESSES = int(os.getenv('PPTX_LAYOUT_PROCESSES', str(min(4, (os.cpu_count() or 1) - 1))))
+    
+    # 用量统计：内存中的调用用量写入数据库的间隔（秒，0 表示只在任务结束和查询时写入）
+    USAGE_FLUSH_INTERVAL = float(os.getenv('USAGE_FLUSH_INTERVAL', '30'))
+    
+    # 运行指标与追踪配置
+    # GET /metrics 输出 Prometheus 文本格式指标（默认关闭；接口本身不鉴权，对外暴露时配置 METRICS_TOKEN）
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+    # 非空时 /metrics 要求请求头 Authorization: Bearer <METRICS_TOKEN>
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    # 追踪后端：空（关闭）、file（写入 TRACING_FILE，每行一个 span）、console / otlp（需要 OpenTelemetry SDK）
+    TRACING_EXPORTER = os.getenv('TRACING_EXPORTER', '')
+    TRACING_FILE = os.getenv('TRACING_FILE', os.path.join(BASE_DIR, 'instance', 'traces.jsonl'))
+    
+    # 任务性能分析配置（单个任务也可通过请求头 X-Task-Profile 或查询参数 profile 开启）
+    TASK_PROFILING = os.getenv('TASK_PROFILING', 'false').lower() == 'true'
+    # 附带的 profiler：none（只记录步骤时间线和内存）、cprofile、pyinstrument（需要安装 pyinstrument）
+    TASK_PROFILER_SAMPLER = os.getenv('TASK_PROFILER_SAMPLER', 'none')
+    # 使用 tracemalloc 记录 Python 内存分配峰值（有一定开销）
+    TASK_PROFILER_TRACK_MEMORY = os.getenv('TASK_PROFILER_TRACK_MEMORY', 'true').lower() == 'true'
+    
     # 日志配置
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
     
@@ -101,6 +146,8 @@ class Config:
     # 可选值: 'volcengine' (火山引擎), 'gemini' (Google Gemini)
     # 注意: 可编辑PPTX导出功能使用 ImageEditabilityService，其中 HybridInpaintProvider 会结合百度重绘和生成式质量增强
     INPAINTING_PROVIDER = os.getenv('INPAINTING_PROVIDER', 'gemini')  # 默认使用 Gemini
+    SAVE_INPAINT_MASKS = os.getenv('SAVE_INPAINT_MASKS', 'false').lower() == 'true'  # 是否把每次修复的掩码写入磁盘（调试用）
+    LOCAL_INPAINT_ENABLED = os.getenv('LOCAL_INPAINT_ENABLED', 'true').lower() == 'true'  # 纯色/渐变背景区域是否先在本地填充（仅 hybrid/baidu 方式）
     
     # 百度 API 配置（用于 OCR 和图像修复）
     BAIDU_OCR_API_KEY = os.getenv('BAIDU_OCR_API_KEY', '')
@@ -271,7 +271,9 @@ def export_editable_pptx(project_id):
         # 读取项目的导出设置
         export_extractor_method = project.export_extractor_method or 'hybrid'
         export_inpaint_method = project.export_inpaint_method or 'hybrid'
-        logger.info(f"Export settings: extractor={export_extractor_method}, inpaint={export_inpaint_method}")
+        export_enhance_threshold = project.export_enhance_threshold
+        logger.info(f"Export settings: extractor={export_extractor_method}, inpaint={export_inpaint_method}, "
+                    f"enhance_threshold={export_enhance_threshold}")
         
         # 使用递归分析任务（不需要 ai_service，使用 ImageEditabilityService）
         task_manager.submit_task(
@@ -285,6 +287,7 @@ def export_editable_pptx(project_id):
             max_workers=max_workers,
             export_extractor_method=export_extractor_method,
             export_inpaint_method=export_inpaint_method,
+            export_enhance_threshold=export_enhance_threshold,
             app=app
         )
         
@@ -4,7 +4,7 @@ Page Controller - handles page-related endpoints
 import logging
 from flask import Blueprint, request, current_app
 from models import db, Project, Page, PageImageVersion, Task
-from utils import success_response, error_response, not_found, bad_request
+from utils import success_response, error_response, not_found, bad_request, wants_event_stream, sse_response
 from services import FileService, ProjectContext
 from services.ai_service_manager import get_ai_service
 from services.task_manager import task_manager, generate_single_page_image_task, edit_page_image_task
@@ -197,6 +197,9 @@ def generate_page_description(project_id, page_id):
     {
         "force_regenerate": false
     }
+    
+    Streaming: with `Accept: text/event-stream` (or ?stream=true) the response is SSE:
+    `delta` events with text chunks, then `done` with the saved page (or `error`).
     """
     try:
         page = Page.query.get(page_id)
@@ -245,6 +248,33 @@ def generate_page_description(project_id, page_id):
         if page.part:
             page_data['part'] = page.part
         
+        def save(desc_text):
+            # Save description
+            desc_content = {
+                "text": desc_text,
+                "generated_at": datetime.utcnow().isoformat()
+            }
+            
+            page.set_description_content(desc_content)
+            page.status = 'DESCRIPTION_GENERATED'
+            page.updated_at = datetime.utcnow()
+            
+            db.session.commit()
+        
+        # 流式响应：逐块推送描述文本，生成完成后再保存
+        if wants_event_stream():
+            def events():
+                for event in ai_service.generate_page_description_stream(
+                    project_context, outline, page_data, page.order_index + 1, language=language
+                ):
+                    if event['type'] == 'description':
+                        save(event['text'])
+                        yield 'done', page.to_dict()
+                    else:
+                        yield event['type'], event
+            
+            return sse_response(events(), on_error=db.session.rollback)
+        
         desc_text = ai_service.generate_page_description(
             project_context,
             outline,
@@ -252,18 +282,7 @@ def generate_page_description(project_id, page_id):
             page.order_index + 1,
             language=language
         )
-        
-        # Save description
-        desc_content = {
-            "text": desc_text,
-            "generated_at": datetime.utcnow().isoformat()
-        }
-        
-        page.set_description_content(desc_content)
-        page.status = 'DESCRIPTION_GENERATED'
-        page.updated_at = datetime.utcnow()
-        
-        db.session.commit()
+        save(desc_text)
         
         return success_response(page.to_dict())
     
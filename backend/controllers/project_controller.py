@@ -3,10 +3,14 @@ Project Controller - handles project-related endpoints
 """
 import json
 import logging
+import os
 import traceback
+from concurrent.futures import as_completed
 from datetime import datetime
+from functools import partial
+from typing import Optional
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, send_file
 from sqlalchemy import desc
 from sqlalchemy.orm import joinedload
 from werkzeug.exceptions import BadRequest
@@ -14,14 +18,19 @@ from werkzeug.exceptions import BadRequest
 from models import db, Project, Page, Task, ReferenceFile
 from services import ProjectContext
 from services.ai_service_manager import get_ai_service
+from services.description_pipeline import get_description_pipeline, outline_signature, page_signature
 from services.task_manager import (
     task_manager,
     generate_descriptions_task,
-    generate_images_task
+    generate_images_task,
+    generate_deck_task
 )
+from services.task_events import get_task_event_broker
+from services.task_profiler import to_folded_stacks
 from utils import (
     success_response, error_response, not_found, bad_request,
-    parse_page_ids_from_body, get_filtered_pages
+    parse_page_ids_from_body, get_filtered_pages,
+    wants_event_stream, sse_response
 )
 
 logger = logging.getLogger(__name__)
@@ -114,6 +123,287 @@ def _reconstruct_outline_from_pages(pages: list) -> list:
     return outline
 
 
+def _outline_stream_events(events, save):
+    """
+    将 AIService 的大纲流式事件转换为 SSE 事件
+    
+    page/item 事件原样转发；收到完整大纲后调用 save(outline) 保存，
+    并以 done 事件返回与非流式接口相同的 pages 数据
+    """
+    for event in events:
+        if event['type'] == 'outline':
+            pages_list = save(event['outline'])
+            yield 'done', {'pages': [page.to_dict() for page in pages_list]}
+        else:
+            yield event['type'], event
+
+
+def _pipelined_outline_events(project_id: str, events, save, describe, limit: int):
+    """
+    流水线模式的大纲 SSE 事件：每个页面大纲一完成就开始生成该页描述
+    
+    除 page/item 外还会推送：
+    - outline_saved: 大纲保存后的 pages
+    - description: 某页描述已写入
+    - description_discarded: 该页大纲已被修改或删除（或已有描述），结果未写入
+    - description_failed: 某页描述生成失败
+    最后以 done 返回最新的 pages
+    
+    Args:
+        project_id: 项目ID
+        events: AIService 的大纲流式事件
+        save: save(outline) 保存大纲并返回 Page 列表
+        describe: describe(outline, page_outline, page_index) 返回生成描述的协程
+        limit: 同时在途的描述调用数上限
+    """
+    pipeline = get_description_pipeline()
+    # 上一次生成留下的任务已经过时
+    pipeline.discard(project_id)
+    
+    outline_so_far = []
+    jobs = {}  # {signature: (page_outline, future)}
+    for event in events:
+        if event['type'] == 'page':
+            page_outline = event['page']
+            outline_so_far.append(page_outline)
+            future = pipeline.start(
+                project_id, page_outline,
+                partial(describe, list(outline_so_far), page_outline, event['index'] + 1),
+                limit=limit
+            )
+            jobs[outline_signature(page_outline)] = (page_outline, future)
+            yield 'page', event
+        elif event['type'] == 'outline':
+            pages_list = save(event['outline'])
+            keep = {page_signature(page) for page in pages_list}
+            pipeline.discard(project_id, keep)
+            jobs = {sig: job for sig, job in jobs.items() if sig in keep}
+            yield 'outline_saved', {'pages': [page.to_dict() for page in pages_list]}
+        else:
+            yield event['type'], event
+    
+    signatures = {future: sig for sig, (_, future) in jobs.items()}
+    for future in as_completed(signatures):
+        signature = signatures[future]
+        page_outline = jobs[signature][0]
+        pipeline.release(project_id, signature, future)
+        try:
+            desc_text = future.result()
+        except Exception as e:
+            logger.error(f"Speculative description failed for '{page_outline.get('title')}': {str(e)}")
+            yield 'description_failed', {'page': page_outline, 'error': str(e)}
+            continue
+        
+        pages = _apply_speculative_description(project_id, signature, desc_text)
+        if not pages:
+            yield 'description_discarded', {'page': page_outline}
+        for page in pages:
+            yield 'description', {'page': page.to_dict()}
+    
+    db.session.expire_all()
+    pages_list = Page.query.filter_by(project_id=project_id).order_by(Page.order_index).all()
+    project = Project.query.get(project_id)
+    if project and pages_list and all(page.description_content for page in pages_list):
+        project.status = 'DESCRIPTIONS_GENERATED'
+        project.updated_at = datetime.utcnow()
+        db.session.commit()
+    yield 'done', {'pages': [page.to_dict() for page in pages_list]}
+
+
+def _apply_speculative_description(project_id: str, signature: str, desc_text: str) -> list:
+    """
+    将提前生成的描述写入大纲签名仍然一致、且还没有描述的页面
+    
+    Returns:
+        写入了描述的 Page 列表（页面大纲已被修改时为空）
+    """
+    # 用户可能在生成期间修改了大纲，必须读取最新数据
+    db.session.expire_all()
+    pages = [
+        page for page in Page.query.filter_by(project_id=project_id).order_by(Page.order_index).all()
+        if not page.description_content and page_signature(page) == signature
+    ]
+    for page in pages:
+        page.set_description_content({
+            "text": desc_text,
+            "generated_at": datetime.utcnow().isoformat()
+        })
+        page.status = 'DESCRIPTION_GENERATED'
+    db.session.commit()
+    return pages
+
+
+def _save_generated_outline(project: Project, pages_data: list) -> list:
+    """
+    用生成的大纲替换项目的所有页面并提交
+    
+    Args:
+        project: Project object
+        pages_data: 扁平化后的页面大纲列表
+        
+    Returns:
+        新建的 Page 列表
+    """
+    # Delete existing pages (using ORM session to trigger cascades)
+    # Note: Cannot use bulk delete as it bypasses ORM cascades for PageImageVersion
+    old_pages = Page.query.filter_by(project_id=project.id).all()
+    for old_page in old_pages:
+        db.session.delete(old_page)
+    
+    # Create pages from outline
+    pages_list = []
+    for i, page_data in enumerate(pages_data):
+        page = Page(
+            project_id=project.id,
+            order_index=i,
+            part=page_data.get('part'),
+            status='DRAFT'
+        )
+        page.set_outline_content({
+            'title': page_data.get('title'),
+            'points': page_data.get('points', [])
+        })
+        
+        db.session.add(page)
+        pages_list.append(page)
+    
+    # Update project status
+    project.status = 'OUTLINE_GENERATED'
+    project.updated_at = datetime.utcnow()
+    
+    db.session.commit()
+    
+    logger.info(f"大纲生成完成: 项目 {project.id}, 创建了 {len(pages_list)} 个页面")
+    return pages_list
+
+
+def _save_refined_outline(project: Project, pages_data: list) -> list:
+    """
+    用修改后的大纲替换项目的所有页面并提交，按标题保留已有的页面描述
+    
+    Args:
+        project: Project object
+        pages_data: 扁平化后的页面大纲列表
+        
+    Returns:
+        新建的 Page 列表
+    """
+    # 在删除旧页面之前，先保存已有的页面描述（按标题匹配）
+    old_pages = Page.query.filter_by(project_id=project.id).order_by(Page.order_index).all()
+    descriptions_map = {}  # {title: description_content}
+    old_status_map = {}  # {title: status} 用于保留状态
+    
+    for old_page in old_pages:
+        old_outline = old_page.get_outline_content()
+        if old_outline and old_outline.get('title'):
+            title = old_outline.get('title')
+            if old_page.description_content:
+                descriptions_map[title] = old_page.description_content
+            # 如果旧页面已经有描述，保留状态
+            if old_page.status in ['DESCRIPTION_GENERATED', 'IMAGE_GENERATED']:
+                old_status_map[title] = old_page.status
+    
+    # Delete existing pages (using ORM session to trigger cascades)
+    for old_page in old_pages:
+        db.session.delete(old_page)
+    
+    # Create pages from refined outline
+    pages_list = []
+    has_descriptions = False
+    preserved_count = 0
+    new_count = 0
+    
+    for i, page_data in enumerate(pages_data):
+        page = Page(
+            project_id=project.id,
+            order_index=i,
+            part=page_data.get('part'),
+            status='DRAFT'
+        )
+        page.set_outline_content({
+            'title': page_data.get('title'),
+            'points': page_data.get('points', [])
+        })
+        
+        # 尝试匹配并恢复已有的描述
+        title = page_data.get('title')
+        if title in descriptions_map:
+            # 恢复描述内容
+            page.description_content = descriptions_map[title]
+            # 恢复状态（如果有）
+            if title in old_status_map:
+                page.status = old_status_map[title]
+            else:
+                page.status = 'DESCRIPTION_GENERATED'
+            has_descriptions = True
+            preserved_count += 1
+        else:
+            # 新页面或标题改变的页面，描述为空
+            # 这包括：新增的页面、合并的页面、标题改变的页面
+            page.status = 'DRAFT'
+            new_count += 1
+        
+        db.session.add(page)
+        pages_list.append(page)
+    
+    logger.info(f"描述匹配完成: 保留了 {preserved_count} 个页面的描述, {new_count} 个页面需要重新生成描述")
+    
+    # Update project status
+    # 如果所有页面都有描述，保持 DESCRIPTION_GENERATED 状态
+    # 否则降级为 OUTLINE_GENERATED
+    if has_descriptions and all(p.description_content for p in pages_list):
+        project.status = 'DESCRIPTIONS_GENERATED'
+    else:
+        project.status = 'OUTLINE_GENERATED'
+    project.updated_at = datetime.utcnow()
+    
+    db.session.commit()
+    
+    logger.info(f"大纲修改完成: 项目 {project.id}, 创建了 {len(pages_list)} 个页面")
+    return pages_list
+
+
+def _check_refined_description_count(pages: list, refined_descriptions: list) -> Optional[str]:
+    """
+    验证 AI 返回的描述数量与页面数量一致
+    
+    Returns:
+        不一致时返回给用户的提示信息，一致时返回 None
+    """
+    if len(refined_descriptions) == len(pages):
+        return None
+    
+    error_msg = ""
+    logger.error(f"AI 返回的描述数量不匹配: 期望 {len(pages)} 个页面，实际返回 {len(refined_descriptions)} 个描述。")
+    
+    # 如果 AI 试图增删页面，给出明确提示
+    if len(refined_descriptions) > len(pages):
+        error_msg += " 提示：如需增加页面，请在大纲页面进行操作。"
+    elif len(refined_descriptions) < len(pages):
+        error_msg += " 提示：如需删除页面，请在大纲页面进行操作。"
+    
+    return error_msg
+
+
+def _save_refined_descriptions(project: Project, pages: list, refined_descriptions: list):
+    """用修改后的描述更新页面并提交"""
+    for page, refined_desc in zip(pages, refined_descriptions):
+        desc_content = {
+            "text": refined_desc,
+            "generated_at": datetime.utcnow().isoformat()
+        }
+        page.set_description_content(desc_content)
+        page.status = 'DESCRIPTION_GENERATED'
+    
+    # Update project status
+    project.status = 'DESCRIPTIONS_GENERATED'
+    project.updated_at = datetime.utcnow()
+    
+    db.session.commit()
+    
+    logger.info(f"页面描述修改完成: 项目 {project.id}, 更新了 {len(pages)} 个页面")
+
+
 @project_bp.route('', methods=['GET'])
 def list_projects():
     """
@@ -281,6 +571,11 @@ def update_project(project_id):
             project.export_extractor_method = data['export_extractor_method']
         if 'export_inpaint_method' in data:
             project.export_inpaint_method = data['export_inpaint_method']
+        if 'export_enhance_threshold' in data:
+            threshold = data['export_enhance_threshold']
+            if threshold is not None and (isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or threshold < 0):
+                return bad_request("export_enhance_threshold must be a non-negative number or null")
+            project.export_enhance_threshold = threshold
         
         # Update page order if provided
         if 'pages_order' in data:
@@ -349,8 +644,21 @@ def generate_outline(project_id):
     Request body (optional):
     {
         "idea_prompt": "...",  # for idea type
-        "language": "zh"  # output language: zh, en, ja, auto
+        "language": "zh",  # output language: zh, en, ja, auto
+        "pipeline_descriptions": false,  # streaming only, default PIPELINE_DESCRIPTIONS
+        "max_workers": 5  # pipelined descriptions in flight
     }
+    
+    Streaming: with `Accept: text/event-stream` (or ?stream=true) the response is SSE:
+    a `page` event for each page as soon as it is complete, an `item` event for each
+    top-level outline item, then `done` with the saved pages (or `error`).
+    
+    With pipeline_descriptions the description of each page is generated as soon as its
+    outline entry is complete: `outline_saved` is sent once the outline is saved, then
+    `description` / `description_discarded` / `description_failed` per page, and `done`
+    with the refreshed pages. A description is only written if the page's outline is
+    unchanged; jobs still running when the client disconnects are reused by
+    /generate/descriptions.
     """
     try:
         project = Project.query.get(project_id)
@@ -380,9 +688,8 @@ def generate_outline(project_id):
             if not project.outline_text:
                 return bad_request("outline_text is required for outline type project")
             
-            # Create project context and parse outline text into structured format
-            project_context = ProjectContext(project, reference_files_content)
-            outline = ai_service.parse_outline_text(project_context, language=language)
+            # Parse outline text into structured format
+            generate, generate_stream = ai_service.parse_outline_text, ai_service.parse_outline_text_stream
         elif project.creation_type == 'descriptions':
             # 从描述生成：这个类型应该使用专门的端点
             return bad_request("Use /generate/from-description endpoint for descriptions type")
@@ -395,43 +702,31 @@ def generate_outline(project_id):
             
             project.idea_prompt = idea_prompt
             
-            # Create project context and generate outline from idea
-            project_context = ProjectContext(project, reference_files_content)
-            outline = ai_service.generate_outline(project_context, language=language)
-        
-        # Flatten outline to pages
-        pages_data = ai_service.flatten_outline(outline)
-        
-        # Delete existing pages (using ORM session to trigger cascades)
-        # Note: Cannot use bulk delete as it bypasses ORM cascades for PageImageVersion
-        old_pages = Page.query.filter_by(project_id=project_id).all()
-        for old_page in old_pages:
-            db.session.delete(old_page)
-        
-        # Create pages from outline
-        pages_list = []
-        for i, page_data in enumerate(pages_data):
-            page = Page(
-                project_id=project_id,
-                order_index=i,
-                part=page_data.get('part'),
-                status='DRAFT'
-            )
-            page.set_outline_content({
-                'title': page_data.get('title'),
-                'points': page_data.get('points', [])
-            })
-            
-            db.session.add(page)
-            pages_list.append(page)
+            # Generate outline from idea
+            generate, generate_stream = ai_service.generate_outline, ai_service.generate_outline_stream
         
-        # Update project status
-        project.status = 'OUTLINE_GENERATED'
-        project.updated_at = datetime.utcnow()
+        project_context = ProjectContext(project, reference_files_content)
         
-        db.session.commit()
+        def save(outline):
+            return _save_generated_outline(project, ai_service.flatten_outline(outline))
+        
+        # 流式响应：页面大纲逐个推送，完整大纲生成后再保存
+        if wants_event_stream():
+            events = generate_stream(project_context, language=language)
+            if data.get('pipeline_descriptions', current_app.config.get('PIPELINE_DESCRIPTIONS', False)):
+                max_workers = data.get('max_workers', current_app.config.get('MAX_DESCRIPTION_WORKERS', 5))
+                
+                def describe(outline, page_outline, page_index):
+                    return ai_service.agenerate_page_description(
+                        project_context, outline, page_outline, page_index, language=language
+                    )
+                
+                events = _pipelined_outline_events(project.id, events, save, describe, max_workers)
+            else:
+                events = _outline_stream_events(events, save)
+            return sse_response(events, on_error=db.session.rollback)
         
-        logger.info(f"大纲生成完成: 项目 {project_id}, 创建了 {len(pages_list)} 个页面")
+        pages_list = save(generate(project_context, language=language))
         
         # Return pages
         return success_response({
@@ -758,10 +1053,128 @@ def generate_images(project_id):
         return error_response('SERVER_ERROR', str(e), 500)
 
 
+@project_bp.route('/<project_id>/generate/deck', methods=['POST'])
+def generate_deck(project_id):
+    """
+    POST /api/projects/{project_id}/generate/deck - Generate outline, descriptions and images in one pipelined task
+    
+    Each page moves through outline -> description -> image on its own, as soon as the
+    previous stage for that page is done. Existing pages are replaced.
+    
+    Request body (optional):
+    {
+        "idea_prompt": "...",  # for idea type
+        "use_template": true,
+        "description_workers": 5,  # default MAX_DESCRIPTION_WORKERS
+        "image_workers": 8,  # default MAX_IMAGE_WORKERS
+        "language": "zh"  # output language: zh, en, ja, auto
+    }
+    
+    Progress: poll /tasks/{task_id}, or request it with `Accept: text/event-stream`
+    to receive a `page` event whenever a page changes stage, then `done`.
+    """
+    try:
+        project = Project.query.get(project_id)
+        
+        if not project:
+            return not_found('Project')
+        
+        data = request.get_json() or {}
+        
+        if project.creation_type == 'descriptions':
+            return bad_request("Use /generate/from-description endpoint for descriptions type")
+        if project.creation_type == 'outline':
+            if not project.outline_text:
+                return bad_request("outline_text is required for outline type project")
+        else:
+            idea_prompt = data.get('idea_prompt') or project.idea_prompt
+            if not idea_prompt:
+                return bad_request("idea_prompt is required")
+            project.idea_prompt = idea_prompt
+        
+        description_workers = data.get('description_workers', current_app.config.get('MAX_DESCRIPTION_WORKERS', 5))
+        image_workers = data.get('image_workers', current_app.config.get('MAX_IMAGE_WORKERS', 8))
+        use_template = data.get('use_template', True)
+        language = data.get('language', current_app.config.get('OUTPUT_LANGUAGE', 'zh'))
+        
+        # Create task
+        task = Task(
+            project_id=project_id,
+            task_type='GENERATE_DECK',
+            status='PENDING'
+        )
+        task.set_progress({
+            'total': 0,
+            'completed': 0,
+            'failed': 0,
+            'described': 0
+        })
+        
+        db.session.add(task)
+        db.session.commit()
+        
+        # Get singleton AI service instance
+        ai_service = get_ai_service()
+        
+        from services import FileService
+        file_service = FileService(current_app.config['UPLOAD_FOLDER'])
+        
+        reference_files_content = _get_project_reference_files_content(project_id)
+        project_context = ProjectContext(project, reference_files_content)
+        
+        # 合并额外要求和风格描述
+        combined_requirements = project.extra_requirements or ""
+        if project.template_style:
+            style_requirement = f"\n\nppt页面风格描述：\n\n{project.template_style}"
+            combined_requirements = combined_requirements + style_requirement
+        
+        # 任务开始前先发布事件，保证客户端立刻订阅也能收到后续进度
+        get_task_event_broker().publish(task.id, 'task', task.to_dict())
+        
+        # Get app instance for background task
+        app = current_app._get_current_object()
+        
+        # Submit background task
+        task_manager.submit_task(
+            task.id,
+            generate_deck_task,
+            project_id,
+            ai_service,
+            file_service,
+            project_context,
+            use_template,
+            description_workers,
+            image_workers,
+            current_app.config['DEFAULT_ASPECT_RATIO'],
+            current_app.config['DEFAULT_RESOLUTION'],
+            app,
+            combined_requirements if combined_requirements.strip() else None,
+            language
+        )
+        
+        # Update project status
+        project.status = 'GENERATING_IMAGES'
+        db.session.commit()
+        
+        return success_response({
+            'task_id': task.id,
+            'status': 'GENERATING_IMAGES'
+        }, status_code=202)
+    
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"generate_deck failed: {str(e)}", exc_info=True)
+        return error_response('SERVER_ERROR', str(e), 500)
+
+
 @project_bp.route('/<project_id>/tasks/<task_id>', methods=['GET'])
 def get_task_status(project_id, task_id):
     """
     GET /api/projects/{project_id}/tasks/{task_id} - Get task status
+    
+    Streaming: with `Accept: text/event-stream` (or ?stream=true), tasks that publish
+    progress events (e.g. /generate/deck) are streamed as SSE: past events are replayed,
+    then new ones are pushed until `done`. Other tasks return a single `done` event.
     """
     try:
         task = Task.query.get(task_id)
@@ -769,6 +1182,12 @@ def get_task_status(project_id, task_id):
         if not task or task.project_id != project_id:
             return not_found('Task')
         
+        if wants_event_stream():
+            broker = get_task_event_broker()
+            if broker.has_events(task_id):
+                return sse_response(broker.subscribe(task_id), error_code='SERVER_ERROR')
+            return sse_response([('done', task.to_dict())], error_code='SERVER_ERROR')
+        
         return success_response(task.to_dict())
     
     except Exception as e:
@@ -776,6 +1195,53 @@ def get_task_status(project_id, task_id):
         return error_response('SERVER_ERROR', str(e), 500)
 
 
+@project_bp.route('/<project_id>/tasks/<task_id>/profile', methods=['GET'])
+def get_task_profile(project_id, task_id):
+    """
+    GET /api/projects/{project_id}/tasks/{task_id}/profile - Download a task's profile
+    
+    Only tasks started with profiling enabled (`X-Task-Profile` header, `?profile=` or
+    TASK_PROFILING) have a profile.
+    
+    Query params:
+        format: json (default) - stage timeline, spans, memory peaks and profiler summary
+                folded - folded stacks (ms) for flamegraph.pl / speedscope
+                profiler - raw profiler output (.prof for cProfile, .html for pyinstrument)
+    """
+    try:
+        task = Task.query.get(task_id)
+        
+        if not task or task.project_id != project_id:
+            return not_found('Task')
+        
+        profile = task.get_profile()
+        if not profile:
+            return not_found('Task profile')
+        
+        output_format = request.args.get('format', 'json')
+        if output_format == 'json':
+            return success_response(profile)
+        
+        if output_format == 'folded':
+            return Response(
+                to_folded_stacks(profile),
+                mimetype='text/plain',
+                headers={'Content-Disposition': f'attachment; filename=profile-{task_id}.folded'}
+            )
+        
+        if output_format == 'profiler':
+            path = (profile.get('sampler') or {}).get('file')
+            if not path or not os.path.exists(path):
+                return not_found('Profiler output')
+            return send_file(path, as_attachment=True, download_name=os.path.basename(path))
+        
+        return bad_request("format must be one of: json, folded, profiler")
+    
+    except Exception as e:
+        logger.error(f"get_task_profile failed: {str(e)}", exc_info=True)
+        return error_response('SERVER_ERROR', str(e), 500)
+
+
 @project_bp.route('/<project_id>/refine/outline', methods=['POST'])
 def refine_outline(project_id):
     """
@@ -786,6 +1252,8 @@ def refine_outline(project_id):
         "user_requirement": "用户要求，例如：增加一页关于XXX的内容",
         "language": "zh"  # output language: zh, en, ja, auto
     }
+    
+    Streaming: same events as /generate/outline (`page`, `item`, then `done` or `error`).
     """
     try:
         project = Project.query.get(project_id)
@@ -834,7 +1302,7 @@ def refine_outline(project_id):
         
         # Refine outline
         logger.info(f"开始修改大纲: 项目 {project_id}, 用户要求: {user_requirement}, 历史要求数: {len(previous_requirements)}")
-        refined_outline = ai_service.refine_outline(
+        refine_kwargs = dict(
             current_outline=current_outline,
             user_requirement=user_requirement,
             project_context=project_context,
@@ -842,81 +1310,16 @@ def refine_outline(project_id):
             language=language
         )
         
-        # Flatten outline to pages
-        pages_data = ai_service.flatten_outline(refined_outline)
+        def save(outline):
+            return _save_refined_outline(project, ai_service.flatten_outline(outline))
         
-        # 在删除旧页面之前，先保存已有的页面描述（按标题匹配）
-        old_pages = Page.query.filter_by(project_id=project_id).order_by(Page.order_index).all()
-        descriptions_map = {}  # {title: description_content}
-        old_status_map = {}  # {title: status} 用于保留状态
-        
-        for old_page in old_pages:
-            old_outline = old_page.get_outline_content()
-            if old_outline and old_outline.get('title'):
-                title = old_outline.get('title')
-                if old_page.description_content:
-                    descriptions_map[title] = old_page.description_content
-                # 如果旧页面已经有描述，保留状态
-                if old_page.status in ['DESCRIPTION_GENERATED', 'IMAGE_GENERATED']:
-                    old_status_map[title] = old_page.status
-        
-        # Delete existing pages (using ORM session to trigger cascades)
-        for old_page in old_pages:
-            db.session.delete(old_page)
-        
-        # Create pages from refined outline
-        pages_list = []
-        has_descriptions = False
-        preserved_count = 0
-        new_count = 0
-        
-        for i, page_data in enumerate(pages_data):
-            page = Page(
-                project_id=project_id,
-                order_index=i,
-                part=page_data.get('part'),
-                status='DRAFT'
+        if wants_event_stream():
+            return sse_response(
+                _outline_stream_events(ai_service.refine_outline_stream(**refine_kwargs), save),
+                on_error=db.session.rollback
             )
-            page.set_outline_content({
-                'title': page_data.get('title'),
-                'points': page_data.get('points', [])
-            })
-            
-            # 尝试匹配并恢复已有的描述
-            title = page_data.get('title')
-            if title in descriptions_map:
-                # 恢复描述内容
-                page.description_content = descriptions_map[title]
-                # 恢复状态（如果有）
-                if title in old_status_map:
-                    page.status = old_status_map[title]
-                else:
-                    page.status = 'DESCRIPTION_GENERATED'
-                has_descriptions = True
-                preserved_count += 1
-            else:
-                # 新页面或标题改变的页面，描述为空
-                # 这包括：新增的页面、合并的页面、标题改变的页面
-                page.status = 'DRAFT'
-                new_count += 1
-            
-            db.session.add(page)
-            pages_list.append(page)
-        
-        logger.info(f"描述匹配完成: 保留了 {preserved_count} 个页面的描述, {new_count} 个页面需要重新生成描述")
-        
-        # Update project status
-        # 如果所有页面都有描述，保持 DESCRIPTION_GENERATED 状态
-        # 否则降级为 OUTLINE_GENERATED
-        if has_descriptions and all(p.description_content for p in pages_list):
-            project.status = 'DESCRIPTIONS_GENERATED'
-        else:
-            project.status = 'OUTLINE_GENERATED'
-        project.updated_at = datetime.utcnow()
         
-        db.session.commit()
-        
-        logger.info(f"大纲修改完成: 项目 {project_id}, 创建了 {len(pages_list)} 个页面")
+        pages_list = save(ai_service.refine_outline(**refine_kwargs))
         
         # Return pages
         return success_response({
@@ -940,6 +1343,10 @@ def refine_descriptions(project_id):
         "user_requirement": "用户要求，例如：让描述更详细一些",
         "language": "zh"  # output language: zh, en, ja, auto
     }
+    
+    Streaming: with `Accept: text/event-stream` (or ?stream=true) the response is SSE:
+    a `description` event for each page as soon as it is complete, then `done` with
+    the saved pages (or `error`).
     """
     try:
         project = Project.query.get(project_id)
@@ -1003,7 +1410,7 @@ def refine_descriptions(project_id):
         
         # Refine descriptions
         logger.info(f"开始修改页面描述: 项目 {project_id}, 用户要求: {user_requirement}, 历史要求数: {len(previous_requirements)}")
-        refined_descriptions = ai_service.refine_descriptions(
+        refine_kwargs = dict(
             current_descriptions=current_descriptions,
             user_requirement=user_requirement,
             project_context=project_context,
@@ -1012,35 +1419,29 @@ def refine_descriptions(project_id):
             language=language
         )
         
-        # 验证返回的描述数量
-        if len(refined_descriptions) != len(pages):
-            error_msg = ""
-            logger.error(f"AI 返回的描述数量不匹配: 期望 {len(pages)} 个页面，实际返回 {len(refined_descriptions)} 个描述。")
-            
-            # 如果 AI 试图增删页面，给出明确提示
-            if len(refined_descriptions) > len(pages):
-                error_msg += " 提示：如需增加页面，请在大纲页面进行操作。"
-            elif len(refined_descriptions) < len(pages):
-                error_msg += " 提示：如需删除页面，请在大纲页面进行操作。"
+        # 流式响应：每页描述完整后立即推送，全部完成并校验页数后再保存
+        if wants_event_stream():
+            def events():
+                for event in ai_service.refine_descriptions_stream(**refine_kwargs):
+                    if event['type'] != 'descriptions':
+                        yield event['type'], event
+                        continue
+                    error_msg = _check_refined_description_count(pages, event['descriptions'])
+                    if error_msg is not None:
+                        raise ValueError(error_msg)
+                    _save_refined_descriptions(project, pages, event['descriptions'])
+                    yield 'done', {'pages': [page.to_dict() for page in pages]}
             
-            return bad_request(error_msg)
+            return sse_response(events(), on_error=db.session.rollback)
         
-        # Update pages with refined descriptions
-        for page, refined_desc in zip(pages, refined_descriptions):
-            desc_content = {
-                "text": refined_desc,
-                "generated_at": datetime.utcnow().isoformat()
-            }
-            page.set_description_content(desc_content)
-            page.status = 'DESCRIPTION_GENERATED'
-        
-        # Update project status
-        project.status = 'DESCRIPTIONS_GENERATED'
-        project.updated_at = datetime.utcnow()
+        refined_descriptions = ai_service.refine_descriptions(**refine_kwargs)
         
-        db.session.commit()
+        # 验证返回的描述数量
+        error_msg = _check_refined_description_count(pages, refined_descriptions)
+        if error_msg is not None:
+            return bad_request(error_msg)
         
-        logger.info(f"页面描述修改完成: 项目 {project_id}, 更新了 {len(pages)} 个页面")
+        _save_refined_descriptions(project, pages, refined_descriptions)
         
         # Return pages
         return success_response({
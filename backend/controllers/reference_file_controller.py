@@ -5,6 +5,7 @@ import os
 import logging
 import re
 import uuid
+import shutil
 from flask import Blueprint, request, current_app
 from werkzeug.utils import secure_filename
 from pathlib import Path
@@ -13,9 +14,10 @@ from datetime import datetime
 from urllib.parse import unquote
 import threading
 
-from models import db, ReferenceFile, Project
+from models import db, ReferenceFile, Project, ParsedFileCache
 from utils.response import success_response, error_response, bad_request, not_found
 from services.file_parser_service import FileParserService
+from services.usage_tracker import get_usage_tracker, usage_scope
 
 logger = logging.getLogger(__name__)
 
@@ -35,10 +37,40 @@ def _get_file_type(filename: str) -> str:
     return 'unknown'
 
 
+def _release_parse_cache(reference_file: ReferenceFile):
+    """
+    Drop the reference file's hold on its shared parse result (caller commits)
+    
+    Returns:
+        extract_id whose directory is no longer referenced and can be deleted, otherwise None
+    """
+    if not reference_file.content_hash:
+        return None
+    extract_id = ParsedFileCache.release(reference_file.content_hash)
+    reference_file.content_hash = None
+    return extract_id
+
+
+def _delete_extract_dir(extract_id: str):
+    """Delete an unreferenced MinerU extract directory"""
+    if not extract_id:
+        return
+    try:
+        extract_dir = Path(current_app.config['UPLOAD_FOLDER']) / 'mineru_files' / extract_id
+        if extract_dir.exists():
+            shutil.rmtree(extract_dir)
+            logger.info(f"Deleted unreferenced MinerU extract: {extract_dir}")
+    except Exception as e:
+        logger.warning(f"Failed to delete MinerU extract {extract_id}: {str(e)}")
+
+
 def _parse_file_async(file_id: str, file_path: str, filename: str, app):
     """
     Parse file asynchronously in background
     
+    Only the upload to MinerU runs in this thread; waiting for the result happens on the
+    shared poller and _complete_parse records the outcome once the parse future resolves.
+    
     Args:
         file_id: Reference file ID
         file_path: Path to the uploaded file
@@ -65,12 +97,33 @@ def _parse_file_async(file_id: str, file_path: str, filename: str, app):
                 openai_api_key=current_app.config.get('OPENAI_API_KEY', ''),
                 openai_api_base=current_app.config.get('OPENAI_API_BASE', ''),
                 image_caption_model=current_app.config['IMAGE_CAPTION_MODEL'],
-                provider_format=current_app.config.get('AI_PROVIDER_FORMAT', 'gemini')
+                provider_format=current_app.config.get('AI_PROVIDER_FORMAT', 'gemini'),
+                upload_folder=current_app.config['UPLOAD_FOLDER']
             )
             
-            # Parse file
+            # Parse file (identical files resolve from the content-hash cache)
             logger.info(f"Starting to parse file: {filename}")
-            batch_id, markdown_content, extract_id, error_message, failed_image_count = parser.parse_file(file_path, filename)
+            content_hash = FileParserService.compute_content_hash(file_path)
+            with usage_scope(project_id=reference_file.project_id):
+                future = parser.parse_file_async(file_path, filename, content_hash=content_hash)
+            
+        except Exception as e:
+            _mark_parse_failed(file_id, e)
+            get_usage_tracker().flush()
+            return
+    
+    future.add_done_callback(lambda done: _complete_parse(file_id, filename, content_hash, app, done))
+
+
+def _complete_parse(file_id: str, filename: str, content_hash: str, app, future):
+    """Store the result of a finished parse_file_async future on the reference file"""
+    with app.app_context():
+        try:
+            batch_id, markdown_content, extract_id, error_message, failed_image_count = future.result()
+            reference_file = ReferenceFile.query.get(file_id)
+            if not reference_file:
+                logger.error(f"Reference file {file_id} was deleted while parsing")
+                return
             
             # Update database
             reference_file.mineru_batch_id = batch_id
@@ -81,6 +134,9 @@ def _parse_file_async(file_id: str, file_path: str, filename: str, app):
             else:
                 reference_file.parse_status = 'completed'
                 reference_file.markdown_content = markdown_content
+                # Hold a reference on the shared parse result so deletes don't remove it under other files
+                if ParsedFileCache.acquire(content_hash):
+                    reference_file.content_hash = content_hash
                 if failed_image_count > 0:
                     logger.warning(f"File parsing completed: {filename}, but {failed_image_count} images failed to generate captions")
                 else:
@@ -90,16 +146,22 @@ def _parse_file_async(file_id: str, file_path: str, filename: str, app):
             db.session.commit()
             
         except Exception as e:
-            logger.error(f"Error in async file parsing: {str(e)}", exc_info=True)
-            try:
-                reference_file = ReferenceFile.query.get(file_id)
-                if reference_file:
-                    reference_file.parse_status = 'failed'
-                    reference_file.error_message = f"Parsing error: {str(e)}"
-                    reference_file.updated_at = datetime.utcnow()
-                    db.session.commit()
-            except Exception as db_error:
-                logger.error(f"Failed to update error status: {str(db_error)}")
+            _mark_parse_failed(file_id, e)
+        finally:
+            get_usage_tracker().flush()
+
+
+def _mark_parse_failed(file_id: str, error: Exception):
+    logger.error(f"Error in async file parsing: {str(error)}", exc_info=True)
+    try:
+        reference_file = ReferenceFile.query.get(file_id)
+        if reference_file:
+            reference_file.parse_status = 'failed'
+            reference_file.error_message = f"Parsing error: {str(error)}"
+            reference_file.updated_at = datetime.utcnow()
+            db.session.commit()
+    except Exception as db_error:
+        logger.error(f"Failed to update error status: {str(db_error)}")
 
 
 @reference_file_bp.route('/upload', methods=['POST'])
@@ -254,9 +316,13 @@ def delete_reference_file(file_id):
         except Exception as e:
             logger.warning(f"Failed to delete file from disk: {str(e)}")
         
+        # Release shared parse result; extracted files are removed once nothing references them
+        unreferenced_extract_id = _release_parse_cache(reference_file)
+        
         # Delete from database
         db.session.delete(reference_file)
         db.session.commit()
+        _delete_extract_dir(unreferenced_extract_id)
         
         logger.info(f"Deleted reference file: {file_id}")
         
@@ -332,7 +398,9 @@ def trigger_file_parse(file_id):
             # 清空之前的解析结果，以便重新解析
             reference_file.markdown_content = None
             reference_file.mineru_batch_id = None
+            unreferenced_extract_id = _release_parse_cache(reference_file)
             db.session.commit()
+            _delete_extract_dir(unreferenced_extract_id)
         
         # 获取文件路径
         upload_folder = current_app.config['UPLOAD_FOLDER']
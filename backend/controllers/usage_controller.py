@@ -0,0 +1,120 @@
+"""Usage Controller - AI / OCR / 修复调用用量查询"""
+
+import logging
+from datetime import datetime
+from flask import Blueprint, request
+from models import UsageStat
+from services.usage_tracker import LATENCY_BUCKETS, get_usage_tracker, merge_entry
+from utils import success_response, error_response, bad_request
+
+logger = logging.getLogger(__name__)
+
+usage_bp = Blueprint('usage', __name__, url_prefix='/api')
+
+_TOTAL_FIELDS = ('calls', 'errors', 'input_tokens', 'output_tokens', 'cached_tokens', 'total_latency_ms')
+
+
+def _summarize(stats, group_by):
+    """
+    按字段分组汇总
+
+    Args:
+        stats: UsageStat 列表
+        group_by: 分组字段，如 ('category',)；为空时返回总计
+
+    Returns:
+        group_by 为空时返回单个汇总；否则返回汇总列表，每项带上分组字段
+    """
+    groups = {}
+    for stat in stats:
+        key = tuple(getattr(stat, field) for field in group_by)
+        entry = groups.get(key)
+        if entry is None:
+            entry = groups[key] = {field: 0 for field in _TOTAL_FIELDS}
+            entry['max_latency_ms'] = 0.0
+            entry['latency_buckets'] = [0] * (len(LATENCY_BUCKETS) + 1)
+        merge_entry(entry, {
+            **{field: getattr(stat, field) or 0 for field in _TOTAL_FIELDS},
+            'max_latency_ms': stat.max_latency_ms or 0.0,
+            'latency_buckets': stat.get_latency_buckets() or [0] * (len(LATENCY_BUCKETS) + 1),
+        })
+
+    summaries = []
+    for key, entry in groups.items():
+        entry['total_latency_ms'] = round(entry['total_latency_ms'], 1)
+        entry['avg_latency_ms'] = round(entry['total_latency_ms'] / entry['calls'], 1) if entry['calls'] else 0.0
+        entry['max_latency_ms'] = round(entry['max_latency_ms'], 1)
+        summaries.append({**dict(zip(group_by, key)), **entry})
+
+    if not group_by:
+        return summaries[0] if summaries else {
+            **{field: 0 for field in _TOTAL_FIELDS}, 'avg_latency_ms': 0.0, 'max_latency_ms': 0.0,
+            'latency_buckets': [0] * (len(LATENCY_BUCKETS) + 1)
+        }
+    return sorted(summaries, key=lambda item: -item['total_latency_ms'])
+
+
+@usage_bp.route('/projects/<project_id>/usage', methods=['GET'])
+def get_project_usage(project_id):
+    """
+    GET /api/projects/{project_id}/usage - 项目的调用用量
+
+    Query params:
+        task_id: 只看某个任务
+
+    Returns:
+        totals（总计）、by_category、by_task、items（每个 类别/provider/模型/操作 的明细）
+    """
+    try:
+        get_usage_tracker().flush()
+
+        query = UsageStat.query.filter(UsageStat.project_id == project_id)
+        task_id = request.args.get('task_id')
+        if task_id:
+            query = query.filter(UsageStat.task_id == task_id)
+        stats = query.all()
+
+        return success_response({
+            'project_id': project_id,
+            'latency_buckets': list(LATENCY_BUCKETS),
+            'totals': _summarize(stats, ()),
+            'by_category': _summarize(stats, ('category', 'provider')),
+            'by_task': _summarize(stats, ('task_id',)),
+            'items': [stat.to_dict() for stat in sorted(stats, key=lambda s: -(s.total_latency_ms or 0))],
+        })
+
+    except Exception as e:
+        logger.error(f"get_project_usage failed: {str(e)}", exc_info=True)
+        return error_response('SERVER_ERROR', str(e), 500)
+
+
+@usage_bp.route('/usage', methods=['GET'])
+def get_usage():
+    """
+    GET /api/usage - 全部项目的调用用量，按 类别/provider/模型/操作 汇总
+
+    Query params:
+        since: ISO 时间，只统计此后有更新的聚合（聚合按项目/任务累计，时间粒度为整条聚合）
+    """
+    try:
+        get_usage_tracker().flush()
+
+        query = UsageStat.query
+        since = request.args.get('since')
+        if since:
+            try:
+                query = query.filter(UsageStat.updated_at >= datetime.fromisoformat(since))
+            except ValueError:
+                return bad_request("since must be an ISO 8601 datetime")
+        stats = query.all()
+
+        return success_response({
+            'latency_buckets': list(LATENCY_BUCKETS),
+            'totals': _summarize(stats, ()),
+            'by_category': _summarize(stats, ('category', 'provider')),
+            'items': _summarize(stats, ('category', 'provider', 'model', 'operation')),
+        })
+
+    except Exception as e:
+        logger.error(f"get_usage failed: {str(e)}", exc_info=True)
+        return error_response('SERVER_ERROR', str(e), 500)
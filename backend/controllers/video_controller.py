@@ -2,7 +2,6 @@
 Video Controller - handles video analysis endpoints
 """
 import os
-import time
 import logging
 from datetime import datetime, timezone
 from flask import Blueprint, request, current_app
@@ -11,10 +10,15 @@ from utils import success_response, error_response, bad_request
 from google import genai
 from google.genai import types
 from models import VideoAnalysis
+from services.async_poller import get_async_poller, BackoffPolicy, PollTimeoutError
 
 logger = logging.getLogger(__name__)
 video_bp = Blueprint('video', __name__, url_prefix='/api')
 
+# GenAI video processing usually takes from a few seconds to a few minutes
+VIDEO_POLL_POLICY = BackoffPolicy(initial_interval=1.0, max_interval=10.0, multiplier=1.5)
+VIDEO_PROCESSING_TIMEOUT = 600
+
 
 def _get_genai_client():
     """Get Google GenAI client instance"""
@@ -108,11 +112,26 @@ def analyze_video():
             uploaded_file = client.files.upload(file=file_path)
             logger.info(f"Video uploaded to GenAI, initial state: {uploaded_file.state.name}")
             
-            # Wait for video processing to complete
-            while uploaded_file.state.name == "PROCESSING":
-                logger.info(f"Video processing in progress...")
-                time.sleep(3)  # Check every 3 seconds
-                uploaded_file = client.files.get(name=uploaded_file.name)
+            # Wait for video processing to complete. The response carries the analysis, so this
+            # request thread stays blocked until the shared poller (with backoff) reports a final state
+            if uploaded_file.state.name == "PROCESSING":
+                logger.info("Video processing in progress...")
+                file_name = uploaded_file.name
+
+                def check_processing():
+                    current = client.files.get(name=file_name)
+                    return current.state.name != "PROCESSING", current
+
+                try:
+                    uploaded_file = get_async_poller().wait(
+                        check_processing,
+                        timeout=VIDEO_PROCESSING_TIMEOUT,
+                        policy=VIDEO_POLL_POLICY,
+                        name=f"genai-video:{file_name}"
+                    )
+                except PollTimeoutError:
+                    logger.error("Video processing timed out")
+                    return error_response('VIDEO_PROCESSING_TIMEOUT', 'Video processing timed out', 504)
             
             if uploaded_file.state.name == "FAILED":
                 logger.error("Video processing failed")
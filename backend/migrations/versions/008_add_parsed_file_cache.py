@@ -0,0 +1,52 @@
+"""Add parsed_file_cache table and reference_files.content_hash
+
+Revision ID: 008_add_parsed_file_cache
+Revises: 006_add_export_settings, 007_add_video_analyses_table
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+# Also merges the two existing heads (006 and 007) back into a single line.
+revision = '008_add_parsed_file_cache'
+down_revision = ('006_add_export_settings', '007_add_video_analyses_table')
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Add content-hash parse cache.
+    - parsed_file_cache: SHA-256 of uploaded bytes -> MinerU extract_id / markdown, with ref_count
+    - reference_files.content_hash: links a reference file to its cache entry
+    """
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    if 'parsed_file_cache' not in inspector.get_table_names():
+        op.create_table('parsed_file_cache',
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('extract_id', sa.String(length=36), nullable=True),
+        sa.Column('mineru_batch_id', sa.String(length=100), nullable=True),
+        sa.Column('markdown_content', sa.Text(), nullable=True),
+        sa.Column('failed_image_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('content_hash')
+        )
+
+    columns = [c['name'] for c in inspector.get_columns('reference_files')]
+    if 'content_hash' not in columns:
+        op.add_column('reference_files', sa.Column('content_hash', sa.String(64), nullable=True))
+        op.create_index('ix_reference_files_content_hash', 'reference_files', ['content_hash'])
+
+
+def downgrade() -> None:
+    """Remove content-hash parse cache"""
+    op.drop_index('ix_reference_files_content_hash', table_name='reference_files')
+    op.drop_column('reference_files', 'content_hash')
+    op.drop_table('parsed_file_cache')
@@ -0,0 +1,37 @@
+"""add export enhance threshold to projects
+
+Revision ID: 009_add_export_enhance_threshold
+Revises: 008_add_parsed_file_cache
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = '009_add_export_enhance_threshold'
+down_revision = '008_add_parsed_file_cache'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Add export_enhance_threshold to projects table.
+    - export_enhance_threshold: quality gate for generative enhancement after hybrid inpainting
+      (NULL uses the built-in default, 0 always enhances)
+    """
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    columns = [col['name'] for col in inspector.get_columns('projects')]
+    if 'export_enhance_threshold' not in columns:
+        op.add_column('projects', sa.Column('export_enhance_threshold', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """
+    Remove export_enhance_threshold from projects table.
+    """
+    op.drop_column('projects', 'export_enhance_threshold')
@@ -0,0 +1,59 @@
+"""add usage_stats table
+
+Revision ID: 010_add_usage_stats
+Revises: 009_add_export_enhance_threshold
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = '010_add_usage_stats'
+down_revision = '009_add_export_enhance_threshold'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Add usage_stats table.
+    - Aggregated call counts, errors, tokens and latency histograms of AI / OCR / inpainting calls,
+      keyed by project, task, category, provider, model and operation
+    """
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    if 'usage_stats' in inspector.get_table_names():
+        return
+
+    op.create_table('usage_stats',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('project_id', sa.String(length=36), nullable=True),
+    sa.Column('task_id', sa.String(length=36), nullable=True),
+    sa.Column('category', sa.String(length=30), nullable=False),
+    sa.Column('provider', sa.String(length=50), nullable=False),
+    sa.Column('model', sa.String(length=100), nullable=True),
+    sa.Column('operation', sa.String(length=100), nullable=False),
+    sa.Column('calls', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('errors', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('input_tokens', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('output_tokens', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('cached_tokens', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('total_latency_ms', sa.Float(), nullable=False, server_default='0'),
+    sa.Column('max_latency_ms', sa.Float(), nullable=False, server_default='0'),
+    sa.Column('latency_buckets', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_usage_stats_project_id', 'usage_stats', ['project_id'])
+    op.create_index('ix_usage_stats_task_id', 'usage_stats', ['task_id'])
+
+
+def downgrade() -> None:
+    """Remove usage_stats table"""
+    op.drop_index('ix_usage_stats_task_id', table_name='usage_stats')
+    op.drop_index('ix_usage_stats_project_id', table_name='usage_stats')
+    op.drop_table('usage_stats')
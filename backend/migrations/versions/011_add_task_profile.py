@@ -0,0 +1,37 @@
+"""add profile to tasks
+
+Revision ID: 011_add_task_profile
+Revises: 010_add_usage_stats
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = '011_add_task_profile'
+down_revision = '010_add_usage_stats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Add profile to tasks table.
+    - profile: JSON profiling result (stage timeline, memory peaks, profiler summary),
+      only set for tasks started with profiling enabled
+    """
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    columns = [col['name'] for col in inspector.get_columns('tasks')]
+    if 'profile' not in columns:
+        op.add_column('tasks', sa.Column('profile', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """
+    Remove profile from tasks table.
+    """
+    op.drop_column('tasks', 'profile')
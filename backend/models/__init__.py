@@ -25,6 +25,8 @@ from .material import Material
 from .reference_file import ReferenceFile
 from .settings import Settings
 from .video_analysis import VideoAnalysis
+from .parsed_file_cache import ParsedFileCache
+from .usage_stat import UsageStat
 
-__all__ = ['db', 'Project', 'Page', 'Task', 'UserTemplate', 'PageImageVersion', 'Material', 'ReferenceFile', 'Settings', 'VideoAnalysis']
+__all__ = ['db', 'Project', 'Page', 'Task', 'UserTemplate', 'PageImageVersion', 'Material', 'ReferenceFile', 'Settings', 'VideoAnalysis', 'ParsedFileCache', 'UsageStat']
 
@@ -0,0 +1,102 @@
+"""
+ParsedFileCache model - content-hash index of MinerU parse results
+"""
+from datetime import datetime
+from . import db
+
+
+class ParsedFileCache(db.Model):
+    """
+    ParsedFileCache model - maps the SHA-256 of an uploaded file to a previous parse result
+
+    同一份文件（例如品牌规范 PDF）被上传到多个项目时，直接复用之前的 MinerU 解析结果
+    和提取出的图片目录（mineru_files/{extract_id}）。ref_count 记录引用该结果的参考文件数量，
+    只有引用数归零时才删除共享的提取目录。
+    """
+    __tablename__ = 'parsed_file_cache'
+
+    content_hash = db.Column(db.String(64), primary_key=True)  # SHA-256 hex of file bytes
+    extract_id = db.Column(db.String(36), nullable=True)  # Directory under mineru_files/
+    mineru_batch_id = db.Column(db.String(100), nullable=True)
+    markdown_content = db.Column(db.Text, nullable=True)
+    failed_image_count = db.Column(db.Integer, nullable=False, default=0)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'content_hash': self.content_hash,
+            'extract_id': self.extract_id,
+            'mineru_batch_id': self.mineru_batch_id,
+            'failed_image_count': self.failed_image_count,
+            'ref_count': self.ref_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_used_at': self.last_used_at.isoformat() if self.last_used_at else None,
+        }
+
+    @classmethod
+    def acquire(cls, content_hash):
+        """
+        Increment the reference count for a content hash (caller commits)
+
+        The increment is a single UPDATE so concurrent parses of the same file can't lose a count.
+
+        Returns:
+            The cache entry, or None if no entry exists for this hash
+        """
+        if not content_hash:
+            return None
+        result = db.session.execute(
+            db.update(cls)
+            .where(cls.content_hash == content_hash)
+            .values(ref_count=cls.ref_count + 1, last_used_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            return None
+        return db.session.execute(
+            db.select(cls).where(cls.content_hash == content_hash).execution_options(populate_existing=True)
+        ).scalar_one_or_none()
+
+    @classmethod
+    def release(cls, content_hash):
+        """
+        Decrement the reference count for a content hash (caller commits)
+
+        The decrement is a single UPDATE, and the entry is only deleted by a DELETE that still sees
+        ref_count at zero, so a concurrent acquire or a second release can't delete it twice or
+        drop an entry that was just re-referenced.
+
+        Returns:
+            extract_id whose files can be deleted now that nothing references them, otherwise None
+        """
+        if not content_hash:
+            return None
+        row = db.session.execute(
+            db.update(cls)
+            .where(cls.content_hash == content_hash, cls.ref_count > 0)
+            .values(ref_count=cls.ref_count - 1)
+            .returning(cls.ref_count, cls.extract_id)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if row is None:
+            # Unknown hash, or an entry left at zero references (e.g. stored by a parse that failed later)
+            row = db.session.execute(
+                db.select(cls.ref_count, cls.extract_id).where(cls.content_hash == content_hash)
+            ).first()
+            if row is None:
+                return None
+        if row.ref_count > 0:
+            return None
+
+        deleted = db.session.execute(
+            db.delete(cls)
+            .where(cls.content_hash == content_hash, cls.ref_count <= 0)
+            .execution_options(synchronize_session=False)
+        )
+        return row.extract_id if deleted.rowcount else None
+
+    def __repr__(self):
+        return f'<ParsedFileCache {self.content_hash[:12]}: {self.extract_id} (refs={self.ref_count})>'
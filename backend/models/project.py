@@ -23,6 +23,7 @@ class Project(db.Model):
     # 导出设置
     export_extractor_method = db.Column(db.String(50), nullable=True, default='hybrid')  # 组件提取方法: mineru, hybrid
     export_inpaint_method = db.Column(db.String(50), nullable=True, default='hybrid')  # 背景图获取方法: generative, baidu, hybrid
+    export_enhance_threshold = db.Column(db.Float, nullable=True)  # 混合修复的画质门限，NULL 使用默认值，0 表示总是做画质提升
     status = db.Column(db.String(50), nullable=False, default='DRAFT')
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -58,6 +59,7 @@ class Project(db.Model):
             'template_style': self.template_style,
             'export_extractor_method': self.export_extractor_method or 'hybrid',
             'export_inpaint_method': self.export_inpaint_method or 'hybrid',
+            'export_enhance_threshold': self.export_enhance_threshold,
             'status': self.status,
             'created_at': created_at_str,
             'updated_at': updated_at_str,
@@ -22,6 +22,7 @@ class ReferenceFile(db.Model):
     markdown_content = db.Column(db.Text, nullable=True)  # Parsed markdown with enhanced image descriptions
     error_message = db.Column(db.Text, nullable=True)  # Error message if parsing failed
     mineru_batch_id = db.Column(db.String(100), nullable=True)  # Mineru service batch ID
+    content_hash = db.Column(db.String(64), nullable=True, index=True)  # SHA-256 of file bytes (key into parsed_file_cache)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -19,6 +19,7 @@ class Task(db.Model):
     status = db.Column(db.String(50), nullable=False, default='PENDING')
     progress = db.Column(db.Text, nullable=True)  # JSON string: {"total": 10, "completed": 5, "failed": 0}
     error_message = db.Column(db.Text, nullable=True)
+    profile = db.Column(db.Text, nullable=True)  # JSON string: 性能分析结果（开启分析的任务才有）
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime, nullable=True)
     
@@ -50,6 +51,19 @@ class Task(db.Model):
             prog['failed'] = failed
         self.set_progress(prog)
     
+    def get_profile(self):
+        """Parse profile from JSON string"""
+        if self.profile:
+            try:
+                return json.loads(self.profile)
+            except json.JSONDecodeError:
+                return None
+        return None
+    
+    def set_profile(self, data):
+        """Set profile as JSON string"""
+        self.profile = json.dumps(data, ensure_ascii=False) if data else None
+    
     def to_dict(self):
         """Convert to dictionary"""
         return {
@@ -58,6 +72,7 @@ class Task(db.Model):
             'status': self.status,
             'progress': self.get_progress(),
             'error_message': self.error_message,
+            'has_profile': self.profile is not None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
         }
@@ -0,0 +1,77 @@
+"""
+UsageStat model - aggregated usage of external AI / OCR / inpainting calls
+"""
+import json
+from datetime import datetime
+from . import db
+
+
+class UsageStat(db.Model):
+    """
+    UsageStat model - 按项目、任务、调用类别、provider、模型和操作聚合的调用用量
+
+    由 UsageTracker 定期累加写入：调用次数、失败数、token 数，以及耗时总和、最大值和直方图
+    （桶上界见 services.usage_tracker.LATENCY_BUCKETS，最后一个桶为 +Inf）。
+    """
+    __tablename__ = 'usage_stats'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    project_id = db.Column(db.String(36), nullable=True, index=True)  # Not a foreign key: stats outlive deleted projects
+    task_id = db.Column(db.String(36), nullable=True, index=True)
+    category = db.Column(db.String(30), nullable=False)  # text|image|ocr|inpaint|parse|caption|extract|...
+    provider = db.Column(db.String(50), nullable=False)
+    model = db.Column(db.String(100), nullable=True)
+    operation = db.Column(db.String(100), nullable=False)
+    calls = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Integer, nullable=False, default=0)
+    input_tokens = db.Column(db.Integer, nullable=False, default=0)
+    output_tokens = db.Column(db.Integer, nullable=False, default=0)
+    cached_tokens = db.Column(db.Integer, nullable=False, default=0)
+    total_latency_ms = db.Column(db.Float, nullable=False, default=0.0)
+    max_latency_ms = db.Column(db.Float, nullable=False, default=0.0)
+    latency_buckets = db.Column(db.Text, nullable=True)  # JSON list of per-bucket call counts
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def get_latency_buckets(self):
+        """Parse latency histogram from JSON string"""
+        if self.latency_buckets:
+            try:
+                return json.loads(self.latency_buckets)
+            except json.JSONDecodeError:
+                return []
+        return []
+
+    def add(self, entry):
+        """Accumulate an in-memory aggregate (see UsageTracker) into this row"""
+        for field in ('calls', 'errors', 'input_tokens', 'output_tokens', 'cached_tokens', 'total_latency_ms'):
+            setattr(self, field, (getattr(self, field) or 0) + entry[field])
+        self.max_latency_ms = max(self.max_latency_ms or 0.0, entry['max_latency_ms'])
+        buckets = self.get_latency_buckets()
+        if len(buckets) != len(entry['latency_buckets']):
+            buckets = [0] * len(entry['latency_buckets'])
+        self.latency_buckets = json.dumps([a + b for a, b in zip(buckets, entry['latency_buckets'])])
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'project_id': self.project_id,
+            'task_id': self.task_id,
+            'category': self.category,
+            'provider': self.provider,
+            'model': self.model,
+            'operation': self.operation,
+            'calls': self.calls,
+            'errors': self.errors,
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'cached_tokens': self.cached_tokens,
+            'total_latency_ms': round(self.total_latency_ms or 0.0, 1),
+            'avg_latency_ms': round((self.total_latency_ms or 0.0) / self.calls, 1) if self.calls else 0.0,
+            'max_latency_ms': round(self.max_latency_ms or 0.0, 1),
+            'latency_buckets': self.get_latency_buckets(),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+    def __repr__(self):
+        return f'<UsageStat {self.category}/{self.provider}/{self.operation} calls={self.calls}>'
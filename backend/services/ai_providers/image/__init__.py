@@ -3,6 +3,7 @@ from .base import ImageProvider
 from .genai_provider import GenAIImageProvider
 from .openai_provider import OpenAIImageProvider
 from .baidu_inpainting_provider import BaiduInpaintingProvider, create_baidu_inpainting_provider
+from .tiled_inpainting import TiledInpainter
 
 __all__ = [
     'ImageProvider', 
@@ -10,4 +11,5 @@ __all__ = [
     'OpenAIImageProvider',
     'BaiduInpaintingProvider',
     'create_baidu_inpainting_provider',
+    'TiledInpainter',
 ]
@@ -4,14 +4,19 @@
 
 API文档: https://ai.baidu.com/ai-doc/IMAGEPROCESS/Mk4i6o3w3
 """
+import asyncio
 import logging
 import base64
+import httpx
 import requests
 import json
 from typing import Dict, List, Any, Optional, Tuple
 from PIL import Image
-import io
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from utils import image_ops
+from utils.mask_utils import create_mask_from_bboxes
+from services.usage_tracker import track_usage
+from .tiled_inpainting import TiledInpainter
 
 logger = logging.getLogger(__name__)
 
@@ -39,18 +44,126 @@ class BaiduInpaintingProvider:
         self.api_key = api_key
         self.api_secret = api_secret
         self.api_url = "https://aip.baidubce.com/rest/2.0/image-process/v1/inpainting"
+        self._tiler = TiledInpainter()
         
         if api_key.startswith('bce-v3/'):
             logger.info("✅ 初始化百度图像修复 Provider (使用BCEv3 API Key)")
         else:
             logger.info("✅ 初始化百度图像修复 Provider (使用Access Token)")
     
+    def _prepare_request(
+        self,
+        image: Image.Image,
+        rectangles: List[Dict[str, int]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        构建修复请求（图片压缩、矩形缩放、编码与认证）
+        
+        Returns:
+            包含 url/headers/body/scale/original_size 的字典；没有有效矩形时返回 None
+        """
+        # 转换图片为RGB模式
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        
+        original_width, original_height = image.size
+        logger.info(f"📏 图片尺寸: {original_width}x{original_height}")
+        
+        # 检查并调整图片大小（最长边不超过5000px）
+        max_size = 5000
+        scale = 1.0
+        if original_width > max_size or original_height > max_size:
+            scale = min(max_size / original_width, max_size / original_height)
+            new_size = (int(original_width * scale), int(original_height * scale))
+            image = image_ops.resize(image, new_size)
+            logger.info(f"✂️ 压缩图片: {image.size}")
+            
+            # 同时缩放矩形区域
+            rectangles = [
+                {
+                    'left': int(r['left'] * scale),
+                    'top': int(r['top'] * scale),
+                    'width': int(r['width'] * scale),
+                    'height': int(r['height'] * scale)
+                }
+                for r in rectangles
+            ]
+        
+        # 过滤掉无效的矩形（宽或高为0）
+        valid_rectangles = [
+            r for r in rectangles 
+            if r['width'] > 0 and r['height'] > 0
+        ]
+        
+        if not valid_rectangles:
+            return None
+        
+        # 转为base64
+        image_base64 = image_ops.to_base64(image, 'JPEG', quality=95)
+        
+        logger.info(f"📦 图片编码完成: {len(image_base64)} bytes, {len(valid_rectangles)} 个矩形区域")
+        
+        # 构建请求头
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+        }
+        
+        # 选择认证方式
+        if self.api_key.startswith('bce-v3/'):
+            headers['Authorization'] = f'Bearer {self.api_key}'
+            url = self.api_url
+            logger.info("🔐 使用BCEv3签名认证")
+        else:
+            url = f"{self.api_url}?access_token={self.api_key}"
+            logger.info("🔐 使用Access Token认证")
+        
+        return {
+            'url': url,
+            'headers': headers,
+            'body': {
+                'image': image_base64,
+                'rectangle': valid_rectangles
+            },
+            'scale': scale,
+            'original_size': (original_width, original_height)
+        }
+    
+    @staticmethod
+    def _parse_result(result: Dict[str, Any], request: Dict[str, Any]) -> Optional[Image.Image]:
+        """解析百度API返回的JSON，必要时恢复到原始尺寸"""
+        # 检查错误 - 抛出异常以触发 @retry 装饰器
+        if 'error_code' in result:
+            error_msg = result.get('error_msg', 'Unknown error')
+            error_code = result.get('error_code')
+            logger.error(f"❌ 百度API错误: [{error_code}] {error_msg}")
+            raise Exception(f"Baidu API error [{error_code}]: {error_msg}")
+        
+        # 解析结果
+        result_image_base64 = result.get('image')
+        if not result_image_base64:
+            logger.error("❌ 百度API返回结果中没有图片")
+            return None
+        
+        # 解码返回的图片
+        result_image_bytes = base64.b64decode(result_image_base64)
+        result_image = image_ops.decode(result_image_bytes)
+        
+        # 如果之前缩放过，恢复到原始尺寸
+        if request['scale'] < 1.0:
+            result_image = image_ops.resize(result_image, request['original_size'])
+            logger.info(f"📐 恢复图片尺寸: {result_image.size}")
+        
+        logger.info(f"✅ 百度图像修复完成!")
+        return result_image
+    
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=0.5, min=1, max=5),
         retry=retry_if_exception_type((requests.exceptions.RequestException, Exception)),
         reraise=True
     )
+    @track_usage('inpaint', 'baidu')
     def inpaint(
         self,
         image: Image.Image,
@@ -77,110 +190,64 @@ class BaiduInpaintingProvider:
         logger.info(f"🔧 开始百度图像修复，共 {len(rectangles)} 个区域")
         
         try:
-            # 转换图片为RGB模式
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            original_width, original_height = image.size
-            logger.info(f"📏 图片尺寸: {original_width}x{original_height}")
-            
-            # 检查并调整图片大小（最长边不超过5000px）
-            max_size = 5000
-            scale = 1.0
-            if original_width > max_size or original_height > max_size:
-                scale = min(max_size / original_width, max_size / original_height)
-                new_size = (int(original_width * scale), int(original_height * scale))
-                image = image.resize(new_size, Image.Resampling.LANCZOS)
-                logger.info(f"✂️ 压缩图片: {image.size}")
-                
-                # 同时缩放矩形区域
-                rectangles = [
-                    {
-                        'left': int(r['left'] * scale),
-                        'top': int(r['top'] * scale),
-                        'width': int(r['width'] * scale),
-                        'height': int(r['height'] * scale)
-                    }
-                    for r in rectangles
-                ]
-            
-            # 过滤掉无效的矩形（宽或高为0）
-            valid_rectangles = [
-                r for r in rectangles 
-                if r['width'] > 0 and r['height'] > 0
-            ]
-            
-            if not valid_rectangles:
+            request = self._prepare_request(image, rectangles)
+            if request is None:
                 logger.warning("过滤后没有有效的矩形区域，返回原图")
                 return image.copy()
             
-            # 转为base64
-            buffer = io.BytesIO()
-            image.save(buffer, format='JPEG', quality=95)
-            image_bytes = buffer.getvalue()
-            image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-            
-            logger.info(f"📦 图片编码完成: {len(image_base64)} bytes, {len(valid_rectangles)} 个矩形区域")
-            
-            # 构建请求头
-            headers = {
-                'Content-Type': 'application/json',
-                'Accept': 'application/json',
-            }
-            
-            # 选择认证方式
-            if self.api_key.startswith('bce-v3/'):
-                headers['Authorization'] = f'Bearer {self.api_key}'
-                url = self.api_url
-                logger.info("🔐 使用BCEv3签名认证")
-            else:
-                url = f"{self.api_url}?access_token={self.api_key}"
-                logger.info("🔐 使用Access Token认证")
-            
-            # 构建请求体
-            request_body = {
-                'image': image_base64,
-                'rectangle': valid_rectangles
-            }
-            
             logger.info("🌐 发送请求到百度图像修复API...")
             response = requests.post(
-                url, 
-                headers=headers, 
-                json=request_body, 
+                request['url'], 
+                headers=request['headers'], 
+                json=request['body'], 
                 timeout=60
             )
             response.raise_for_status()
             
-            result = response.json()
+            return self._parse_result(response.json(), request)
             
-            # 检查错误 - 抛出异常以触发 @retry 装饰器
-            if 'error_code' in result:
-                error_msg = result.get('error_msg', 'Unknown error')
-                error_code = result.get('error_code')
-                logger.error(f"❌ 百度API错误: [{error_code}] {error_msg}")
-                raise Exception(f"Baidu API error [{error_code}]: {error_msg}")
-            
-            # 解析结果
-            result_image_base64 = result.get('image')
-            if not result_image_base64:
-                logger.error("❌ 百度API返回结果中没有图片")
-                return None
-            
-            # 解码返回的图片
-            result_image_bytes = base64.b64decode(result_image_base64)
-            result_image = Image.open(io.BytesIO(result_image_bytes))
+        except Exception as e:
+            logger.error(f"❌ 百度图像修复失败: {str(e)}")
+            raise
+    
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=0.5, min=1, max=5),
+        retry=retry_if_exception_type((httpx.HTTPError, Exception)),
+        reraise=True
+    )
+    @track_usage('inpaint', 'baidu')
+    async def ainpaint(
+        self,
+        image: Image.Image,
+        rectangles: List[Dict[str, int]]
+    ) -> Optional[Image.Image]:
+        """
+        inpaint 的异步版本：使用 httpx 异步客户端发送请求，等待期间不占用线程
+        
+        图片编码与解码在工作线程中进行，参数与返回值同 inpaint
+        """
+        if not rectangles:
+            logger.warning("没有提供矩形区域，返回原图")
+            return image.copy()
+        
+        logger.info(f"🔧 开始百度图像修复（异步），共 {len(rectangles)} 个区域")
+        
+        try:
+            request = await asyncio.to_thread(self._prepare_request, image, rectangles)
+            if request is None:
+                logger.warning("过滤后没有有效的矩形区域，返回原图")
+                return image.copy()
             
-            # 如果之前缩放过，恢复到原始尺寸
-            if scale < 1.0:
-                result_image = result_image.resize(
-                    (original_width, original_height), 
-                    Image.Resampling.LANCZOS
+            async with httpx.AsyncClient(timeout=60) as client:
+                response = await client.post(
+                    request['url'],
+                    headers=request['headers'],
+                    json=request['body']
                 )
-                logger.info(f"📐 恢复图片尺寸: {result_image.size}")
+            response.raise_for_status()
             
-            logger.info(f"✅ 百度图像修复完成!")
-            return result_image
+            return await asyncio.to_thread(self._parse_result, response.json(), request)
             
         except Exception as e:
             logger.error(f"❌ 百度图像修复失败: {str(e)}")
@@ -190,7 +257,8 @@ class BaiduInpaintingProvider:
         self,
         image: Image.Image,
         bboxes: List[Tuple[float, float, float, float]],
-        expand_pixels: int = 2
+        expand_pixels: int = 2,
+        tiled: bool = True
     ) -> Optional[Image.Image]:
         """
         使用bbox格式修复图片
@@ -199,6 +267,7 @@ class BaiduInpaintingProvider:
             image: PIL Image对象
             bboxes: bbox列表，每个bbox格式为 (x0, y0, x1, y1)
             expand_pixels: 扩展像素数，默认2
+            tiled: 是否只上传矩形附近的图块并发修复（默认True），False 时上传整张图片
         
         Returns:
             修复后的PIL Image对象
@@ -220,7 +289,32 @@ class BaiduInpaintingProvider:
                 'height': int(y1 - y0)
             })
         
-        return self.inpaint(image, rectangles)
+        if not tiled:
+            return self.inpaint(image, rectangles)
+        
+        return self._tiler.inpaint(
+            image,
+            create_mask_from_bboxes(image.size, [
+                (r['left'], r['top'], r['left'] + r['width'], r['top'] + r['height'])
+                for r in rectangles
+            ]),
+            lambda tile, tile_mask, box: self.inpaint(tile, self._rectangles_in_tile(rectangles, box))
+        )
+    
+    @staticmethod
+    def _rectangles_in_tile(
+        rectangles: List[Dict[str, int]],
+        box: Tuple[int, int, int, int]
+    ) -> List[Dict[str, int]]:
+        """将矩形裁剪到图块范围内，并转换为图块坐标"""
+        bx0, by0, bx1, by1 = box
+        result = []
+        for r in rectangles:
+            x0, y0 = max(r['left'], bx0), max(r['top'], by0)
+            x1, y1 = min(r['left'] + r['width'], bx1), min(r['top'] + r['height'], by1)
+            if x1 > x0 and y1 > y0:
+                result.append({'left': x0 - bx0, 'top': y0 - by0, 'width': x1 - x0, 'height': y1 - y0})
+        return result
 
 
 def create_baidu_inpainting_provider(
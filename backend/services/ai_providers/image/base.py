@@ -1,6 +1,7 @@
 """
 Abstract base class for image generation providers
 """
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Optional, List
 from PIL import Image
@@ -30,3 +31,30 @@ class ImageProvider(ABC):
             Generated PIL Image object, or None if failed
         """
         pass
+    
+    async def agenerate_image(
+        self,
+        prompt: str,
+        ref_images: Optional[List[Image.Image]] = None,
+        aspect_ratio: str = "16:9",
+        resolution: str = "2K"
+    ) -> Optional[Image.Image]:
+        """
+        Async variant of generate_image
+        
+        The default implementation runs generate_image in a worker thread;
+        providers with a native async client override it.
+        
+        Args:
+            prompt: The image generation prompt
+            ref_images: Optional list of reference images (PIL Image objects)
+            aspect_ratio: Image aspect ratio (e.g., "16:9", "1:1", "4:3")
+            resolution: Image resolution ("1K", "2K", "4K")
+            
+        Returns:
+            Generated PIL Image object, or None if failed
+        """
+        return await asyncio.to_thread(
+            self.generate_image, prompt,
+            ref_images=ref_images, aspect_ratio=aspect_ratio, resolution=resolution
+        )
@@ -9,6 +9,8 @@ import numpy as np
 from tenacity import retry, stop_after_attempt, wait_exponential
 from .genai_provider import GenAIImageProvider
 from config import get_config
+from utils import image_ops
+from services.usage_tracker import track_usage
 
 logger = logging.getLogger(__name__)
 
@@ -72,7 +74,7 @@ class GeminiInpaintingProvider:
         """
         # 确保 mask 和原图尺寸一致
         if mask_image.size != original_image.size:
-            mask_image = mask_image.resize(original_image.size, Image.LANCZOS)
+            mask_image = image_ops.resize(mask_image, original_image.size)
         
         # 转换为 RGB 模式
         if original_image.mode != 'RGB':
@@ -108,6 +110,7 @@ class GeminiInpaintingProvider:
         wait=wait_exponential(multiplier=1, min=2, max=10),  # 指数避让: 2s, 4s, 8s
         reraise=True
     )
+    @track_usage('inpaint', 'gemini')
     def inpaint_image(
         self,
         original_image: Image.Image,
@@ -148,7 +151,7 @@ class GeminiInpaintingProvider:
             # 将原 mask 粘贴到正确的位置
             x0, y0, x1, y1 = crop_box
             # 确保 mask 尺寸匹配
-            mask_resized = mask_image.resize((x1 - x0, y1 - y0), Image.LANCZOS)
+            mask_resized = image_ops.resize(mask_image, (x1 - x0, y1 - y0))
             full_mask.paste(mask_resized, (x0, y0))
             final_mask = full_mask
             logger.info(f"📷 完整页面模式: 页面={final_image.size}, mask扩展到={final_mask.size}, 粘贴位置={crop_box}")
@@ -187,7 +190,7 @@ class GeminiInpaintingProvider:
             # 6. Resize 到原图尺寸
             if result_image.size != final_image.size:
                 logger.info(f"🔄 Resize 从 {result_image.size} 到 {final_image.size}")
-                result_image = result_image.resize(final_image.size, Image.LANCZOS)
+                result_image = image_ops.resize(result_image, final_image.size)
             
             # 7. 合成图像：只在mask区域使用inpaint结果，其他区域保留原图
             logger.info("🎨 合成图像：将inpaint结果与原图按mask合并...")
@@ -1,16 +1,18 @@
 """
 OpenAI SDK implementation for image generation
 """
+import asyncio
 import logging
 import base64
 import re
 import requests
-from io import BytesIO
 from typing import Optional, List
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from PIL import Image
 from .base import ImageProvider
 from config import get_config
+from utils import image_ops
+from services.usage_tracker import record_response_usage, track_usage
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +35,12 @@ class OpenAIImageProvider(ImageProvider):
             timeout=get_config().OPENAI_TIMEOUT,  # set timeout from config
             max_retries=get_config().OPENAI_MAX_RETRIES  # set max retries from config
         )
+        self.async_client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=api_base,
+            timeout=get_config().OPENAI_TIMEOUT,
+            max_retries=get_config().OPENAI_MAX_RETRIES
+        )
         self.model = model
     
     def _encode_image_to_base64(self, image: Image.Image) -> str:
@@ -45,13 +53,158 @@ class OpenAIImageProvider(ImageProvider):
         Returns:
             Base64 encoded string
         """
-        buffered = BytesIO()
         # Convert to RGB if necessary (e.g., RGBA images)
         if image.mode in ('RGBA', 'LA', 'P'):
             image = image.convert('RGB')
-        image.save(buffered, format="JPEG", quality=95)
-        return base64.b64encode(buffered.getvalue()).decode('utf-8')
+        return image_ops.to_base64(image, 'JPEG', quality=95)
+    
+    def _build_messages(
+        self,
+        prompt: str,
+        ref_images: Optional[List[Image.Image]],
+        aspect_ratio: str
+    ) -> List[dict]:
+        """
+        Build chat messages for an image generation request
+        
+        Note: resolution is not supported in OpenAI format, only aspect_ratio via system message
+        """
+        # Build message content
+        content = []
+        
+        # Add reference images first (if any)
+        if ref_images:
+            for ref_img in ref_images:
+                base64_image = self._encode_image_to_base64(ref_img)
+                content.append({
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/jpeg;base64,{base64_image}"
+                    }
+                })
+        
+        # Add text prompt
+        content.append({"type": "text", "text": prompt})
+        
+        return [
+            {"role": "system", "content": f"aspect_ratio={aspect_ratio}"},
+            {"role": "user", "content": content},
+        ]
+    
+    def _extract_image(self, message) -> Image.Image:
+        """
+        Extract the generated image from a response message - handle different response formats
+        
+        Raises:
+            ValueError: No image found in the message
+        """
+        # Debug: log available attributes
+        logger.debug(f"Response message attributes: {dir(message)}")
+        
+        # Try multi_mod_content first (custom format from some proxies)
+        if hasattr(message, 'multi_mod_content') and message.multi_mod_content:
+            parts = message.multi_mod_content
+            for part in parts:
+                if "text" in part:
+                    logger.debug(f"Response text: {part['text'][:100] if len(part['text']) > 100 else part['text']}")
+                if "inline_data" in part:
+                    image_data = base64.b64decode(part["inline_data"]["data"])
+                    image = image_ops.decode(image_data)
+                    logger.debug(f"Successfully extracted image: {image.size}, {image.mode}")
+                    return image
+        
+        # Try standard OpenAI content format (list of content parts)
+        if hasattr(message, 'content') and message.content:
+            # If content is a list (multimodal response)
+            if isinstance(message.content, list):
+                for part in message.content:
+                    if isinstance(part, dict):
+                        # Handle image_url type
+                        if part.get('type') == 'image_url':
+                            image_url = part.get('image_url', {}).get('url', '')
+                            if image_url.startswith('data:image'):
+                                # Extract base64 data from data URL
+                                base64_data = image_url.split(',', 1)[1]
+                                image_data = base64.b64decode(base64_data)
+                                image = image_ops.decode(image_data)
+                                logger.debug(f"Successfully extracted image from content: {image.size}, {image.mode}")
+                                return image
+                        # Handle text type
+                        elif part.get('type') == 'text':
+                            text = part.get('text', '')
+                            if text:
+                                logger.debug(f"Response text: {text[:100] if len(text) > 100 else text}")
+                    elif hasattr(part, 'type'):
+                        # Handle as object with attributes
+                        if part.type == 'image_url':
+                            image_url = getattr(part, 'image_url', {})
+                            if isinstance(image_url, dict):
+                                url = image_url.get('url', '')
+                            else:
+                                url = getattr(image_url, 'url', '')
+                            if url.startswith('data:image'):
+                                base64_data = url.split(',', 1)[1]
+                                image_data = base64.b64decode(base64_data)
+                                image = image_ops.decode(image_data)
+                                logger.debug(f"Successfully extracted image from content object: {image.size}, {image.mode}")
+                                return image
+            # If content is a string, try to extract image from it
+            elif isinstance(message.content, str):
+                content_str = message.content
+                logger.debug(f"Response content (string): {content_str[:200] if len(content_str) > 200 else content_str}")
+                
+                # Try to extract Markdown image URL: ![...](url)
+                markdown_pattern = r'!\[.*?\]\((https?://[^\s\)]+)\)'
+                markdown_matches = re.findall(markdown_pattern, content_str)
+                if markdown_matches:
+                    image_url = markdown_matches[0]  # Use the first image URL found
+                    logger.debug(f"Found Markdown image URL: {image_url}")
+                    try:
+                        response = requests.get(image_url, timeout=30, stream=True)
+                        response.raise_for_status()
+                        image = image_ops.decode(response.content)
+                        logger.debug(f"Successfully downloaded image from Markdown URL: {image.size}, {image.mode}")
+                        return image
+                    except Exception as download_error:
+                        logger.warning(f"Failed to download image from Markdown URL: {download_error}")
+                
+                # Try to extract plain URL (not in Markdown format)
+                url_pattern = r'(https?://[^\s\)\]]+\.(?:png|jpg|jpeg|gif|webp|bmp)(?:\?[^\s\)\]]*)?)'
+                url_matches = re.findall(url_pattern, content_str, re.IGNORECASE)
+                if url_matches:
+                    image_url = url_matches[0]
+                    logger.debug(f"Found plain image URL: {image_url}")
+                    try:
+                        response = requests.get(image_url, timeout=30, stream=True)
+                        response.raise_for_status()
+                        image = image_ops.decode(response.content)
+                        logger.debug(f"Successfully downloaded image from plain URL: {image.size}, {image.mode}")
+                        return image
+                    except Exception as download_error:
+                        logger.warning(f"Failed to download image from plain URL: {download_error}")
+                
+                # Try to extract base64 data URL from string
+                base64_pattern = r'data:image/[^;]+;base64,([A-Za-z0-9+/=]+)'
+                base64_matches = re.findall(base64_pattern, content_str)
+                if base64_matches:
+                    base64_data = base64_matches[0]
+                    logger.debug(f"Found base64 image data in string")
+                    try:
+                        image_data = base64.b64decode(base64_data)
+                        image = image_ops.decode(image_data)
+                        logger.debug(f"Successfully extracted base64 image from string: {image.size}, {image.mode}")
+                        return image
+                    except Exception as decode_error:
+                        logger.warning(f"Failed to decode base64 image from string: {decode_error}")
+        
+        # Log raw response for debugging
+        logger.warning(f"Unable to extract image. Raw message type: {type(message)}")
+        logger.warning(f"Message content type: {type(getattr(message, 'content', None))}")
+        logger.warning(f"Message content: {getattr(message, 'content', 'N/A')}")
+        
+        raise ValueError("No valid multimodal response received from OpenAI API")
     
+    @track_usage('image', 'openai')
     def generate_image(
         self,
         prompt: str,
@@ -74,148 +227,63 @@ class OpenAIImageProvider(ImageProvider):
             Generated PIL Image object, or None if failed
         """
         try:
-            # Build message content
-            content = []
-            
-            # Add reference images first (if any)
-            if ref_images:
-                for ref_img in ref_images:
-                    base64_image = self._encode_image_to_base64(ref_img)
-                    content.append({
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
-                        }
-                    })
-            
-            # Add text prompt
-            content.append({"type": "text", "text": prompt})
+            messages = self._build_messages(prompt, ref_images, aspect_ratio)
             
             logger.debug(f"Calling OpenAI API for image generation with {len(ref_images) if ref_images else 0} reference images...")
             logger.debug(f"Config - aspect_ratio: {aspect_ratio} (resolution ignored, OpenAI format only supports 1K)")
             
-            # Note: resolution is not supported in OpenAI format, only aspect_ratio via system message
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": f"aspect_ratio={aspect_ratio}"},
-                    {"role": "user", "content": content},
-                ],
+                messages=messages,
                 modalities=["text", "image"]
             )
             
+            record_response_usage(response)
             logger.debug("OpenAI API call completed")
             
-            # Extract image from response - handle different response formats
-            message = response.choices[0].message
+            return self._extract_image(response.choices[0].message)
             
-            # Debug: log available attributes
-            logger.debug(f"Response message attributes: {dir(message)}")
+        except Exception as e:
+            error_detail = f"Error generating image with OpenAI (model={self.model}): {type(e).__name__}: {str(e)}"
+            logger.error(error_detail, exc_info=True)
+            raise Exception(error_detail) from e
+    
+    @track_usage('image', 'openai')
+    async def agenerate_image(
+        self,
+        prompt: str,
+        ref_images: Optional[List[Image.Image]] = None,
+        aspect_ratio: str = "16:9",
+        resolution: str = "2K"
+    ) -> Optional[Image.Image]:
+        """
+        Generate image using the async OpenAI client
+        
+        Reference image encoding and response decoding run in a worker thread
+        so that large payloads do not block the event loop.
+        
+        Args:
+            prompt: The image generation prompt
+            ref_images: Optional list of reference images
+            aspect_ratio: Image aspect ratio
+            resolution: Image resolution (only 1K supported, parameter ignored)
             
-            # Try multi_mod_content first (custom format from some proxies)
-            if hasattr(message, 'multi_mod_content') and message.multi_mod_content:
-                parts = message.multi_mod_content
-                for part in parts:
-                    if "text" in part:
-                        logger.debug(f"Response text: {part['text'][:100] if len(part['text']) > 100 else part['text']}")
-                    if "inline_data" in part:
-                        image_data = base64.b64decode(part["inline_data"]["data"])
-                        image = Image.open(BytesIO(image_data))
-                        logger.debug(f"Successfully extracted image: {image.size}, {image.mode}")
-                        return image
+        Returns:
+            Generated PIL Image object, or None if failed
+        """
+        try:
+            messages = await asyncio.to_thread(self._build_messages, prompt, ref_images, aspect_ratio)
             
-            # Try standard OpenAI content format (list of content parts)
-            if hasattr(message, 'content') and message.content:
-                # If content is a list (multimodal response)
-                if isinstance(message.content, list):
-                    for part in message.content:
-                        if isinstance(part, dict):
-                            # Handle image_url type
-                            if part.get('type') == 'image_url':
-                                image_url = part.get('image_url', {}).get('url', '')
-                                if image_url.startswith('data:image'):
-                                    # Extract base64 data from data URL
-                                    base64_data = image_url.split(',', 1)[1]
-                                    image_data = base64.b64decode(base64_data)
-                                    image = Image.open(BytesIO(image_data))
-                                    logger.debug(f"Successfully extracted image from content: {image.size}, {image.mode}")
-                                    return image
-                            # Handle text type
-                            elif part.get('type') == 'text':
-                                text = part.get('text', '')
-                                if text:
-                                    logger.debug(f"Response text: {text[:100] if len(text) > 100 else text}")
-                        elif hasattr(part, 'type'):
-                            # Handle as object with attributes
-                            if part.type == 'image_url':
-                                image_url = getattr(part, 'image_url', {})
-                                if isinstance(image_url, dict):
-                                    url = image_url.get('url', '')
-                                else:
-                                    url = getattr(image_url, 'url', '')
-                                if url.startswith('data:image'):
-                                    base64_data = url.split(',', 1)[1]
-                                    image_data = base64.b64decode(base64_data)
-                                    image = Image.open(BytesIO(image_data))
-                                    logger.debug(f"Successfully extracted image from content object: {image.size}, {image.mode}")
-                                    return image
-                # If content is a string, try to extract image from it
-                elif isinstance(message.content, str):
-                    content_str = message.content
-                    logger.debug(f"Response content (string): {content_str[:200] if len(content_str) > 200 else content_str}")
-                    
-                    # Try to extract Markdown image URL: ![...](url)
-                    markdown_pattern = r'!\[.*?\]\((https?://[^\s\)]+)\)'
-                    markdown_matches = re.findall(markdown_pattern, content_str)
-                    if markdown_matches:
-                        image_url = markdown_matches[0]  # Use the first image URL found
-                        logger.debug(f"Found Markdown image URL: {image_url}")
-                        try:
-                            response = requests.get(image_url, timeout=30, stream=True)
-                            response.raise_for_status()
-                            image = Image.open(BytesIO(response.content))
-                            image.load()  # Ensure image is fully loaded
-                            logger.debug(f"Successfully downloaded image from Markdown URL: {image.size}, {image.mode}")
-                            return image
-                        except Exception as download_error:
-                            logger.warning(f"Failed to download image from Markdown URL: {download_error}")
-                    
-                    # Try to extract plain URL (not in Markdown format)
-                    url_pattern = r'(https?://[^\s\)\]]+\.(?:png|jpg|jpeg|gif|webp|bmp)(?:\?[^\s\)\]]*)?)'
-                    url_matches = re.findall(url_pattern, content_str, re.IGNORECASE)
-                    if url_matches:
-                        image_url = url_matches[0]
-                        logger.debug(f"Found plain image URL: {image_url}")
-                        try:
-                            response = requests.get(image_url, timeout=30, stream=True)
-                            response.raise_for_status()
-                            image = Image.open(BytesIO(response.content))
-                            image.load()
-                            logger.debug(f"Successfully downloaded image from plain URL: {image.size}, {image.mode}")
-                            return image
-                        except Exception as download_error:
-                            logger.warning(f"Failed to download image from plain URL: {download_error}")
-                    
-                    # Try to extract base64 data URL from string
-                    base64_pattern = r'data:image/[^;]+;base64,([A-Za-z0-9+/=]+)'
-                    base64_matches = re.findall(base64_pattern, content_str)
-                    if base64_matches:
-                        base64_data = base64_matches[0]
-                        logger.debug(f"Found base64 image data in string")
-                        try:
-                            image_data = base64.b64decode(base64_data)
-                            image = Image.open(BytesIO(image_data))
-                            logger.debug(f"Successfully extracted base64 image from string: {image.size}, {image.mode}")
-                            return image
-                        except Exception as decode_error:
-                            logger.warning(f"Failed to decode base64 image from string: {decode_error}")
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                modalities=["text", "image"]
+            )
             
-            # Log raw response for debugging
-            logger.warning(f"Unable to extract image. Raw message type: {type(message)}")
-            logger.warning(f"Message content type: {type(getattr(message, 'content', None))}")
-            logger.warning(f"Message content: {getattr(message, 'content', 'N/A')}")
+            record_response_usage(response)
+            logger.debug("OpenAI API call completed (async)")
             
-            raise ValueError("No valid multimodal response received from OpenAI API")
+            return await asyncio.to_thread(self._extract_image, response.choices[0].message)
             
         except Exception as e:
             error_detail = f"Error generating image with OpenAI (model={self.model}): {type(e).__name__}: {str(e)}"
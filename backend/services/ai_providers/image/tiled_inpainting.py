@@ -0,0 +1,208 @@
+"""
+分块 Inpainting 包装器
+只把掩码覆盖的局部区域（带边距的图块）发送给远程修复服务，再羽化拼回原图
+
+百度 / 火山引擎的修复接口每次都要上传整张（可能被压缩的）幻灯片，
+而掩码往往只覆盖几行文字。分块后：
+- 请求体只包含掩码附近的小图块，体积大幅下降
+- 图块不需要整体压缩，不会损失分辨率
+- 多个图块可以并发修复
+"""
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from utils import image_ops
+from utils.mask_utils import dilate_mask, merge_overlapping_bboxes
+from services.usage_tracker import propagate_context
+
+logger = logging.getLogger(__name__)
+
+# (tile_image, tile_mask, tile_box) -> 修复后的图块；tile_box 为图块在原图中的 (x0, y0, x1, y1)
+TileInpaintFn = Callable[[Image.Image, Image.Image, Tuple[int, int, int, int]], Optional[Image.Image]]
+
+
+class TiledInpainter:
+    """
+    按掩码连通区域分块修复
+
+    使用方式：
+        >>> tiler = TiledInpainter(padding=48, max_workers=4)
+        >>> result = tiler.inpaint(image, mask, lambda tile, tile_mask, box: provider.inpaint_image(tile, tile_mask))
+    """
+
+    def __init__(
+        self,
+        padding: int = 48,
+        feather: int = 8,
+        min_tile_size: int = 256,
+        max_workers: int = 4,
+        full_image_ratio: float = 0.5
+    ):
+        """
+        Args:
+            padding: 图块在掩码区域外保留的上下文边距（像素），相距小于该值的区域会合并为同一图块
+            feather: 拼接时掩码边缘的羽化半径（像素）
+            min_tile_size: 图块最小边长，太小的图块修复服务缺少上下文
+            max_workers: 并发修复的图块数
+            full_image_ratio: 图块总面积超过原图该比例时，直接整图修复（一次调用更划算）
+        """
+        self.padding = padding
+        self.feather = feather
+        self.min_tile_size = min_tile_size
+        self.max_workers = max_workers
+        self.full_image_ratio = full_image_ratio
+
+    def compute_tiles(self, mask: Image.Image) -> List[Tuple[int, int, int, int]]:
+        """
+        根据掩码计算需要修复的图块
+
+        先把掩码缩到 padding/2 大小的网格上做 8 邻域连通区域标记，
+        再把每个区域扩展 padding 边距，最后合并互相重叠的图块。
+
+        Returns:
+            图块列表 [(x0, y0, x1, y1), ...]，掩码为空时返回空列表
+        """
+        m = np.asarray(mask.convert('L')) > 127
+        if not m.any():
+            return []
+
+        height, width = m.shape
+        cell = max(4, self.padding // 2)
+        grid_h, grid_w = math.ceil(height / cell), math.ceil(width / cell)
+        padded = np.zeros((grid_h * cell, grid_w * cell), dtype=bool)
+        padded[:height, :width] = m
+        grid = padded.reshape(grid_h, cell, grid_w, cell).any(axis=(1, 3))
+
+        boxes = []
+        for gy0, gx0, gy1, gx1 in self._label_components(grid):
+            # 在格子范围内取精确的掩码边界
+            y0, y1 = gy0 * cell, min(height, gy1 * cell)
+            x0, x1 = gx0 * cell, min(width, gx1 * cell)
+            region = m[y0:y1, x0:x1]
+            rows = np.flatnonzero(region.any(axis=1))
+            cols = np.flatnonzero(region.any(axis=0))
+            boxes.append(self._expand_box(
+                (x0 + cols[0], y0 + rows[0], x0 + cols[-1] + 1, y0 + rows[-1] + 1),
+                width, height
+            ))
+
+        return merge_overlapping_bboxes(boxes, merge_threshold=0)
+
+    def inpaint(
+        self,
+        image: Image.Image,
+        mask: Image.Image,
+        inpaint_tile: TileInpaintFn
+    ) -> Optional[Image.Image]:
+        """
+        分块修复并羽化拼接
+
+        Args:
+            image: 原图
+            mask: 掩码（白色=修复，黑色=保留），尺寸与原图一致
+            inpaint_tile: 单个图块的修复函数
+
+        Returns:
+            修复后的整图；任一图块修复失败返回 None，修复函数抛出的异常会向上传递
+        """
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        mask = mask.convert('L')
+        if mask.size != image.size:
+            mask = mask.resize(image.size, Image.NEAREST)
+
+        tiles = self.compute_tiles(mask)
+        if not tiles:
+            logger.info("掩码为空，无需修复")
+            return image.copy()
+
+        tile_area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in tiles)
+        if tile_area > image.width * image.height * self.full_image_ratio:
+            logger.info(f"图块覆盖 {tile_area / (image.width * image.height):.0%} 的画面，直接整图修复")
+            return inpaint_tile(image, mask, (0, 0, image.width, image.height))
+
+        logger.info(f"分块修复: {len(tiles)} 个图块，覆盖 {tile_area / (image.width * image.height):.1%} 的画面")
+
+        def run(box):
+            return box, inpaint_tile(image_ops.crop(image, box), image_ops.crop(mask, box), box)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tiles))) as executor:
+            results = list(executor.map(propagate_context(run), tiles))
+
+        output = image.copy()
+        for box, tile_result in results:
+            if tile_result is None:
+                logger.error(f"图块 {box} 修复失败")
+                return None
+            self._composite_tile(output, image, mask, box, tile_result)
+
+        return output
+
+    def _composite_tile(self, output: Image.Image, image: Image.Image, mask: Image.Image,
+                        box: Tuple[int, int, int, int], tile_result: Image.Image):
+        """把修复后的图块按羽化掩码贴回原图"""
+        size = (box[2] - box[0], box[3] - box[1])
+        if tile_result.size != size:
+            tile_result = image_ops.resize(tile_result, size)
+        if tile_result.mode != 'RGB':
+            tile_result = tile_result.convert('RGB')
+
+        blend = mask.crop(box)
+        if self.feather > 0:
+            # 先向外扩展再模糊：掩码内部保持完全使用修复结果，过渡带落在掩码外侧
+            blend = Image.fromarray(dilate_mask(np.asarray(blend), self.feather), 'L')
+            blend = blend.filter(ImageFilter.GaussianBlur(self.feather / 2))
+
+        output.paste(Image.composite(tile_result, image.crop(box), blend), box[:2])
+
+    def _expand_box(self, box, width: int, height: int) -> Tuple[int, int, int, int]:
+        """扩展 padding 边距，并保证最小边长（不超出图片范围）"""
+        x0, y0, x1, y1 = (int(v) for v in box)
+        x0, y0 = x0 - self.padding, y0 - self.padding
+        x1, y1 = x1 + self.padding, y1 + self.padding
+
+        def grow(lo, hi, limit):
+            short = self.min_tile_size - (hi - lo)
+            if short > 0:
+                lo -= short // 2
+                hi += short - short // 2
+                if lo < 0:
+                    hi, lo = hi - lo, 0
+                if hi > limit:
+                    lo, hi = lo - (hi - limit), limit
+            return max(0, lo), min(limit, hi)
+
+        x0, x1 = grow(x0, x1, width)
+        y0, y1 = grow(y0, y1, height)
+        return x0, y0, x1, y1
+
+    @staticmethod
+    def _label_components(grid: np.ndarray) -> List[Tuple[int, int, int, int]]:
+        """8 邻域连通区域标记，返回每个区域的网格范围 (y0, x0, y1, x1)（右下角不含）"""
+        visited = np.zeros_like(grid)
+        components = []
+
+        for start_y, start_x in zip(*np.nonzero(grid)):
+            if visited[start_y, start_x]:
+                continue
+            visited[start_y, start_x] = True
+            stack = [(start_y, start_x)]
+            y0, x0, y1, x1 = start_y, start_x, start_y, start_x
+
+            while stack:
+                y, x = stack.pop()
+                y0, x0, y1, x1 = min(y0, y), min(x0, x), max(y1, y), max(x1, x)
+                for ny in range(max(0, y - 1), min(grid.shape[0], y + 2)):
+                    for nx in range(max(0, x - 1), min(grid.shape[1], x + 2)):
+                        if grid[ny, nx] and not visited[ny, nx]:
+                            visited[ny, nx] = True
+                            stack.append((ny, nx))
+
+            components.append((int(y0), int(x0), int(y1) + 1, int(x1) + 1))
+
+        return components
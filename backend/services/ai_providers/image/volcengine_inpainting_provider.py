@@ -2,15 +2,18 @@
 火山引擎 Inpainting 消除服务提供者
 直接HTTP调用，完全绕过SDK限制
 """
+import asyncio
 import logging
 import base64
 import json
 import requests
 from datetime import datetime
-from io import BytesIO
 from typing import Optional
 from PIL import Image
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from utils import image_ops
+from services.usage_tracker import track_usage
+from .tiled_inpainting import TiledInpainter
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +37,7 @@ class VolcengineInpaintingProvider:
         self.access_key = access_key
         self.secret_key = secret_key
         self.timeout = timeout
+        self._tiler = TiledInpainter()
         logger.info("火山引擎 Inpainting Provider 初始化（直接HTTP模式）")
         
     def _encode_image_to_base64(self, image: Image.Image, is_mask: bool = False) -> str:
@@ -44,15 +48,13 @@ class VolcengineInpaintingProvider:
             image: PIL Image对象
             is_mask: 是否是mask图（mask需要特殊处理）
         """
-        buffered = BytesIO()
-        
         if is_mask:
             # Mask要求：单通道灰度图，或RGB值相等的三通道图
             # 转换为灰度图以确保正确
             if image.mode != 'L':
                 image = image.convert('L')
             # 保存为PNG（文档要求8bit PNG，不嵌入ICC Profile）
-            image.save(buffered, format="PNG", optimize=True)
+            return image_ops.to_base64(image, 'PNG', optimize=True)
         else:
             # 原图：转换为 RGB
             if image.mode in ('RGBA', 'LA', 'P'):
@@ -63,9 +65,62 @@ class VolcengineInpaintingProvider:
                 else:
                     image = image.convert('RGB')
             # 保存为 JPEG 减小大小
-            image.save(buffered, format="JPEG", quality=85)
+            return image_ops.to_base64(image, 'JPEG', quality=85)
+    
+    def inpaint_image(
+        self,
+        original_image: Image.Image,
+        mask_image: Image.Image,
+        inpaint_mode: str = "remove",
+        full_page_image: Optional[Image.Image] = None,
+        crop_box: Optional[tuple] = None,
+        tiled: bool = True
+    ) -> Optional[Image.Image]:
+        """
+        使用掩码消除图像中的指定区域
+        
+        默认只把掩码附近的图块发送给火山引擎并发修复，再羽化拼回原图，
+        避免整张图片被压缩到 2048px 以内造成的分辨率损失。
+        
+        Args:
+            original_image: 原始图像
+            mask_image: 掩码图像（白色=消除，黑色=保留）
+            inpaint_mode: 修复模式
+            tiled: 是否分块修复（默认True），False 时上传整张图片
+            
+        Returns:
+            处理后的图像，失败返回 None
+        """
+        if not tiled:
+            return self._inpaint_single(original_image, mask_image)
         
-        return base64.b64encode(buffered.getvalue()).decode('utf-8')
+        try:
+            return self._tiler.inpaint(
+                original_image,
+                mask_image,
+                lambda tile, tile_mask, box: self._inpaint_single(tile, tile_mask)
+            )
+        except Exception as e:
+            logger.error(f"❌ 分块Inpainting失败: {str(e)}", exc_info=True)
+            return None
+    
+    async def ainpaint_image(
+        self,
+        original_image: Image.Image,
+        mask_image: Image.Image,
+        inpaint_mode: str = "remove",
+        tiled: bool = True
+    ) -> Optional[Image.Image]:
+        """
+        inpaint_image 的异步版本
+        
+        请求签名依赖火山引擎 SDK（只有同步接口），因此在工作线程中执行同步调用；
+        参数与返回值同 inpaint_image
+        """
+        return await asyncio.to_thread(
+            self.inpaint_image, original_image, mask_image,
+            inpaint_mode=inpaint_mode, tiled=tiled
+        )
     
     @retry(
         stop=stop_after_attempt(3),  # 最多重试3次
@@ -73,21 +128,18 @@ class VolcengineInpaintingProvider:
         retry=retry_if_exception_type((requests.exceptions.RequestException, Exception)),
         reraise=True
     )
-    def inpaint_image(
+    @track_usage('inpaint', 'volcengine')
+    def _inpaint_single(
         self,
         original_image: Image.Image,
-        mask_image: Image.Image,
-        inpaint_mode: str = "remove",
-        full_page_image: Optional[Image.Image] = None,
-        crop_box: Optional[tuple] = None
+        mask_image: Image.Image
     ) -> Optional[Image.Image]:
         """
-        使用掩码消除图像中的指定区域（带指数避让重试）
+        调用一次火山引擎 inpainting（带指数避让重试）
         
         Args:
-            original_image: 原始图像
+            original_image: 原始图像（或图块）
             mask_image: 掩码图像（白色=消除，黑色=保留）
-            inpaint_mode: 修复模式
             
         Returns:
             处理后的图像，失败返回 None
@@ -98,10 +150,8 @@ class VolcengineInpaintingProvider:
             # 1. 压缩图片（火山引擎限制5MB）
             max_dimension = 2048
             if max(original_image.size) > max_dimension:
-                ratio = max_dimension / max(original_image.size)
-                new_size = tuple(int(dim * ratio) for dim in original_image.size)
-                original_image = original_image.resize(new_size, Image.LANCZOS)
-                mask_image = mask_image.resize(new_size, Image.LANCZOS)
+                original_image = image_ops.fit_within(original_image, max_dimension)
+                mask_image = image_ops.resize(mask_image, original_image.size)
                 logger.info(f"✂️ 压缩图片: {original_image.size}")
             
             # 2. 编码为base64（mask要特殊处理为灰度图）
@@ -187,18 +237,18 @@ class VolcengineInpaintingProvider:
                 
                 if result_base64:
                     image_data = base64.b64decode(result_base64)
-                    inpainted_image = Image.open(BytesIO(image_data))
+                    inpainted_image = image_ops.decode(image_data)
                     logger.info(f"✅ Inpainting成功！结果: {inpainted_image.size}, {inpainted_image.mode}")
                     
                     # 合成：只取inpainting结果的mask区域，其他区域用原图覆盖
                     # 确保尺寸一致
                     if inpainted_image.size != original_image.size:
                         logger.warning(f"尺寸不一致，调整inpainting结果: {inpainted_image.size} -> {original_image.size}")
-                        inpainted_image = inpainted_image.resize(original_image.size, Image.LANCZOS)
+                        inpainted_image = image_ops.resize(inpainted_image, original_image.size)
                     
                     # 确保mask尺寸一致
                     if mask_image.size != original_image.size:
-                        mask_image = mask_image.resize(original_image.size, Image.LANCZOS)
+                        mask_image = image_ops.resize(mask_image, original_image.size)
                     
                     # 确保inpainted_image是RGB模式
                     if inpainted_image.mode != 'RGB':
@@ -5,13 +5,12 @@
 API文档: https://ai.baidu.com/ai-doc/OCR/1k3h7y3db
 """
 import logging
-import base64
 import requests
 import urllib.parse
 from typing import Dict, List, Any, Optional, Literal
-from PIL import Image
-import io
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from utils import image_ops
+from services.usage_tracker import track_usage
 
 logger = logging.getLogger(__name__)
 
@@ -81,6 +80,7 @@ class BaiduAccurateOCRProvider:
         retry=retry_if_exception_type((requests.exceptions.RequestException, Exception)),
         reraise=True
     )
+    @track_usage('ocr', 'baidu_accurate')
     def recognize(
         self,
         image_path: str,
@@ -128,7 +128,7 @@ class BaiduAccurateOCRProvider:
         try:
             # 读取图片并转为base64
             original_width, original_height = 0, 0
-            with Image.open(image_path) as img:
+            with image_ops.load(image_path) as img:
                 # 获取原始图片尺寸
                 original_width, original_height = img.size
                 logger.info(f"📏 图片尺寸: {original_width}x{original_height}")
@@ -148,14 +148,11 @@ class BaiduAccurateOCRProvider:
                 if width > max_size or height > max_size:
                     ratio = min(max_size / width, max_size / height)
                     new_size = (int(width * ratio), int(height * ratio))
-                    img = img.resize(new_size, Image.Resampling.LANCZOS)
+                    img = image_ops.resize(img, new_size)
                     logger.info(f"✂️ 压缩图片: {img.size}")
                 
                 # 转为base64
-                buffer = io.BytesIO()
-                img.save(buffer, format='JPEG', quality=95)
-                image_bytes = buffer.getvalue()
-                image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+                image_base64 = image_ops.to_base64(img, 'JPEG', quality=95)
                 
                 # URL encode
                 image_encoded = urllib.parse.quote(image_base64)
@@ -5,13 +5,12 @@
 API文档: https://ai.baidu.com/ai-doc/OCR/1k3h7y3db
 """
 import logging
-import base64
 import requests
 import urllib.parse
 from typing import Dict, List, Any, Optional
-from PIL import Image
-import io
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from utils import image_ops
+from services.usage_tracker import track_usage
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +41,7 @@ class BaiduTableOCRProvider:
         retry=retry_if_exception_type((requests.exceptions.RequestException, Exception)),
         reraise=True
     )
+    @track_usage('ocr', 'baidu_table')
     def recognize_table(
         self,
         image_path: str,
@@ -69,7 +69,7 @@ class BaiduTableOCRProvider:
         try:
             # 读取图片并转为base64
             original_width, original_height = 0, 0
-            with Image.open(image_path) as img:
+            with image_ops.load(image_path) as img:
                 # 获取原始图片尺寸
                 original_width, original_height = img.size
                 logger.info(f"📏 图片尺寸: {original_width}x{original_height}")
@@ -89,14 +89,11 @@ class BaiduTableOCRProvider:
                 if width > max_size or height > max_size:
                     ratio = min(max_size / width, max_size / height)
                     new_size = (int(width * ratio), int(height * ratio))
-                    img = img.resize(new_size, Image.Resampling.LANCZOS)
+                    img = image_ops.resize(img, new_size)
                     logger.info(f"✂️ 压缩图片: {img.size}")
                 
                 # 转为base64
-                buffer = io.BytesIO()
-                img.save(buffer, format='JPEG', quality=95)
-                image_bytes = buffer.getvalue()
-                image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+                image_base64 = image_ops.to_base64(img, 'JPEG', quality=95)
                 
                 # URL encode
                 image_encoded = urllib.parse.quote(image_base64)
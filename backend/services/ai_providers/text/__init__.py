@@ -2,5 +2,7 @@
 from .base import TextProvider
 from .genai_provider import GenAITextProvider
 from .openai_provider import OpenAITextProvider
+from .prompt_cache import PromptCacheStats, prompt_cache_scope, prompt_cache_stats
 
-__all__ = ['TextProvider', 'GenAITextProvider', 'OpenAITextProvider']
+__all__ = ['TextProvider', 'GenAITextProvider', 'OpenAITextProvider', 'PromptCacheStats',
+           'prompt_cache_scope', 'prompt_cache_stats']
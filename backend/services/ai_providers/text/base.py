@@ -1,7 +1,9 @@
 """
 Abstract base class for text generation providers
 """
+import asyncio
 from abc import ABC, abstractmethod
+from typing import Iterator
 
 
 class TextProvider(ABC):
@@ -20,3 +22,68 @@ class TextProvider(ABC):
             Generated text content
         """
         pass
+    
+    async def agenerate_text(self, prompt: str, thinking_budget: int = 1000) -> str:
+        """
+        Async variant of generate_text
+        
+        The default implementation runs generate_text in a worker thread;
+        providers with a native async client override it so that the call
+        does not occupy a thread while waiting for the model.
+        
+        Args:
+            prompt: The input prompt for text generation
+            thinking_budget: Budget for thinking/reasoning (provider-specific)
+            
+        Returns:
+            Generated text content
+        """
+        return await asyncio.to_thread(self.generate_text, prompt, thinking_budget=thinking_budget)
+    
+    def generate_text_stream(self, prompt: str, thinking_budget: int = 1000) -> Iterator[str]:
+        """
+        Generate text and yield it in chunks as the model produces it
+        
+        The default implementation yields the full result of generate_text
+        as a single chunk; providers that support streaming override it.
+        
+        Args:
+            prompt: The input prompt for text generation
+            thinking_budget: Budget for thinking/reasoning (provider-specific)
+            
+        Yields:
+            Text chunks, in order
+        """
+        yield self.generate_text(prompt, thinking_budget=thinking_budget)
+    
+    def generate_text_with_prefix(self, prefix: str, suffix: str, thinking_budget: int = 1000) -> str:
+        """
+        Generate text for a prompt made of a prefix shared by many calls and a per-call suffix
+        
+        The default implementation sends prefix + suffix as one prompt, which
+        still benefits from providers that cache identical prompt prefixes
+        automatically; providers with explicit context caching override it.
+        
+        Args:
+            prefix: Stable part of the prompt (same across calls)
+            suffix: Call-specific part of the prompt
+            thinking_budget: Budget for thinking/reasoning (provider-specific)
+            
+        Returns:
+            Generated text content
+        """
+        return self.generate_text(prefix + suffix, thinking_budget=thinking_budget)
+    
+    async def agenerate_text_with_prefix(self, prefix: str, suffix: str, thinking_budget: int = 1000) -> str:
+        """
+        Async variant of generate_text_with_prefix
+        
+        Args:
+            prefix: Stable part of the prompt (same across calls)
+            suffix: Call-specific part of the prompt
+            thinking_budget: Budget for thinking/reasoning (provider-specific)
+            
+        Returns:
+            Generated text content
+        """
+        return await self.agenerate_text(prefix + suffix, thinking_budget=thinking_budget)
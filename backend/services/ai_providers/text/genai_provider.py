@@ -5,12 +5,19 @@ Supports two modes:
 - Google AI Studio: Uses API key authentication
 - Vertex AI: Uses GCP service account authentication
 """
+import asyncio
 import logging
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
 from google import genai
-from google.genai import types
+from google.genai import errors, types
 from tenacity import retry, stop_after_attempt, wait_exponential
 from .base import TextProvider
+from .prompt_cache import prompt_cache_stats
 from config import get_config
+from services.usage_tracker import record_response_usage, track_usage
+from services.metrics import record_cache_lookup
 
 logger = logging.getLogger(__name__)
 
@@ -62,11 +69,17 @@ class GenAITextProvider(TextProvider):
             )
 
         self.model = model
+        # prefix -> (context cache name or None if creation failed, local expiry)
+        self._context_caches: Dict[str, Tuple[Optional[str], float]] = {}
+        # Guards the two dicts; cache creation only holds the lock of its own prefix
+        self._context_cache_lock = threading.Lock()
+        self._prefix_locks: Dict[str, threading.Lock] = {}
     
     @retry(
         stop=stop_after_attempt(get_config().GENAI_MAX_RETRIES + 1),
         wait=wait_exponential(multiplier=1, min=2, max=10)
     )
+    @track_usage('text', 'genai')
     def generate_text(self, prompt: str, thinking_budget: int = 1000) -> str:
         """
         Generate text using Google GenAI SDK
@@ -85,12 +98,215 @@ class GenAITextProvider(TextProvider):
                 thinking_config=types.ThinkingConfig(thinking_budget=thinking_budget),
             ),
         )
+        self._record_usage(response)
         return response.text
     
+    @track_usage('text', 'genai')
+    def generate_text_stream(self, prompt: str, thinking_budget: int = 1000) -> Iterator[str]:
+        """
+        Generate text using Google GenAI SDK streaming API
+        
+        Not retried: chunks may already have been consumed when an error occurs.
+        
+        Args:
+            prompt: The input prompt
+            thinking_budget: Thinking budget for the model
+            
+        Yields:
+            Text chunks
+        """
+        last_chunk = None
+        for chunk in self.client.models.generate_content_stream(
+            model=self.model,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                thinking_config=types.ThinkingConfig(thinking_budget=thinking_budget),
+            ),
+        ):
+            last_chunk = chunk
+            if chunk.text:
+                yield chunk.text
+        # Usage metadata is cumulative, so only the final chunk is recorded
+        self._record_usage(last_chunk)
+    
+    @retry(
+        stop=stop_after_attempt(get_config().GENAI_MAX_RETRIES + 1),
+        wait=wait_exponential(multiplier=1, min=2, max=10)
+    )
+    @track_usage('text', 'genai')
+    async def agenerate_text(self, prompt: str, thinking_budget: int = 1000) -> str:
+        """
+        Generate text using the async client of Google GenAI SDK
+        
+        Args:
+            prompt: The input prompt
+            thinking_budget: Thinking budget for the model
+            
+        Returns:
+            Generated text
+        """
+        response = await self.client.aio.models.generate_content(
+            model=self.model,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                thinking_config=types.ThinkingConfig(thinking_budget=thinking_budget),
+            ),
+        )
+        self._record_usage(response)
+        return response.text
+    
+    @retry(
+        stop=stop_after_attempt(get_config().GENAI_MAX_RETRIES + 1),
+        wait=wait_exponential(multiplier=1, min=2, max=10)
+    )
+    @track_usage('text', 'genai')
+    def generate_text_with_prefix(self, prefix: str, suffix: str, thinking_budget: int = 1000) -> str:
+        """
+        Generate text with the shared prefix served from an explicit context cache
+        
+        Falls back to sending prefix + suffix when no cache is available.
+        
+        Args:
+            prefix: Stable part of the prompt (same across calls)
+            suffix: Call-specific part of the prompt
+            thinking_budget: Thinking budget for the model
+            
+        Returns:
+            Generated text
+        """
+        cache_name = self._context_cache_for(prefix)
+        try:
+            response = self.client.models.generate_content(
+                model=self.model,
+                contents=suffix if cache_name else prefix + suffix,
+                config=types.GenerateContentConfig(
+                    thinking_config=types.ThinkingConfig(thinking_budget=thinking_budget),
+                    cached_content=cache_name,
+                ),
+            )
+        except errors.ClientError as e:
+            # The cache may have expired server-side; recreate it on retry
+            self._forget_context_cache(prefix, cache_name, e)
+            raise
+        self._record_usage(response)
+        return response.text
+    
+    @retry(
+        stop=stop_after_attempt(get_config().GENAI_MAX_RETRIES + 1),
+        wait=wait_exponential(multiplier=1, min=2, max=10)
+    )
+    @track_usage('text', 'genai')
+    async def agenerate_text_with_prefix(self, prefix: str, suffix: str, thinking_budget: int = 1000) -> str:
+        """
+        Async variant of generate_text_with_prefix
+        
+        Args:
+            prefix: Stable part of the prompt (same across calls)
+            suffix: Call-specific part of the prompt
+            thinking_budget: Thinking budget for the model
+            
+        Returns:
+            Generated text
+        """
+        # Cache creation is a blocking call guarded by a lock, so concurrent
+        # pages sharing a prefix wait for a single cache instead of creating many
+        cache_name = await asyncio.to_thread(self._context_cache_for, prefix)
+        try:
+            response = await self.client.aio.models.generate_content(
+                model=self.model,
+                contents=suffix if cache_name else prefix + suffix,
+                config=types.GenerateContentConfig(
+                    thinking_config=types.ThinkingConfig(thinking_budget=thinking_budget),
+                    cached_content=cache_name,
+                ),
+            )
+        except errors.ClientError as e:
+            self._forget_context_cache(prefix, cache_name, e)
+            raise
+        self._record_usage(response)
+        return response.text
+    
+    def _context_cache_for(self, prefix: str) -> Optional[str]:
+        """
+        Name of an explicit context cache holding prefix, created on first use
+        
+        Returns None when explicit caching is disabled, the prefix is below the
+        minimum cacheable size, or creation failed. Failures are remembered for
+        one TTL so calls fall back to the full prompt (Gemini may still apply
+        implicit caching to the repeated prefix).
+        """
+        config = get_config()
+        ttl = config.GENAI_CONTEXT_CACHE_TTL
+        if ttl <= 0:
+            return None
+        from services.reference_retrieval import estimate_tokens
+        if estimate_tokens(prefix) < config.GENAI_CONTEXT_CACHE_MIN_TOKENS:
+            return None
+        
+        with self._context_cache_lock:
+            entry = self._context_caches.get(prefix)
+            hit = bool(entry and entry[1] > time.monotonic())
+            record_cache_lookup('genai_context', hit)
+            if hit:
+                return entry[0]
+            prefix_lock = self._prefix_locks.setdefault(prefix, threading.Lock())
+        
+        # Concurrent pages with the same prefix wait for one creation; other prefixes aren't blocked
+        with prefix_lock:
+            with self._context_cache_lock:
+                entry = self._context_caches.get(prefix)
+                if entry and entry[1] > time.monotonic():
+                    return entry[0]
+            
+            try:
+                cache = self.client.caches.create(
+                    model=self.model,
+                    config=types.CreateCachedContentConfig(contents=[prefix], ttl=f"{ttl}s"),
+                )
+                cache_name = cache.name
+                logger.info(f"Created context cache {cache_name} for a {len(prefix)}-char prompt prefix")
+            except Exception as e:
+                logger.warning(f"Context cache creation failed, sending full prompts: {e}")
+                cache_name = None
+            
+            with self._context_cache_lock:
+                now = time.monotonic()
+                expired = [key for key, value in self._context_caches.items() if value[1] <= now]
+                for key in expired:
+                    del self._context_caches[key]
+                    # A held lock means another thread is recreating that prefix right now;
+                    # dropping it would let a later caller start a second creation in parallel
+                    lock = self._prefix_locks.get(key)
+                    if key != prefix and lock is not None and not lock.locked():
+                        del self._prefix_locks[key]
+                # Expire locally a little before the server does
+                self._context_caches[prefix] = (cache_name, now + ttl * 0.9)
+            return cache_name
+    
+    def _forget_context_cache(self, prefix: str, cache_name: Optional[str], error: errors.ClientError):
+        """Drop a cache the server no longer accepts (expired or deleted)"""
+        if not cache_name or error.code not in (403, 404):
+            return
+        with self._context_cache_lock:
+            entry = self._context_caches.get(prefix)
+            if entry and entry[0] == cache_name:
+                del self._context_caches[prefix]
+    
+    @staticmethod
+    def _record_usage(response):
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is None:
+            return
+        record_response_usage(response)
+        prompt_cache_stats.record(
+            'genai', usage.prompt_token_count or 0, usage.cached_content_token_count or 0
+        )
+    
     @retry(
         stop=stop_after_attempt(get_config().GENAI_MAX_RETRIES + 1),
         wait=wait_exponential(multiplier=1, min=2, max=10)
     )
+    @track_usage('text', 'genai')
     def generate_with_image(self, prompt: str, image_path: str, thinking_budget: int = 1000) -> str:
         """
         Generate text with image input using Google GenAI SDK (multimodal)
@@ -118,4 +334,5 @@ class GenAITextProvider(TextProvider):
                 thinking_config=types.ThinkingConfig(thinking_budget=thinking_budget),
             ),
         )
+        self._record_usage(response)
         return response.text
\ No newline at end of file
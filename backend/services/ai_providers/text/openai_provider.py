@@ -2,9 +2,12 @@
 OpenAI SDK implementation for text generation
 """
 import logging
-from openai import OpenAI
+from typing import Iterator
+from openai import AsyncOpenAI, OpenAI
 from .base import TextProvider
+from .prompt_cache import prompt_cache_stats
 from config import get_config
+from services.usage_tracker import record_response_usage, track_usage
 
 logger = logging.getLogger(__name__)
 
@@ -27,8 +30,15 @@ class OpenAITextProvider(TextProvider):
             timeout=get_config().OPENAI_TIMEOUT,  # set timeout from config
             max_retries=get_config().OPENAI_MAX_RETRIES  # set max retries from config
         )
+        self.async_client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=api_base,
+            timeout=get_config().OPENAI_TIMEOUT,
+            max_retries=get_config().OPENAI_MAX_RETRIES
+        )
         self.model = model
     
+    @track_usage('text', 'openai')
     def generate_text(self, prompt: str, thinking_budget: int = 1000) -> str:
         """
         Generate text using OpenAI SDK
@@ -46,4 +56,61 @@ class OpenAITextProvider(TextProvider):
                 {"role": "user", "content": prompt}
             ]
         )
+        self._record_usage(response)
         return response.choices[0].message.content
+    
+    @track_usage('text', 'openai')
+    def generate_text_stream(self, prompt: str, thinking_budget: int = 1000) -> Iterator[str]:
+        """
+        Generate text using OpenAI SDK with stream=True
+        
+        Args:
+            prompt: The input prompt
+            thinking_budget: Not used in OpenAI format, kept for interface compatibility
+            
+        Yields:
+            Text chunks
+        """
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    @track_usage('text', 'openai')
+    async def agenerate_text(self, prompt: str, thinking_budget: int = 1000) -> str:
+        """
+        Generate text using the async OpenAI client
+        
+        Args:
+            prompt: The input prompt
+            thinking_budget: Not used in OpenAI format, kept for interface compatibility
+            
+        Returns:
+            Generated text
+        """
+        response = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "user", "content": prompt}
+            ]
+        )
+        self._record_usage(response)
+        return response.choices[0].message.content
+    
+    @staticmethod
+    def _record_usage(response):
+        """Record prompt/cached token counts (prefixes of 1024+ tokens are cached automatically)"""
+        usage = getattr(response, 'usage', None)
+        if usage is None:
+            return
+        record_response_usage(response)
+        details = getattr(usage, 'prompt_tokens_details', None)
+        prompt_cache_stats.record(
+            'openai', usage.prompt_tokens or 0, getattr(details, 'cached_tokens', None) or 0
+        )
@@ -0,0 +1,81 @@
+"""
+Prompt cache accounting for text providers
+
+Providers report the prompt and cached token counts from each response's
+usage metadata (Gemini implicit/explicit context caching, OpenAI automatic
+prompt caching), so the share of prompt tokens served from provider-side
+caches can be monitored.
+
+prompt_cache_scope() additionally collects the calls made within one unit of work
+(e.g. a description task) so its ratio isn't mixed with concurrent tasks.
+"""
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+
+class PromptCacheStats:
+    """Thread-safe running totals of prompt and cached tokens per provider"""
+
+    def __init__(self):
+        self._totals: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, prompt_tokens: int, cached_tokens: int):
+        """
+        Record the usage of one call
+
+        Args:
+            provider: Provider name, e.g. 'genai' or 'openai'
+            prompt_tokens: Total prompt tokens, cached ones included
+            cached_tokens: Prompt tokens served from the provider's cache
+        """
+        self._add(provider, prompt_tokens, cached_tokens)
+        scoped = _current_scope.get()
+        if scoped is not None and scoped is not self:
+            scoped._add(provider, prompt_tokens, cached_tokens)
+
+    def _add(self, provider: str, prompt_tokens: int, cached_tokens: int):
+        with self._lock:
+            totals = self._totals.setdefault(provider, {'calls': 0, 'prompt_tokens': 0, 'cached_tokens': 0})
+            totals['calls'] += 1
+            totals['prompt_tokens'] += prompt_tokens or 0
+            totals['cached_tokens'] += cached_tokens or 0
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Totals per provider, each with a cached_ratio of cached to prompt tokens"""
+        with self._lock:
+            return {
+                provider: {
+                    **totals,
+                    'cached_ratio': (totals['cached_tokens'] / totals['prompt_tokens'])
+                    if totals['prompt_tokens'] else 0.0
+                }
+                for provider, totals in self._totals.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+
+
+_current_scope: ContextVar[Optional[PromptCacheStats]] = ContextVar('prompt_cache_scope', default=None)
+
+prompt_cache_stats = PromptCacheStats()
+
+
+@contextmanager
+def prompt_cache_scope() -> Iterator[PromptCacheStats]:
+    """
+    Collect the calls recorded in this context into a separate PromptCacheStats
+
+    Work submitted to executors that copy contextvars (generation executor,
+    propagate_context) is included; the process-wide totals are still updated.
+    """
+    stats = PromptCacheStats()
+    token = _current_scope.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_scope.reset(token)
@@ -4,18 +4,19 @@ Based on demo.py and gemini_genai.py
 TODO: use structured output API
 """
 import os
+import asyncio
 import json
 import re
 import logging
 import requests
-from typing import List, Dict, Optional, Union
+from typing import Any, Iterator, List, Dict, Optional, Tuple, Union
 from textwrap import dedent
 from PIL import Image
 from tenacity import retry, stop_after_attempt, retry_if_exception_type
 from .prompts import (
     get_outline_generation_prompt,
     get_outline_parsing_prompt,
-    get_page_description_prompt,
+    get_page_description_prompt_parts,
     get_image_generation_prompt,
     get_image_edit_prompt,
     get_description_to_outline_prompt,
@@ -24,7 +25,9 @@ from .prompts import (
     get_descriptions_refinement_prompt
 )
 from .ai_providers import get_text_provider, get_image_provider, TextProvider, ImageProvider
+from .usage_tracker import usage_operation
 from config import get_config
+from utils.json_stream import IncrementalJSONParser, JSONPath
 
 logger = logging.getLogger(__name__)
 
@@ -238,6 +241,66 @@ class AIService:
             logger.warning(f"JSON解析失败（带图片），将重新生成。原始文本: {cleaned_text[:200]}... 错误: {str(e)}")
             raise
     
+    def _stream_json(self, prompt: str, select, thinking_budget: int = 1000) -> Iterator[Tuple[str, Any]]:
+        """
+        流式生成JSON：select 选中的值一旦完整就产出 ('value', (path, value, context))，
+        最后产出 ('result', 完整的JSON对象)
+        
+        部分内容已经发给调用方，因此不像 generate_json 那样在解析失败时重新生成
+        
+        Raises:
+            json.JSONDecodeError: 完整响应无法解析为JSON
+            ValueError: 生成的文本为空
+        """
+        parser = IncrementalJSONParser(select)
+        chunks = []
+        for chunk in self.text_provider.generate_text_stream(prompt, thinking_budget=thinking_budget):
+            chunks.append(chunk)
+            for completed in parser.feed(chunk):
+                yield 'value', completed
+        
+        if parser.done:
+            yield 'result', parser.value
+            return
+        
+        response_text = ''.join(chunks)
+        if not response_text.strip():
+            raise ValueError("生成的文本为空，无法解析为JSON")
+        # 根值没有闭合：按 generate_json 的方式清理后解析，失败时抛出 JSONDecodeError
+        cleaned_text = response_text.strip().strip("```json").strip("```").strip()
+        yield 'result', json.loads(cleaned_text)
+    
+    @staticmethod
+    def _is_outline_item_or_page(path: JSONPath) -> bool:
+        """大纲的顶层元素，或 part 中 pages 数组的元素"""
+        return len(path) == 1 or (len(path) == 3 and path[1] == 'pages')
+    
+    def _stream_outline(self, prompt: str) -> Iterator[Dict]:
+        """
+        流式生成大纲，产出事件：
+        - {'type': 'page', 'index': 扁平化后的页码, 'page': 页面大纲}：每个页面完整时
+        - {'type': 'item', 'index': 顶层下标, 'item': 顶层元素}：每个顶层元素（part 或页面）完整时
+        - {'type': 'outline', 'outline': 完整大纲}：结束时，以此为准
+        
+        part 中的页面会带上 part 字段（与 flatten_outline 一致），前提是模型先输出 part 再输出 pages
+        """
+        page_index = 0
+        for kind, payload in self._stream_json(prompt, self._is_outline_item_or_page):
+            if kind == 'result':
+                yield {'type': 'outline', 'outline': payload}
+                continue
+            
+            path, value, context = payload
+            is_part = len(path) == 1 and isinstance(value, dict) and 'pages' in value
+            if not is_part:
+                page = dict(value) if isinstance(value, dict) else value
+                if len(path) == 3 and context.get('part') and isinstance(page, dict):
+                    page['part'] = context['part']
+                yield {'type': 'page', 'index': page_index, 'page': page}
+                page_index += 1
+            if len(path) == 1:
+                yield {'type': 'item', 'index': path[0], 'item': value}
+    
     @staticmethod
     def _convert_mineru_path_to_local(mineru_path: str) -> Optional[str]:
         """
@@ -280,6 +343,7 @@ class AIService:
             logger.error(f"Failed to download image from {url}: {str(e)}")
             return None
     
+    @usage_operation('generate_outline')
     def generate_outline(self, project_context: ProjectContext, language: str = None) -> List[Dict]:
         """
         Generate PPT outline from idea prompt
@@ -295,6 +359,14 @@ class AIService:
         outline = self.generate_json(outline_prompt, thinking_budget=1000)
         return outline
     
+    @usage_operation('generate_outline_stream')
+    def generate_outline_stream(self, project_context: ProjectContext, language: str = None) -> Iterator[Dict]:
+        """
+        generate_outline 的流式版本，事件格式见 _stream_outline
+        """
+        return self._stream_outline(get_outline_generation_prompt(project_context, language))
+    
+    @usage_operation('parse_outline_text')
     def parse_outline_text(self, project_context: ProjectContext, language: str = None) -> List[Dict]:
         """
         Parse user-provided outline text into structured outline format
@@ -310,6 +382,13 @@ class AIService:
         outline = self.generate_json(parse_prompt, thinking_budget=1000)
         return outline
     
+    @usage_operation('parse_outline_text_stream')
+    def parse_outline_text_stream(self, project_context: ProjectContext, language: str = None) -> Iterator[Dict]:
+        """
+        parse_outline_text 的流式版本，事件格式见 _stream_outline
+        """
+        return self._stream_outline(get_outline_parsing_prompt(project_context, language))
+    
     def flatten_outline(self, outline: List[Dict]) -> List[Dict]:
         """
         Flatten outline structure to page list
@@ -328,6 +407,7 @@ class AIService:
                 pages.append(item)
         return pages
     
+    @usage_operation('generate_page_description')
     def generate_page_description(self, project_context: ProjectContext, outline: List[Dict], 
                                  page_outline: Dict, page_index: int, language='zh') -> str:
         """
@@ -343,9 +423,54 @@ class AIService:
         Returns:
             Text description for the page
         """
+        prefix, suffix = self._build_page_description_prompt(
+            project_context, outline, page_outline, page_index, language
+        )
+        response_text = self.text_provider.generate_text_with_prefix(prefix, suffix, thinking_budget=1000)
+        return self._clean_page_description(response_text, page_outline, page_index)
+    
+    @usage_operation('generate_page_description')
+    async def agenerate_page_description(self, project_context: ProjectContext, outline: List[Dict],
+                                         page_outline: Dict, page_index: int, language='zh') -> str:
+        """
+        generate_page_description 的异步版本，通过 text_provider.agenerate_text 调用模型
+        
+        参数与返回值同 generate_page_description
+        """
+        prefix, suffix = self._build_page_description_prompt(
+            project_context, outline, page_outline, page_index, language
+        )
+        response_text = await self.text_provider.agenerate_text_with_prefix(prefix, suffix, thinking_budget=1000)
+        return self._clean_page_description(response_text, page_outline, page_index)
+    
+    @usage_operation('generate_page_description_stream')
+    def generate_page_description_stream(self, project_context: ProjectContext, outline: List[Dict],
+                                         page_outline: Dict, page_index: int, language='zh') -> Iterator[Dict]:
+        """
+        generate_page_description 的流式版本
+        
+        Yields:
+            {'type': 'delta', 'text': 文本片段}，最后是 {'type': 'description', 'text': 完整描述}
+        """
+        prefix, suffix = self._build_page_description_prompt(
+            project_context, outline, page_outline, page_index, language
+        )
+        chunks = []
+        for chunk in self.text_provider.generate_text_stream(prefix + suffix, thinking_budget=1000):
+            chunks.append(chunk)
+            yield {'type': 'delta', 'text': chunk}
+        yield {
+            'type': 'description',
+            'text': self._clean_page_description(''.join(chunks), page_outline, page_index)
+        }
+    
+    @staticmethod
+    def _build_page_description_prompt(project_context: ProjectContext, outline: List[Dict],
+                                       page_outline: Dict, page_index: int, language) -> Tuple[str, str]:
+        """返回 (各页共享的前缀, 当前页的后缀)，前缀可以由 provider 缓存"""
         part_info = f"\nThis page belongs to: {page_outline['part']}" if 'part' in page_outline else ""
         
-        desc_prompt = get_page_description_prompt(
+        return get_page_description_prompt_parts(
             project_context=project_context,
             outline=outline,
             page_outline=page_outline,
@@ -353,9 +478,9 @@ class AIService:
             part_info=part_info,
             language=language
         )
-        
-        response_text = self.text_provider.generate_text(desc_prompt, thinking_budget=1000)
-        
+    
+    @staticmethod
+    def _clean_page_description(response_text: Optional[str], page_outline: Dict, page_index: int) -> str:
         # 检查生成的文本是否为空
         if response_text is None or not response_text.strip():
             logger.warning(f"页面描述生成失败，返回空结果。页面索引: {page_index}, 大纲: {page_outline.get('title', '未知')}")
@@ -425,6 +550,7 @@ class AIService:
         
         return prompt
     
+    @usage_operation('generate_image')
     def generate_image(self, prompt: str, ref_image_path: Optional[str] = None, 
                       aspect_ratio: str = "16:9", resolution: str = "2K",
                       additional_ref_images: Optional[List[Union[str, Image.Image]]] = None) -> Optional[Image.Image]:
@@ -451,44 +577,7 @@ class AIService:
                 logger.debug(f"Additional reference images: {len(additional_ref_images)}")
             logger.debug(f"Config - aspect_ratio: {aspect_ratio}, resolution: {resolution}")
 
-            # 构建参考图片列表
-            ref_images = []
-            
-            # 添加主参考图片（如果提供了路径）
-            if ref_image_path:
-                if not os.path.exists(ref_image_path):
-                    raise FileNotFoundError(f"Reference image not found: {ref_image_path}")
-                main_ref_image = Image.open(ref_image_path)
-                ref_images.append(main_ref_image)
-            
-            # 添加额外的参考图片
-            if additional_ref_images:
-                for ref_img in additional_ref_images:
-                    if isinstance(ref_img, Image.Image):
-                        # 已经是 PIL Image 对象
-                        ref_images.append(ref_img)
-                    elif isinstance(ref_img, str):
-                        # 可能是本地路径或 URL
-                        if os.path.exists(ref_img):
-                            # 本地路径
-                            ref_images.append(Image.open(ref_img))
-                        elif ref_img.startswith('http://') or ref_img.startswith('https://'):
-                            # URL，需要下载
-                            downloaded_img = self.download_image_from_url(ref_img)
-                            if downloaded_img:
-                                ref_images.append(downloaded_img)
-                            else:
-                                logger.warning(f"Failed to download image from URL: {ref_img}, skipping...")
-                        elif ref_img.startswith('/files/mineru/'):
-                            # MinerU 本地文件路径，需要转换为文件系统路径（支持前缀匹配）
-                            local_path = self._convert_mineru_path_to_local(ref_img)
-                            if local_path and os.path.exists(local_path):
-                                ref_images.append(Image.open(local_path))
-                                logger.debug(f"Loaded MinerU image from local path: {local_path}")
-                            else:
-                                logger.warning(f"MinerU image file not found (with prefix matching): {ref_img}, skipping...")
-                        else:
-                            logger.warning(f"Invalid image reference: {ref_img}, skipping...")
+            ref_images = self._load_reference_images(ref_image_path, additional_ref_images)
             
             logger.debug(f"Calling image provider for generation with {len(ref_images)} reference images...")
             
@@ -505,6 +594,84 @@ class AIService:
             logger.error(error_detail, exc_info=True)
             raise Exception(error_detail) from e
     
+    @usage_operation('generate_image')
+    async def agenerate_image(self, prompt: str, ref_image_path: Optional[str] = None,
+                              aspect_ratio: str = "16:9", resolution: str = "2K",
+                              additional_ref_images: Optional[List[Union[str, Image.Image]]] = None) -> Optional[Image.Image]:
+        """
+        generate_image 的异步版本，通过 image_provider.agenerate_image 调用模型
+        
+        参考图片的读取/下载在工作线程中进行；参数与返回值同 generate_image
+        """
+        try:
+            ref_images = await asyncio.to_thread(
+                self._load_reference_images, ref_image_path, additional_ref_images
+            )
+            
+            logger.debug(f"Calling image provider for async generation with {len(ref_images)} reference images...")
+            
+            return await self.image_provider.agenerate_image(
+                prompt=prompt,
+                ref_images=ref_images if ref_images else None,
+                aspect_ratio=aspect_ratio,
+                resolution=resolution
+            )
+            
+        except Exception as e:
+            error_detail = f"Error generating image: {type(e).__name__}: {str(e)}"
+            logger.error(error_detail, exc_info=True)
+            raise Exception(error_detail) from e
+    
+    def _load_reference_images(self, ref_image_path: Optional[str],
+                               additional_ref_images: Optional[List[Union[str, Image.Image]]]) -> List[Image.Image]:
+        """
+        加载主参考图片和额外参考图片（本地路径、URL、MinerU 路径或 PIL Image）
+        
+        Raises:
+            FileNotFoundError: 主参考图片不存在
+        """
+        # 构建参考图片列表
+        ref_images = []
+        
+        # 添加主参考图片（如果提供了路径）
+        if ref_image_path:
+            if not os.path.exists(ref_image_path):
+                raise FileNotFoundError(f"Reference image not found: {ref_image_path}")
+            main_ref_image = Image.open(ref_image_path)
+            ref_images.append(main_ref_image)
+        
+        # 添加额外的参考图片
+        if additional_ref_images:
+            for ref_img in additional_ref_images:
+                if isinstance(ref_img, Image.Image):
+                    # 已经是 PIL Image 对象
+                    ref_images.append(ref_img)
+                elif isinstance(ref_img, str):
+                    # 可能是本地路径或 URL
+                    if os.path.exists(ref_img):
+                        # 本地路径
+                        ref_images.append(Image.open(ref_img))
+                    elif ref_img.startswith('http://') or ref_img.startswith('https://'):
+                        # URL，需要下载
+                        downloaded_img = self.download_image_from_url(ref_img)
+                        if downloaded_img:
+                            ref_images.append(downloaded_img)
+                        else:
+                            logger.warning(f"Failed to download image from URL: {ref_img}, skipping...")
+                    elif ref_img.startswith('/files/mineru/'):
+                        # MinerU 本地文件路径，需要转换为文件系统路径（支持前缀匹配）
+                        local_path = self._convert_mineru_path_to_local(ref_img)
+                        if local_path and os.path.exists(local_path):
+                            ref_images.append(Image.open(local_path))
+                            logger.debug(f"Loaded MinerU image from local path: {local_path}")
+                        else:
+                            logger.warning(f"MinerU image file not found (with prefix matching): {ref_img}, skipping...")
+                    else:
+                        logger.warning(f"Invalid image reference: {ref_img}, skipping...")
+        
+        return ref_images
+    
+    @usage_operation('edit_image')
     def edit_image(self, prompt: str, current_image_path: str,
                   aspect_ratio: str = "16:9", resolution: str = "2K",
                   original_description: str = None,
@@ -531,6 +698,7 @@ class AIService:
         )
         return self.generate_image(edit_instruction, current_image_path, aspect_ratio, resolution, additional_ref_images)
     
+    @usage_operation('parse_description_to_outline')
     def parse_description_to_outline(self, project_context: ProjectContext, language='zh') -> List[Dict]:
         """
         从描述文本解析出大纲结构
@@ -545,6 +713,7 @@ class AIService:
         outline = self.generate_json(parse_prompt, thinking_budget=1000)
         return outline
     
+    @usage_operation('parse_description_to_page_descriptions')
     def parse_description_to_page_descriptions(self, project_context: ProjectContext, 
                                                outline: List[Dict],
                                                language='zh') -> List[str]:
@@ -567,6 +736,7 @@ class AIService:
         else:
             raise ValueError("Expected a list of page descriptions, but got: " + str(type(descriptions)))
     
+    @usage_operation('refine_outline')
     def refine_outline(self, current_outline: List[Dict], user_requirement: str,
                       project_context: ProjectContext,
                       previous_requirements: Optional[List[str]] = None,
@@ -593,6 +763,24 @@ class AIService:
         outline = self.generate_json(refinement_prompt, thinking_budget=1000)
         return outline
     
+    @usage_operation('refine_outline_stream')
+    def refine_outline_stream(self, current_outline: List[Dict], user_requirement: str,
+                              project_context: ProjectContext,
+                              previous_requirements: Optional[List[str]] = None,
+                              language='zh') -> Iterator[Dict]:
+        """
+        refine_outline 的流式版本，事件格式见 _stream_outline
+        """
+        refinement_prompt = get_outline_refinement_prompt(
+            current_outline=current_outline,
+            user_requirement=user_requirement,
+            project_context=project_context,
+            previous_requirements=previous_requirements,
+            language=language
+        )
+        return self._stream_outline(refinement_prompt)
+    
+    @usage_operation('refine_descriptions')
     def refine_descriptions(self, current_descriptions: List[Dict], user_requirement: str,
                            project_context: ProjectContext,
                            outline: List[Dict] = None,
@@ -626,4 +814,33 @@ class AIService:
             return [str(desc) for desc in descriptions]
         else:
             raise ValueError("Expected a list of page descriptions, but got: " + str(type(descriptions)))
-
+    
+    @usage_operation('refine_descriptions_stream')
+    def refine_descriptions_stream(self, current_descriptions: List[Dict], user_requirement: str,
+                                   project_context: ProjectContext,
+                                   outline: List[Dict] = None,
+                                   previous_requirements: Optional[List[str]] = None,
+                                   language='zh') -> Iterator[Dict]:
+        """
+        refine_descriptions 的流式版本
+        
+        Yields:
+            {'type': 'description', 'index': 页码, 'text': 修改后的描述}：每页描述完整时
+            {'type': 'descriptions', 'descriptions': 完整的描述列表}：结束时，以此为准
+        """
+        refinement_prompt = get_descriptions_refinement_prompt(
+            current_descriptions=current_descriptions,
+            user_requirement=user_requirement,
+            project_context=project_context,
+            outline=outline,
+            previous_requirements=previous_requirements,
+            language=language
+        )
+        for kind, payload in self._stream_json(refinement_prompt, lambda path: len(path) == 1):
+            if kind == 'value':
+                path, value, _ = payload
+                yield {'type': 'description', 'index': path[0], 'text': str(value)}
+            elif isinstance(payload, list):
+                yield {'type': 'descriptions', 'descriptions': [str(desc) for desc in payload]}
+            else:
+                raise ValueError("Expected a list of page descriptions, but got: " + str(type(payload)))
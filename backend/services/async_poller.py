@@ -0,0 +1,189 @@
+"""
+Async Poller - shared exponential-backoff poller for long-running remote jobs
+
+MinerU 文件解析、GenAI 视频处理等远程任务都需要"提交 -> 轮询状态 -> 取结果"。
+原先每个调用方在自己的工作线程里 `while ...: time.sleep(N)`，等待期间线程一直被占用，
+同时解析多个参考文件时会耗尽线程池。
+
+本模块在一个后台事件循环线程中统一等待所有轮询任务：
+- 等待间隔使用 asyncio.sleep，不占用任何工作线程
+- 间隔从很短开始并按指数退避增长（带抖动），快任务能尽快返回，慢任务不会频繁请求
+- 单次状态检查（阻塞的 HTTP 调用）放到一个小的共享线程池中执行
+- 调用方拿到 concurrent.futures.Future，可以 result() 等待或 add_done_callback 异步恢复
+
+Usage:
+    from services.async_poller import get_async_poller
+
+    def check():
+        status = query_status()
+        if status == 'done':
+            return True, fetch_result()
+        return False, None
+
+    future = get_async_poller().submit(check, timeout=600, name='mineru:batch-id')
+    result = future.result()
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+
+class PollTimeoutError(TimeoutError):
+    """轮询超过最大等待时间"""
+    pass
+
+
+@dataclass
+class BackoffPolicy:
+    """
+    指数退避策略
+
+    Attributes:
+        initial_interval: 第一次检查未完成后的等待时间（秒），第一次检查本身立即进行
+        max_interval: 单次等待的上限（秒）
+        multiplier: 每次等待后的增长倍数
+        jitter: 抖动比例（0.1 表示 ±10%），避免大量任务同时请求
+    """
+    initial_interval: float = 0.5
+    max_interval: float = 10.0
+    multiplier: float = 1.6
+    jitter: float = 0.1
+
+    def intervals(self) -> Iterator[float]:
+        """生成无限的等待间隔序列"""
+        interval = self.initial_interval
+        while True:
+            if self.jitter:
+                delta = interval * self.jitter
+                yield max(0.0, interval + random.uniform(-delta, delta))
+            else:
+                yield interval
+            interval = min(interval * self.multiplier, self.max_interval)
+
+
+class AsyncPoller:
+    """
+    在单个事件循环线程上等待多个轮询任务
+
+    check 函数约定：返回 (done, value)。done 为 True 时 value 作为 Future 的结果；
+    抛出 retry_on 中的异常视为暂时性错误，继续轮询；其他异常直接作为 Future 的异常。
+    """
+
+    def __init__(self, max_check_workers: int = 8):
+        """
+        Args:
+            max_check_workers: 执行单次状态检查（阻塞 HTTP 请求）的线程数
+        """
+        self._check_executor = ThreadPoolExecutor(
+            max_workers=max_check_workers,
+            thread_name_prefix='poller-check'
+        )
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._run_loop,
+            name='async-poller',
+            daemon=True
+        )
+        self._thread.start()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    @property
+    def pending_count(self) -> int:
+        """当前正在等待的轮询任务数"""
+        with self._pending_lock:
+            return self._pending
+
+    def submit(self,
+               check: Callable[[], Tuple[bool, Any]],
+               timeout: float = 600,
+               policy: Optional[BackoffPolicy] = None,
+               retry_on: Tuple[Type[BaseException], ...] = (),
+               name: str = '') -> Future:
+        """
+        提交一个轮询任务
+
+        Args:
+            check: 状态检查函数，返回 (done, value)
+            timeout: 最大等待时间（秒），超时后 Future 抛出 PollTimeoutError
+            policy: 退避策略，默认 BackoffPolicy()
+            retry_on: 视为暂时性错误、继续轮询的异常类型
+            name: 任务名称（用于日志）
+
+        Returns:
+            concurrent.futures.Future，结果为 check 返回的 value
+        """
+        policy = policy or BackoffPolicy()
+        with self._pending_lock:
+            self._pending += 1
+        future = asyncio.run_coroutine_threadsafe(
+            self._poll(check, timeout, policy, retry_on, name or repr(check)),
+            self._loop
+        )
+        future.add_done_callback(self._on_done)
+        return future
+
+    def wait(self, check: Callable[[], Tuple[bool, Any]], **kwargs) -> Any:
+        """提交轮询任务并阻塞等待结果（兼容同步调用方）"""
+        return self.submit(check, **kwargs).result()
+
+    def _on_done(self, _future: Future):
+        with self._pending_lock:
+            self._pending -= 1
+
+    async def _poll(self, check, timeout, policy, retry_on, name):
+        deadline = time.monotonic() + timeout
+        attempts = 0
+
+        for interval in policy.intervals():
+            attempts += 1
+            try:
+                done, value = await self._loop.run_in_executor(self._check_executor, check)
+            except retry_on as e:
+                logger.warning(f"[poller] {name}: transient error on attempt {attempts}: {e}, retrying...")
+                done, value = False, None
+
+            if done:
+                logger.debug(f"[poller] {name}: completed after {attempts} checks")
+                return value
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise PollTimeoutError(f"{name} did not complete within {timeout} seconds")
+
+            await asyncio.sleep(min(interval, remaining))
+
+    def shutdown(self):
+        """停止事件循环并关闭检查线程池"""
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._check_executor.shutdown(wait=False)
+
+
+_poller_instance: Optional[AsyncPoller] = None
+_lock = threading.Lock()
+
+
+def get_async_poller() -> AsyncPoller:
+    """获取全局共享的 AsyncPoller 实例（懒加载）"""
+    global _poller_instance
+
+    if _poller_instance is None:
+        with _lock:
+            if _poller_instance is None:
+                _poller_instance = AsyncPoller()
+                logger.info("AsyncPoller initialized")
+
+    return _poller_instance
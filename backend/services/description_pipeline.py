@@ -0,0 +1,207 @@
+"""
+Description Pipeline - 大纲流式生成期间提前生成页面描述
+
+流式生成大纲时，每个页面的大纲一旦完整就可以开始生成它的描述，
+不必等整个大纲保存、用户再点击"生成描述"。本模块按项目登记这些投机任务：
+
+- 任务以页面大纲签名（title + points + part）为键，在 GenerationExecutor 上执行，
+  每个项目同时在途的任务数受 limit 限制，其余排队
+- 大纲保存后，只保留签名与最终页面一致的任务，其余取消或丢弃
+- 结果写回页面前会再次核对签名：用户在此期间修改了大纲（或页面已被删除、已有描述）时丢弃结果
+- 用户随后触发 generate_descriptions_task 时，签名一致的页面直接复用投机任务的结果
+- 完成后超过 result_ttl 仍未被取用的任务在下次登记时清理，避免放弃编辑的项目一直占用内存
+
+投机任务使用的是生成到该页为止的大纲，而不是完整大纲。
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from functools import partial
+from typing import Awaitable, Callable, Deque, Dict, Iterable, Optional, Tuple
+
+from services.generation_executor import GenerationExecutor, get_generation_executor
+from services.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+
+def outline_signature(page_outline: Dict) -> str:
+    """页面大纲的签名：标题、要点和所属章节都相同才视为同一页"""
+    return json.dumps({
+        'title': page_outline.get('title'),
+        'points': page_outline.get('points') or [],
+        'part': page_outline.get('part')
+    }, ensure_ascii=False, sort_keys=True)
+
+
+def page_signature(page) -> str:
+    """已保存页面（Page 对象）的大纲签名"""
+    return outline_signature({**(page.get_outline_content() or {}), 'part': page.part})
+
+
+class DescriptionPipeline:
+    """按项目登记投机生成的页面描述任务"""
+
+    def __init__(self, executor: Optional[GenerationExecutor] = None, result_ttl: float = 1800.0):
+        """
+        Args:
+            executor: 执行描述任务的 GenerationExecutor（默认使用全局实例）
+            result_ttl: 已完成任务的结果保留时间（秒），超时未被取用则清理
+        """
+        self._executor = executor
+        self.result_ttl = result_ttl
+        # project_id -> {signature: Future}
+        self._jobs: Dict[str, Dict[str, Future]] = {}
+        # 仍登记着的已完成任务 -> 完成时间（time.monotonic）
+        self._finished_at: Dict[Future, float] = {}
+        # project_id -> 等待提交的 (Future, call)
+        self._queued: Dict[str, Deque[Tuple[Future, Callable[[], Awaitable[str]]]]] = {}
+        self._running: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> GenerationExecutor:
+        return self._executor or get_generation_executor()
+
+    def start(self, project_id: str, page_outline: Dict,
+              call: Callable[[], Awaitable[str]], limit: int = 5) -> Future:
+        """
+        登记并（在有空位时）启动一个描述任务
+
+        Args:
+            project_id: 项目ID
+            page_outline: 页面大纲（扁平化后，可带 part）
+            call: 无参异步函数，返回描述文本
+            limit: 该项目同时在途的任务数上限
+
+        Returns:
+            描述文本的 Future；签名相同的页面共享同一个 Future
+        """
+        signature = outline_signature(page_outline)
+        with self._lock:
+            self._evict_finished_locked()
+            jobs = self._jobs.setdefault(project_id, {})
+            if signature in jobs:
+                return jobs[signature]
+            future = Future()
+            jobs[signature] = future
+            self._queued.setdefault(project_id, deque()).append((future, call))
+        self._drain(project_id, limit)
+        return future
+
+    def take(self, project_id: str, page_outline: Dict) -> Optional[Future]:
+        """取出与页面大纲签名一致的任务（取出后不再登记）"""
+        with self._lock:
+            future = self._jobs.get(project_id, {}).pop(outline_signature(page_outline), None)
+            self._finished_at.pop(future, None)
+        record_cache_lookup('speculative_description', future is not None)
+        return future
+
+    def release(self, project_id: str, signature: str, future: Future):
+        """结果已被使用后注销任务（签名已登记为其他任务时不做处理）"""
+        with self._lock:
+            jobs = self._jobs.get(project_id, {})
+            if jobs.get(signature) is future:
+                del jobs[signature]
+                self._finished_at.pop(future, None)
+            if not jobs:
+                self._jobs.pop(project_id, None)
+
+    def discard(self, project_id: str, keep: Iterable[str] = ()) -> int:
+        """
+        丢弃项目中签名不在 keep 中的任务：排队中的直接取消，已在途的结果将被忽略
+
+        Returns:
+            丢弃的任务数
+        """
+        keep = set(keep)
+        with self._lock:
+            jobs = self._jobs.get(project_id, {})
+            dropped = [sig for sig in jobs if sig not in keep]
+            for sig in dropped:
+                future = jobs.pop(sig)
+                self._finished_at.pop(future, None)
+                future.cancel()
+            if not jobs:
+                self._jobs.pop(project_id, None)
+        if dropped:
+            logger.info(f"Discarded {len(dropped)} speculative description job(s) for project {project_id}")
+        return len(dropped)
+
+    def pending_count(self, project_id: str) -> int:
+        """项目中尚未完成的任务数"""
+        with self._lock:
+            return sum(1 for f in self._jobs.get(project_id, {}).values() if not f.done())
+
+    def _evict_finished_locked(self):
+        """清理完成超过 result_ttl 仍未被取用的任务（调用方持有 self._lock）"""
+        deadline = time.monotonic() - self.result_ttl
+        expired = [future for future, finished in self._finished_at.items() if finished <= deadline]
+        if not expired:
+            return
+        for future in expired:
+            del self._finished_at[future]
+        expired = set(expired)
+        for project_id in list(self._jobs):
+            jobs = self._jobs[project_id]
+            for sig in [sig for sig, future in jobs.items() if future in expired]:
+                del jobs[sig]
+            if not jobs:
+                del self._jobs[project_id]
+        logger.info(f"Evicted {len(expired)} unused speculative description result(s)")
+
+    def _drain(self, project_id: str, limit: int):
+        to_submit = []
+        with self._lock:
+            queue = self._queued.get(project_id)
+            while queue and self._running.get(project_id, 0) < limit:
+                future, call = queue.popleft()
+                # 已被 discard 取消的任务不再提交
+                if not future.set_running_or_notify_cancel():
+                    continue
+                self._running[project_id] = self._running.get(project_id, 0) + 1
+                to_submit.append((future, call))
+            if not queue:
+                self._queued.pop(project_id, None)
+
+        for future, call in to_submit:
+            self.executor.submit(call).add_done_callback(
+                partial(self._on_done, project_id, future, limit)
+            )
+
+    def _on_done(self, project_id: str, future: Future, limit: int, inner: Future):
+        with self._lock:
+            self._running[project_id] -= 1
+            if not self._running[project_id]:
+                self._running.pop(project_id)
+            # 只记录仍登记着的任务；已被取出或丢弃的由调用方持有
+            if any(job is future for job in self._jobs.get(project_id, {}).values()):
+                self._finished_at[future] = time.monotonic()
+
+        error = inner.exception()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(inner.result())
+        self._drain(project_id, limit)
+
+
+_pipeline_instance: Optional[DescriptionPipeline] = None
+_lock = threading.Lock()
+
+
+def get_description_pipeline() -> DescriptionPipeline:
+    """获取全局共享的 DescriptionPipeline 实例（懒加载）"""
+    global _pipeline_instance
+
+    if _pipeline_instance is None:
+        with _lock:
+            if _pipeline_instance is None:
+                _pipeline_instance = DescriptionPipeline()
+                logger.info("DescriptionPipeline initialized")
+
+    return _pipeline_instance
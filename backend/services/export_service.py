@@ -10,12 +10,14 @@ from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
 from textwrap import dedent
 from dataclasses import dataclass, field
-from pptx import Presentation
-from pptx.util import Inches
 from PIL import Image
 import io
 import tempfile
 import img2pdf
+from services.usage_tracker import propagate_context
+from services.metrics import stage
+from services.tracing import traced
+from services.task_profiler import profile_step
 logger = logging.getLogger(__name__)
 
 
@@ -41,6 +43,12 @@ class ExportWarnings:
     # 其他警告
     other_warnings: List[str] = field(default_factory=list)
     
+    # 文本样式提取的模型调用次数（统计信息，不计入警告）
+    style_extraction_calls: Dict[str, int] = field(default_factory=dict)
+    
+    # 背景修复的生成式画质提升决策（统计信息，不计入警告）
+    inpaint_enhancement: Dict[str, Any] = field(default_factory=dict)
+    
     def add_style_extraction_failed(self, element_id: str, reason: str):
         """记录样式提取失败"""
         self.style_extraction_failed.append({
@@ -73,6 +81,23 @@ class ExportWarnings:
         """添加其他警告"""
         self.other_warnings.append(message)
     
+    def set_inpaint_enhancement(self, enhanced: int, skipped: int, max_defect: float):
+        """记录背景修复中执行/跳过生成式画质提升的数量"""
+        self.inpaint_enhancement = {
+            'enhanced': enhanced,
+            'skipped': skipped,
+            'max_defect': max_defect
+        }
+    
+    def set_style_extraction_calls(self, baseline: int, batch: int, fallback: int):
+        """记录文本样式提取的模型调用次数（baseline 为逐元素识别策略的估算值）"""
+        self.style_extraction_calls = {
+            'baseline': baseline,
+            'batch': batch,
+            'fallback': fallback,
+            'total': batch + fallback
+        }
+    
     def has_warnings(self) -> bool:
         """是否有警告"""
         return bool(
@@ -115,6 +140,8 @@ class ExportWarnings:
             'image_add_failed': self.image_add_failed,
             'json_parse_failed': self.json_parse_failed,
             'other_warnings': self.other_warnings,
+            'style_extraction_calls': self.style_extraction_calls,
+            'inpaint_enhancement': self.inpaint_enhancement,
             'total_warnings': (
                 len(self.style_extraction_failed) + 
                 len(self.text_render_failed) + 
@@ -125,9 +152,37 @@ class ExportWarnings:
         }
 
 
+@dataclass
+class SlideOperation:
+    """
+    可编辑幻灯片上的一次绘制操作
+    
+    操作按 z 序排列：背景图片在前，其上的文本框在后
+    """
+    kind: str  # 'text' / 'image' / 'placeholder'
+    bbox: List[int]
+    image_path: Optional[str] = None
+    text: Optional[str] = None
+    # add_text_element 的其余参数（text_level, align, text_style）
+    text_options: Dict[str, Any] = field(default_factory=dict)
+    
+    @classmethod
+    def text_box(cls, text: str, bbox: List[int], **text_options) -> 'SlideOperation':
+        return cls('text', bbox, text=text, text_options=text_options)
+    
+    def render_args(self) -> Dict[str, Any]:
+        """SlideRenderer 渲染该文本框所需的参数"""
+        return {'text': self.text, 'bbox': self.bbox, **self.text_options}
+
+
 class ExportService:
     """Service for exporting presentations"""
     
+    # 文本样式批量识别：每次模型调用分析的文本元素数上限
+    TEXT_STYLE_BATCH_SIZE = 12
+    # 批量识别结果低于该置信度时回退到单个裁剪识别
+    TEXT_STYLE_MIN_CONFIDENCE = 0.6
+    
     # NOTE: clean background生成功能已迁移到解耦的InpaintProvider实现
     # - DefaultInpaintProvider: 基于mask的精确区域重绘（Volcengine）
     # - GenerativeEditInpaintProvider: 基于生成式大模型的整图编辑重绘（Gemini等）
@@ -146,31 +201,22 @@ class ExportService:
         Returns:
             PPTX file as bytes if output_file is None
         """
-        # Create presentation
-        prs = Presentation()
+        from utils.pptx_builder import PPTXBuilder
         
-        # Set slide dimensions to 16:9 (width 10 inches, height 5.625 inches)
-        prs.slide_width = Inches(10)
-        prs.slide_height = Inches(5.625)
+        # Create presentation (16:9, width 10 inches, height 5.625 inches)
+        builder = PPTXBuilder()
+        prs = builder.create_presentation()
         
-        # Add each image as a slide
+        # Add each image as a slide; repeated images are embedded once
         for image_path in image_paths:
             if not os.path.exists(image_path):
                 logger.warning(f"Image not found: {image_path}")
                 continue
             
-            # Add blank slide layout (layout 6 is typically blank)
-            blank_slide_layout = prs.slide_layouts[6]
-            slide = prs.slides.add_slide(blank_slide_layout)
+            slide = builder.add_blank_slide()
             
             # Add image to fill entire slide
-            slide.shapes.add_picture(
-                image_path,
-                left=0,
-                top=0,
-                width=prs.slide_width,
-                height=prs.slide_height
-            )
+            builder.add_background_image(slide, image_path)
         
         # Save or return bytes
         if output_file:
@@ -600,7 +646,7 @@ class ExportService:
                 return element_id, None
         
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(extract_single, item): item[0] for item in text_items}
+            futures = {executor.submit(propagate_context(extract_single), item): item[0] for item in text_items}
             
             for future in as_completed(futures):
                 element_id, style = future.result()
@@ -731,7 +777,7 @@ class ExportService:
         # 并发处理所有页面
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             futures = {
-                executor.submit(process_single_page, img, idx): idx 
+                executor.submit(propagate_context(process_single_page), img, idx): idx 
                 for idx, img in enumerate(editable_images)
             }
             
@@ -751,25 +797,47 @@ class ExportService:
         
         return all_results
     
+    @staticmethod
+    def _group_text_elements_into_tiles(
+        text_elements: List[Dict[str, Any]],
+        batch_size: int
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        按阅读顺序（自上而下、自左而右）把同一页的文本元素分组，每组最多 batch_size 个
+        
+        相邻元素落在同一组，模型在一次调用中看到的是页面上连续的一块区域。
+        """
+        ordered = sorted(text_elements, key=lambda e: (e['bbox'][1], e['bbox'][0]))
+        return [ordered[i:i + batch_size] for i in range(0, len(ordered), batch_size)]
+    
     @staticmethod
     def _batch_extract_text_styles_hybrid(
         editable_images: List,  # List[EditableImage]
         text_attribute_extractor,
-        max_workers: int = 8
+        max_workers: int = 8,
+        batch_size: int = None,
+        min_confidence: float = None,
+        warnings: Optional[ExportWarnings] = None
     ) -> Tuple[Dict[str, Any], List[Tuple[str, str]]]:
         """
-        【混合策略】结合全局识别和单个裁剪识别的优势
+        【分层策略】先按页批量识别，只对缺失或低置信度的元素回退到单个裁剪识别
         
         策略：
-        - 全局识别（全图分析）：获取 is_bold、is_italic、is_underline、text_alignment
-          因为这些属性需要看整体布局和上下文才能判断准确
-        - 单个裁剪识别：获取 font_color
-          因为颜色需要精确看局部像素才能识别准确
+        - 批量识别（全图 + 分组）：每次调用分析一页上最多 batch_size 个相邻文本元素，
+          一次拿到颜色、is_bold、is_italic、is_underline、text_alignment
+        - 单个裁剪识别（回退）：仅针对批量结果缺失或置信度低于 min_confidence 的元素，
+          颜色（含 colored_segments）使用裁剪结果，布局属性仍优先使用批量结果
+        
+        原先每个文本元素都要单独调用一次模型，密集的页面会产生数百次调用；
+        调用次数（原策略估算值 / 实际值）会记录到 warnings.style_extraction_calls。
         
         Args:
             editable_images: EditableImage列表，每个对应一张PPT页面
             text_attribute_extractor: 文本属性提取器
             max_workers: 并发数
+            batch_size: 每次批量调用的元素数上限，默认 TEXT_STYLE_BATCH_SIZE
+            min_confidence: 低于该置信度的批量结果会回退到单个识别，默认 TEXT_STYLE_MIN_CONFIDENCE
+            warnings: ExportWarnings（可选），用于记录模型调用次数
         
         Returns:
             (results, failed_extractions):
@@ -782,9 +850,13 @@ class ExportService:
         if not editable_images or not text_attribute_extractor:
             return {}, []
         
+        batch_size = max(1, batch_size or ExportService.TEXT_STYLE_BATCH_SIZE)
+        if min_confidence is None:
+            min_confidence = ExportService.TEXT_STYLE_MIN_CONFIDENCE
+        
         # 检查提取器是否支持批量提取
         if not hasattr(text_attribute_extractor, 'extract_batch_with_full_image'):
-            logger.warning("提取器不支持混合策略，回退到单个裁剪识别")
+            logger.warning("提取器不支持批量识别，回退到单个裁剪识别")
             all_text_items = []
             for editable_img in editable_images:
                 text_items = ExportService._collect_text_elements_for_extraction(editable_img.elements)
@@ -794,49 +866,63 @@ class ExportService:
                 text_attribute_extractor=text_attribute_extractor,
                 max_workers=max_workers
             )
+            if warnings is not None:
+                warnings.set_style_extraction_calls(
+                    baseline=len(all_text_items), batch=0, fallback=len(all_text_items)
+                )
             return results, []  # 回退方法暂不收集失败信息
         
-        logger.info(f"【混合策略】开始分析 {len(editable_images)} 页的文本样式...")
-        logger.info(f"  - 全局识别: is_bold, is_italic, is_underline, text_alignment")
-        logger.info(f"  - 单个识别: font_color")
-        
         # Step 1: 收集所有文本元素
-        all_text_items = []  # 用于单个裁剪识别 (element_id, image_path, content)
-        page_text_elements = {}  # 用于全局识别 {page_idx: [text_elements]}
+        crop_items = {}  # 用于单个裁剪识别 {element_id: (element_id, image_path, content)}
+        page_tiles = []  # 用于批量识别 [(page_idx, image_path, [text_elements])]
+        pages_with_text = 0
         
         for page_idx, editable_img in enumerate(editable_images):
-            # 收集用于单个裁剪识别的数据
-            text_items = ExportService._collect_text_elements_for_extraction(editable_img.elements)
-            all_text_items.extend(text_items)
+            for item in ExportService._collect_text_elements_for_extraction(editable_img.elements):
+                crop_items[item[0]] = item
             
-            # 收集用于全局识别的数据
             batch_elements = ExportService._collect_text_elements_for_batch_extraction(editable_img.elements)
             if batch_elements:
-                page_text_elements[page_idx] = {
-                    'image_path': editable_img.image_path,
-                    'elements': batch_elements
-                }
+                pages_with_text += 1
+                for tile in ExportService._group_text_elements_into_tiles(batch_elements, batch_size):
+                    page_tiles.append((page_idx, editable_img.image_path, tile))
         
-        if not all_text_items:
-            return {}
+        all_element_ids = {elem['element_id'] for _, _, tile in page_tiles for elem in tile}
+        if not all_element_ids:
+            return {}, []
+        
+        # 原策略：每页一次全局识别 + 每个元素一次裁剪识别
+        baseline_calls = pages_with_text + len(crop_items)
+        logger.info(f"【分层策略】分析 {len(editable_images)} 页、{len(all_element_ids)} 个文本元素的样式 "
+                    f"（每批最多 {batch_size} 个，共 {len(page_tiles)} 批）...")
         
-        # Step 2: 并行执行两种识别
-        global_results = {}  # 全局识别结果
-        local_results = {}   # 单个裁剪识别结果
+        # Step 2: 分组批量识别
+        batch_results = {}
         
-        def extract_global_for_page(page_idx, page_data):
-            """全局识别单页"""
+        def extract_tile(page_idx, image_path, tile):
             try:
-                results = text_attribute_extractor.extract_batch_with_full_image(
-                    full_image=page_data['image_path'],
-                    text_elements=page_data['elements']
-                )
-                return page_idx, results
+                return text_attribute_extractor.extract_batch_with_full_image(
+                    full_image=image_path,
+                    text_elements=tile
+                ) or {}
             except Exception as e:
-                logger.warning(f"全局识别页面 {page_idx + 1} 失败: {e}")
-                return page_idx, {}
+                logger.warning(f"批量识别页面 {page_idx + 1} 失败: {e}")
+                return {}
         
-        # 收集失败信息
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(propagate_context(extract_tile), *tile_args) for tile_args in page_tiles]
+            for future in as_completed(futures):
+                batch_results.update(future.result())
+        
+        # Step 3: 仅对缺失或低置信度的元素做单个裁剪识别
+        def needs_fallback(element_id):
+            style = batch_results.get(element_id)
+            return style is None or style.confidence < min_confidence
+        
+        fallback_ids = [eid for eid in all_element_ids if needs_fallback(eid)]
+        fallback_items = [crop_items[eid] for eid in fallback_ids if eid in crop_items]
+        
+        local_results = {}
         failed_extractions = []  # [(element_id, reason), ...]
         
         def extract_local_single(item):
@@ -856,63 +942,35 @@ class ExportService:
                 logger.warning(f"单个识别失败 [{element_id}]: {e}")
                 return element_id, None, str(e)
         
-        # 并发执行全局识别和单个裁剪识别
-        logger.info(f"  并发执行: 全局识别 {len(page_text_elements)} 页 + 单个识别 {len(all_text_items)} 个元素...")
-        
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交全局识别任务
-            global_futures = {
-                executor.submit(extract_global_for_page, idx, data): ('global', idx)
-                for idx, data in page_text_elements.items()
-            }
-            
-            # 提交单个裁剪识别任务
-            local_futures = {
-                executor.submit(extract_local_single, item): ('local', item[0])
-                for item in all_text_items
-            }
-            
-            # 收集全局识别结果
-            for future in as_completed(global_futures):
-                task_type, page_idx = global_futures[future]
-                try:
-                    _, page_results = future.result()
-                    global_results.update(page_results)
-                except Exception as e:
-                    logger.error(f"全局识别任务失败: {e}")
-            
-            # 收集单个裁剪识别结果
-            for future in as_completed(local_futures):
-                task_type, element_id = local_futures[future]
-                try:
-                    elem_id, style, error = future.result()
+        if fallback_items:
+            logger.info(f"  回退单个识别: {len(fallback_items)} 个元素（批量结果缺失或置信度 < {min_confidence}）")
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for elem_id, style, error in executor.map(propagate_context(extract_local_single), fallback_items):
                     if style is not None:
                         local_results[elem_id] = style
                     if error:
                         failed_extractions.append((elem_id, error))
-                except Exception as e:
-                    logger.error(f"单个识别任务失败: {e}")
-                    failed_extractions.append((element_id, str(e)))
         
-        # Step 3: 合并结果
-        # 优先使用全局识别的布局属性，使用单个识别的颜色属性
-        merged_results = {}
+        for element_id in fallback_ids:
+            if element_id not in crop_items and element_id not in batch_results:
+                failed_extractions.append((element_id, "批量识别无结果且无可用裁剪图"))
         
-        all_element_ids = set(global_results.keys()) | set(local_results.keys())
+        # Step 4: 合并结果
+        # 批量结果可信时直接使用；回退时颜色用单个识别，布局优先用批量识别
+        merged_results = {}
         
         for element_id in all_element_ids:
-            global_style = global_results.get(element_id)
+            batch_style = batch_results.get(element_id)
             local_style = local_results.get(element_id)
             
-            if global_style and local_style:
-                # 混合：颜色用单个识别（包括 colored_segments），布局用全局识别
+            if batch_style and local_style:
                 merged_results[element_id] = TextStyleResult(
                     font_color_rgb=local_style.font_color_rgb,  # 单个识别的颜色
                     colored_segments=local_style.colored_segments,  # 单个识别的多颜色片段
-                    is_bold=global_style.is_bold,              # 全局识别的粗体
-                    is_italic=global_style.is_italic,          # 全局识别的斜体
-                    is_underline=global_style.is_underline,    # 全局识别的下划线
-                    text_alignment=global_style.text_alignment, # 全局识别的对齐
+                    is_bold=batch_style.is_bold,              # 批量识别的粗体
+                    is_italic=batch_style.is_italic,          # 批量识别的斜体
+                    is_underline=batch_style.is_underline,    # 批量识别的下划线
+                    text_alignment=batch_style.text_alignment, # 批量识别的对齐
                     confidence=0.9,
                     metadata={
                         'source': 'hybrid',
@@ -921,17 +979,54 @@ class ExportService:
                     }
                 )
             elif local_style:
-                # 只有单个识别结果
                 merged_results[element_id] = local_style
-            elif global_style:
-                # 只有全局识别结果
-                merged_results[element_id] = global_style
+            elif batch_style:
+                merged_results[element_id] = batch_style
+        
+        if warnings is not None:
+            warnings.set_style_extraction_calls(
+                baseline=baseline_calls, batch=len(page_tiles), fallback=len(fallback_items)
+            )
         
-        logger.info(f"✓ 混合策略完成: 全局识别 {len(global_results)} 个, 单个识别 {len(local_results)} 个, 合并 {len(merged_results)} 个, 失败 {len(failed_extractions)} 个")
+        logger.info(f"✓ 分层策略完成: 批量识别 {len(batch_results)} 个, 回退识别 {len(local_results)} 个, "
+                    f"合并 {len(merged_results)} 个, 失败 {len(failed_extractions)} 个; "
+                    f"模型调用 {len(page_tiles) + len(fallback_items)} 次（原策略约 {baseline_calls} 次）")
         
         return merged_results, failed_extractions
     
     @staticmethod
+    def _record_inpaint_enhancement(editable_images: List, warnings: ExportWarnings):
+        """
+        汇总各页面（含递归子图）背景修复的画质提升决策，写入 warnings
+        
+        决策由 HybridInpaintProvider 写在 EditableImage.metadata['inpaint'] /
+        EditableElement.metadata['inpaint'] 中。
+        """
+        decisions = []
+        
+        def collect_from_elements(elements):
+            for elem in elements:
+                if elem.metadata.get('inpaint'):
+                    decisions.append(elem.metadata['inpaint'])
+                if elem.children:
+                    collect_from_elements(elem.children)
+        
+        for editable_img in editable_images:
+            if editable_img.metadata.get('inpaint'):
+                decisions.append(editable_img.metadata['inpaint'])
+            collect_from_elements(editable_img.elements)
+        
+        if decisions:
+            enhanced = sum(1 for d in decisions if d.get('enhanced'))
+            warnings.set_inpaint_enhancement(
+                enhanced=enhanced,
+                skipped=len(decisions) - enhanced,
+                max_defect=max(d.get('defect', 0) for d in decisions)
+            )
+            logger.info(f"背景画质提升: {enhanced} 张执行, {len(decisions) - enhanced} 张跳过")
+    
+    @staticmethod
+    @traced('export.editable_pptx')
     def create_editable_pptx_with_recursive_analysis(
         image_paths: List[str] = None,
         output_file: str = None,
@@ -943,7 +1038,8 @@ class ExportService:
         text_attribute_extractor = None,  # 可选：文字属性提取器，用于提取颜色、粗体、斜体等样式
         progress_callback = None,  # 可选：进度回调函数 (step, message, percent) -> None
         export_extractor_method: str = 'hybrid',  # 组件提取方法: mineru, hybrid
-        export_inpaint_method: str = 'hybrid'  # 背景修复方法: generative, baidu, hybrid
+        export_inpaint_method: str = 'hybrid',  # 背景修复方法: generative, baidu, hybrid
+        export_enhance_threshold: Optional[float] = None  # 混合修复的画质门限（None 使用默认值）
     ) -> Tuple[Optional[bytes], ExportWarnings]:
         """
         使用递归图片可编辑化服务创建可编辑PPTX
@@ -968,6 +1064,7 @@ class ExportService:
                 可通过 TextAttributeExtractorFactory.create_caption_model_extractor() 创建
             export_extractor_method: 组件提取方法 ('mineru' 或 'hybrid'，默认 'hybrid')
             export_inpaint_method: 背景修复方法 ('generative', 'baidu', 'hybrid'，默认 'hybrid')
+            export_enhance_threshold: 混合修复的画质门限（灰度级），修复缺陷不超过该值时跳过生成式画质提升
         
         Returns:
             (pptx_bytes, warnings): 元组，包含 PPTX 字节流和警告信息
@@ -976,6 +1073,7 @@ class ExportService:
         """
         from services.image_editability import ServiceConfig, ImageEditabilityService
         from utils.pptx_builder import PPTXBuilder
+        from services.slide_renderer import get_slide_renderer
         
         # 初始化警告收集器
         warnings = ExportWarnings()
@@ -983,6 +1081,7 @@ class ExportService:
         # 辅助函数：报告进度
         def report_progress(step: str, message: str, percent: int):
             logger.info(f"[进度 {percent}%] {step}: {message}")
+            profile_step(step)
             if progress_callback:
                 try:
                     progress_callback(step, message, percent)
@@ -1006,7 +1105,8 @@ class ExportService:
             config = ServiceConfig.from_defaults(
                 max_depth=max_depth,
                 extractor_method=export_extractor_method,
-                inpaint_method=export_inpaint_method
+                inpaint_method=export_inpaint_method,
+                enhance_threshold=export_enhance_threshold
             )
             editability_service = ImageEditabilityService(config)
             
@@ -1018,7 +1118,7 @@ class ExportService:
             completed_count = 0
             with ThreadPoolExecutor(max_workers=max_workers) as executor:
                 futures = {
-                    executor.submit(editability_service.make_image_editable, img_path): idx
+                    executor.submit(propagate_context(editability_service.make_image_editable), img_path): idx
                     for idx, img_path in enumerate(image_paths)
                 }
                 
@@ -1037,11 +1137,14 @@ class ExportService:
                 
                 editable_images = results
         
-        # 2.5. 使用混合策略提取所有文本元素的样式（如果提供了提取器）
-        # 混合策略：全局识别（粗体/斜体/下划线/对齐）+ 单个裁剪识别（颜色）
+        # 记录背景画质提升的决策（哪些背景跳过了生成式画质提升）
+        ExportService._record_inpaint_enhancement(editable_images, warnings)
+        
+        # 2.5. 使用分层策略提取所有文本元素的样式（如果提供了提取器）
+        # 分层策略：按页分组批量识别，缺失或低置信度的元素回退到单个裁剪识别
         text_styles_cache = {}
         if text_attribute_extractor:
-            report_progress("样式提取", "开始提取文本样式（混合策略）...", 45)
+            report_progress("样式提取", "开始提取文本样式（分层策略）...", 45)
             
             # 统计文本元素数量
             total_text_count = sum(
@@ -1050,12 +1153,14 @@ class ExportService:
             )
             
             if total_text_count > 0:
-                report_progress("样式提取", f"混合策略分析 {total_text_count} 个文本元素...", 50)
-                text_styles_cache, failed_extractions = ExportService._batch_extract_text_styles_hybrid(
-                    editable_images=editable_images,
-                    text_attribute_extractor=text_attribute_extractor,
-                    max_workers=max_workers * 2
-                )
+                report_progress("样式提取", f"分层策略分析 {total_text_count} 个文本元素...", 50)
+                with stage('style', text_elements=total_text_count):
+                    text_styles_cache, failed_extractions = ExportService._batch_extract_text_styles_hybrid(
+                        editable_images=editable_images,
+                        text_attribute_extractor=text_attribute_extractor,
+                        max_workers=max_workers * 2,
+                        warnings=warnings
+                    )
                 
                 # 记录样式提取失败的元素（详细）
                 for element_id, reason in failed_extractions:
@@ -1071,74 +1176,74 @@ class ExportService:
         
         report_progress("构建PPTX", "开始构建可编辑PPTX文件...", 75)
         
-        # 4. 创建PPTX构建器
-        builder = PPTXBuilder()
-        builder.create_presentation()
-        builder.setup_presentation_size(slide_width_pixels, slide_height_pixels)
-        
-        # 5. 为每个页面构建幻灯片
-        total_pages = len(editable_images)
-        for page_idx, editable_img in enumerate(editable_images):
-            # 构建PPTX占 75% - 95% 的进度
-            percent = 75 + int(20 * page_idx / total_pages)
-            report_progress("构建PPTX", f"构建第 {page_idx + 1}/{total_pages} 页...", percent)
-            logger.info(f"  构建第 {page_idx + 1}/{total_pages} 页...")
-            
-            # 创建空白幻灯片
-            slide = builder.add_blank_slide()
-            
-            # 添加背景图（参考原实现，使用slide.shapes.add_picture）
-            if editable_img.clean_background and os.path.exists(editable_img.clean_background):
-                logger.info(f"    添加clean background: {editable_img.clean_background}")
-                try:
-                    slide.shapes.add_picture(
-                        editable_img.clean_background,
-                        left=0,
-                        top=0,
-                        width=builder.prs.slide_width,
-                        height=builder.prs.slide_height
-                    )
-                except Exception as e:
-                    logger.error(f"Failed to add background: {e}")
-            else:
-                # 回退到原图
-                logger.info(f"    使用原图作为背景: {editable_img.image_path}")
-                try:
-                    slide.shapes.add_picture(
-                        editable_img.image_path,
-                        left=0,
-                        top=0,
-                        width=builder.prs.slide_width,
-                        height=builder.prs.slide_height
-                    )
-                except Exception as e:
-                    logger.error(f"Failed to add background: {e}")
+        with stage('build', pages=len(editable_images)):
+            # 4. 创建PPTX构建器
+            builder = PPTXBuilder()
+            builder.create_presentation()
+            builder.setup_presentation_size(slide_width_pixels, slide_height_pixels)
             
-            # 添加所有元素（递归地）
-            # 计算缩放比例：将原始图片坐标映射到统一的幻灯片坐标
-            # 背景图已经缩放到幻灯片尺寸，所以元素坐标也需要相应缩放
-            scale_x = slide_width_pixels / editable_img.width
-            scale_y = slide_height_pixels / editable_img.height
-            logger.info(f"    元素数量: {len(editable_img.elements)}, 图片尺寸: {editable_img.width}x{editable_img.height}, "
-                       f"幻灯片尺寸: {slide_width_pixels}x{slide_height_pixels}, 缩放比例: {scale_x:.3f}x{scale_y:.3f}")
+            # 5. 为每个页面规划绘制操作，文本框排版交给 SlideRenderer 并行执行
+            total_pages = len(editable_images)
+            page_operations = []
+            for editable_img in editable_images:
+                # 计算缩放比例：将原始图片坐标映射到统一的幻灯片坐标
+                # 背景图已经缩放到幻灯片尺寸，所以元素坐标也需要相应缩放
+                scale_x = slide_width_pixels / editable_img.width
+                scale_y = slide_height_pixels / editable_img.height
+                logger.info(f"    元素数量: {len(editable_img.elements)}, 图片尺寸: {editable_img.width}x{editable_img.height}, "
+                           f"幻灯片尺寸: {slide_width_pixels}x{slide_height_pixels}, 缩放比例: {scale_x:.3f}x{scale_y:.3f}")
+                page_operations.append(ExportService._plan_editable_elements(
+                    editable_img.elements, scale_x, scale_y,
+                    text_styles_cache=text_styles_cache  # 使用预提取的样式缓存
+                ))
             
-            ExportService._add_editable_elements_to_slide(
-                builder=builder,
-                slide=slide,
-                elements=editable_img.elements,
-                scale_x=scale_x,
-                scale_y=scale_y,
-                depth=0,
-                text_styles_cache=text_styles_cache,  # 使用预提取的样式缓存
-                warnings=warnings  # 收集警告
-            )
+            text_ops = [op for operations in page_operations for op in operations if op.kind == 'text']
+            report_progress("构建PPTX", f"排版 {len(text_ops)} 个文本框...", 77)
+            with stage('fit_text', text_boxes=len(text_ops)):
+                rendered = get_slide_renderer().render_text_elements([op.render_args() for op in text_ops])
             
-            logger.info(f"    ✓ 第 {page_idx + 1} 页完成，添加了 {len(editable_img.elements)} 个元素")
+            # 6. 按页组装幻灯片（单线程操作 Presentation）
+            rendered_iter = iter(rendered)
+            for page_idx, (editable_img, operations) in enumerate(zip(editable_images, page_operations)):
+                # 组装幻灯片占 80% - 95% 的进度
+                percent = 80 + int(15 * page_idx / total_pages)
+                report_progress("构建PPTX", f"构建第 {page_idx + 1}/{total_pages} 页...", percent)
+                logger.info(f"  构建第 {page_idx + 1}/{total_pages} 页...")
+                
+                # 创建空白幻灯片
+                slide = builder.add_blank_slide()
+                # 新幻灯片只由这里添加形状，缓存最大形状 id，避免每次添加都扫描整棵形状树
+                slide.shapes.turbo_add_enabled = True
+                
+                # 添加背景图（通过媒体注册表添加，相同图片只嵌入一次）
+                if editable_img.clean_background and os.path.exists(editable_img.clean_background):
+                    logger.info(f"    添加clean background: {editable_img.clean_background}")
+                    try:
+                        builder.add_background_image(slide, editable_img.clean_background)
+                    except Exception as e:
+                        logger.error(f"Failed to add background: {e}")
+                else:
+                    # 回退到原图
+                    logger.info(f"    使用原图作为背景: {editable_img.image_path}")
+                    try:
+                        builder.add_background_image(slide, editable_img.image_path)
+                    except Exception as e:
+                        logger.error(f"Failed to add background: {e}")
+                
+                # 添加所有元素（已按绘制顺序展开）
+                page_rendered = [next(rendered_iter) for op in operations if op.kind == 'text']
+                ExportService._apply_slide_operations(
+                    builder, slide, operations, rendered=page_rendered,
+                    warnings=warnings  # 收集警告
+                )
+                
+                logger.info(f"    ✓ 第 {page_idx + 1} 页完成，添加了 {len(editable_img.elements)} 个元素")
         
-        # 5. 保存或返回字节流
+        # 7. 保存或返回字节流
         report_progress("保存文件", "正在保存PPTX文件...", 95)
         if output_file:
-            builder.save(output_file)
+            with stage('save'):
+                builder.save(output_file)
             report_progress("完成", f"✓ 可编辑PPTX已保存", 100)
             logger.info(f"✓ 可编辑PPTX已保存: {output_file}")
             
@@ -1148,7 +1253,8 @@ class ExportService:
             
             return None, warnings
         else:
-            pptx_bytes = builder.to_bytes()
+            with stage('save'):
+                pptx_bytes = builder.to_bytes()
             report_progress("完成", f"✓ 可编辑PPTX已生成", 100)
             logger.info(f"✓ 可编辑PPTX已生成（{len(pptx_bytes)} 字节）")
             
@@ -1170,7 +1276,7 @@ class ExportService:
         warnings: 'ExportWarnings' = None  # 警告收集器
     ):
         """
-        递归地将EditableElement添加到幻灯片
+        递归地将EditableElement添加到幻灯片（在当前线程中排版）
         
         Args:
             builder: PPTXBuilder实例
@@ -1180,12 +1286,44 @@ class ExportService:
             scale_y: Y轴缩放因子
             depth: 当前递归深度
             text_styles_cache: 预提取的文本样式缓存（可选），由 _batch_extract_text_styles 生成
+        """
+        operations = ExportService._plan_editable_elements(
+            elements, scale_x, scale_y, depth=depth, text_styles_cache=text_styles_cache
+        )
+        ExportService._apply_slide_operations(builder, slide, operations, warnings=warnings)
+    
+    @staticmethod
+    def _plan_editable_elements(
+        elements: List,  # List[EditableElement]
+        scale_x: float = 1.0,
+        scale_y: float = 1.0,
+        depth: int = 0,
+        text_styles_cache: Dict[str, Any] = None,
+        operations: List['SlideOperation'] = None
+    ) -> List['SlideOperation']:
+        """
+        递归地把EditableElement转换为按绘制顺序排列的幻灯片操作
+        
+        只做纯数据的转换，不接触 Presentation，文本框排版可以交给 SlideRenderer 并行执行。
+        
+        Args:
+            elements: EditableElement列表
+            scale_x: X轴缩放因子
+            scale_y: Y轴缩放因子
+            depth: 当前递归深度
+            text_styles_cache: 预提取的文本样式缓存（可选），由 _batch_extract_text_styles 生成
+            operations: 追加到的操作列表（递归时使用）
+        
+        Returns:
+            SlideOperation列表
         
         Note:
             elem.image_path 现在是绝对路径，无需额外的目录参数
         """
         if text_styles_cache is None:
             text_styles_cache = {}
+        if operations is None:
+            operations = []
         
         for elem in elements:
             elem_type = elem.element_type
@@ -1214,51 +1352,31 @@ class ExportService:
                 if elem.content:
                     text = elem.content.strip()
                     if text:
-                        try:
-                            # 确定文本级别
-                            level = 'title' if elem_type in ['title', 'heading'] else 'default'
-                            
-                            # 从缓存获取预提取的文字样式
-                            text_style = text_styles_cache.get(elem.element_id)
-                            if text_style:
-                                logger.debug(f"{'  ' * depth}  使用缓存的文字样式: color={text_style.font_color_rgb}, bold={text_style.is_bold}")
-                            
-                            builder.add_text_element(
-                                slide=slide,
-                                text=text,
-                                bbox=bbox_list,
-                                text_level=level,
-                                text_style=text_style
-                            )
-                        except Exception as e:
-                            logger.warning(f"添加文本元素失败: {e}")
-                            if warnings:
-                                warnings.add_text_render_failed(text, str(e))
+                        # 确定文本级别
+                        level = 'title' if elem_type in ['title', 'heading'] else 'default'
+                        
+                        # 从缓存获取预提取的文字样式
+                        text_style = text_styles_cache.get(elem.element_id)
+                        if text_style:
+                            logger.debug(f"{'  ' * depth}  使用缓存的文字样式: color={text_style.font_color_rgb}, bold={text_style.is_bold}")
+                        
+                        operations.append(SlideOperation.text_box(
+                            text, bbox_list, text_level=level, text_style=text_style
+                        ))
             
             elif elem_type == 'table_cell':
                 # 添加表格单元格（带边框的文本框）
                 if elem.content:
                     text = elem.content.strip()
                     if text:
-                        try:
-                            # 从缓存获取预提取的文字样式
-                            text_style = text_styles_cache.get(elem.element_id)
-                            
-                            # 表格单元格已经在上面统一处理了bbox_global和缩放
-                            # 直接使用bbox_list即可
-                            builder.add_text_element(
-                                slide=slide,
-                                text=text,
-                                bbox=bbox_list,
-                                text_level=None,
-                                align='center',
-                                text_style=text_style
-                            )
-                            
-                        except Exception as e:
-                            logger.warning(f"添加单元格失败: {e}")
-                            if warnings:
-                                warnings.add_text_render_failed(text, str(e))
+                        # 从缓存获取预提取的文字样式
+                        text_style = text_styles_cache.get(elem.element_id)
+                        
+                        # 表格单元格已经在上面统一处理了bbox_global和缩放
+                        # 直接使用bbox_list即可
+                        operations.append(SlideOperation.text_box(
+                            text, bbox_list, text_level=None, align='center', text_style=text_style
+                        ))
             
             elif elem_type == 'table':
                 # 如果表格有子元素（单元格），使用inpainted背景 + 单元格
@@ -1267,41 +1385,21 @@ class ExportService:
                     
                     # 先添加inpainted背景（干净的表格框架）
                     if os.path.exists(elem.inpainted_background_path):
-                        try:
-                            builder.add_image_element(
-                                slide=slide,
-                                image_path=elem.inpainted_background_path,
-                                bbox=bbox_list
-                            )
-                        except Exception as e:
-                            logger.error(f"Failed to add table background: {e}")
+                        operations.append(SlideOperation('image', bbox_list, image_path=elem.inpainted_background_path))
                     
                     # 递归添加单元格
-                    ExportService._add_editable_elements_to_slide(
-                        builder=builder,
-                        slide=slide,
-                        elements=elem.children,
-                        scale_x=scale_x,
-                        scale_y=scale_y,
-                        depth=depth + 1,
-                        text_styles_cache=text_styles_cache,
-                        warnings=warnings
+                    ExportService._plan_editable_elements(
+                        elem.children, scale_x, scale_y, depth=depth + 1,
+                        text_styles_cache=text_styles_cache, operations=operations
                     )
                 else:
                     # 没有子元素，添加整体表格图片
                     # elem.image_path 现在是绝对路径
                     if elem.image_path and os.path.exists(elem.image_path):
-                        try:
-                            builder.add_image_element(
-                                slide=slide,
-                                image_path=elem.image_path,
-                                bbox=bbox_list
-                            )
-                        except Exception as e:
-                            logger.error(f"Failed to add table image: {e}")
+                        operations.append(SlideOperation('image', bbox_list, image_path=elem.image_path))
                     else:
                         logger.warning(f"Table image not found: {elem.image_path}")
-                        builder.add_image_placeholder(slide, bbox_list)
+                        operations.append(SlideOperation('placeholder', bbox_list))
             
             elif elem_type in ['image', 'figure', 'chart']:
                 # 检查是否应该使用递归渲染
@@ -1335,40 +1433,67 @@ class ExportService:
                     
                     # 先添加inpainted背景
                     if os.path.exists(elem.inpainted_background_path):
-                        try:
-                            builder.add_image_element(slide, elem.inpainted_background_path, bbox_list)
-                        except Exception as e:
-                            logger.error(f"Failed to add inpainted background: {e}")
+                        operations.append(SlideOperation('image', bbox_list, image_path=elem.inpainted_background_path))
                     
                     # 递归添加子元素
-                    ExportService._add_editable_elements_to_slide(
-                        builder=builder,
-                        slide=slide,
-                        elements=elem.children,
-                        scale_x=scale_x,
-                        scale_y=scale_y,
-                        depth=depth + 1,
-                        text_styles_cache=text_styles_cache,
-                        warnings=warnings
+                    ExportService._plan_editable_elements(
+                        elem.children, scale_x, scale_y, depth=depth + 1,
+                        text_styles_cache=text_styles_cache, operations=operations
                     )
                 else:
                     # 没有子元素或子元素占比过大，直接添加原图
                     # elem.image_path 现在是绝对路径
                     if elem.image_path and os.path.exists(elem.image_path):
-                        try:
-                            builder.add_image_element(
-                                slide=slide,
-                                image_path=elem.image_path,
-                                bbox=bbox_list
-                            )
-                        except Exception as e:
-                            logger.error(f"Failed to add image: {e}")
+                        operations.append(SlideOperation('image', bbox_list, image_path=elem.image_path))
                     else:
                         logger.warning(f"Image file not found: {elem.image_path}")
-                        builder.add_image_placeholder(slide, bbox_list)
+                        operations.append(SlideOperation('placeholder', bbox_list))
             
             else:
                 # 其他类型
                 logger.debug(f"{'  ' * depth}  跳过未知类型: {elem_type}")
+        
+        return operations
     
-
+    @staticmethod
+    def _apply_slide_operations(
+        builder,
+        slide,
+        operations: List['SlideOperation'],
+        rendered: List[Tuple[bool, Any]] = None,
+        warnings: 'ExportWarnings' = None
+    ):
+        """
+        按顺序把幻灯片操作应用到幻灯片上
+        
+        Args:
+            builder: PPTXBuilder实例
+            slide: 幻灯片对象
+            operations: _plan_editable_elements 生成的操作列表
+            rendered: SlideRenderer 预先渲染的文本框结果，与 operations 中的文本操作一一对应；
+                      为 None 时在当前线程中排版
+            warnings: 警告收集器
+        """
+        text_results = iter(rendered) if rendered is not None else None
+        
+        for op in operations:
+            if op.kind == 'text':
+                try:
+                    if text_results is None:
+                        builder.add_text_element(slide=slide, text=op.text, bbox=op.bbox, **op.text_options)
+                    else:
+                        ok, result = next(text_results)
+                        if not ok:
+                            raise RuntimeError(result)
+                        builder.add_shape_xml(slide, result)
+                except Exception as e:
+                    logger.warning(f"添加文本元素失败: {e}")
+                    if warnings:
+                        warnings.add_text_render_failed(op.text, str(e))
+            elif op.kind == 'image':
+                try:
+                    builder.add_image_element(slide=slide, image_path=op.image_path, bbox=op.bbox)
+                except Exception as e:
+                    logger.error(f"Failed to add image: {e}")
+            else:
+                builder.add_image_placeholder(slide, op.bbox)
@@ -6,14 +6,23 @@ import re
 import time
 import logging
 import zipfile
-import io
-import base64
+import hashlib
+import json
+import tempfile
+import threading
 import requests
+from collections import OrderedDict
 from typing import Optional, List
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, ThreadPoolExecutor
+from flask import current_app, has_app_context
 from PIL import Image
 from markitdown import MarkItDown
 
+from services.async_poller import get_async_poller, BackoffPolicy, PollTimeoutError
+from services.usage_tracker import propagate_context, record_response_usage, track_usage
+from services.metrics import record_cache_lookup
+from utils import image_ops
+
 logger = logging.getLogger(__name__)
 
 
@@ -47,15 +56,155 @@ def _get_ai_provider_format(provider_format: str = None) -> str:
     return os.getenv('AI_PROVIDER_FORMAT', 'gemini').lower()
 
 
+def _get_config_value(key: str):
+    """Get a config value from Flask app.config, falling back to the static Config class"""
+    try:
+        from flask import current_app
+        if current_app and current_app.config.get(key) is not None:
+            return current_app.config[key]
+    except RuntimeError:
+        # Not in Flask application context
+        pass
+    
+    from config import Config
+    return getattr(Config, key)
+
+
+def _returned_error(result) -> bool:
+    """MinerU 请求方法通过返回的错误信息（元组的最后一项，或唯一的返回值）报告失败"""
+    error = result[-1] if isinstance(result, tuple) else result
+    return error is not None
+
+
+def perceptual_hash(image: Image.Image, hash_size: int = 8) -> str:
+    """
+    Compute a difference hash (dHash) of an image
+    
+    Visually identical images (same logo re-encoded or slightly resized) get the same hash,
+    so copies within one document are captioned once. Different images can share a dHash,
+    so it is never used as a key across documents (see pixel_digest).
+    """
+    gray = image.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = list(gray.getdata())
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+
+def pixel_digest(image: Image.Image) -> str:
+    """SHA-1 of an image's mode, size and decoded pixels (exact-match key of the caption cache)"""
+    sha1 = hashlib.sha1(f"{image.mode}:{image.width}x{image.height}:".encode())
+    sha1.update(image.tobytes())
+    return sha1.hexdigest()
+
+
+def parse_indexed_captions(text: str, count: int) -> List[str]:
+    """Parse a batch caption answer ([{"index": 1, "caption": "..."}]) into a list aligned by index"""
+    captions = [""] * count
+    if not text:
+        return captions
+    
+    # Strip markdown code fences the model may wrap around the JSON
+    match = re.search(r'\[.*\]', text, re.DOTALL)
+    if not match:
+        return captions
+    try:
+        items = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return captions
+    
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            index = int(item.get('index', 0))
+        except (TypeError, ValueError):
+            continue
+        caption = str(item.get('caption') or '').strip()
+        if 1 <= index <= count and caption:
+            captions[index - 1] = caption
+    return captions
+
+
+class CaptionCache:
+    """Thread-safe LRU cache of image captions keyed by model + exact pixel digest"""
+    
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            caption = self._entries.get(key)
+            if caption is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        record_cache_lookup('image_caption', caption is not None)
+        return caption
+    
+    def set(self, key: str, caption: str):
+        with self._lock:
+            self._entries[key] = caption
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Process-wide caption cache shared by all parser instances
+caption_cache = CaptionCache()
+
+# Finishes non-blocking parses (download, captions) once the poller reports MinerU is done
+_finish_executor: Optional[ThreadPoolExecutor] = None
+_finish_executor_lock = threading.Lock()
+
+
+def _get_finish_executor() -> ThreadPoolExecutor:
+    """Shared pool running the post-poll steps of parse_file_async (lazy)"""
+    global _finish_executor
+
+    if _finish_executor is None:
+        with _finish_executor_lock:
+            if _finish_executor is None:
+                _finish_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='parse-finish')
+    return _finish_executor
+
+
 class FileParserService:
     """Service for parsing files using MinerU and enhancing with image captions"""
+
+    # MinerU small files usually finish in a few seconds, large PDFs take minutes
+    poll_policy = BackoffPolicy(initial_interval=1.0, max_interval=15.0, multiplier=1.5)
+    MAX_POLL_SECONDS = 600
     
+    # Result zips are spooled in memory up to this size, then moved to a temp file on disk
+    ZIP_SPOOL_MEMORY_LIMIT = 16 * 1024 * 1024
+    ZIP_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+    IMAGE_WRITE_WORKERS = 8
+    IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp')
+
     def __init__(self, mineru_token: str, mineru_api_base: str = "https://mineru.net",
                  google_api_key: str = "", google_api_base: str = "",
                  openai_api_key: str = "", openai_api_base: str = "",
                  image_caption_model: str = "gemini-3-flash-preview",
                  provider_format: str = None,
-                 mineru_model_version: str = "vlm"):
+                 mineru_model_version: str = "vlm",
+                 upload_folder: str = None,
+                 max_zip_size: int = None,
+                 caption_batch_size: int = None):
         """
         Initialize the file parser service
         
@@ -69,6 +218,9 @@ class FileParserService:
             image_caption_model: Model to use for image captioning
             provider_format: AI provider format ('gemini' or 'openai'). If not provided, reads from environment variable.
             mineru_model_version: MinerU model version ('vlm' or 'pipeline'). Default is 'vlm'.
+            upload_folder: Root folder for extracted MinerU files. If not provided, reads UPLOAD_FOLDER from Flask config.
+            max_zip_size: Maximum size in bytes of a MinerU result zip. If not provided, reads MINERU_MAX_ZIP_SIZE from config.
+            caption_batch_size: Images per multimodal caption request (1 disables batching). If not provided, reads IMAGE_CAPTION_BATCH_SIZE from config.
         """
         self.mineru_token = mineru_token
         self.mineru_api_base = mineru_api_base
@@ -87,6 +239,10 @@ class FileParserService:
         self._gemini_client = None
         self._openai_client = None
         self._provider_format = _get_ai_provider_format(provider_format)
+        
+        self.upload_folder = upload_folder or _get_config_value('UPLOAD_FOLDER')
+        self.max_zip_size = max_zip_size or int(_get_config_value('MINERU_MAX_ZIP_SIZE'))
+        self.caption_batch_size = caption_batch_size or int(_get_config_value('IMAGE_CAPTION_BATCH_SIZE'))
     
     def _get_gemini_client(self):
         """Lazily initialize Gemini client"""
@@ -116,13 +272,28 @@ class FileParserService:
         else:
             return bool(self._google_api_key)
     
-    def parse_file(self, file_path: str, filename: str) -> tuple[Optional[str], Optional[str], Optional[str], Optional[str], int]:
+    @staticmethod
+    def compute_content_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+        """Compute the SHA-256 hex digest of a file's bytes (key of the parse-result cache)"""
+        sha256 = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+    
+    def parse_file(self, file_path: str, filename: str, content_hash: Optional[str] = None,
+                   use_cache: bool = True) -> tuple[Optional[str], Optional[str], Optional[str], Optional[str], int]:
         """
         Parse a file using MinerU service and enhance with image captions
         
+        Files that go through MinerU are looked up by content hash first: an identical file
+        parsed before resolves instantly to the same extract_id and markdown.
+        
         Args:
             file_path: Path to the file to parse
             filename: Original filename
+            content_hash: SHA-256 of the file bytes (computed if not provided)
+            use_cache: Whether to consult and populate the parse-result cache
             
         Returns:
             Tuple of (batch_id, markdown_content, extract_id, error_message, failed_image_count)
@@ -133,62 +304,199 @@ class FileParserService:
             - failed_image_count: Number of images that failed to generate captions
         """
         try:
-            # Check if it's a plain text file that doesn't need MinerU parsing
-            file_ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
-            
-            if file_ext in ['txt', 'md', 'markdown']:
-                logger.info(f"File {filename} is a plain text file, reading directly...")
-                return self._parse_text_file(file_path, filename)
-            
-            # Check if it's a spreadsheet file (xlsx, csv) - use markitdown
-            if file_ext in ['xlsx', 'xls', 'csv']:
-                logger.info(f"File {filename} is a spreadsheet file, using markitdown...")
-                return self._parse_spreadsheet_file(file_path, filename)
-            
-            # For other file types, use MinerU service
-            logger.info(f"File {filename} requires MinerU parsing...")
-            
-            # Step 1: Get upload URL
-            logger.info(f"Step 1/4: Requesting upload URL for {filename}...")
-            batch_id, upload_url, error = self._get_upload_url(filename)
-            if error:
-                return None, None, None, error, 0
-            
-            logger.info(f"Got upload URL. Batch ID: {batch_id}")
-            
-            # Step 2: Upload file
-            logger.info(f"Step 2/4: Uploading file {filename}...")
-            error = self._upload_file(file_path, upload_url)
-            if error:
-                return batch_id, None, None, error, 0
-            
-            logger.info("File uploaded successfully.")
+            result, batch_id, content_hash = self._start_parse(file_path, filename, content_hash, use_cache)
+            if result is not None:
+                return result
             
             # Step 3: Poll for parsing result
             logger.info("Step 3/4: Waiting for parsing to complete...")
             markdown_content, extract_id, error = self._poll_result(batch_id)
-            if error:
-                return batch_id, None, None, error, 0
+            return self._finish_parse(batch_id, markdown_content, extract_id, error, content_hash, use_cache)
             
-            logger.info("File parsed successfully.")
+        except Exception as e:
+            return self._unexpected_parse_error(e)
+    
+    def parse_file_async(self, file_path: str, filename: str, content_hash: Optional[str] = None,
+                         use_cache: bool = True) -> Future:
+        """
+        Non-blocking variant of parse_file
+        
+        Uploading happens in the calling thread; the wait for MinerU runs on the shared
+        async poller, so the caller can return right after this call. Downloading the result
+        and generating captions then run on a small shared pool, inside a copy of the caller's
+        context (usage scope) and Flask app context.
+        
+        Returns:
+            Future resolving to the same tuple as parse_file (it never raises)
+        """
+        result: Future = Future()
+        app = current_app._get_current_object() if has_app_context() else None
+        
+        def finish(poll_future: Future):
+            try:
+                markdown_content, extract_id, error = self._collect_poll_result(poll_future, self.MAX_POLL_SECONDS)
+                result.set_result(self._finish_parse(batch_id, markdown_content, extract_id, error,
+                                                     content_hash, use_cache))
+            except Exception as e:
+                result.set_result(self._unexpected_parse_error(e))
+        
+        def run_finish(poll_future: Future):
+            if app is None:
+                return finish(poll_future)
+            with app.app_context():
+                return finish(poll_future)
+        
+        try:
+            early, batch_id, content_hash = self._start_parse(file_path, filename, content_hash, use_cache)
+            if early is not None:
+                result.set_result(early)
+                return result
             
-            # Step 4: Enhance markdown with image captions
-            if markdown_content and self._can_generate_captions():
-                logger.info("Step 4/4: Enhancing markdown with image captions...")
-                enhanced_content, failed_count = self._enhance_markdown_with_captions(markdown_content)
-                if failed_count > 0:
-                    logger.warning(f"Markdown enhanced with image captions, but {failed_count} images failed to generate captions.")
-                else:
-                    logger.info("Markdown enhanced with image captions (all images succeeded).")
-                return batch_id, enhanced_content, extract_id, None, failed_count
+            # Step 3: the poller owns the wait; its done callback runs on the poller loop,
+            # so the remaining steps are handed to the finishing pool
+            logger.info("Step 3/4: Waiting for parsing to complete (non-blocking)...")
+            run_finish = propagate_context(run_finish)
+            poll_future = self._start_polling(batch_id, self.MAX_POLL_SECONDS)
+            poll_future.add_done_callback(lambda done: _get_finish_executor().submit(run_finish, done))
+        except Exception as e:
+            result.set_result(self._unexpected_parse_error(e))
+        return result
+    
+    def _start_parse(self, file_path: str, filename: str, content_hash: Optional[str],
+                     use_cache: bool) -> tuple:
+        """
+        Parse steps before waiting on MinerU: local formats, cache lookup, upload
+        
+        Returns:
+            (result, batch_id, content_hash): result is the final parse_file tuple when
+            no MinerU wait is needed, otherwise None and batch_id is the submitted batch
+        """
+        # Check if it's a plain text file that doesn't need MinerU parsing
+        file_ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        
+        if file_ext in ['txt', 'md', 'markdown']:
+            logger.info(f"File {filename} is a plain text file, reading directly...")
+            return self._parse_text_file(file_path, filename), None, content_hash
+        
+        # Check if it's a spreadsheet file (xlsx, csv) - use markitdown
+        if file_ext in ['xlsx', 'xls', 'csv']:
+            logger.info(f"File {filename} is a spreadsheet file, using markitdown...")
+            return self._parse_spreadsheet_file(file_path, filename), None, content_hash
+        
+        # For other file types, use MinerU service
+        if use_cache:
+            content_hash = content_hash or self.compute_content_hash(file_path)
+            cached = self._lookup_parse_cache(content_hash)
+            record_cache_lookup('parsed_file', bool(cached))
+            if cached:
+                logger.info(f"File {filename} matches cached parse result (hash {content_hash[:12]}), skipping MinerU")
+                return cached, None, content_hash
+        
+        logger.info(f"File {filename} requires MinerU parsing...")
+        
+        # Step 1: Get upload URL
+        logger.info(f"Step 1/4: Requesting upload URL for {filename}...")
+        batch_id, upload_url, error = self._get_upload_url(filename)
+        if error:
+            return (None, None, None, error, 0), None, content_hash
+        
+        logger.info(f"Got upload URL. Batch ID: {batch_id}")
+        
+        # Step 2: Upload file
+        logger.info(f"Step 2/4: Uploading file {filename}...")
+        error = self._upload_file(file_path, upload_url)
+        if error:
+            return (batch_id, None, None, error, 0), None, content_hash
+        
+        logger.info("File uploaded successfully.")
+        return None, batch_id, content_hash
+    
+    def _finish_parse(self, batch_id: str, markdown_content: Optional[str], extract_id: Optional[str],
+                      error: Optional[str], content_hash: Optional[str], use_cache: bool) -> tuple:
+        """Parse steps after MinerU finished: image captions and the parse-result cache"""
+        if error:
+            return batch_id, None, None, error, 0
+        
+        logger.info("File parsed successfully.")
+        
+        # Step 4: Enhance markdown with image captions
+        if markdown_content and self._can_generate_captions():
+            logger.info("Step 4/4: Enhancing markdown with image captions...")
+            enhanced_content, failed_count = self._enhance_markdown_with_captions(markdown_content)
+            if failed_count > 0:
+                logger.warning(f"Markdown enhanced with image captions, but {failed_count} images failed to generate captions.")
             else:
-                logger.info("Skipping image caption enhancement (no Gemini client).")
-                return batch_id, markdown_content, extract_id, None, 0
+                logger.info("Markdown enhanced with image captions (all images succeeded).")
+                if use_cache:
+                    self._store_parse_cache(content_hash, batch_id, enhanced_content, extract_id)
+            return batch_id, enhanced_content, extract_id, None, failed_count
+        else:
+            logger.info("Skipping image caption enhancement (no Gemini client).")
+            if use_cache:
+                self._store_parse_cache(content_hash, batch_id, markdown_content, extract_id)
+            return batch_id, markdown_content, extract_id, None, 0
+    
+    @staticmethod
+    def _unexpected_parse_error(e: Exception) -> tuple:
+        error_msg = f"Unexpected error during file parsing: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        return None, None, None, error_msg, 0
+    
+    def _lookup_parse_cache(self, content_hash: str) -> Optional[tuple]:
+        """
+        Look up a previous parse result by content hash
+        
+        Returns:
+            parse_file result tuple on hit, None on miss (or when no database is available)
+        """
+        try:
+            from models import db, ParsedFileCache
+            entry = ParsedFileCache.query.get(content_hash)
+            if not entry:
+                return None
+            
+            # The shared extract directory may have been removed manually; treat as a miss
+            if entry.extract_id and not os.path.isdir(os.path.join(self.upload_folder, 'mineru_files', entry.extract_id)):
+                logger.warning(f"Cached extract {entry.extract_id} is missing on disk, dropping cache entry")
+                db.session.delete(entry)
+                db.session.commit()
+                return None
             
+            return entry.mineru_batch_id, entry.markdown_content, entry.extract_id, None, entry.failed_image_count
+        except RuntimeError:
+            # Not in Flask application context
+            return None
         except Exception as e:
-            error_msg = f"Unexpected error during file parsing: {str(e)}"
-            logger.error(error_msg, exc_info=True)
-            return None, None, None, error_msg, 0
+            logger.warning(f"Parse cache lookup failed: {str(e)}")
+            return None
+    
+    def _store_parse_cache(self, content_hash: str, batch_id: Optional[str],
+                           markdown_content: Optional[str], extract_id: Optional[str]):
+        """Record a successful parse result in the content-hash index (ref_count starts at 0)"""
+        if not content_hash or not markdown_content:
+            return
+        try:
+            from models import db, ParsedFileCache
+            if ParsedFileCache.query.get(content_hash):
+                return
+            db.session.add(ParsedFileCache(
+                content_hash=content_hash,
+                extract_id=extract_id,
+                mineru_batch_id=batch_id,
+                markdown_content=markdown_content,
+                failed_image_count=0
+            ))
+            db.session.commit()
+        except RuntimeError:
+            # Not in Flask application context
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to store parse cache entry: {str(e)}")
+            try:
+                from models import db
+                db.session.rollback()
+            except Exception:
+                pass
     
     def _parse_text_file(self, file_path: str, filename: str) -> tuple[Optional[str], Optional[str], Optional[str], Optional[str], int]:
         """
@@ -275,6 +583,7 @@ class FileParserService:
             logger.error(error_msg, exc_info=True)
             return None, None, None, error_msg, 0
     
+    @track_usage('parse', 'mineru', failed=_returned_error)
     def _get_upload_url(self, filename: str) -> tuple[Optional[str], Optional[str], Optional[str]]:
         """Get upload URL from MinerU"""
         headers = {
@@ -311,6 +620,7 @@ class FileParserService:
             logger.error(error_msg)
             return None, None, error_msg
     
+    @track_usage('parse', 'mineru', failed=_returned_error)
     def _upload_file(self, file_path: str, upload_url: str) -> Optional[str]:
         """Upload file to MinerU"""
         try:
@@ -333,108 +643,108 @@ class FileParserService:
             logger.error(error_msg)
             return error_msg
     
-    def _poll_result(self, batch_id: str, max_wait_time: int = 600) -> tuple[Optional[str], Optional[str], Optional[str]]:
-        """Poll for parsing result
+    def _poll_result(self, batch_id: str, max_wait_time: int = MAX_POLL_SECONDS) -> tuple[Optional[str], Optional[str], Optional[str]]:
+        """Poll for parsing result, blocking the calling thread until MinerU finishes
         
         Returns:
             Tuple of (markdown_content, extract_id, error_message)
         """
+        return self._collect_poll_result(self._start_polling(batch_id, max_wait_time), max_wait_time)
+    
+    def _start_polling(self, batch_id: str, max_wait_time: int) -> Future:
+        """Submit the MinerU status check to the shared poller
+        
+        Returns:
+            Future resolving to (full_zip_url, error_message)
+        """
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.mineru_token}"
         }
         
         result_url = self.get_result_api_template.format(batch_id)
-        start_time = time.time()
+
+        def check_status():
+            """Single status query; returns (done, (zip_url, error_message))"""
+            response = requests.get(result_url, headers=headers, timeout=30)
+            response.raise_for_status()
+            task_info = response.json()
+
+            if task_info.get("code") != 0:
+                return True, (None, f"Failed to query task status: {task_info.get('msg')}")
+
+            extract_result = task_info["data"]["extract_result"][0]
+            task_status = extract_result["state"]
+
+            if task_status == "done":
+                return True, (extract_result["full_zip_url"], None)
+            if task_status == "failed":
+                return True, (None, f"File parsing failed: {extract_result.get('err_msg', 'Unknown error')}")
+
+            logger.debug(f"Current task status: {task_status}, waiting...")
+            return False, None
+
+        # Exponential backoff on the shared poller's event loop
+        return get_async_poller().submit(
+            check_status,
+            timeout=max_wait_time,
+            policy=self.poll_policy,
+            retry_on=(requests.exceptions.RequestException,),
+            name=f"mineru:{batch_id}"
+        )
+    
+    @track_usage('parse', 'mineru', failed=_returned_error)
+    def _collect_poll_result(self, poll_future: Future,
+                             max_wait_time: int) -> tuple[Optional[str], Optional[str], Optional[str]]:
+        """Turn a finished (or pending, blocking) poll into (markdown_content, extract_id, error_message)
         
-        while True:
-            if time.time() - start_time > max_wait_time:
-                error_msg = f"Parsing timeout after {max_wait_time} seconds"
-                logger.error(error_msg)
-                return None, None, error_msg
-            
-            try:
-                response = requests.get(result_url, headers=headers, timeout=30)
-                response.raise_for_status()
-                task_info = response.json()
-                
-                if task_info.get("code") != 0:
-                    error_msg = f"Failed to query task status: {task_info.get('msg')}"
-                    logger.error(error_msg)
-                    return None, None, error_msg
-                
-                task_status = task_info["data"]["extract_result"][0]["state"]
-                
-                if task_status == "done":
-                    logger.info("File parsing completed!")
-                    full_zip_url = task_info["data"]["extract_result"][0]["full_zip_url"]
-                    # Download and extract markdown
-                    return self._download_markdown(full_zip_url)
-                elif task_status == "failed":
-                    err_msg = task_info["data"]["extract_result"][0].get("err_msg", "Unknown error")
-                    error_msg = f"File parsing failed: {err_msg}"
-                    logger.error(error_msg)
-                    return None, None, error_msg
-                else:
-                    logger.debug(f"Current task status: {task_status}, waiting...")
-                    time.sleep(2)  # Wait 2 seconds before next poll
-                    
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"Network error while polling result: {str(e)}, retrying...")
-                time.sleep(2)
+        Both parse_file and parse_file_async end up here, so usage is recorded once per poll
+        whichever path waited for MinerU.
+        """
+        try:
+            full_zip_url, error_msg = poll_future.result()
+        except PollTimeoutError:
+            error_msg = f"Parsing timeout after {max_wait_time} seconds"
+            logger.error(error_msg)
+            return None, None, error_msg
+
+        if error_msg:
+            logger.error(error_msg)
+            return None, None, error_msg
+
+        logger.info("File parsing completed!")
+        # Download and extract markdown
+        return self._download_markdown(full_zip_url)
     
+    @track_usage('parse', 'mineru', failed=_returned_error)
     def _download_markdown(self, zip_url: str) -> tuple[Optional[str], Optional[str], Optional[str]]:
         """Download and extract markdown from result zip, save images to local server
         
+        The zip is streamed into a spooled temp file (memory first, disk when large) with a
+        size cap. Only the markdown, metadata files (layout/content_list json) and images
+        referenced by them are extracted; images are written in parallel.
+        
         Returns:
             Tuple of (markdown_content, extract_id, error_message)
         """
         try:
-            response = requests.get(zip_url, timeout=60)
-            response.raise_for_status()
-            
             # Generate unique directory name for this extraction
             import uuid
             extract_id = str(uuid.uuid4())[:8]
             
-            # Get upload folder from Flask config (we'll need to pass this)
-            # For now, use a hardcoded path relative to project root
-            import os
-            from pathlib import Path
-            
-            # Navigate to project root (assuming this file is in backend/services/)
-            current_file = Path(__file__).resolve()
-            backend_dir = current_file.parent.parent
-            project_root = backend_dir.parent
-            
-            # Create directory for mineru extracts
-            mineru_storage = project_root / 'uploads' / 'mineru_files' / extract_id
-            mineru_storage.mkdir(parents=True, exist_ok=True)
-            
-            logger.info(f"Extracting ZIP to: {mineru_storage}")
-            
-            markdown_content = None
-            markdown_file_path = None
-            
-            with zipfile.ZipFile(io.BytesIO(response.content)) as z:
-                # Extract all files
-                z.extractall(mineru_storage)
-                logger.info(f"Extracted {len(z.namelist())} files from ZIP")
-                
-                # Find markdown file (usually full.md or similar)
-                for name in z.namelist():
-                    if name.endswith('.md') or name.endswith('.MD'):
-                        markdown_file_path = name
-                        md_full_path = mineru_storage / name
-                        with open(md_full_path, 'r', encoding='utf-8') as f:
-                            markdown_content = f.read()
-                        logger.info(f"Found markdown file: {name}")
-                        break
+            with tempfile.SpooledTemporaryFile(max_size=self.ZIP_SPOOL_MEMORY_LIMIT) as zip_buffer:
+                error = self._stream_download(zip_url, zip_buffer)
+                if error:
+                    return None, None, error
                 
-                if not markdown_content:
-                    error_msg = "No markdown file found in result zip"
-                    logger.error(error_msg)
-                    return None, None, error_msg
+                zip_buffer.seek(0)
+                with zipfile.ZipFile(zip_buffer) as z:
+                    markdown_file_path, markdown_content = self._extract_result_zip(z, extract_id)
+            
+            if not markdown_content:
+                error_msg = "No markdown file found in result zip"
+                logger.error(error_msg)
+                return None, None, error_msg
             
             # Replace relative image paths with local server URLs
             markdown_content = self._replace_image_paths(
@@ -458,6 +768,110 @@ class FileParserService:
             logger.error(error_msg)
             return None, None, error_msg
     
+    def _stream_download(self, zip_url: str, buffer) -> Optional[str]:
+        """Stream the result zip into buffer, enforcing max_zip_size
+        
+        Returns:
+            Error message if the download exceeds the size cap, otherwise None
+        """
+        with requests.get(zip_url, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            
+            content_length = int(response.headers.get('Content-Length') or 0)
+            if content_length > self.max_zip_size:
+                error_msg = f"Result zip too large: {content_length} bytes (limit {self.max_zip_size})"
+                logger.error(error_msg)
+                return error_msg
+            
+            downloaded = 0
+            for chunk in response.iter_content(chunk_size=self.ZIP_DOWNLOAD_CHUNK_SIZE):
+                downloaded += len(chunk)
+                if downloaded > self.max_zip_size:
+                    error_msg = f"Result zip exceeds size limit of {self.max_zip_size} bytes"
+                    logger.error(error_msg)
+                    return error_msg
+                buffer.write(chunk)
+        
+        logger.info(f"Downloaded result zip: {downloaded} bytes")
+        return None
+    
+    def _extract_result_zip(self, z: zipfile.ZipFile, extract_id: str) -> tuple[Optional[str], Optional[str]]:
+        """Selectively extract markdown, metadata and referenced images from a MinerU result zip
+        
+        Returns:
+            Tuple of (markdown_file_path, markdown_content)
+        """
+        mineru_storage = os.path.join(self.upload_folder, 'mineru_files', extract_id)
+        os.makedirs(mineru_storage, exist_ok=True)
+        logger.info(f"Extracting ZIP to: {mineru_storage}")
+        
+        names = [n for n in z.namelist() if not n.endswith('/')]
+        image_names = [n for n in names if n.lower().endswith(self.IMAGE_EXTENSIONS)]
+        other_names = [n for n in names if not n.lower().endswith(self.IMAGE_EXTENSIONS)]
+        
+        # Markdown and metadata files are small: read them directly from the archive
+        markdown_file_path = None
+        markdown_content = None
+        referenced = set()
+        for name in other_names:
+            data = z.read(name)
+            self._write_member(mineru_storage, name, data)
+            
+            if name.lower().endswith('.md'):
+                text = data.decode('utf-8')
+                if markdown_content is None:
+                    markdown_file_path = name
+                    markdown_content = text
+                    logger.info(f"Found markdown file: {name}")
+                referenced.update(self._collect_markdown_image_refs(text, os.path.dirname(name)))
+            elif name.lower().endswith('.json'):
+                text = data.decode('utf-8', errors='ignore')
+                for ref in re.findall(r'"(?:image_path|img_path)"\s*:\s*"([^"]+)"', text):
+                    ref = ref.replace('\\', '/')
+                    referenced.add(ref)
+                    referenced.add(f"images/{ref}")
+        
+        # Only extract images that the markdown or layout actually reference
+        selected_images = [n for n in image_names if n in referenced or os.path.basename(n) in referenced]
+        
+        def write_image(name: str):
+            # ZipFile serializes access to the shared file handle; decompression releases the GIL
+            self._write_member(mineru_storage, name, z.read(name))
+        
+        if selected_images:
+            with ThreadPoolExecutor(max_workers=self.IMAGE_WRITE_WORKERS) as executor:
+                list(executor.map(write_image, selected_images))
+        
+        logger.info(f"Extracted {len(other_names)} files and {len(selected_images)}/{len(image_names)} referenced images from ZIP")
+        return markdown_file_path, markdown_content
+    
+    @staticmethod
+    def _collect_markdown_image_refs(markdown_content: str, md_dir: str) -> set:
+        """Collect zip member paths of images referenced in markdown (both ![]() and <img src>)"""
+        refs = set()
+        pattern = r'!\[.*?\]\(([^\)\s]+)[^\)]*\)|<img[^>]+src=["\']([^"\']+)["\']'
+        for match in re.finditer(pattern, markdown_content):
+            img_path = (match.group(1) or match.group(2)).strip()
+            if img_path.startswith(('http://', 'https://', 'data:')):
+                continue
+            if img_path.startswith(('/file/', '/files/')):
+                img_path = img_path.lstrip('/').split('/', 1)[1]
+            rel_path = os.path.normpath(os.path.join(md_dir, img_path)).replace('\\', '/')
+            refs.add(rel_path)
+            refs.add(os.path.basename(rel_path))
+        return refs
+    
+    @staticmethod
+    def _write_member(root_dir: str, name: str, data: bytes):
+        """Write a zip member under root_dir, rejecting paths that escape it"""
+        target = os.path.realpath(os.path.join(root_dir, name))
+        if not target.startswith(os.path.realpath(root_dir) + os.sep):
+            logger.warning(f"Skipping unsafe zip member path: {name}")
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+    
     def _replace_image_paths(self, markdown_content: str, markdown_file_path: str, extract_id: str) -> str:
         """Replace relative image paths in markdown with local server URLs"""
         import os
@@ -565,7 +979,14 @@ class FileParserService:
     
     def _generate_captions_parallel(self, image_urls: List[str], max_workers: int = 12, max_retries: int = 3) -> tuple[List[str], int]:
         """
-        Generate captions for multiple images in parallel with retry mechanism
+        Generate captions for multiple images, deduplicated by perceptual hash
+        
+        Visually identical images in this document (e.g. a logo repeated on every page) are
+        captioned once; captions already in the process-wide cache are reused only for
+        pixel-identical images, since unrelated images from other uploads can share a
+        perceptual hash; the remaining unique images are sent
+        in batches of caption_batch_size per multimodal request, falling back to one request
+        per image (with retries) for any image the batch did not answer.
         
         Args:
             image_urls: List of image URLs
@@ -576,132 +997,244 @@ class FileParserService:
             Tuple of (list of captions, number of failed images)
         """
         captions = [""] * len(image_urls)
-        failed_count = 0
         
-        def generate_with_retry(url: str, idx: int) -> tuple[int, str, bool]:
-            """Generate caption with retry logic"""
-            for attempt in range(max_retries):
+        # Load images and group identical ones by perceptual hash
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            images = list(executor.map(self._load_caption_image, image_urls))
+        
+        key_to_indices = {}
+        key_to_image = {}
+        key_to_cache_keys = {}
+        for idx, image in enumerate(images):
+            if image is None:
+                continue
+            key = perceptual_hash(image)
+            key_to_indices.setdefault(key, []).append(idx)
+            key_to_image.setdefault(key, image)
+            cache_key = f"{self.image_caption_model}:{pixel_digest(image)}"
+            key_to_cache_keys.setdefault(key, [])
+            if cache_key not in key_to_cache_keys[key]:
+                key_to_cache_keys[key].append(cache_key)
+        
+        resolved = {}
+        for key, cache_keys in key_to_cache_keys.items():
+            for cache_key in cache_keys:
+                cached = caption_cache.get(cache_key)
+                if cached:
+                    resolved[key] = cached
+                    break
+        
+        pending = [key for key in key_to_indices if key not in resolved]
+        logger.info(f"Captioning {len(image_urls)} images: {len(key_to_indices)} unique, "
+                    f"{len(resolved)} from cache, {len(pending)} to generate")
+        
+        batch_size = max(1, self.caption_batch_size)
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        
+        def caption_batch(keys: List[str]) -> dict:
+            """Caption one batch; returns key -> caption for the images that succeeded"""
+            results = {}
+            if len(keys) > 1:
                 try:
-                    caption = self._generate_single_caption(url)
-                    if caption:
-                        logger.debug(f"Generated caption for image {idx + 1}/{len(image_urls)} (attempt {attempt + 1})")
-                        return (idx, caption, True)
-                    else:
-                        logger.warning(f"Empty caption for image {idx + 1} (attempt {attempt + 1}/{max_retries})")
+                    batch_captions = self._generate_batch_captions([key_to_image[k] for k in keys])
+                    results = {k: c for k, c in zip(keys, batch_captions) if c}
                 except Exception as e:
-                    logger.warning(f"Failed to generate caption for image {idx + 1} (attempt {attempt + 1}/{max_retries}): {str(e)}")
-                    if attempt < max_retries - 1:
-                        import time
-                        time.sleep(1 * (attempt + 1))  # Exponential backoff: 1s, 2s, 3s
+                    logger.warning(f"Batch caption request for {len(keys)} images failed: {str(e)}, falling back to single requests")
             
-            # All retries failed
-            logger.error(f"Failed to generate caption for image {idx + 1} after {max_retries} attempts")
-            return (idx, "", False)
+            for key in keys:
+                if key not in results:
+                    caption = self._caption_with_retry(key_to_image[key], max_retries)
+                    if caption:
+                        results[key] = caption
+            return results
         
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_idx = {
-                executor.submit(generate_with_retry, url, idx): idx
-                for idx, url in enumerate(image_urls)
-            }
-            
-            for future in as_completed(future_to_idx):
-                try:
-                    idx, caption, success = future.result()
-                    captions[idx] = caption
-                    if not success:
-                        failed_count += 1
-                except Exception as e:
-                    idx = future_to_idx[future]
-                    logger.error(f"Unexpected error generating caption for image {idx + 1}: {str(e)}")
-                    failed_count += 1
+            for results in executor.map(propagate_context(caption_batch), batches):
+                for key, caption in results.items():
+                    for cache_key in key_to_cache_keys[key]:
+                        caption_cache.set(cache_key, caption)
+                    resolved[key] = caption
         
+        for key, indices in key_to_indices.items():
+            for idx in indices:
+                captions[idx] = resolved.get(key, "")
+        
+        failed_count = sum(1 for caption in captions if not caption)
         return captions, failed_count
     
-    def _generate_single_caption(self, image_url: str) -> str:
+    def _caption_with_retry(self, image: Image.Image, max_retries: int) -> str:
+        """Caption a single image with retry logic; returns empty string if all attempts fail"""
+        for attempt in range(max_retries):
+            try:
+                caption = self._caption_image(image)
+                if caption:
+                    return caption
+                logger.warning(f"Empty caption (attempt {attempt + 1}/{max_retries})")
+            except Exception as e:
+                logger.warning(f"Failed to generate caption (attempt {attempt + 1}/{max_retries}): {str(e)}")
+                if attempt < max_retries - 1:
+                    time.sleep(1 * (attempt + 1))  # Backoff: 1s, 2s, 3s
+        
+        logger.error(f"Failed to generate caption after {max_retries} attempts")
+        return ""
+    
+    def _load_caption_image(self, image_url: str) -> Optional[Image.Image]:
         """
-        Generate caption for a single image (supports both HTTP URLs and local paths)
+        Load an image for captioning (supports both HTTP URLs and local MinerU paths)
         
-        Args:
-            image_url: URL or local path of the image
-            
         Returns:
-            Generated caption
+            Loaded PIL Image, or None if the image could not be loaded
         """
         try:
-            # Load image based on URL type
             if image_url.startswith('http://') or image_url.startswith('https://'):
                 # Download from HTTP(S) URL
                 response = requests.get(image_url, timeout=30)
                 response.raise_for_status()
-                image = Image.open(io.BytesIO(response.content))
+                image = image_ops.decode(response.content)
             elif image_url.startswith('/files/mineru/'):
                 # Local MinerU extracted file with prefix matching support
                 from utils.path_utils import find_mineru_file_with_prefix
                 
-                # Find file with prefix matching
                 img_path = find_mineru_file_with_prefix(image_url)
-                
                 if img_path is None or not img_path.exists():
                     logger.warning(f"Local image file not found (with prefix matching): {image_url}")
-                    return ""
+                    return None
                 
-                image = Image.open(img_path)
+                image = image_ops.load(img_path)
             else:
-                # Unsupported path type
                 logger.warning(f"Unsupported image path type: {image_url}")
-                return ""
-            
-            # Generate caption based on provider format
-            prompt = "请用一句简短的中文描述这张图片的主要内容。只返回描述文字，不要其他解释。"
-            
-            if self._provider_format == 'openai':
-                # Use OpenAI SDK format
-                client = self._get_openai_client()
-                if not client:
-                    logger.warning("OpenAI client not initialized, skipping caption generation")
-                    return ""
-                
-                # Encode image to base64
-                buffered = io.BytesIO()
-                if image.mode in ('RGBA', 'LA', 'P'):
-                    image = image.convert('RGB')
-                image.save(buffered, format="JPEG", quality=95)
-                base64_image = base64.b64encode(buffered.getvalue()).decode('utf-8')
-                
-                response = client.chat.completions.create(
-                    model=self.image_caption_model,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}},
-                                {"type": "text", "text": prompt}
-                            ]
-                        }
-                    ],
-                    temperature=0.3
-                )
-                caption = response.choices[0].message.content.strip()
-            else:
-                # Use Gemini SDK format (default)
-                from google.genai import types
-                client = self._get_gemini_client()
-                if not client:
-                    logger.warning("Gemini client not initialized, skipping caption generation")
-                    return ""
-                
-                result = client.models.generate_content(
-                    model=self.image_caption_model,
-                    contents=[image, prompt],
-                    config=types.GenerateContentConfig(
-                        temperature=0.3,  # Lower temperature for more consistent captions
-                    )
-                )
-                caption = result.text.strip()
+                return None
             
-            return caption
+            image.load()
+            return image
+        except Exception as e:
+            logger.warning(f"Failed to load image {image_url}: {str(e)}")
+            return None
+    
+    def _generate_single_caption(self, image_url: str) -> str:
+        """
+        Generate caption for a single image (supports both HTTP URLs and local paths)
+        
+        Args:
+            image_url: URL or local path of the image
             
+        Returns:
+            Generated caption
+        """
+        image = self._load_caption_image(image_url)
+        if image is None:
+            return ""
+        try:
+            return self._caption_image(image)
         except Exception as e:
             logger.warning(f"Failed to generate caption for {image_url}: {str(e)}")
             return ""  # Return empty string on failure
-
+    
+    @track_usage('caption', lambda self: self._provider_format, model_attr='image_caption_model')
+    def _caption_image(self, image: Image.Image) -> str:
+        """Caption one image with the configured provider (raises on API errors)"""
+        prompt = "请用一句简短的中文描述这张图片的主要内容。只返回描述文字，不要其他解释。"
+        
+        if self._provider_format == 'openai':
+            # Use OpenAI SDK format
+            client = self._get_openai_client()
+            if not client:
+                logger.warning("OpenAI client not initialized, skipping caption generation")
+                return ""
+            
+            response = client.chat.completions.create(
+                model=self.image_caption_model,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "image_url", "image_url": {"url": self._to_data_url(image)}},
+                            {"type": "text", "text": prompt}
+                        ]
+                    }
+                ],
+                temperature=0.3
+            )
+            record_response_usage(response)
+            return response.choices[0].message.content.strip()
+        
+        # Use Gemini SDK format (default)
+        from google.genai import types
+        client = self._get_gemini_client()
+        if not client:
+            logger.warning("Gemini client not initialized, skipping caption generation")
+            return ""
+        
+        result = client.models.generate_content(
+            model=self.image_caption_model,
+            contents=[image, prompt],
+            config=types.GenerateContentConfig(
+                temperature=0.3,  # Lower temperature for more consistent captions
+            )
+        )
+        record_response_usage(result)
+        return result.text.strip()
+    
+    @track_usage('caption', lambda self: self._provider_format, model_attr='image_caption_model')
+    def _generate_batch_captions(self, images: List[Image.Image]) -> List[str]:
+        """
+        Caption several images in one multimodal request
+        
+        The model is asked for a JSON array of {"index", "caption"}; images whose index is
+        missing from the answer get an empty caption so the caller can retry them alone.
+        
+        Returns:
+            List of captions aligned with images (empty string where missing)
+        """
+        count = len(images)
+        prompt = (
+            f"上面依次给出了 {count} 张图片，编号 1 到 {count}。"
+            "请用一句简短的中文分别描述每张图片的主要内容。"
+            '只返回 JSON 数组，不要其他解释，格式为：[{"index": 1, "caption": "描述"}, ...]'
+        )
+        
+        if self._provider_format == 'openai':
+            client = self._get_openai_client()
+            if not client:
+                return [""] * count
+            
+            content = []
+            for i, image in enumerate(images, 1):
+                content.append({"type": "text", "text": f"图片 {i}:"})
+                content.append({"type": "image_url", "image_url": {"url": self._to_data_url(image)}})
+            content.append({"type": "text", "text": prompt})
+            
+            response = client.chat.completions.create(
+                model=self.image_caption_model,
+                messages=[{"role": "user", "content": content}],
+                temperature=0.3
+            )
+            record_response_usage(response)
+            text = response.choices[0].message.content
+        else:
+            from google.genai import types
+            client = self._get_gemini_client()
+            if not client:
+                return [""] * count
+            
+            contents = []
+            for i, image in enumerate(images, 1):
+                contents.extend([f"图片 {i}:", image])
+            contents.append(prompt)
+            
+            result = client.models.generate_content(
+                model=self.image_caption_model,
+                contents=contents,
+                config=types.GenerateContentConfig(temperature=0.3)
+            )
+            record_response_usage(result)
+            text = result.text
+        
+        return parse_indexed_captions(text, count)
+    
+    @staticmethod
+    def _to_data_url(image: Image.Image) -> str:
+        """Encode an image as a JPEG data URL for OpenAI-compatible APIs"""
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        return f"data:image/jpeg;base64,{image_ops.to_base64(image, 'JPEG', quality=95)}"
@@ -3,12 +3,14 @@ File Service - handles all file operations
 """
 import os
 import uuid
+from concurrent.futures import Future
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
 from werkzeug.utils import secure_filename
 from PIL import Image
 from models import Project
 from models import db
+from services.image_writer import get_encoding_profile, get_image_writer
 
 
 class FileService:
@@ -74,7 +76,7 @@ class FileService:
         return filepath.relative_to(self.upload_folder).as_posix()
     
     def save_generated_image(self, image: Image.Image, project_id: str, 
-                           page_id: str, image_format: str = 'PNG', 
+                           page_id: str, image_format: Optional[str] = None, 
                            version_number: int = None) -> str:
         """
         Save generated image with version support
@@ -83,44 +85,57 @@ class FileService:
             image: PIL Image object
             project_id: Project ID
             page_id: Page ID
-            image_format: Image format (PNG, JPEG, etc.)
+            image_format: Image format (PNG, JPEG, WEBP). If None, uses GENERATED_IMAGE_PROFILE
             version_number: Optional version number. If None, uses timestamp-based naming
         
         Returns:
-            Relative file path from upload folder
+            Relative file path from upload folder (the file is durable on disk)
         """
-        pages_dir = self._get_pages_dir(project_id)
+        relative_path, future = self.save_generated_image_async(
+            image, project_id, page_id, image_format=image_format, version_number=version_number
+        )
+        future.result()
+        return relative_path
+
+    def save_generated_image_async(self, image: Image.Image, project_id: str,
+                                   page_id: str, image_format: Optional[str] = None,
+                                   version_number: int = None) -> Tuple[str, 'Future[str]']:
+        """
+        Start writing a generated image in the background
+        
+        The encode runs in the ImageWriter process pool. Callers must wait for the
+        returned future before committing anything that references the path.
         
-        # Use lowercase extension
-        ext = image_format.lower()
+        Returns:
+            (relative_path, future) - future resolves once the file is fsynced
+        """
+        pages_dir = self._get_pages_dir(project_id)
+        profile = get_encoding_profile(image_format=image_format)
         
         # Generate filename with version number or timestamp
         if version_number is not None:
-            filename = f"{page_id}_v{version_number}.{ext}"
+            filename = f"{page_id}_v{version_number}.{profile.extension}"
         else:
             # Use timestamp for unique filename
             import time
             timestamp = int(time.time() * 1000)  # milliseconds
-            filename = f"{page_id}_{timestamp}.{ext}"
+            filename = f"{page_id}_{timestamp}.{profile.extension}"
         
         filepath = pages_dir / filename
-        
-        # Save image - format is determined by file extension or explicitly specified
-        # Some PIL Image objects may not support format parameter, so we use extension
-        image.save(str(filepath))
+        future = get_image_writer().submit(image, filepath, profile)
         
         # Return relative path
-        return filepath.relative_to(self.upload_folder).as_posix()
+        return filepath.relative_to(self.upload_folder).as_posix(), future
 
     def save_material_image(self, image: Image.Image, project_id: Optional[str],
-                            image_format: str = 'PNG') -> str:
+                            image_format: Optional[str] = None) -> str:
         """
         Save standalone generated material image (not bound to a specific page)
 
         Args:
             image: PIL Image object
             project_id: Project ID (None for global materials)
-            image_format: Image format (PNG, JPEG, etc.)
+            image_format: Image format (PNG, JPEG, WEBP). If None, uses GENERATED_IMAGE_PROFILE
 
         Returns:
             Relative file path from upload folder
@@ -132,18 +147,17 @@ class FileService:
         else:
             materials_dir = self._get_materials_dir(project_id)
 
-        # Use lowercase extension
-        ext = image_format.lower()
+        profile = get_encoding_profile(image_format=image_format)
 
         # Generate unique filename
         import time
         timestamp = int(time.time() * 1000)  # milliseconds
-        filename = f"material_{timestamp}.{ext}"
+        filename = f"material_{timestamp}.{profile.extension}"
 
         filepath = materials_dir / filename
 
         # Save image
-        image.save(str(filepath))
+        get_image_writer().write(image, filepath, profile)
 
         # Return relative path
         return filepath.relative_to(self.upload_folder).as_posix()
@@ -0,0 +1,168 @@
+"""
+Generation Executor - 在单个事件循环上并发执行 AI 生成调用
+
+批量生成描述、图片时，原先每个在途的 AI 调用都占用一个工作线程，
+线程在等待模型响应的几十秒里什么也不做，并发数受限于线程池大小。
+
+Provider 现在提供 agenerate_text / agenerate_image 等异步接口（GenAI、OpenAI SDK
+的异步客户端、httpx），本模块在一个后台事件循环线程中运行这些协程：
+- 在途调用只占用事件循环上的一个协程，几个线程即可维持数百个并发请求
+- 全局信号量限制同时在途的调用数，避免压垮上游服务
+- 没有原生异步客户端的 provider 回退为 asyncio.to_thread，使用独立的有界线程池
+- 调用方拿到 concurrent.futures.Future，同步代码可以直接 result() 等待
+
+提交时会复制调用方的 contextvars（包括 Flask 应用上下文），协程中可以读取配置，
+但不要在协程中使用数据库会话：会话不是线程安全的，数据库读写应留在调用线程中完成。
+
+Usage:
+    from services.generation_executor import get_generation_executor
+
+    executor = get_generation_executor()
+    future = executor.submit(ai_service.agenerate_image, prompt, ref_path)
+    image = future.result()
+
+    # 按完成顺序处理一批调用，最多同时 8 个在途
+    for page_id, future in executor.map_unordered(generate_page, page_ids, limit=8):
+        handle(page_id, future.result())
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationExecutor:
+    """在后台事件循环线程上执行 AI 生成协程"""
+
+    def __init__(self, max_in_flight: int = 256, blocking_workers: int = 16):
+        """
+        Args:
+            max_in_flight: 同时在途的调用数上限（超出的调用在事件循环中排队）
+            blocking_workers: asyncio.to_thread 使用的线程数（同步 provider、图片编解码）
+        """
+        self.max_in_flight = max_in_flight
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._blocking_executor = ThreadPoolExecutor(
+            max_workers=blocking_workers,
+            thread_name_prefix='generation-blocking'
+        )
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(self._blocking_executor)
+        self._thread = threading.Thread(
+            target=self._run_loop,
+            name='generation-executor',
+            daemon=True
+        )
+        self._thread.start()
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    @property
+    def in_flight_count(self) -> int:
+        """已提交但尚未完成的调用数（包括排队中的）"""
+        with self._in_flight_lock:
+            return self._in_flight
+
+    def submit(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Future:
+        """
+        提交一个异步调用
+
+        Args:
+            fn: 异步函数（如 provider.agenerate_image），在事件循环线程中调用
+            *args, **kwargs: 传给 fn 的参数
+
+        Returns:
+            concurrent.futures.Future，结果为 fn 的返回值
+        """
+        with self._in_flight_lock:
+            self._in_flight += 1
+        future = asyncio.run_coroutine_threadsafe(self._run(fn, args, kwargs), self._loop)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def run(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """提交异步调用并阻塞等待结果（同步调用方使用）"""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("GenerationExecutor.run() cannot be called from the executor loop")
+        return self.submit(fn, *args, **kwargs).result()
+
+    def map_unordered(self,
+                      fn: Callable[[Any], Awaitable[Any]],
+                      items: Iterable[Any],
+                      limit: Optional[int] = None) -> Iterator[Tuple[Any, Future]]:
+        """
+        对每个 item 提交 fn(item)，按完成顺序产出 (item, future)
+
+        items 是惰性消费的：只有在途调用数低于 limit 时才取下一个 item，
+        因此调用方可以在生成器中做准备工作（如更新页面状态）。
+
+        Args:
+            fn: 异步函数，接收单个 item
+            items: 待处理的 item
+            limit: 本批次同时在途的调用数上限，默认 max_in_flight
+
+        Yields:
+            (item, 已完成的 Future)
+        """
+        limit = max(1, limit or self.max_in_flight)
+        items = iter(items)
+        pending: Dict[Future, Any] = {}
+
+        def fill():
+            while len(pending) < limit:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+                pending[self.submit(fn, item)] = item
+
+        fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future
+            fill()
+
+    def _on_done(self, _future: Future):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    async def _run(self, fn, args, kwargs):
+        async with self._semaphore:
+            return await fn(*args, **kwargs)
+
+    def shutdown(self):
+        """停止事件循环并关闭阻塞调用线程池"""
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._blocking_executor.shutdown(wait=False)
+
+
+_executor_instance: Optional[GenerationExecutor] = None
+_lock = threading.Lock()
+
+
+def get_generation_executor() -> GenerationExecutor:
+    """获取全局共享的 GenerationExecutor 实例（懒加载）"""
+    global _executor_instance
+
+    if _executor_instance is None:
+        with _lock:
+            if _executor_instance is None:
+                from config import get_config
+                config = get_config()
+                _executor_instance = GenerationExecutor(
+                    max_in_flight=config.GENERATION_MAX_IN_FLIGHT,
+                    blocking_workers=config.GENERATION_BLOCKING_WORKERS
+                )
+                logger.info("GenerationExecutor initialized")
+
+    return _executor_instance
@@ -65,6 +65,7 @@ from .inpaint_providers import (
     GenerativeEditInpaintProvider,
     BaiduInpaintProvider,
     HybridInpaintProvider,
+    LocalInpaintProvider,
     InpaintProviderRegistry
 )
 
@@ -73,6 +74,7 @@ from .text_attribute_extractors import (
     TextStyleResult,
     TextAttributeExtractor,
     CaptionModelTextAttributeExtractor,
+    PixelColorTextAttributeExtractor,
     TextAttributeExtractorRegistry
 )
 
@@ -110,11 +112,13 @@ __all__ = [
     'GenerativeEditInpaintProvider',
     'BaiduInpaintProvider',
     'HybridInpaintProvider',
+    'LocalInpaintProvider',
     'InpaintProviderRegistry',
     # 文字属性提取器
     'TextStyleResult',
     'TextAttributeExtractor',
     'CaptionModelTextAttributeExtractor',
+    'PixelColorTextAttributeExtractor',
     'TextAttributeExtractorRegistry',
     # 工厂和配置
     'ExtractorFactory',
@@ -18,6 +18,8 @@ from typing import Dict, Any, List, Optional, Tuple, Type
 from pathlib import Path
 from PIL import Image
 
+from services.usage_tracker import track_usage
+
 logger = logging.getLogger(__name__)
 
 
@@ -131,6 +133,7 @@ class MinerUElementExtractor(ElementExtractor):
         """MinerU支持所有通用类型（除了特殊的表格单元格）"""
         return element_type != 'table_cell'
     
+    @track_usage('extract', 'mineru')
     def extract(
         self,
         image_path: str,
@@ -207,10 +210,10 @@ class MinerUElementExtractor(ElementExtractor):
         try:
             ExportService.create_pdf_from_images([image_path], output_file=pdf_path)
             
-            # 调用MinerU解析
+            # 调用MinerU解析（临时PDF没有参考文件持有引用，不写入解析缓存）
             image_id = str(uuid.uuid4())[:8]
             batch_id, markdown_content, extract_id, error_message, failed_image_count = \
-                self._parser_service.parse_file(pdf_path, f"image_{image_id}.pdf")
+                self._parser_service.parse_file(pdf_path, f"image_{image_id}.pdf", use_cache=False)
             
             if error_message or not extract_id:
                 logger.error(f"{'  ' * depth}MinerU解析失败: {error_message}")
@@ -455,6 +458,7 @@ class BaiduOCRElementExtractor(ElementExtractor):
         """百度OCR主要支持表格类型"""
         return element_type in ['table', 'table_cell', None]
     
+    @track_usage('extract', 'baidu_table_ocr')
     def extract(
         self,
         image_path: str,
@@ -657,6 +661,7 @@ class BaiduAccurateOCRElementExtractor(ElementExtractor):
         """百度高精度OCR主要支持文字类型"""
         return element_type in ['text', 'title', 'paragraph', None]
     
+    @track_usage('extract', 'baidu_accurate_ocr')
     def extract(
         self,
         image_path: str,
@@ -13,11 +13,13 @@ from .inpaint_providers import (
     GenerativeEditInpaintProvider, 
     BaiduInpaintProvider,
     HybridInpaintProvider,
+    LocalInpaintProvider,
     InpaintProviderRegistry
 )
 from .text_attribute_extractors import (
     TextAttributeExtractor,
     CaptionModelTextAttributeExtractor,
+    PixelColorTextAttributeExtractor,
     TextAttributeExtractorRegistry,
     TextStyleResult
 )
@@ -386,6 +388,26 @@ class InpaintProviderFactory:
         
         return registry
     
+    @staticmethod
+    def create_local_inpaint_provider(
+        remote_provider: Optional[InpaintProvider] = None,
+        **kwargs
+    ) -> LocalInpaintProvider:
+        """
+        创建本地快速Inpaint提供者
+        
+        纯色/渐变背景上的区域在本地CPU填充，复杂背景的区域交给 remote_provider。
+        
+        Args:
+            remote_provider: 复杂区域使用的远程提供者（可选）
+            **kwargs: 透传给 LocalInpaintProvider（ring_width、max_residual、max_edge_density、max_area_ratio）
+        
+        Returns:
+            LocalInpaintProvider实例
+        """
+        logger.info(f"创建LocalInpaintProvider（远程: {remote_provider.__class__.__name__ if remote_provider else 'None'}）")
+        return LocalInpaintProvider(remote_provider=remote_provider, **kwargs)
+    
     @staticmethod
     def create_baidu_inpaint_provider() -> Optional[BaiduInpaintProvider]:
         """
@@ -414,7 +436,8 @@ class InpaintProviderFactory:
         baidu_provider: Optional[BaiduInpaintProvider] = None,
         generative_provider: Optional[GenerativeEditInpaintProvider] = None,
         ai_service: Optional[Any] = None,
-        enhance_quality: bool = True
+        enhance_quality: bool = True,
+        enhance_threshold: Optional[float] = None
     ) -> Optional[HybridInpaintProvider]:
         """
         创建混合Inpaint提供者（百度修复 + 生成式画质提升）
@@ -428,6 +451,7 @@ class InpaintProviderFactory:
             generative_provider: 生成式编辑提供者（可选，自动创建）
             ai_service: AI服务实例（用于创建生成式提供者）
             enhance_quality: 是否启用画质提升，默认True
+            enhance_threshold: 画质门限（灰度级），修复缺陷不超过该值时跳过画质提升（可选）
         
         Returns:
             HybridInpaintProvider实例，如果无法创建则返回None
@@ -450,7 +474,8 @@ class InpaintProviderFactory:
         return HybridInpaintProvider(
             baidu_provider=baidu_provider,
             generative_provider=generative_provider,
-            enhance_quality=enhance_quality
+            enhance_quality=enhance_quality,
+            enhance_threshold=enhance_threshold
         )
 
 
@@ -464,7 +489,8 @@ class ServiceConfig:
         inpaint_registry: InpaintProviderRegistry,
         max_depth: int = 1,
         min_image_size: int = 200,
-        min_image_area: int = 40000
+        min_image_area: int = 40000,
+        save_debug_masks: bool = False
     ):
         """
         初始化服务配置
@@ -476,6 +502,7 @@ class ServiceConfig:
             max_depth: 最大递归深度（默认1）
             min_image_size: 最小图片尺寸
             min_image_area: 最小图片面积
+            save_debug_masks: 是否把修复掩码保存到输出目录（调试用，默认关闭）
         """
         self.upload_folder = upload_folder
         self.extractor_registry = extractor_registry
@@ -483,6 +510,7 @@ class ServiceConfig:
         self.max_depth = max_depth
         self.min_image_size = min_image_size
         self.min_image_area = min_image_area
+        self.save_debug_masks = save_debug_masks
     
     @classmethod
     def from_defaults(
@@ -534,6 +562,9 @@ class ServiceConfig:
                 - contain_threshold: 混合提取器包含判断阈值（默认0.8）
                 - intersection_threshold: 混合提取器交集判断阈值（默认0.3）
                 - enhance_quality: 混合Inpaint是否启用画质提升（默认True）
+                - enhance_threshold: 混合Inpaint画质门限，修复缺陷不超过该值时跳过画质提升
+                - local_inpaint: 是否先对简单背景区域做本地填充（默认取 LOCAL_INPAINT_ENABLED，生成式重绘时不生效）
+                - save_debug_masks: 是否保存修复掩码（默认取 SAVE_INPAINT_MASKS 配置）
         
         Returns:
             ServiceConfig实例
@@ -555,6 +586,8 @@ class ServiceConfig:
                 mineru_api_base = current_app.config.get('MINERU_API_BASE', 'https://mineru.net')
             if upload_folder is None:
                 upload_folder = current_app.config.get('UPLOAD_FOLDER', './uploads')
+            kwargs.setdefault('save_debug_masks', current_app.config.get('SAVE_INPAINT_MASKS', False))
+            kwargs.setdefault('local_inpaint', current_app.config.get('LOCAL_INPAINT_ENABLED', True))
         else:
             # 回退到默认值
             if mineru_api_base is None:
@@ -581,7 +614,8 @@ class ServiceConfig:
         # 创建MinerU解析服务
         parser_service = FileParserService(
             mineru_token=mineru_token,
-            mineru_api_base=mineru_api_base
+            mineru_api_base=mineru_api_base,
+            upload_folder=str(upload_path)
         )
         
         # 创建提取器注册表
@@ -625,7 +659,8 @@ class ServiceConfig:
             # 混合Inpaint提供者（百度修复 + 生成式画质提升）
             hybrid_inpaint = InpaintProviderFactory.create_hybrid_inpaint_provider(
                 ai_service=ai_service,
-                enhance_quality=kwargs.get('enhance_quality', True)
+                enhance_quality=kwargs.get('enhance_quality', True),
+                enhance_threshold=kwargs.get('enhance_threshold')
             )
             
             if hybrid_inpaint:
@@ -662,13 +697,22 @@ class ServiceConfig:
             inpaint_registry.register_default(generative_provider)
             logger.info("✅ 重绘注册表已创建（GenerativeEdit通用）")
         
+        # 本地快速路径：简单背景的区域直接本地填充，其余区域再交给上面选择的提供者
+        # 生成式重绘是整图重新生成，不做区域拆分（包括 hybrid/baidu 创建失败后的回退）
+        remote_provider = inpaint_registry.get_provider(None)
+        if kwargs.get('local_inpaint', True) and not isinstance(remote_provider, GenerativeEditInpaintProvider):
+            inpaint_registry.register_default(
+                InpaintProviderFactory.create_local_inpaint_provider(remote_provider=remote_provider)
+            )
+        
         return cls(
             upload_folder=upload_path,
             extractor_registry=extractor_registry,
             inpaint_registry=inpaint_registry,
             max_depth=kwargs.get('max_depth', 1),
             min_image_size=kwargs.get('min_image_size', 200),
-            min_image_area=kwargs.get('min_image_area', 40000)
+            min_image_area=kwargs.get('min_image_area', 40000),
+            save_debug_masks=kwargs.get('save_debug_masks', False)
         )
 
 
@@ -703,10 +747,38 @@ class TextAttributeExtractorFactory:
         logger.info("创建CaptionModelTextAttributeExtractor")
         return CaptionModelTextAttributeExtractor(ai_service, prompt_template)
     
+    @staticmethod
+    def create_pixel_color_extractor(
+        fallback_extractor: Optional[TextAttributeExtractor] = None,
+        ai_service: Optional[Any] = None,
+        min_confidence: float = 0.6
+    ) -> TextAttributeExtractor:
+        """
+        创建基于像素统计的文字颜色提取器
+        
+        本地估算文字颜色，只有置信度低于 min_confidence 时才调用回退提取器（模型）。
+        
+        Args:
+            fallback_extractor: 回退提取器（可选，默认自动创建 Caption Model 提取器）
+            ai_service: AIService实例（可选，用于自动创建回退提取器）
+            min_confidence: 回退阈值
+        
+        Returns:
+            PixelColorTextAttributeExtractor实例
+        """
+        if fallback_extractor is None:
+            fallback_extractor = TextAttributeExtractorFactory.create_caption_model_extractor(
+                ai_service=ai_service
+            )
+        
+        logger.info("创建PixelColorTextAttributeExtractor")
+        return PixelColorTextAttributeExtractor(fallback_extractor, min_confidence=min_confidence)
+    
     @staticmethod
     def create_text_attribute_registry(
         caption_extractor: Optional[TextAttributeExtractor] = None,
-        ai_service: Optional[Any] = None
+        ai_service: Optional[Any] = None,
+        use_pixel_color: bool = True
     ) -> TextAttributeExtractorRegistry:
         """
         创建文字属性提取器注册表
@@ -716,6 +788,7 @@ class TextAttributeExtractorFactory:
         Args:
             caption_extractor: Caption Model提取器（可选，自动创建）
             ai_service: AIService实例（可选，用于自动创建提取器）
+            use_pixel_color: 文本类型是否优先使用本地像素颜色估算（低置信度时回退到 caption_extractor）
         
         Returns:
             配置好的TextAttributeExtractorRegistry实例
@@ -729,6 +802,12 @@ class TextAttributeExtractorFactory:
                 ai_service=ai_service
             )
         
+        text_extractor = caption_extractor
+        if use_pixel_color:
+            text_extractor = TextAttributeExtractorFactory.create_pixel_color_extractor(
+                fallback_extractor=caption_extractor
+            )
+        
         # 创建注册表
         registry = TextAttributeExtractorRegistry()
         
@@ -738,7 +817,7 @@ class TextAttributeExtractorFactory:
         # 注册文本类型
         registry.register_types(
             ['text', 'title', 'paragraph', 'heading', 'table_cell'],
-            caption_extractor
+            text_extractor
         )
         
         logger.info("创建TextAttributeExtractorRegistry")
@@ -5,9 +5,12 @@
 """
 import logging
 import tempfile
-from typing import List
+from typing import Any, Dict, List
+import numpy as np
 from PIL import Image
 
+from utils import image_ops
+
 from .data_models import EditableElement, BBox
 
 logger = logging.getLogger(__name__)
@@ -49,11 +52,11 @@ def crop_element_from_image(
     
     # 裁剪
     crop_box = (int(bbox.x0), int(bbox.y0), int(bbox.x1), int(bbox.y1))
-    cropped = img.crop(crop_box)
+    cropped = image_ops.crop(img, crop_box)
     
     # 保存到临时文件
     with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
-        cropped.save(tmp.name)
+        image_ops.save(cropped, tmp.name)
         return tmp.name
 
 
@@ -103,3 +106,82 @@ def should_recurse_into_element(
         return False
     
     return True
+
+
+def measure_repair_defect(
+    image: Image.Image,
+    bboxes: List[tuple],
+    expand_pixels: int = 0,
+    ring_width: int = 6
+) -> Dict[str, Any]:
+    """
+    评估修复区域与周围背景的衔接质量（用于决定是否需要生成式画质提升）
+    
+    对每个修复区域计算两项指标（单位：灰度级，0-255）：
+    - seam: 区域边界内外相邻像素的平均差，减去外围带内相邻像素的平均差（接缝是否突兀）
+    - texture: 区域内部相邻像素差的 95 分位数减去外围带的 95 分位数（是否残留文字笔画或涂抹痕迹，
+      残留笔画通常稀疏但对比强烈，用高分位数而不是均值）
+    
+    Args:
+        image: 修复后的图片
+        bboxes: 修复区域 [(x0, y0, x1, y1), ...]
+        expand_pixels: 修复时使用的扩展像素数（接缝位于扩展后的边界上）
+        ring_width: 外围参考带宽度
+    
+    Returns:
+        字典：defect（所有区域 seam/texture 的最大值）、seam、texture、regions（参与评估的区域数）
+    """
+    gray = np.asarray(image.convert('L'), dtype=np.float32)
+    height, width = gray.shape
+    max_seam = max_texture = 0.0
+    regions = 0
+    
+    for bbox in bboxes:
+        x0 = max(0, int(bbox[0]) - expand_pixels)
+        y0 = max(0, int(bbox[1]) - expand_pixels)
+        x1 = min(width, int(round(bbox[2])) + expand_pixels)
+        y1 = min(height, int(round(bbox[3])) + expand_pixels)
+        if x1 - x0 < 4 or y1 - y0 < 4:
+            continue
+        
+        # 接缝：边界两侧像素差（只统计不在图片边缘的边）
+        seams = []
+        if y0 > 0:
+            seams.append(np.abs(gray[y0, x0:x1] - gray[y0 - 1, x0:x1]))
+        if y1 < height:
+            seams.append(np.abs(gray[y1 - 1, x0:x1] - gray[y1, x0:x1]))
+        if x0 > 0:
+            seams.append(np.abs(gray[y0:y1, x0] - gray[y0:y1, x0 - 1]))
+        if x1 < width:
+            seams.append(np.abs(gray[y0:y1, x1 - 1] - gray[y0:y1, x1]))
+        if not seams:
+            continue
+        
+        # 外围参考带的相邻像素差
+        bands = []
+        top, bottom = gray[max(0, y0 - ring_width):y0, x0:x1], gray[y1:y1 + ring_width, x0:x1]
+        left, right = gray[y0:y1, max(0, x0 - ring_width):x0], gray[y0:y1, x1:x1 + ring_width]
+        for band in (top, bottom, left, right):
+            if band.shape[0] > 1:
+                bands.append(np.abs(np.diff(band, axis=0)).ravel())
+            if band.shape[1] > 1:
+                bands.append(np.abs(np.diff(band, axis=1)).ravel())
+        ring_diffs = np.concatenate(bands) if bands else np.zeros(1, dtype=np.float32)
+        
+        inner = gray[y0:y1, x0:x1]
+        inner_diffs = np.concatenate([
+            np.abs(np.diff(inner, axis=0)).ravel(),
+            np.abs(np.diff(inner, axis=1)).ravel()
+        ])
+        seam = float(np.concatenate(seams).mean())
+        
+        max_seam = max(max_seam, seam - float(ring_diffs.mean()))
+        max_texture = max(max_texture, float(np.percentile(inner_diffs, 95) - np.percentile(ring_diffs, 95)))
+        regions += 1
+    
+    return {
+        'defect': round(max(max_seam, max_texture), 2),
+        'seam': round(max_seam, 2),
+        'texture': round(max_texture, 2),
+        'regions': regions
+    }
@@ -13,6 +13,8 @@ from typing import Dict, Any, List, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from PIL import Image
 
+from services.usage_tracker import propagate_context, track_usage
+
 from .extractors import (
     ElementExtractor, 
     ExtractionResult, 
@@ -192,6 +194,7 @@ class HybridElementExtractor(ElementExtractor):
         """混合提取器支持所有类型"""
         return True
     
+    @track_usage('extract', 'hybrid')
     def extract(
         self,
         image_path: str,
@@ -234,8 +237,8 @@ class HybridElementExtractor(ElementExtractor):
             return self._baidu_ocr_extractor.extract(image_path, element_type, **kwargs)
         
         with ThreadPoolExecutor(max_workers=2) as executor:
-            future_mineru = executor.submit(run_mineru)
-            future_baidu = executor.submit(run_baidu_ocr)
+            future_mineru = executor.submit(propagate_context(run_mineru))
+            future_baidu = executor.submit(propagate_context(run_baidu_ocr))
             
             # 等待两个任务完成
             for future in as_completed([future_mineru, future_baidu]):
@@ -6,6 +6,7 @@ Inpaint提供者 - 抽象不同的inpaint实现
 2. GenerativeEditInpaintProvider - 基于生成式大模型的整图编辑重绘（如Gemini图片编辑）
 3. BaiduInpaintProvider - 基于百度图像修复API的区域重绘
 4. HybridInpaintProvider - 混合方法：先百度修复去除文字，再生成式提升画质
+5. LocalInpaintProvider - 本地快速填充：纯色/渐变背景上的区域直接在CPU上修复，其余交给远程提供者
 
 以及注册表：
 - InpaintProviderRegistry - 元素类型到重绘方法的映射注册表
@@ -13,10 +14,14 @@ Inpaint提供者 - 抽象不同的inpaint实现
 import logging
 import tempfile
 from abc import ABC, abstractmethod
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
+import numpy as np
 from PIL import Image
 
+from utils import image_ops
 from utils.mask_utils import create_mask_from_bboxes
+from services.usage_tracker import track_usage
+from .helpers import measure_repair_defect
 
 logger = logging.getLogger(__name__)
 
@@ -71,6 +76,7 @@ class DefaultInpaintProvider(InpaintProvider):
         """
         self.inpainting_service = inpainting_service
     
+    @track_usage('inpaint_region', 'default')
     def inpaint_regions(
         self,
         image: Image.Image,
@@ -145,6 +151,7 @@ class GenerativeEditInpaintProvider(InpaintProvider):
         self.aspect_ratio = aspect_ratio
         self.resolution = resolution
     
+    @track_usage('inpaint_region', 'generative')
     def inpaint_regions(
         self,
         image: Image.Image,
@@ -173,7 +180,7 @@ class GenerativeEditInpaintProvider(InpaintProvider):
             # 保存临时图片文件（AI服务需要文件路径）
             with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
                 tmp_path = tmp_file.name
-                image.save(tmp_path)
+                image_ops.save(image, tmp_path)
             
             logger.info("GenerativeEditInpaintProvider: 开始生成式编辑重绘...")
             
@@ -231,6 +238,7 @@ class BaiduInpaintProvider(InpaintProvider):
         """
         self._provider = baidu_inpainting_provider
     
+    @track_usage('inpaint_region', 'baidu')
     def inpaint_regions(
         self,
         image: Image.Image,
@@ -287,11 +295,15 @@ class HybridInpaintProvider(InpaintProvider):
     - 单独使用生成式模型容易遗漏文字的情况
     """
     
+    # 默认画质门限（灰度级）：修复区域的接缝/残留纹理超过该值才做生成式画质提升
+    DEFAULT_ENHANCE_THRESHOLD = 6.0
+    
     def __init__(
         self,
         baidu_provider: BaiduInpaintProvider,
         generative_provider: 'GenerativeEditInpaintProvider',
-        enhance_quality: bool = True
+        enhance_quality: bool = True,
+        enhance_threshold: Optional[float] = None
     ):
         """
         初始化混合Inpaint提供者
@@ -300,11 +312,15 @@ class HybridInpaintProvider(InpaintProvider):
             baidu_provider: 百度图像修复提供者
             generative_provider: 生成式编辑提供者（用于画质提升）
             enhance_quality: 是否在百度修复后使用生成式模型提升画质，默认True
+            enhance_threshold: 画质门限（灰度级），百度修复结果的缺陷值不超过该值时跳过画质提升；
+                0 表示总是提升，默认 DEFAULT_ENHANCE_THRESHOLD
         """
         self._baidu_provider = baidu_provider
         self._generative_provider = generative_provider
         self._enhance_quality = enhance_quality
+        self._enhance_threshold = self.DEFAULT_ENHANCE_THRESHOLD if enhance_threshold is None else enhance_threshold
     
+    @track_usage('inpaint_region', 'hybrid')
     def inpaint_regions(
         self,
         image: Image.Image,
@@ -318,11 +334,15 @@ class HybridInpaintProvider(InpaintProvider):
         支持的kwargs参数：
         - expand_pixels: int, 百度修复的扩展像素数，默认2
         - enhance_quality: bool, 是否提升画质，默认使用初始化时的值
+        - enhance_threshold: float, 画质门限，默认使用初始化时的值
         - aspect_ratio: str, 画质提升的宽高比
         - resolution: str, 画质提升的分辨率
+        
+        是否做了画质提升及缺陷值记录在返回图片的 info['inpaint_metrics'] 中。
         """
         expand_pixels = kwargs.get('expand_pixels', 2)
         enhance_quality = kwargs.get('enhance_quality', self._enhance_quality)
+        enhance_threshold = kwargs.get('enhance_threshold', self._enhance_threshold)
         
         try:
             # Step 1: 百度图像修复 - 精确去除文字
@@ -342,8 +362,19 @@ class HybridInpaintProvider(InpaintProvider):
             logger.info("HybridInpaintProvider: 百度修复完成")
             
             # Step 2: 生成式画质提升（可选）
+            # 先在本地评估修复质量，接缝和残留纹理都不明显时跳过这次整图生成调用
+            metrics = None
+            if enhance_quality and self._generative_provider:
+                metrics = measure_repair_defect(repaired_image, bboxes, expand_pixels=expand_pixels)
+                metrics['threshold'] = enhance_threshold
+                if enhance_threshold > 0 and metrics['defect'] <= enhance_threshold:
+                    logger.info(f"HybridInpaintProvider: 修复质量达标（缺陷 {metrics['defect']} <= {enhance_threshold}），跳过画质提升")
+                    enhance_quality = False
+                    metrics['enhanced'] = False
+                    repaired_image.info['inpaint_metrics'] = metrics
+            
             if enhance_quality and self._generative_provider:
-                logger.info("HybridInpaintProvider Step 2: 生成式画质提升...")
+                logger.info(f"HybridInpaintProvider Step 2: 生成式画质提升（缺陷 {metrics['defect']}）...")
                 
                 # 使用专门的画质提升prompt，传入被修复的区域信息
                 enhanced_image = self._enhance_image_quality(
@@ -355,9 +386,11 @@ class HybridInpaintProvider(InpaintProvider):
                 
                 if enhanced_image:
                     logger.info("HybridInpaintProvider: 画质提升完成")
+                    enhanced_image.info['inpaint_metrics'] = dict(metrics, enhanced=True)
                     return enhanced_image
                 else:
                     logger.warning("HybridInpaintProvider: 画质提升失败，返回百度修复结果")
+                    repaired_image.info['inpaint_metrics'] = dict(metrics, enhanced=False, enhance_failed=True)
                     return repaired_image
             else:
                 logger.info("HybridInpaintProvider: 跳过画质提升")
@@ -390,7 +423,7 @@ class HybridInpaintProvider(InpaintProvider):
             # 保存临时图片
             with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
                 tmp_path = tmp_file.name
-                image.save(tmp_path)
+                image_ops.save(image, tmp_path)
             
             # 将bboxes转换为百分比形式（相对于图片宽高）
             regions = None
@@ -453,6 +486,173 @@ class HybridInpaintProvider(InpaintProvider):
             return None
 
 
+class LocalInpaintProvider(InpaintProvider):
+    """
+    本地快速Inpaint提供者 - 简单背景本地填充，复杂背景交给远程提供者
+    
+    幻灯片上大部分文字压在纯色或线性渐变背景上，这类区域用周围像素拟合一个
+    平面（每个通道 a + b·x + c·y）直接填充，效果与远程修复没有区别。
+    
+    对每个bbox，取其外围一圈像素（排除其他待修复区域）评估背景复杂度：
+    - 平面拟合残差（RMS）：衡量背景是否为纯色/线性渐变
+    - 边缘密度：相邻像素差超过阈值的比例，衡量是否有纹理、线条、图案
+    两者都低于阈值的区域在本地填充，其余区域交给 remote_provider（如百度/混合提供者）。
+    所有区域都能本地处理时完全不需要网络请求。
+    """
+    
+    def __init__(
+        self,
+        remote_provider: Optional[InpaintProvider] = None,
+        ring_width: int = 12,
+        max_residual: float = 6.0,
+        max_edge_density: float = 0.05,
+        max_area_ratio: float = 0.25
+    ):
+        """
+        初始化本地Inpaint提供者
+        
+        Args:
+            remote_provider: 复杂背景区域使用的提供者（可选，不提供则只填充简单区域，复杂区域保持原样）
+            ring_width: 用于评估背景的外围像素宽度
+            max_residual: 平面拟合残差RMS上限（0-255灰度）
+            max_edge_density: 外围边缘像素比例上限
+            max_area_ratio: 单个区域面积占整图比例上限，超过则交给远程提供者
+        """
+        self._remote_provider = remote_provider
+        self.ring_width = ring_width
+        self.max_residual = max_residual
+        self.max_edge_density = max_edge_density
+        self.max_area_ratio = max_area_ratio
+    
+    @track_usage('inpaint_region', 'local')
+    def inpaint_regions(
+        self,
+        image: Image.Image,
+        bboxes: List[tuple],
+        types: Optional[List[str]] = None,
+        **kwargs
+    ) -> Optional[Image.Image]:
+        """
+        本地填充简单区域，其余区域交给远程提供者
+        
+        支持的kwargs参数：
+        - expand_pixels: int, 本地填充区域的扩展像素数，默认2
+        - 其他参数原样透传给 remote_provider
+        """
+        expand_pixels = kwargs.get('expand_pixels', 2)
+        
+        try:
+            pixels = np.asarray(image.convert('RGB'), dtype=np.float32).copy()
+            height, width, _ = pixels.shape
+            boxes = [self._clip_box(bbox, expand_pixels, width, height) for bbox in bboxes]
+            
+            # 所有待修复区域，评估背景时排除这些像素
+            pending = np.zeros((height, width), dtype=bool)
+            for x0, y0, x1, y1 in boxes:
+                pending[y0:y1, x0:x1] = True
+            
+            remote_bboxes, remote_types = [], []
+            local_count = 0
+            
+            for idx, box in enumerate(boxes):
+                fill = None
+                if self._is_simple_region(pixels, pending, box):
+                    fill = self._plane_fill(pixels, pending, box)
+                
+                if fill is not None:
+                    x0, y0, x1, y1 = box
+                    pixels[y0:y1, x0:x1] = fill
+                    local_count += 1
+                elif self._remote_provider is not None:
+                    remote_bboxes.append(bboxes[idx])
+                    remote_types.append(types[idx] if types and idx < len(types) else None)
+            
+            result = Image.fromarray(np.clip(pixels + 0.5, 0, 255).astype(np.uint8), 'RGB')
+            logger.info(f"LocalInpaintProvider: 本地填充 {local_count} 个区域，远程修复 {len(remote_bboxes)} 个区域")
+            
+            if not remote_bboxes:
+                return result
+            
+            return self._remote_provider.inpaint_regions(
+                image=result,
+                bboxes=remote_bboxes,
+                types=remote_types if types else None,
+                **kwargs
+            )
+        
+        except Exception as e:
+            logger.error(f"LocalInpaintProvider处理失败: {e}", exc_info=True)
+            return None
+    
+    @staticmethod
+    def _clip_box(bbox, expand_pixels: int, width: int, height: int) -> Tuple[int, int, int, int]:
+        x0, y0, x1, y1 = bbox
+        return (
+            max(0, int(x0) - expand_pixels),
+            max(0, int(y0) - expand_pixels),
+            min(width, int(round(x1)) + expand_pixels),
+            min(height, int(round(y1)) + expand_pixels)
+        )
+    
+    def _ring(self, pending: np.ndarray, box: Tuple[int, int, int, int]):
+        """外围一圈未被其他待修复区域覆盖的像素，返回 (外框, 该外框内的布尔掩码)"""
+        height, width = pending.shape
+        x0, y0, x1, y1 = box
+        r = self.ring_width
+        outer = (max(0, x0 - r), max(0, y0 - r), min(width, x1 + r), min(height, y1 + r))
+        ox0, oy0, ox1, oy1 = outer
+        ring = ~pending[oy0:oy1, ox0:ox1]
+        return outer, ring
+    
+    def _is_simple_region(self, pixels: np.ndarray, pending: np.ndarray, box: Tuple[int, int, int, int]) -> bool:
+        """外围背景是否为纯色/线性渐变（可以本地填充）"""
+        height, width = pending.shape
+        x0, y0, x1, y1 = box
+        if (x1 - x0) * (y1 - y0) > self.max_area_ratio * width * height:
+            return False
+        
+        (ox0, oy0, ox1, oy1), ring = self._ring(pending, box)
+        if ring.sum() < 2 * self.ring_width * 4:
+            return False
+        
+        patch = pixels[oy0:oy1, ox0:ox1]
+        coeffs, residual = self._fit_plane(patch, ring)
+        if residual > self.max_residual:
+            return False
+        
+        # 边缘密度：只统计两端都在外围的相邻像素对
+        gray = patch.mean(axis=2)
+        edges, pairs = 0, 0
+        for axis in (0, 1):
+            diff = np.abs(np.diff(gray, axis=axis))
+            valid = ring[1:, :] & ring[:-1, :] if axis == 0 else ring[:, 1:] & ring[:, :-1]
+            edges += int((diff[valid] > 24).sum())
+            pairs += int(valid.sum())
+        return pairs > 0 and edges / pairs <= self.max_edge_density
+    
+    def _plane_fill(self, pixels: np.ndarray, pending: np.ndarray, box: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
+        """用外围像素拟合的平面填充区域，外围没有可用像素时返回None"""
+        (ox0, oy0, ox1, oy1), ring = self._ring(pending, box)
+        if not ring.any():
+            return None
+        
+        coeffs, _ = self._fit_plane(pixels[oy0:oy1, ox0:ox1], ring)
+        x0, y0, x1, y1 = box
+        ys, xs = np.mgrid[y0 - oy0:y1 - oy0, x0 - ox0:x1 - ox0]
+        design = np.stack([np.ones(xs.size), xs.ravel(), ys.ravel()], axis=1)
+        return (design @ coeffs).reshape(y1 - y0, x1 - x0, 3)
+    
+    @staticmethod
+    def _fit_plane(patch: np.ndarray, ring: np.ndarray):
+        """对外围像素的每个通道做最小二乘平面拟合，返回 (系数[3x3], 残差RMS)"""
+        ys, xs = np.nonzero(ring)
+        design = np.stack([np.ones(xs.size), xs, ys], axis=1).astype(np.float64)
+        values = patch[ys, xs].astype(np.float64)
+        coeffs, *_ = np.linalg.lstsq(design, values, rcond=None)
+        residual = float(np.sqrt(np.mean((design @ coeffs - values) ** 2)))
+        return coeffs, residual
+
+
 class InpaintProviderRegistry:
     """
     元素类型到重绘方法的映射注册表
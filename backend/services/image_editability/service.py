@@ -9,9 +9,14 @@
 """
 import logging
 import uuid
-from typing import List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from PIL import Image
 
+from utils import image_ops
+from services.usage_tracker import propagate_context
+from services.metrics import stage
+from services.tracing import traced
+
 from .data_models import BBox, EditableElement, EditableImage
 from .coordinate_mapper import CoordinateMapper
 from .extractors import ElementExtractor, ExtractionResult
@@ -58,6 +63,7 @@ class ImageEditabilityService:
         self._max_depth = config.max_depth
         self._min_image_size = config.min_image_size
         self._min_image_area = config.min_image_area
+        self._save_debug_masks = config.save_debug_masks
         self._max_child_coverage_ratio = 0.85
         
         extractors = self._extractor_registry.get_all_extractors()
@@ -68,6 +74,8 @@ class ImageEditabilityService:
             f"max_depth={self._max_depth}"
         )
     
+    @traced('editability.make_image_editable',
+            lambda self, image_path, depth=0, **kwargs: {'image_path': image_path, 'depth': depth})
     def make_image_editable(
         self,
         image_path: str,
@@ -139,6 +147,7 @@ class ImageEditabilityService:
         
         # 3. 生成clean background（根据元素类型选择重绘方法）
         clean_background = None
+        metadata = {}
         if self._inpaint_registry and elements:
             clean_background = self._generate_clean_background(
                 image_path=image_path,
@@ -148,7 +157,8 @@ class ImageEditabilityService:
                 parent_bbox=parent_bbox,
                 root_image_path=root_image_path,
                 image_size=(width, height),
-                element_type=element_type  # 传递元素类型以选择对应的重绘方法
+                element_type=element_type,  # 传递元素类型以选择对应的重绘方法
+                metadata=metadata
             )
         
         # 4. 递归处理子元素
@@ -173,12 +183,14 @@ class ImageEditabilityService:
             elements=elements,
             clean_background=clean_background,
             depth=depth,
-            parent_id=parent_id
+            parent_id=parent_id,
+            metadata=metadata
         )
         
         logger.info(f"{'  ' * depth}[{image_id}] 处理完成")
         return editable_image
     
+    @stage('extract')
     def _extract_elements(
         self,
         image_path: str,
@@ -267,9 +279,9 @@ class ImageEditabilityService:
                     
                     # 检查裁剪区域有效性
                     if crop_box[2] > crop_box[0] and crop_box[3] > crop_box[1]:
-                        cropped = source_img.crop(crop_box)
+                        cropped = image_ops.crop(source_img, crop_box)
                         element_image_path = str(output_dir / f"{idx}_{elem_dict['type']}.png")
-                        cropped.save(element_image_path)
+                        image_ops.save(cropped, element_image_path)
                 except Exception as e:
                     logger.warning(f"裁剪元素 {idx} 失败: {e}")
             
@@ -291,6 +303,7 @@ class ImageEditabilityService:
         
         return elements
     
+    @stage('inpaint')
     def _generate_clean_background(
         self,
         image_path: str,
@@ -300,7 +313,8 @@ class ImageEditabilityService:
         parent_bbox: Optional[BBox],
         root_image_path: str,
         image_size: Tuple[int, int],
-        element_type: Optional[str] = None
+        element_type: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
     ) -> Optional[str]:
         """
         生成clean background
@@ -308,6 +322,8 @@ class ImageEditabilityService:
         根据元素类型从注册表选择对应的重绘方法：
         - 如果指定了element_type，使用该类型对应的重绘方法
         - 否则使用默认的重绘方法
+        
+        重绘方法返回的质量指标（如是否做了画质提升）写入 metadata['inpaint']。
         """
         logger.info(f"{'  ' * depth}生成clean background (element_type={element_type})...")
         
@@ -367,7 +383,7 @@ class ImageEditabilityService:
                 bboxes=filtered_bboxes,
                 types=filtered_types,
                 expand_pixels=10,
-                save_mask_path=str(output_dir / 'mask.png'),
+                save_mask_path=str(output_dir / 'mask.png') if self._save_debug_masks else None,
                 full_page_image=full_page_img,
                 crop_box=crop_box
             )
@@ -375,9 +391,12 @@ class ImageEditabilityService:
             if result_img is None:
                 return None
             
+            if metadata is not None and result_img.info.get('inpaint_metrics'):
+                metadata['inpaint'] = result_img.info['inpaint_metrics']
+            
             # 保存结果
             output_path = output_dir / 'clean_background.png'
-            result_img.save(str(output_path))
+            image_ops.save(result_img, output_path)
             return str(output_path)
         
         except Exception as e:
@@ -444,7 +463,7 @@ class ImageEditabilityService:
         # 使用线程池并行处理
         max_workers = min(8, len(elements_to_process))  # 限制并发数
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(process_single_element, elem): elem for elem in elements_to_process}
+            futures = {executor.submit(propagate_context(process_single_element), elem): elem for elem in elements_to_process}
             
             for future in as_completed(futures):
                 element, child_editable, error = future.result()
@@ -454,4 +473,6 @@ class ImageEditabilityService:
                 else:
                     element.children = child_editable.elements
                     element.inpainted_background_path = child_editable.clean_background
+                    if 'inpaint' in child_editable.metadata:
+                        element.metadata['inpaint'] = child_editable.metadata['inpaint']
                     logger.info(f"{'  ' * depth}  ✓ {element.element_id} 完成: {len(child_editable.elements)} 个子元素")
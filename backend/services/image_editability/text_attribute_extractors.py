@@ -5,14 +5,18 @@
 - TextStyleResult: 文字样式数据结构
 - TextAttributeExtractor: 提取器抽象接口
 - CaptionModelTextAttributeExtractor: 基于Caption Model的默认实现
+- PixelColorTextAttributeExtractor: 基于像素统计的本地颜色提取（低置信度时回退到模型）
 - TextAttributeExtractorRegistry: 提取器注册表
 """
 import logging
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field, asdict
 from typing import Dict, Any, List, Optional, Tuple, Union
+import numpy as np
 from PIL import Image
 from services.prompts import get_text_attribute_extraction_prompt
+from services.usage_tracker import track_usage
+from utils import image_ops
 
 logger = logging.getLogger(__name__)
 
@@ -145,7 +149,8 @@ class TextAttributeExtractor(ABC):
     
     用于从文字区域图像中提取文字的视觉属性，支持接入多种实现：
     - CaptionModelTextAttributeExtractor: 使用视觉语言模型（如Gemini）分析图像
-    - 未来可扩展：基于传统CV的方法、专用OCR模型等
+    - PixelColorTextAttributeExtractor: 直接从像素估算文字颜色
+    - 未来可扩展：专用OCR模型等
     """
     
     @abstractmethod
@@ -242,6 +247,7 @@ class CaptionModelTextAttributeExtractor(TextAttributeExtractor):
         """当前实现不支持批量处理"""
         return False
     
+    @track_usage('text_style', 'caption_model')
     def extract(
         self,
         image: Union[str, Image.Image],
@@ -311,7 +317,7 @@ class CaptionModelTextAttributeExtractor(TextAttributeExtractor):
         # 保存临时图片文件
         with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
             tmp_path = tmp_file.name
-            image.save(tmp_path)
+            image_ops.save(image, tmp_path)
         
         try:
             # 使用 ai_service.generate_json_with_image（带重试机制）
@@ -365,6 +371,18 @@ class CaptionModelTextAttributeExtractor(TextAttributeExtractor):
         except ValueError:
             return (0, 0, 0)
     
+    @staticmethod
+    def _is_valid_hex_color(hex_color: str) -> bool:
+        """是否为合法的十六进制颜色（#RGB 或 #RRGGBB）"""
+        value = hex_color.lstrip('#')
+        if len(value) not in (3, 6):
+            return False
+        try:
+            int(value, 16)
+            return True
+        except ValueError:
+            return False
+    
     def _parse_result(self, result_json: Dict[str, Any]) -> TextStyleResult:
         """
         解析AI返回的JSON结果
@@ -426,6 +444,7 @@ class CaptionModelTextAttributeExtractor(TextAttributeExtractor):
             logger.error(f"解析结果失败: {e}")
             return TextStyleResult(confidence=0.0, metadata={'error': str(e)})
     
+    @track_usage('text_style', 'caption_model')
     def extract_batch_with_full_image(
         self,
         full_image: Union[str, Image.Image],
@@ -469,7 +488,7 @@ class CaptionModelTextAttributeExtractor(TextAttributeExtractor):
                 # 保存临时图片文件
                 with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
                     tmp_path = tmp_file.name
-                    pil_image.save(tmp_path)
+                    image_ops.save(pil_image, tmp_path)
                 need_cleanup = True
             
             # 构建文本元素的 JSON 描述
@@ -550,12 +569,14 @@ class CaptionModelTextAttributeExtractor(TextAttributeExtractor):
                 if not element_id:
                     continue
                 
-                # 解析颜色（十六进制格式）
-                font_color_hex = item.get('font_color', '#000000')
-                if isinstance(font_color_hex, str):
+                # 解析颜色（十六进制格式）；缺失或格式无效时降低置信度，由调用方决定是否单独复核
+                font_color_hex = item.get('font_color')
+                if isinstance(font_color_hex, str) and self._is_valid_hex_color(font_color_hex):
                     font_color_rgb = self._hex_to_rgb(font_color_hex)
+                    confidence = 0.9
                 else:
                     font_color_rgb = (0, 0, 0)
+                    confidence = 0.3
                 
                 # 解析布尔值
                 is_bold = bool(item.get('is_bold', False))
@@ -573,7 +594,7 @@ class CaptionModelTextAttributeExtractor(TextAttributeExtractor):
                     is_italic=is_italic,
                     is_underline=is_underline,
                     text_alignment=text_alignment,
-                    confidence=0.9,
+                    confidence=confidence,
                     metadata={'source': 'batch_caption_model', 'raw_response': item}
                 )
                 
@@ -585,6 +606,173 @@ class CaptionModelTextAttributeExtractor(TextAttributeExtractor):
         return results
 
 
+class PixelColorTextAttributeExtractor(TextAttributeExtractor):
+    """
+    基于像素统计的文字颜色提取器
+    
+    大多数幻灯片的文字区域是"纯色/近似纯色背景 + 单色文字"，不需要调用模型：
+    1. 用裁剪图边缘像素的中位数估计背景色
+    2. 计算每个像素到背景色的距离，用 Otsu 阈值把前景（文字笔画）和背景分开
+    3. 取距离最大的一半前景像素（笔画中心，排除抗锯齿边缘）的中位数作为文字颜色
+    
+    置信度由前景/背景对比度、背景均匀程度、前景颜色一致性和前景占比共同决定。
+    渐变/图片背景、多色文字等情况置信度会较低，此时交给 fallback_extractor（通常是
+    CaptionModelTextAttributeExtractor）处理。该提取器只提供颜色，粗体/斜体/对齐等属性
+    仍由批量识别或回退模型给出。
+    """
+    
+    # 分析前把裁剪图缩放到的最大边长（像素），文字颜色不需要高分辨率
+    MAX_ANALYSIS_SIZE = 256
+    
+    def __init__(
+        self,
+        fallback_extractor: Optional[TextAttributeExtractor] = None,
+        min_confidence: float = 0.6
+    ):
+        """
+        初始化像素颜色提取器
+        
+        Args:
+            fallback_extractor: 置信度不足时使用的提取器（可选，不提供则直接返回本地结果）
+            min_confidence: 低于该置信度时回退到 fallback_extractor
+        """
+        self.fallback_extractor = fallback_extractor
+        self.min_confidence = min_confidence
+    
+    def supports_batch(self) -> bool:
+        """逐个计算已足够快，不需要批量接口"""
+        return False
+    
+    def extract_batch_with_full_image(
+        self,
+        full_image: Union[str, Image.Image],
+        text_elements: List[Dict[str, Any]],
+        **kwargs
+    ) -> Dict[str, TextStyleResult]:
+        """
+        全图批量识别委托给回退提取器；没有可用的回退时返回空结果，
+        调用方会对每个元素再走 extract（即本地像素估算）
+        """
+        fallback = self.fallback_extractor
+        if fallback is None or not hasattr(fallback, 'extract_batch_with_full_image'):
+            return {}
+        return fallback.extract_batch_with_full_image(full_image, text_elements, **kwargs)
+    
+    def extract(
+        self,
+        image: Union[str, Image.Image],
+        text_content: Optional[str] = None,
+        **kwargs
+    ) -> TextStyleResult:
+        """
+        从像素估算文字颜色，置信度不足时回退到模型
+        
+        Args:
+            image: 文字区域的图像
+            text_content: 文字内容（仅回退时使用）
+            **kwargs: 透传给回退提取器
+        
+        Returns:
+            TextStyleResult对象
+        """
+        try:
+            local_result = self.estimate_color(image)
+        except Exception as e:
+            logger.warning(f"像素颜色估算失败: {e}")
+            local_result = TextStyleResult(confidence=0.0, metadata={'source': 'pixel', 'error': str(e)})
+        
+        if local_result.confidence >= self.min_confidence or self.fallback_extractor is None:
+            return local_result
+        
+        logger.debug(f"像素颜色置信度 {local_result.confidence:.2f} < {self.min_confidence}，回退到模型识别")
+        result = self.fallback_extractor.extract(image, text_content, **kwargs)
+        if result is not None:
+            result.metadata.setdefault('pixel_confidence', local_result.confidence)
+        return result
+    
+    def estimate_color(self, image: Union[str, Image.Image]) -> TextStyleResult:
+        """
+        仅用像素统计估算文字颜色（不回退）
+        
+        Returns:
+            TextStyleResult，confidence 表示本地估算的可信程度
+        """
+        if isinstance(image, str):
+            with Image.open(image) as img:
+                pixels = self._to_array(img)
+        else:
+            pixels = self._to_array(image)
+        
+        h, w, _ = pixels.shape
+        if h < 3 or w < 3:
+            return TextStyleResult(confidence=0.0, metadata={'source': 'pixel', 'reason': 'too_small'})
+        
+        # 1. 背景色：边缘一圈像素的中位数
+        border = np.concatenate([pixels[0], pixels[-1], pixels[1:-1, 0], pixels[1:-1, -1]])
+        background = np.median(border, axis=0)
+        border_std = float(np.linalg.norm(border - background, axis=1).mean())
+        
+        # 2. 到背景色的距离 + Otsu 阈值分离前景
+        flat = pixels.reshape(-1, 3)
+        distance = np.linalg.norm(flat - background, axis=1)
+        threshold = self._otsu_threshold(distance)
+        foreground = distance > threshold
+        coverage = float(foreground.mean())
+        
+        if not foreground.any():
+            return TextStyleResult(confidence=0.0, metadata={'source': 'pixel', 'reason': 'no_foreground'})
+        
+        # 3. 笔画中心像素（排除抗锯齿边缘）的中位数作为文字颜色
+        fg_distance = distance[foreground]
+        core = flat[foreground][fg_distance >= np.median(fg_distance)]
+        color = np.median(core, axis=0)
+        fg_std = float(np.linalg.norm(core - color, axis=1).mean())
+        contrast = float(np.linalg.norm(color - background))
+        
+        # 4. 置信度
+        contrast_score = min(1.0, contrast / 80.0)
+        background_score = max(0.0, 1.0 - border_std / 40.0)
+        consistency_score = max(0.0, 1.0 - fg_std / 50.0)
+        coverage_score = 1.0 if 0.01 <= coverage <= 0.6 else 0.3
+        confidence = round(0.95 * contrast_score * background_score * consistency_score * coverage_score, 3)
+        
+        font_color_rgb = tuple(int(round(c)) for c in color)
+        return TextStyleResult(
+            font_color_rgb=font_color_rgb,
+            confidence=confidence,
+            metadata={
+                'source': 'pixel',
+                'background_rgb': [int(round(c)) for c in background],
+                'contrast': round(contrast, 1),
+                'coverage': round(coverage, 3),
+            }
+        )
+    
+    def _to_array(self, image: Image.Image) -> np.ndarray:
+        """转换为 float32 RGB 数组，必要时缩小"""
+        img = image.convert('RGB')
+        if max(img.size) > self.MAX_ANALYSIS_SIZE:
+            img = img.copy()
+            img.thumbnail((self.MAX_ANALYSIS_SIZE, self.MAX_ANALYSIS_SIZE))
+        return np.asarray(img, dtype=np.float32)
+    
+    @staticmethod
+    def _otsu_threshold(values: np.ndarray, bins: int = 64) -> float:
+        """对一维数据计算 Otsu 阈值（最大化类间方差）"""
+        hist, edges = np.histogram(values, bins=bins)
+        hist = hist.astype(np.float64)
+        centers = (edges[:-1] + edges[1:]) / 2
+        
+        weight_bg = np.cumsum(hist)
+        weight_fg = weight_bg[-1] - weight_bg
+        sum_bg = np.cumsum(hist * centers)
+        mean_bg = sum_bg / np.maximum(weight_bg, 1)
+        mean_fg = (sum_bg[-1] - sum_bg) / np.maximum(weight_fg, 1)
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        
+        return float(edges[int(np.argmax(between)) + 1])
+
+
 class TextAttributeExtractorRegistry:
     """
     文字属性提取器注册表
@@ -0,0 +1,242 @@
+"""
+Image Writer - 生成图片的编码配置与异步落盘
+
+4K 页面图片用默认 zlib 参数编码 PNG 需要数百毫秒到数秒，且会占用请求/任务线程。
+这里提供：
+- 编码配置（PNG 压缩级别、可选无损 WebP、可选 JPEG）
+- 基于进程池的异步写入：编码在独立进程中完成，写入临时文件并 fsync 后再原子替换，
+  调用方拿到的 Future 完成时文件已经落盘，可以安全地提交数据库记录
+"""
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from PIL import Image
+
+from utils import image_ops
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ImageEncodingProfile:
+    """图片编码配置"""
+    name: str
+    format: str                                   # Pillow 格式名: PNG / WEBP / JPEG
+    params: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def extension(self) -> str:
+        return {'JPEG': 'jpg'}.get(self.format, self.format.lower())
+
+    def prepare(self, image: Image.Image) -> Image.Image:
+        """转换为该格式支持的模式（JPEG 不支持透明通道）"""
+        if self.format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            return image.convert('RGB')
+        return image
+
+
+ENCODING_PROFILES: Dict[str, ImageEncodingProfile] = {
+    # 与之前 image.save() 的默认行为一致
+    'png': ImageEncodingProfile('png', 'PNG', {'compress_level': 6}),
+    # 编码快 3~4 倍，文件约大 30%
+    'png-fast': ImageEncodingProfile('png-fast', 'PNG', {'compress_level': 1}),
+    # 无损 WebP，体积与 PNG 相当，编码更快（导出 PPTX 时会转为 PNG 嵌入）
+    'webp-lossless': ImageEncodingProfile('webp-lossless', 'WEBP', {'lossless': True, 'quality': 0, 'method': 0}),
+    # 有损 JPEG，适合只用于预览的场景
+    'jpeg': ImageEncodingProfile('jpeg', 'JPEG', {'quality': 90}),
+}
+
+# 显式指定 image_format 时使用的配置
+_FORMAT_PROFILES = {'PNG': 'png', 'WEBP': 'webp-lossless', 'JPEG': 'jpeg', 'JPG': 'jpeg'}
+
+
+def get_encoding_profile(name: Optional[str] = None, image_format: Optional[str] = None) -> ImageEncodingProfile:
+    """
+    获取编码配置
+
+    Args:
+        name: 配置名称，None 时读取 GENERATED_IMAGE_PROFILE
+        image_format: 图片格式（PNG/JPEG/WEBP），优先于 name
+
+    Returns:
+        ImageEncodingProfile，未知名称回退到 'png'
+    """
+    if image_format:
+        name = _FORMAT_PROFILES.get(image_format.upper(), 'png')
+    if name is None:
+        from config import get_config
+        try:
+            from flask import current_app, has_app_context
+            name = current_app.config.get('GENERATED_IMAGE_PROFILE') if has_app_context() else None
+        except ImportError:
+            name = None
+        name = name or get_config().GENERATED_IMAGE_PROFILE
+
+    profile = ENCODING_PROFILES.get(str(name).lower())
+    if profile is None:
+        logger.warning(f"未知的图片编码配置: {name}，使用 png")
+        profile = ENCODING_PROFILES['png']
+    return profile
+
+
+def write_file_durable(path: Union[str, Path], data: bytes) -> None:
+    """
+    写入文件并确保落盘：先写同目录临时文件并 fsync，再原子替换目标文件
+    """
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    # 目录项也需要 fsync，否则断电后 rename 可能丢失（Windows 不支持打开目录）
+    if os.name == 'posix':
+        dir_fd = os.open(str(path.parent), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def _encode_and_write(image: Image.Image, path: str, image_format: str, params: Dict[str, Any]) -> str:
+    """在工作进程中执行：编码并落盘（模块级函数以便 pickle）"""
+    write_file_durable(path, image_ops.encode(image, image_format, **params))
+    return path
+
+
+class ImageWriter:
+    """
+    异步图片写入器
+
+    编码交给进程池（spawn 方式启动，避免在多线程进程中 fork），
+    max_processes 为 0 时在调用线程中同步编码，进程池不可用时也会回退到同步编码。
+    """
+
+    def __init__(self, max_processes: int = 2):
+        self.max_processes = max_processes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.max_processes <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_processes,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                logger.info(f"ImageWriter process pool started ({self.max_processes} processes)")
+            return self._executor
+
+    def submit(self, image: Image.Image, path: Union[str, Path],
+               profile: Optional[ImageEncodingProfile] = None) -> 'Future[str]':
+        """
+        提交写入任务
+
+        Returns:
+            Future，结果为写入的文件路径；完成时文件已经 fsync 落盘
+        """
+        profile = profile or get_encoding_profile()
+        # Provider 可能返回 google.genai 的 types.Image 等非 PIL 对象
+        image = profile.prepare(image_ops.to_pil(image))
+        image.load()
+        args = (image, str(path), profile.format, profile.params)
+
+        future: 'Future[str]' = Future()
+        executor = self._get_executor()
+        if executor is not None:
+            try:
+                pool_future = executor.submit(_encode_and_write, *args)
+            except (BrokenProcessPool, RuntimeError, OSError) as e:
+                logger.warning(f"ImageWriter process pool unavailable, encoding inline: {e}")
+                self._reset_executor(executor)
+            else:
+                pool_future.add_done_callback(lambda f: self._on_pool_done(f, future, args, executor))
+                return future
+
+        self._write_inline(future, args)
+        return future
+
+    def _on_pool_done(self, pool_future: Future, future: Future, args: tuple,
+                      executor: ProcessPoolExecutor):
+        """
+        进程池任务完成：工作进程意外退出或任务被取消（进程池被重置）时改为在本进程中编码，
+        其余异常原样传递。每条路径都会完成 future，调用方不会一直等待
+        """
+        if pool_future.cancelled():
+            logger.warning(f"ImageWriter pool task for {args[1]} was cancelled, encoding inline")
+            self._write_inline(future, args)
+            return
+        error = pool_future.exception()
+        if error is None:
+            future.set_result(pool_future.result())
+        elif isinstance(error, BrokenProcessPool):
+            logger.warning(f"ImageWriter worker died, encoding {args[1]} inline: {error}")
+            self._reset_executor(executor)
+            self._write_inline(future, args)
+        else:
+            future.set_exception(error)
+
+    @staticmethod
+    def _write_inline(future: Future, args: tuple):
+        try:
+            future.set_result(_encode_and_write(*args))
+        except Exception as e:
+            future.set_exception(e)
+
+    def write(self, image: Image.Image, path: Union[str, Path],
+              profile: Optional[ImageEncodingProfile] = None) -> str:
+        """同步写入（等待进程池完成编码并落盘）"""
+        return self.submit(image, path, profile).result()
+
+    def _reset_executor(self, failed_executor: ProcessPoolExecutor):
+        """丢弃出错的进程池；已经换成新进程池时不做任何事，避免取消其他线程刚提交的任务"""
+        with self._lock:
+            if self._executor is failed_executor:
+                self._executor = None
+            else:
+                return
+        failed_executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        """关闭进程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+_writer_instance: Optional[ImageWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_image_writer() -> ImageWriter:
+    """获取全局共享的 ImageWriter 实例（懒加载）"""
+    global _writer_instance
+
+    if _writer_instance is None:
+        with _writer_lock:
+            if _writer_instance is None:
+                from config import get_config
+                _writer_instance = ImageWriter(max_processes=get_config().IMAGE_WRITE_PROCESSES)
+                logger.info("ImageWriter initialized")
+
+    return _writer_instance
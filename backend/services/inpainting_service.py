@@ -11,6 +11,7 @@ from PIL import Image
 
 from services.ai_providers.image.volcengine_inpainting_provider import VolcengineInpaintingProvider
 from services.ai_providers.image.gemini_inpainting_provider import GeminiInpaintingProvider
+from utils import image_ops
 from utils.mask_utils import (
     create_mask_from_bboxes,
     create_inverse_mask_from_bboxes,
@@ -147,7 +148,7 @@ class InpaintingService:
             # 保存mask图像（如果指定了路径）
             if save_mask_path:
                 try:
-                    mask.save(save_mask_path)
+                    image_ops.save(mask, save_mask_path)
                     logger.info(f"📷 Mask图像已保存: {save_mask_path}")
                 except Exception as e:
                     logger.warning(f"⚠️ 保存mask图像失败: {e}")
@@ -0,0 +1,297 @@
+"""
+Metrics - Prometheus 文本格式的运行指标
+
+不依赖 prometheus_client，内置计数器、仪表盘和直方图，由 GET /metrics 输出：
+
+- 任务：提交/完成数、耗时、排队与运行中的任务数
+- 流水线阶段耗时：extract（元素提取）、inpaint（背景修复）、style（样式提取）、fit_text（文本框排版）、
+  build（PPTX 组装）、save（保存文件），通过 stage() 记录
+- 外部调用：按 类别/provider/操作 的耗时直方图、调用数（含失败）与 token 数（由 UsageTracker 上报）
+- 数据库提交/回滚次数
+- 缓存命中：各本地缓存的查询次数与命中率，以及 provider 侧 prompt 缓存的 token 命中率
+
+仪表盘类指标（队列深度、命中率等）通过 register_collector 在抓取时计算。
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# (指标名, 标签, 值)
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels.items()) + '}'
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    """可任意设置的当前值"""
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    """累积分桶的直方图（_bucket / _sum / _count）"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return entry[2] if entry else 0
+
+    def samples(self) -> List[Sample]:
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    samples.append((f'{self.name}_bucket', {**labels, 'le': _format_value(bound)}, cumulative))
+                samples.append((f'{self.name}_sum', labels, total))
+                samples.append((f'{self.name}_count', labels, count))
+        return samples
+
+
+class MetricsRegistry:
+    """指标注册表，负责输出 Prometheus 文本格式"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], None]):
+        """注册在每次抓取前调用的函数（用于设置仪表盘类指标）"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """输出 Prometheus text exposition format (0.0.4)"""
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics.values())
+        for collector in collectors:
+            collector()
+
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+TASKS_SUBMITTED = registry.counter(
+    'bananappt_tasks_submitted_total', 'Background tasks submitted', ['task'])
+TASKS_FINISHED = registry.counter(
+    'bananappt_tasks_finished_total', 'Background tasks finished', ['task', 'outcome'])
+TASK_DURATION = registry.histogram(
+    'bananappt_task_duration_seconds', 'Background task run time', ['task'],
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600))
+TASK_QUEUE_DEPTH = registry.gauge(
+    'bananappt_task_queue_depth', 'Background tasks by state', ['state'])
+GENERATION_IN_FLIGHT = registry.gauge(
+    'bananappt_generation_in_flight', 'AI calls submitted to the generation executor and not finished')
+STAGE_DURATION = registry.histogram(
+    'bananappt_stage_duration_seconds', 'Pipeline stage duration', ['stage'])
+PROVIDER_CALL_DURATION = registry.histogram(
+    'bananappt_provider_call_duration_seconds', 'External call latency', ['category', 'provider', 'operation'])
+PROVIDER_CALLS = registry.counter(
+    'bananappt_provider_calls_total', 'External calls', ['category', 'provider', 'outcome'])
+PROVIDER_TOKENS = registry.counter(
+    'bananappt_provider_tokens_total', 'Model tokens', ['category', 'provider', 'kind'])
+DB_COMMITS = registry.counter(
+    'bananappt_db_commits_total', 'Database session commits')
+DB_ROLLBACKS = registry.counter(
+    'bananappt_db_rollbacks_total', 'Database session rollbacks')
+CACHE_LOOKUPS = registry.counter(
+    'bananappt_cache_lookups_total', 'Local cache lookups', ['cache', 'result'])
+CACHE_HIT_RATIO = registry.gauge(
+    'bananappt_cache_hit_ratio', 'Share of local cache lookups that hit', ['cache'])
+PROMPT_CACHE_RATIO = registry.gauge(
+    'bananappt_prompt_cache_token_ratio', 'Share of prompt tokens served from the provider cache', ['provider'])
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    """记录一次本地缓存查询"""
+    CACHE_LOOKUPS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def observe_provider_call(category: str, provider: str, operation: str, latency: float, error: bool,
+                          input_tokens: int = 0, output_tokens: int = 0, cached_tokens: int = 0):
+    """记录一次外部调用（UsageTracker 调用）"""
+    PROVIDER_CALL_DURATION.observe(latency, category=category, provider=provider, operation=operation)
+    PROVIDER_CALLS.inc(category=category, provider=provider, outcome='error' if error else 'success')
+    for kind, count in (('input', input_tokens), ('output', output_tokens), ('cached', cached_tokens)):
+        if count:
+            PROVIDER_TOKENS.inc(count, category=category, provider=provider, kind=kind)
+
+
+@contextmanager
+def stage(name: str, **attributes):
+    """
+    记录一个流水线阶段的耗时，并在启用追踪时生成同名 span
+
+    Args:
+        name: 阶段名（extract / inpaint / style / build / save 等）
+        attributes: 附加到 span 上的属性
+    """
+    from services.tracing import span
+
+    started = time.perf_counter()
+    try:
+        with span(f'stage.{name}', **attributes) as current:
+            yield current
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - started, stage=name)
+
+
+def _collect_cache_ratios():
+    hits: Dict[str, float] = {}
+    totals: Dict[str, float] = {}
+    for _, labels, value in CACHE_LOOKUPS.samples():
+        totals[labels['cache']] = totals.get(labels['cache'], 0) + value
+        if labels['result'] == 'hit':
+            hits[labels['cache']] = hits.get(labels['cache'], 0) + value
+    for cache, total in totals.items():
+        CACHE_HIT_RATIO.set(hits.get(cache, 0) / total if total else 0.0, cache=cache)
+
+    from services.ai_providers.text import prompt_cache_stats
+    for provider, stats in prompt_cache_stats.snapshot().items():
+        PROMPT_CACHE_RATIO.set(stats['cached_ratio'], provider=provider)
+
+
+def _collect_queue_depth():
+    from services.task_manager import task_manager
+    for state, count in task_manager.stats().items():
+        TASK_QUEUE_DEPTH.set(count, state=state)
+
+    from services import generation_executor
+    executor = generation_executor._executor_instance
+    GENERATION_IN_FLIGHT.set(executor.in_flight_count if executor else 0)
+
+
+registry.register_collector(_collect_cache_ratios)
+registry.register_collector(_collect_queue_depth)
+
+_sqlalchemy_instrumented = False
+
+
+def instrument_sqlalchemy():
+    """统计所有 SQLAlchemy 会话的提交与回滚次数（多次调用只注册一次）"""
+    global _sqlalchemy_instrumented
+    if _sqlalchemy_instrumented:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    event.listen(Session, 'after_commit', lambda session: DB_COMMITS.inc())
+    event.listen(Session, 'after_rollback', lambda session: DB_ROLLBACKS.inc())
+    _sqlalchemy_instrumented = True
+
+
+def render_metrics() -> str:
+    """当前所有指标的 Prometheus 文本"""
+    return registry.render()
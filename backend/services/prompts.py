@@ -3,8 +3,9 @@ AI Service Prompts - 集中管理所有 AI 服务的 prompt 模板
 """
 import json
 import logging
+from functools import lru_cache
 from textwrap import dedent
-from typing import List, Dict, Optional, TYPE_CHECKING
+from typing import List, Dict, Optional, Tuple, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from services.ai_service import ProjectContext
@@ -78,12 +79,53 @@ def get_ppt_language_instruction(language: str = None) -> str:
     return config['ppt_text']
 
 
-def _format_reference_files_xml(reference_files_content: Optional[List[Dict[str, str]]]) -> str:
+def _select_reference_context(reference_files_content: List[Dict[str, str]],
+                              query: str = None) -> Optional[List[Dict]]:
+    """参考文件总量超过 REFERENCE_CONTEXT_MAX_TOKENS 时返回每个文件的摘要与相关片段，否则返回 None"""
+    from flask import current_app, has_app_context
+    from config import Config
+    from services.reference_retrieval import select_reference_context
+    # 优先读取应用配置（测试和按实例覆盖的配置），没有应用上下文时回退到 Config
+    max_tokens = getattr(Config, 'REFERENCE_CONTEXT_MAX_TOKENS', 0)
+    if has_app_context():
+        max_tokens = current_app.config.get('REFERENCE_CONTEXT_MAX_TOKENS', max_tokens)
+    if max_tokens <= 0:
+        return None
+    return select_reference_context(reference_files_content, query, max_tokens)
+
+
+@lru_cache(maxsize=16)
+def _format_full_reference_files_xml(files: Tuple[Tuple[str, str], ...]) -> str:
+    """完整内联的参考文件 XML，同一批文件只拼接一次"""
+    xml_parts = ["<uploaded_files>"]
+    for filename, content in files:
+        xml_parts.append(f'  <file name="{filename}">')
+        xml_parts.append('    <content>')
+        xml_parts.append(content)
+        xml_parts.append('    </content>')
+        xml_parts.append('  </file>')
+    xml_parts.append('</uploaded_files>')
+    xml_parts.append('')  # Empty line after XML
+    return '\n'.join(xml_parts)
+
+
+def _reference_files_key(reference_files_content: List[Dict[str, str]]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(
+        (file_info.get('filename', 'unknown'), file_info.get('content', ''))
+        for file_info in reference_files_content
+    )
+
+
+def _format_reference_files_xml(reference_files_content: Optional[List[Dict[str, str]]],
+                                query: str = None) -> str:
     """
     Format reference files content as XML structure
     
+    参考文件总量超过 REFERENCE_CONTEXT_MAX_TOKENS 时，每个文件只放摘要和与 query 最相关的片段
+    
     Args:
         reference_files_content: List of dicts with 'filename' and 'content' keys
+        query: 检索查询（如页面标题和要点），为空时取文件开头的片段
         
     Returns:
         Formatted XML string
@@ -91,14 +133,19 @@ def _format_reference_files_xml(reference_files_content: Optional[List[Dict[str,
     if not reference_files_content:
         return ""
     
+    selected = _select_reference_context(reference_files_content, query)
+    if selected is None:
+        return _format_full_reference_files_xml(_reference_files_key(reference_files_content))
+    
     xml_parts = ["<uploaded_files>"]
-    for file_info in reference_files_content:
-        filename = file_info.get('filename', 'unknown')
-        content = file_info.get('content', '')
-        xml_parts.append(f'  <file name="{filename}">')
-        xml_parts.append('    <content>')
-        xml_parts.append(content)
-        xml_parts.append('    </content>')
+    for file_info in selected:
+        xml_parts.append(f'  <file name="{file_info["filename"]}">')
+        xml_parts.append('    <summary>')
+        xml_parts.append(file_info['summary'])
+        xml_parts.append('    </summary>')
+        xml_parts.append('    <excerpts>')
+        xml_parts.append('\n\n...\n\n'.join(file_info['excerpts']))
+        xml_parts.append('    </excerpts>')
         xml_parts.append('  </file>')
     xml_parts.append('</uploaded_files>')
     xml_parts.append('')  # Empty line after XML
@@ -106,6 +153,41 @@ def _format_reference_files_xml(reference_files_content: Optional[List[Dict[str,
     return '\n'.join(xml_parts)
 
 
+def _format_reference_files_xml_parts(reference_files_content: Optional[List[Dict[str, str]]],
+                                      query: str = None) -> Tuple[str, str]:
+    """
+    与 _format_reference_files_xml 相同，但拆成与 query 无关、有关的两部分
+    
+    完整内联时全部内容都在第一部分；检索模式下摘要在第一部分，相关片段在第二部分。
+    第一部分在同一套 PPT 的各页之间相同，可以作为共享前缀缓存
+    
+    Returns:
+        (共享部分 XML, 与 query 相关的 XML)
+    """
+    if not reference_files_content:
+        return "", ""
+    
+    selected = _select_reference_context(reference_files_content, query)
+    if selected is None:
+        return _format_full_reference_files_xml(_reference_files_key(reference_files_content)), ""
+    
+    shared_parts = ["<uploaded_files>"]
+    excerpt_parts = ["<reference_excerpts>"]
+    for file_info in selected:
+        shared_parts.append(f'  <file name="{file_info["filename"]}">')
+        shared_parts.append('    <summary>')
+        shared_parts.append(file_info['summary'])
+        shared_parts.append('    </summary>')
+        shared_parts.append('  </file>')
+        excerpt_parts.append(f'  <file name="{file_info["filename"]}">')
+        excerpt_parts.append('\n\n...\n\n'.join(file_info['excerpts']))
+        excerpt_parts.append('  </file>')
+    shared_parts.extend(['</uploaded_files>', ''])
+    excerpt_parts.extend(['</reference_excerpts>', ''])
+    
+    return '\n'.join(shared_parts), '\n'.join(excerpt_parts)
+
+
 def get_outline_generation_prompt(project_context: 'ProjectContext', language: str = None) -> str:
     """
     生成 PPT 大纲的 prompt
@@ -117,8 +199,8 @@ def get_outline_generation_prompt(project_context: 'ProjectContext', language: s
     Returns:
         格式化后的 prompt 字符串
     """
-    files_xml = _format_reference_files_xml(project_context.reference_files_content)
     idea_prompt = project_context.idea_prompt or ""
+    files_xml = _format_reference_files_xml(project_context.reference_files_content, query=idea_prompt)
     
     prompt = (f"""\
 You are a helpful assistant that generates an outline for a ppt.
@@ -168,8 +250,8 @@ def get_outline_parsing_prompt(project_context: 'ProjectContext', language: str
     Returns:
         格式化后的 prompt 字符串
     """
-    files_xml = _format_reference_files_xml(project_context.reference_files_content)
     outline_text = project_context.outline_text or ""
+    files_xml = _format_reference_files_xml(project_context.reference_files_content, query=outline_text)
     
     prompt = (f"""\
 You are a helpful assistant that parses a user-provided PPT outline text into a structured format.
@@ -239,7 +321,39 @@ def get_page_description_prompt(project_context: 'ProjectContext', outline: list
     Returns:
         格式化后的 prompt 字符串
     """
-    files_xml = _format_reference_files_xml(project_context.reference_files_content)
+    prefix, suffix = get_page_description_prompt_parts(
+        project_context, outline, page_outline, page_index, part_info, language
+    )
+    final_prompt = prefix + suffix
+    logger.debug(f"[get_page_description_prompt] Final prompt:\n{final_prompt}")
+    return final_prompt
+
+
+def get_page_description_prompt_parts(project_context: 'ProjectContext', outline: list,
+                                      page_outline: dict, page_index: int,
+                                      part_info: str = "",
+                                      language: str = None) -> Tuple[str, str]:
+    """
+    生成单个页面描述的 prompt，拆成各页共享的前缀和当前页的后缀
+    
+    前缀包含参考文件（或其摘要）、原始需求、大纲和输出要求，同一套 PPT 的各页完全相同，
+    可以使用模型服务的上下文缓存；后缀只包含当前页相关的参考片段和页面大纲。
+    
+    参数同 get_page_description_prompt
+    
+    Returns:
+        (prefix, suffix)，prefix + suffix 即完整 prompt
+    """
+    # 只检索与当前页相关的参考内容
+    page_query = ' '.join([
+        str(page_outline.get('title', '')),
+        ' '.join(map(str, page_outline.get('points', []))),
+        str(page_outline.get('part', '')),
+        part_info
+    ]) if isinstance(page_outline, dict) else str(page_outline)
+    files_xml, excerpts_xml = _format_reference_files_xml_parts(
+        project_context.reference_files_content, query=page_query
+    )
     # 根据项目类型选择最相关的原始输入
     if project_context.creation_type == 'idea' and project_context.idea_prompt:
         original_input = project_context.idea_prompt
@@ -250,13 +364,27 @@ def get_page_description_prompt(project_context: 'ProjectContext', outline: list
     else:
         original_input = project_context.idea_prompt or ""
     
+    # 先解析默认语言，避免缓存的前缀在语言设置变更后失效
+    prefix = _page_description_prefix(
+        files_xml, original_input, str(outline), language or get_default_output_language()
+    )
+    
+    suffix = (f"""\
+{excerpts_xml}现在请为第 {page_index} 页生成描述：{part_info}
+{page_outline}
+{"**除非特殊要求，第一页的内容需要保持极简，只放标题副标题以及演讲人等（输出到标题后）, 不添加任何素材。**" if page_index == 1 else ""}
+{"第一页输出格式示例：页面标题：原始社会：与自然共生 / 副标题：人类祖先和自然的相处之道" if page_index == 1 else ""}
+""")
+    return prefix, suffix
+
+
+@lru_cache(maxsize=32)
+def _page_description_prefix(files_xml: str, original_input: str, outline_text: str, language: str) -> str:
+    """各页共享的页面描述前缀，同一套 PPT 只拼接一次（返回同一个字符串对象）"""
     prompt = (f"""\
 我们正在为PPT的每一页生成内容描述。
 用户的原始需求是：\n{original_input}\n
-我们已经有了完整的大纲：\n{outline}\n{part_info}
-现在请为第 {page_index} 页生成描述：
-{page_outline}
-{"**除非特殊要求，第一页的内容需要保持极简，只放标题副标题以及演讲人等（输出到标题后）, 不添加任何素材。**" if page_index == 1 else ""}
+我们已经有了完整的大纲：\n{outline_text}\n
 
 【重要提示】生成的"页面文字"部分会直接渲染到PPT页面上，因此请务必注意：
 1. 文字内容要简洁精炼，每条要点控制在15-25字以内
@@ -267,7 +395,6 @@ def get_page_description_prompt(project_context: 'ProjectContext', outline: list
 
 输出格式示例：
 页面标题：原始社会：与自然共生
-{"副标题：人类祖先和自然的相处之道" if page_index == 1 else ""}
 
 页面文字：
 - 狩猎采集文明：人类活动规模小，对环境影响有限
@@ -281,10 +408,7 @@ def get_page_description_prompt(project_context: 'ProjectContext', outline: list
 
 {get_language_instruction(language)}
 """)
-    
-    final_prompt = files_xml + prompt
-    logger.debug(f"[get_page_description_prompt] Final prompt:\n{final_prompt}")
-    return final_prompt
+    return files_xml + prompt
 
 
 def get_image_generation_prompt(page_desc: str, outline_text: str, 
@@ -401,8 +525,8 @@ def get_description_to_outline_prompt(project_context: 'ProjectContext', languag
     Returns:
         格式化后的 prompt 字符串
     """
-    files_xml = _format_reference_files_xml(project_context.reference_files_content)
     description_text = project_context.description_text or ""
+    files_xml = _format_reference_files_xml(project_context.reference_files_content, query=description_text)
     
     prompt = (f"""\
 You are a helpful assistant that analyzes a user-provided PPT description text and extracts the outline structure from it.
@@ -534,14 +658,16 @@ def get_outline_refinement_prompt(current_outline: List[Dict], user_requirement:
     Returns:
         格式化后的 prompt 字符串
     """
-    files_xml = _format_reference_files_xml(project_context.reference_files_content)
-    
     # 处理空大纲的情况
     if not current_outline or len(current_outline) == 0:
         outline_text = "(当前没有内容)"
     else:
         outline_text = json.dumps(current_outline, ensure_ascii=False, indent=2)
     
+    files_xml = _format_reference_files_xml(
+        project_context.reference_files_content, query=f"{user_requirement}\n{outline_text}"
+    )
+    
     # 构建之前的修改历史记录
     previous_req_text = ""
     if previous_requirements and len(previous_requirements) > 0:
@@ -629,7 +755,7 @@ def get_descriptions_refinement_prompt(current_descriptions: List[Dict], user_re
     Returns:
         格式化后的 prompt 字符串
     """
-    files_xml = _format_reference_files_xml(project_context.reference_files_content)
+    files_xml = _format_reference_files_xml(project_context.reference_files_content, query=user_requirement)
     
     # 构建之前的修改历史记录
     previous_req_text = ""
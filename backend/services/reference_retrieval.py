@@ -0,0 +1,310 @@
+"""
+Reference Retrieval - 参考文件的本地检索
+
+参考文件（解析后的 markdown）原先会完整拼进每一个大纲、页面描述 prompt，
+一份几百页的 PDF 在一套 PPT 中要重复发送 N 次。这里在本地对参考文件分块并建立 BM25 索引：
+
+- 按 markdown 标题和段落分块，每块带上所属标题路径
+- 中文按单字 + 相邻双字切词，英文/数字按单词切词，不依赖额外的分词库
+- 每个文件计算一次抽取式摘要（标题结构 + 各节首句），与索引一起按内容哈希缓存
+- 构建 prompt 时按查询（如页面标题、要点）取最相关的若干块，控制在 token 预算以内
+
+token 数按字符粗略估算（中日韩字符约 1 token，其他字符约 4 个 1 token），只用于预算控制。
+"""
+
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from services.metrics import record_cache_lookup
+
+_HEADING_RE = re.compile(r'^(#{1,6})\s+(.+?)\s*#*\s*$')
+_CJK_CHARS = '\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af'
+_TOKEN_RE = re.compile(rf'[a-z0-9]+|[{_CJK_CHARS}]')
+_CJK_RE = re.compile(rf'[{_CJK_CHARS}]')
+_SENTENCE_END_RE = re.compile(r'(?<=[。！？!?；;])|(?<=\.)\s')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的 token 数"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def tokenize(text: str) -> List[str]:
+    """检索用切词：英文/数字按单词，中日韩文字按单字和相邻双字"""
+    tokens = []
+    prev_char, prev_end = None, -1
+    for match in _TOKEN_RE.finditer(text.lower()):
+        token = match.group()
+        if _CJK_RE.match(token):
+            tokens.append(token)
+            if prev_char and prev_end == match.start():
+                tokens.append(prev_char + token)
+            prev_char, prev_end = token, match.end()
+        else:
+            tokens.append(token)
+            prev_char = None
+    return tokens
+
+
+@dataclass
+class Chunk:
+    """参考文件的一个分块"""
+    index: int
+    heading: str  # 所属标题路径，如 "第一章 > 背景"
+    text: str
+    tokens: int
+
+
+def _split_long(paragraph: str, max_tokens: int) -> List[str]:
+    """把超出单块上限的段落按句子（必要时按长度）切开"""
+    pieces, current = [], ''
+    for sentence in _SENTENCE_END_RE.split(paragraph):
+        if not sentence:
+            continue
+        while estimate_tokens(sentence) > max_tokens:
+            # 没有断句的超长文本：按字符硬切
+            cut = max(1, len(sentence) * max_tokens // estimate_tokens(sentence))
+            if current:
+                pieces.append(current)
+                current = ''
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:]
+        if current and estimate_tokens(current + sentence) > max_tokens:
+            pieces.append(current)
+            current = ''
+        current += sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_markdown(text: str, max_tokens: int = 400) -> List[Chunk]:
+    """
+    按标题和段落切分 markdown
+
+    同一标题下的相邻段落合并成一块，直到超过 max_tokens；标题变化时开始新块
+
+    Args:
+        text: markdown 文本
+        max_tokens: 单块的 token 上限（估算值）
+
+    Returns:
+        按原文顺序排列的分块
+    """
+    chunks: List[Chunk] = []
+    headings: List[Tuple[int, str]] = []
+    buffer: List[str] = []
+
+    def heading_path() -> str:
+        return ' > '.join(title for _, title in headings)
+
+    def flush():
+        if buffer:
+            body = '\n\n'.join(buffer)
+            chunks.append(Chunk(len(chunks), heading_path(), body, estimate_tokens(body)))
+            buffer.clear()
+
+    paragraph: List[str] = []
+
+    def end_paragraph():
+        if not paragraph:
+            return
+        para = '\n'.join(paragraph).strip()
+        paragraph.clear()
+        if not para:
+            return
+        for piece in _split_long(para, max_tokens) if estimate_tokens(para) > max_tokens else [para]:
+            if buffer and estimate_tokens('\n\n'.join(buffer + [piece])) > max_tokens:
+                flush()
+            buffer.append(piece)
+
+    for line in text.splitlines():
+        heading = _HEADING_RE.match(line)
+        if heading:
+            end_paragraph()
+            flush()
+            level = len(heading.group(1))
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            headings.append((level, heading.group(2)))
+        elif not line.strip():
+            end_paragraph()
+        else:
+            paragraph.append(line)
+    end_paragraph()
+    flush()
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 检索"""
+
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            documents: 已切词的文档列表
+        """
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(doc) for doc in documents]
+        self.doc_lengths = [len(doc) for doc in documents]
+        self.avg_length = (sum(self.doc_lengths) / len(documents)) if documents else 0
+        doc_freq = Counter(term for freqs in self.term_freqs for term in freqs)
+        n = len(documents)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in doc_freq.items()
+        }
+
+    def scores(self, query: List[str]) -> List[float]:
+        """每个文档对查询的得分"""
+        terms = [term for term in set(query) if term in self.idf]
+        scores = []
+        for freqs, length in zip(self.term_freqs, self.doc_lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            score = 0.0
+            for term in terms:
+                tf = freqs.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+
+class ReferenceIndex:
+    """单个参考文件的分块、检索索引与摘要"""
+
+    min_relative_score = 0.2
+
+    def __init__(self, content: str, chunk_tokens: int = 400, summary_tokens: int = 800):
+        self.tokens = estimate_tokens(content)
+        self.chunks = chunk_markdown(content, max_tokens=chunk_tokens)
+        self.bm25 = BM25Index([tokenize(f"{chunk.heading}\n{chunk.text}") for chunk in self.chunks])
+        self.summary_lines = self._summary_lines(summary_tokens)
+
+    def _summary_lines(self, max_tokens: int) -> List[str]:
+        """抽取式摘要：各节标题加首句，没有标题时取开头的内容"""
+        lines, seen_headings, used = [], set(), 0
+        for chunk in self.chunks:
+            if chunk.heading in seen_headings:
+                continue
+            seen_headings.add(chunk.heading)
+            first = _SENTENCE_END_RE.split(chunk.text.strip(), maxsplit=1)[0].strip()
+            line = f"{chunk.heading}: {first}" if chunk.heading else first
+            cost = estimate_tokens(line)
+            if used + cost > max_tokens:
+                break
+            lines.append(line)
+            used += cost
+        return lines
+
+    def summary(self, max_tokens: int) -> str:
+        """不超过 max_tokens 的摘要"""
+        lines, used = [], 0
+        for line in self.summary_lines:
+            used += estimate_tokens(line)
+            if used > max_tokens:
+                break
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def search(self, query: str, max_tokens: int) -> List[Chunk]:
+        """
+        取与查询最相关的分块，总量不超过 max_tokens，按原文顺序返回
+
+        得分低于最高分 min_relative_score 倍的分块（通常只是零星单字命中）不会被选入；
+        查询没有命中任何分块时，按原文顺序取开头的分块
+        """
+        scores = self.bm25.scores(tokenize(query or ''))
+        threshold = max(scores, default=0) * self.min_relative_score
+        ranked = sorted(
+            (i for i in range(len(self.chunks)) if scores[i] > 0 and scores[i] >= threshold),
+            key=lambda i: (-scores[i], i)
+        ) or range(len(self.chunks))
+
+        selected, used = [], 0
+        for i in ranked:
+            chunk = self.chunks[i]
+            if used + chunk.tokens > max_tokens:
+                continue
+            selected.append(chunk)
+            used += chunk.tokens
+        return sorted(selected, key=lambda chunk: chunk.index)
+
+
+_index_cache: "OrderedDict[str, ReferenceIndex]" = OrderedDict()
+_cache_lock = threading.Lock()
+_CACHE_SIZE = 32
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _content_stats(content: str) -> Tuple[str, int]:
+    """
+    参考文件内容的 (sha1, 估算 token 数)
+
+    每个页面 prompt 都会传入同样的参考文件内容，按内容缓存后不必每次都扫描全文；
+    str 对象会缓存自身的 hash，同一对象再次查找不需要重新遍历
+    """
+    return hashlib.sha1(content.encode('utf-8')).hexdigest(), estimate_tokens(content)
+
+
+def get_reference_index(content: str) -> ReferenceIndex:
+    """按内容哈希缓存参考文件的索引与摘要，同一文件只计算一次"""
+    key = _content_stats(content)[0]
+    with _cache_lock:
+        index = _index_cache.get(key)
+        if index is not None:
+            _index_cache.move_to_end(key)
+    record_cache_lookup('reference_index', index is not None)
+    if index is not None:
+        return index
+
+    index = ReferenceIndex(content)
+    with _cache_lock:
+        _index_cache[key] = index
+        while len(_index_cache) > _CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+
+def select_reference_context(reference_files_content: List[Dict[str, str]], query: str,
+                             max_tokens: int) -> Optional[List[Dict[str, str]]]:
+    """
+    为一个 prompt 选择参考文件内容
+
+    Args:
+        reference_files_content: [{'filename', 'content'}]
+        query: 检索查询（如页面标题与要点）
+        max_tokens: 参考文件内容的总 token 预算
+
+    Returns:
+        总量在预算以内时返回 None（调用方应完整内联）；
+        否则返回 [{'filename', 'summary', 'excerpts'}]，每个文件平分预算，
+        摘要最多占文件预算的四分之一
+    """
+    total = sum(_content_stats(f.get('content', ''))[1] for f in reference_files_content)
+    if total <= max_tokens:
+        return None
+
+    per_file = max_tokens // len(reference_files_content)
+    selected = []
+    for file_info in reference_files_content:
+        index = get_reference_index(file_info.get('content', ''))
+        summary = index.summary(per_file // 4)
+        chunks = index.search(query, per_file - estimate_tokens(summary))
+        selected.append({
+            'filename': file_info.get('filename', 'unknown'),
+            'summary': summary,
+            'excerpts': [f"[{chunk.heading}]\n{chunk.text}" if chunk.heading else chunk.text
+                         for chunk in chunks]
+        })
+    return selected
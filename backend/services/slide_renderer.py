@@ -0,0 +1,122 @@
+"""
+Slide Renderer - 可编辑 PPTX 文本框的并行排版
+
+构建可编辑 PPTX 时，每个文本框都要做字号拟合并通过 python-pptx 生成 XML，
+在单线程中逐页执行时耗时随文本元素数量线性增长。
+这里把文本框渲染交给进程池：工作进程只产出 `p:sp` XML（普通字节数据），
+由调用线程按原有顺序插入 Presentation，结果与串行构建完全一致。
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.pptx_builder import PPTXBuilder
+
+logger = logging.getLogger(__name__)
+
+# (是否成功, p:sp XML 或错误信息)
+RenderResult = Tuple[bool, Any]
+
+
+def _render_text_batch(items: List[Dict[str, Any]]) -> List[RenderResult]:
+    """在工作进程中执行：渲染一批文本框（模块级函数以便 pickle）"""
+    results = []
+    for item in items:
+        try:
+            results.append((True, PPTXBuilder.render_text_element_xml(**item)))
+        except Exception as e:
+            results.append((False, str(e)))
+    return results
+
+
+class SlideRenderer:
+    """
+    文本框并行渲染器
+
+    进程池以 spawn 方式懒加载并常驻复用；max_processes 为 0、元素数量较少
+    或进程池不可用时，在调用线程中渲染。
+    """
+
+    # 每个任务包含的文本框数量（均衡负载与进程间通信开销）
+    CHUNK_SIZE = 64
+    # 少于该数量时直接在当前线程渲染，进程间通信得不偿失
+    MIN_PARALLEL_ELEMENTS = 128
+
+    def __init__(self, max_processes: int = 2):
+        self.max_processes = max_processes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.max_processes <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_processes,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                logger.info(f"SlideRenderer process pool started ({self.max_processes} processes)")
+            return self._executor
+
+    def render_text_elements(self, items: List[Dict[str, Any]]) -> List[RenderResult]:
+        """
+        渲染文本框
+
+        Args:
+            items: add_text_element 的参数字典（text, bbox, text_level, align, text_style）
+
+        Returns:
+            与 items 一一对应的 (成功, XML/错误信息) 列表
+        """
+        if len(items) < self.MIN_PARALLEL_ELEMENTS:
+            return _render_text_batch(items)
+
+        executor = self._get_executor()
+        if executor is None:
+            return _render_text_batch(items)
+
+        chunks = [items[i:i + self.CHUNK_SIZE] for i in range(0, len(items), self.CHUNK_SIZE)]
+        try:
+            results = []
+            for chunk_results in executor.map(_render_text_batch, chunks):
+                results.extend(chunk_results)
+            return results
+        except (BrokenProcessPool, RuntimeError, OSError) as e:
+            logger.warning(f"SlideRenderer process pool unavailable, rendering inline: {e}")
+            self._reset_executor()
+            return _render_text_batch(items)
+
+    def _reset_executor(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def shutdown(self):
+        """关闭进程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+_renderer_instance: Optional[SlideRenderer] = None
+_renderer_lock = threading.Lock()
+
+
+def get_slide_renderer() -> SlideRenderer:
+    """获取全局共享的 SlideRenderer 实例（懒加载）"""
+    global _renderer_instance
+
+    if _renderer_instance is None:
+        with _renderer_lock:
+            if _renderer_instance is None:
+                from config import get_config
+                _renderer_instance = SlideRenderer(max_processes=get_config().PPTX_LAYOUT_PROCESSES)
+                logger.info("SlideRenderer initialized")
+
+    return _renderer_instance
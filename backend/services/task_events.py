@@ -0,0 +1,142 @@
+"""
+Task Events - 后台任务向客户端推送进度事件
+
+后台任务（如流水线生成整套 PPT）在任务线程中调用 publish 发布事件，
+任务状态接口以 SSE 方式订阅并转发给客户端，客户端无需轮询即可看到每页的进度。
+
+事件保存在内存中（与 TaskManager 相同，只在单进程内有效）：
+- 订阅时先回放该任务已发布的事件，再等待新事件，晚到的订阅者不会漏掉进度
+- 任务结束时调用 close，订阅者在收到所有事件后退出
+- 已结束任务的事件只保留最近 max_closed 个
+
+Usage:
+    broker = get_task_event_broker()
+    broker.publish(task_id, 'page', {'page': page.to_dict(), 'stage': 'description'})
+    broker.close(task_id)
+
+    for event, data in broker.subscribe(task_id):
+        ...
+"""
+
+import logging
+import queue
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TaskEvent = Tuple[str, Dict[str, Any]]
+
+_CLOSED = object()
+
+
+class _Topic:
+    """单个任务的事件历史与订阅者"""
+
+    def __init__(self):
+        self.history: List[TaskEvent] = []
+        self.subscribers: List[queue.Queue] = []
+        self.closed = False
+
+
+class TaskEventBroker:
+    """进程内的任务事件发布/订阅"""
+
+    def __init__(self, max_closed: int = 64):
+        """
+        Args:
+            max_closed: 保留事件历史的已结束任务数
+        """
+        self.max_closed = max_closed
+        self._topics: Dict[str, _Topic] = {}
+        self._closed: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def publish(self, task_id: str, event: str, data: Dict[str, Any]):
+        """发布一个事件（任务已结束时忽略）"""
+        with self._lock:
+            topic = self._topics.setdefault(task_id, _Topic())
+            if topic.closed:
+                return
+            topic.history.append((event, data))
+            subscribers = list(topic.subscribers)
+        for subscriber in subscribers:
+            subscriber.put((event, data))
+
+    def close(self, task_id: str):
+        """标记任务结束，通知所有订阅者"""
+        with self._lock:
+            topic = self._topics.setdefault(task_id, _Topic())
+            if topic.closed:
+                return
+            topic.closed = True
+            subscribers, topic.subscribers = topic.subscribers, []
+            self._closed[task_id] = None
+            while len(self._closed) > self.max_closed:
+                expired, _ = self._closed.popitem(last=False)
+                self._topics.pop(expired, None)
+        for subscriber in subscribers:
+            subscriber.put(_CLOSED)
+
+    def has_events(self, task_id: str) -> bool:
+        """任务是否发布过事件（已过期的不算）"""
+        with self._lock:
+            return task_id in self._topics
+
+    def subscribe(self, task_id: str, timeout: Optional[float] = None) -> Iterator[TaskEvent]:
+        """
+        订阅任务事件：先回放历史事件，再产出新事件，直到任务结束
+
+        任务没有发布过事件时立即结束
+
+        Args:
+            task_id: 任务ID
+            timeout: 等待新事件的最长秒数，超时则结束订阅（None 表示一直等待）
+
+        Yields:
+            (事件名, 数据)
+        """
+        subscriber: queue.Queue = queue.Queue()
+        with self._lock:
+            topic = self._topics.get(task_id)
+            if topic is None:
+                # 没有发布过事件的任务（或事件已过期）
+                return
+            history = list(topic.history)
+            if topic.closed:
+                subscriber.put(_CLOSED)
+            else:
+                topic.subscribers.append(subscriber)
+
+        try:
+            yield from history
+            while True:
+                try:
+                    item = subscriber.get(timeout=timeout)
+                except queue.Empty:
+                    logger.debug(f"Subscription to task {task_id} timed out")
+                    return
+                if item is _CLOSED:
+                    return
+                yield item
+        finally:
+            with self._lock:
+                if subscriber in topic.subscribers:
+                    topic.subscribers.remove(subscriber)
+
+
+_broker_instance: Optional[TaskEventBroker] = None
+_lock = threading.Lock()
+
+
+def get_task_event_broker() -> TaskEventBroker:
+    """获取全局共享的 TaskEventBroker 实例（懒加载）"""
+    global _broker_instance
+
+    if _broker_instance is None:
+        with _lock:
+            if _broker_instance is None:
+                _broker_instance = TaskEventBroker()
+
+    return _broker_instance
@@ -2,14 +2,24 @@
 Task Manager - handles background tasks using ThreadPoolExecutor
 No need for Celery or Redis, uses in-memory task tracking
 """
+import asyncio
 import logging
+import queue
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Callable, List, Dict, Any
 from datetime import datetime
 from sqlalchemy import func
 from models import db, Task, Page, Material, PageImageVersion
 from utils import get_filtered_pages
+from services.generation_executor import get_generation_executor
+from services.description_pipeline import get_description_pipeline
+from services.task_events import get_task_event_broker
+from services.usage_tracker import get_usage_tracker, propagate_context, usage_scope
+from services.metrics import TASK_DURATION, TASKS_FINISHED, TASKS_SUBMITTED
+from services.task_profiler import create_task_profiler
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
@@ -22,41 +32,77 @@ class TaskManager:
         """Initialize task manager"""
         self.executor = ThreadPoolExecutor(max_workers=max_workers)
         self.active_tasks = {}  # task_id -> Future
+        self.running_tasks = set()  # 已开始执行的 task_id，其余 active_tasks 在排队
         self.lock = threading.Lock()
     
     def submit_task(self, task_id: str, func: Callable, *args, **kwargs):
         """Submit a background task"""
-        future = self.executor.submit(func, task_id, *args, **kwargs)
+        task_name = getattr(func, '__name__', 'task')
+        # 请求带 X-Task-Profile（或开启 TASK_PROFILING）时记录性能分析，结束后写入 Task.profile
+        profiler = create_task_profiler(task_id, task_name)
+        
+        def run(*run_args, **run_kwargs):
+            with self.lock:
+                self.running_tasks.add(task_id)
+            started = time.perf_counter()
+            try:
+                if profiler is None:
+                    return func(*run_args, **run_kwargs)
+                try:
+                    with profiler:
+                        return func(*run_args, **run_kwargs)
+                finally:
+                    profiler.save()
+            finally:
+                TASK_DURATION.observe(time.perf_counter() - started, task=task_name)
+        
+        # 任务中的 AI/OCR 调用用量归属到该任务（以及请求中的项目）
+        with usage_scope(task_id=task_id):
+            run = propagate_context(run)
+        future = self.executor.submit(run, task_id, *args, **kwargs)
+        TASKS_SUBMITTED.inc(task=task_name)
         
         with self.lock:
             self.active_tasks[task_id] = future
         
         # Add callback to clean up when done and log exceptions
-        future.add_done_callback(lambda f: self._task_done_callback(task_id, f))
+        future.add_done_callback(lambda f: self._task_done_callback(task_id, task_name, f))
     
-    def _task_done_callback(self, task_id: str, future):
+    def _task_done_callback(self, task_id: str, task_name: str, future):
         """Handle task completion and log any exceptions"""
         try:
             # Check if task raised an exception
             exception = future.exception()
+            TASKS_FINISHED.inc(task=task_name, outcome='error' if exception else 'success')
             if exception:
                 logger.error(f"Task {task_id} failed with exception: {exception}", exc_info=exception)
         except Exception as e:
             logger.error(f"Error in task callback for {task_id}: {e}", exc_info=True)
         finally:
             self._cleanup_task(task_id)
+            try:
+                get_usage_tracker().flush()
+            except Exception as e:
+                logger.warning(f"Failed to flush usage stats for task {task_id}: {e}")
     
     def _cleanup_task(self, task_id: str):
         """Clean up completed task"""
         with self.lock:
             if task_id in self.active_tasks:
                 del self.active_tasks[task_id]
+            self.running_tasks.discard(task_id)
     
     def is_task_active(self, task_id: str) -> bool:
         """Check if task is still running"""
         with self.lock:
             return task_id in self.active_tasks
     
+    def stats(self) -> Dict[str, int]:
+        """排队中和运行中的任务数"""
+        with self.lock:
+            running = len(self.running_tasks)
+            return {'queued': max(len(self.active_tasks) - running, 0), 'running': running}
+    
     def shutdown(self):
         """Shutdown the executor"""
         self.executor.shutdown(wait=True)
@@ -67,7 +113,7 @@ task_manager = TaskManager(max_workers=4)
 
 
 def save_image_with_version(image, project_id: str, page_id: str, file_service, 
-                            page_obj=None, image_format: str = 'PNG') -> tuple[str, int]:
+                            page_obj=None, image_format: str = None) -> tuple[str, int]:
     """
     保存图片并创建历史版本记录的公共函数
     
@@ -77,32 +123,32 @@ def save_image_with_version(image, project_id: str, page_id: str, file_service,
         page_id: 页面ID
         file_service: FileService 实例
         page_obj: Page 对象（可选，如果提供则更新页面状态）
-        image_format: 图片格式，默认 PNG
+        image_format: 图片格式（可选，默认使用 GENERATED_IMAGE_PROFILE 编码配置）
     
     Returns:
         tuple: (image_path, version_number) - 图片路径和版本号
     
     这个函数会：
     1. 计算下一个版本号（使用 MAX 查询确保安全）
-    2. 标记所有旧版本为非当前版本
-    3. 保存图片到最终位置
-    4. 创建新版本记录
-    5. 如果提供了 page_obj，更新页面状态和图片路径
+    2. 在编码进程池中开始保存图片到最终位置
+    3. 标记所有旧版本为非当前版本，创建新版本记录
+    4. 如果提供了 page_obj，更新页面状态和图片路径
+    5. 等待图片落盘后再提交事务；保存失败则回滚，不会留下指向缺失文件的版本记录
     """
     # 使用 MAX 查询确保版本号安全（即使有版本被删除也不会重复）
     max_version = db.session.query(func.max(PageImageVersion.version_number)).filter_by(page_id=page_id).scalar() or 0
     next_version = max_version + 1
     
-    # 批量更新：标记所有旧版本为非当前版本（使用单条 SQL 更高效）
-    PageImageVersion.query.filter_by(page_id=page_id).update({'is_current': False})
-    
-    # 保存图片到最终位置（使用版本号）
-    image_path = file_service.save_generated_image(
+    # 保存图片到最终位置（使用版本号），编码在后台进行
+    image_path, write_future = file_service.save_generated_image_async(
         image, project_id, page_id,
         version_number=next_version,
         image_format=image_format
     )
     
+    # 批量更新：标记所有旧版本为非当前版本（使用单条 SQL 更高效）
+    PageImageVersion.query.filter_by(page_id=page_id).update({'is_current': False})
+    
     # 创建新版本记录
     new_version = PageImageVersion(
         page_id=page_id,
@@ -118,7 +164,12 @@ def save_image_with_version(image, project_id: str, page_id: str, file_service,
         page_obj.status = 'COMPLETED'
         page_obj.updated_at = datetime.utcnow()
     
-    # 提交事务
+    # 图片落盘后再提交事务
+    try:
+        write_future.result()
+    except Exception:
+        db.session.rollback()
+        raise
     db.session.commit()
     
     logger.debug(f"Page {page_id} image saved as version {next_version}: {image_path}")
@@ -126,6 +177,72 @@ def save_image_with_version(image, project_id: str, page_id: str, file_service,
     return image_path, next_version
 
 
+def build_image_request(ai_service, file_service, project_id: str, page_obj,
+                        outline: List[Dict], page_data: Dict, page_index: int,
+                        use_template: bool = True, aspect_ratio: str = "16:9",
+                        resolution: str = "2K", extra_requirements: str = None,
+                        language: str = None) -> Dict:
+    """
+    根据页面描述构建单页图片生成参数（读取描述、提取素材图片、获取模板、生成提示词）
+    
+    Returns:
+        ai_service.agenerate_image 的参数
+    """
+    # Get description content
+    desc_content = page_obj.get_description_content()
+    if not desc_content:
+        raise ValueError("No description content for page")
+    
+    # 获取描述文本（可能是 text 字段或 text_content 数组）
+    desc_text = desc_content.get('text', '')
+    if not desc_text and desc_content.get('text_content'):
+        # 如果 text 字段不存在，尝试从 text_content 数组获取
+        text_content = desc_content.get('text_content', [])
+        if isinstance(text_content, list):
+            desc_text = '\n'.join(text_content)
+        else:
+            desc_text = str(text_content)
+    
+    logger.debug(f"Got description text for page {page_obj.id}: {desc_text[:100]}...")
+    
+    # 从当前页面的描述内容中提取图片 URL
+    page_additional_ref_images = []
+    has_material_images = False
+    
+    # 从描述文本中提取图片
+    if desc_text:
+        image_urls = ai_service.extract_image_urls_from_markdown(desc_text)
+        if image_urls:
+            logger.info(f"Found {len(image_urls)} image(s) in page {page_obj.id} description")
+            page_additional_ref_images = image_urls
+            has_material_images = True
+    
+    # 每页开始生成时动态获取模板路径，确保使用最新模板
+    page_ref_image_path = None
+    if use_template:
+        page_ref_image_path = file_service.get_template_path(project_id)
+        # 注意：如果有风格描述，即使没有模板图片也允许生成
+        # 这个检查已经在 controller 层完成，这里不再检查
+    
+    # Generate image prompt
+    prompt = ai_service.generate_image_prompt(
+        outline, page_data, desc_text, page_index,
+        has_material_images=has_material_images,
+        extra_requirements=extra_requirements,
+        language=language,
+        has_template=use_template
+    )
+    logger.debug(f"Generated image prompt for page {page_obj.id}")
+    
+    return {
+        'prompt': prompt,
+        'ref_image_path': page_ref_image_path,
+        'aspect_ratio': aspect_ratio,
+        'resolution': resolution,
+        'additional_ref_images': page_additional_ref_images or None
+    }
+
+
 def generate_descriptions_task(task_id: str, project_id: str, ai_service, 
                                project_context, outline: List[Dict], 
                                max_workers: int = 5, app=None,
@@ -183,48 +300,53 @@ def generate_descriptions_task(task_id: str, project_id: str, ai_service,
             completed = 0
             failed = 0
             
-            def generate_single_desc(page_id, page_outline, page_index):
+            # Get singleton AI service instance
+            from services.ai_service_manager import get_ai_service
+            desc_ai_service = get_ai_service()
+            
+            async def generate_single_desc(job):
                 """
                 Generate description for a single page
-                注意：只传递 page_id（字符串），不传递 ORM 对象，避免跨线程会话问题
+                在生成执行器的事件循环上运行，只做模型调用，不访问数据库
                 """
-                # 关键修复：在子线程中也需要应用上下文
-                with app.app_context():
+                page_id, page_outline, page_index = job
+                # 流水线模式下，大纲流式生成期间可能已经为该页提前生成了描述
+                speculative = get_description_pipeline().take(project_id, page_outline)
+                if speculative is not None:
+                    try:
+                        return await asyncio.wrap_future(speculative)
+                    except Exception as e:
+                        logger.warning(f"Speculative description for page {page_id} failed, regenerating: {str(e)}")
+                return await desc_ai_service.agenerate_page_description(
+                    project_context, outline, page_outline, page_index,
+                    language=language
+                )
+            
+            # 所有描述请求在共享的事件循环上并发等待，max_workers 限制本任务同时在途的调用数
+            # 关键：提前提取 page.id，不要把 ORM 对象传给协程
+            jobs = [
+                (page.id, page_data, i)
+                for i, (page, page_data) in enumerate(zip(pages, pages_data), 1)
+            ]
+            
+            # Process results as they complete; prompt cache usage is collected for this task only
+            from services.ai_providers.text import prompt_cache_scope
+            with prompt_cache_scope() as task_cache_stats:
+                for (page_id, _, _), future in get_generation_executor().map_unordered(
+                    generate_single_desc, jobs, limit=max_workers
+                ):
+                    error = None
                     try:
-                        # Get singleton AI service instance
-                        from services.ai_service_manager import get_ai_service
-                        ai_service = get_ai_service()
-                        
-                        desc_text = ai_service.generate_page_description(
-                            project_context, outline, page_outline, page_index,
-                            language=language
-                        )
-                        
                         # Parse description into structured format
                         # This is a simplified version - you may want more sophisticated parsing
                         desc_content = {
-                            "text": desc_text,
+                            "text": future.result(),
                             "generated_at": datetime.utcnow().isoformat()
                         }
-                        
-                        return (page_id, desc_content, None)
                     except Exception as e:
                         import traceback
-                        error_detail = traceback.format_exc()
-                        logger.error(f"Failed to generate description for page {page_id}: {error_detail}")
-                        return (page_id, None, str(e))
-            
-            # Use ThreadPoolExecutor for parallel generation
-            # 关键：提前提取 page.id，不要传递 ORM 对象到子线程
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = [
-                    executor.submit(generate_single_desc, page.id, page_data, i)
-                    for i, (page, page_data) in enumerate(zip(pages, pages_data), 1)
-                ]
-                
-                # Process results as they complete
-                for future in as_completed(futures):
-                    page_id, desc_content, error = future.result()
+                        logger.error(f"Failed to generate description for page {page_id}: {traceback.format_exc()}")
+                        error = str(e)
                     
                     db.session.expire_all()
                     
@@ -256,6 +378,11 @@ def generate_descriptions_task(task_id: str, project_id: str, ai_service,
                 db.session.commit()
                 logger.info(f"Task {task_id} COMPLETED - {completed} pages generated, {failed} failed")
             
+            # 本任务各页共享的 prompt 前缀命中模型服务缓存的比例
+            for provider, stats in task_cache_stats.snapshot().items():
+                logger.info(f"Prompt cache ({provider}): {stats['cached_tokens']}/{stats['prompt_tokens']} "
+                            f"prompt tokens cached ({stats['cached_ratio']:.0%}) over {stats['calls']} calls")
+            
             # Update project status
             from models import Project
             project = Project.query.get(project_id)
@@ -323,129 +450,95 @@ def generate_images_task(task_id: str, project_id: str, ai_service, file_service
             completed = 0
             failed = 0
             
-            def generate_single_image(page_id, page_data, page_index):
+            def record_result(page_id, error=None):
+                """更新页面失败状态和任务进度（在任务线程中执行）"""
+                nonlocal completed, failed
+                
+                db.session.expire_all()
+                
+                # Update page in database (主要是为了更新失败状态)
+                page = Page.query.get(page_id)
+                if page:
+                    if error:
+                        page.status = 'FAILED'
+                        failed += 1
+                        db.session.commit()
+                    else:
+                        # 图片已保存并创建版本记录，这里只需要更新计数
+                        completed += 1
+                        # 刷新页面对象以获取最新状态
+                        db.session.refresh(page)
+                
+                # Update task progress
+                task = Task.query.get(task_id)
+                if task:
+                    task.update_progress(completed=completed, failed=failed)
+                    db.session.commit()
+                    logger.info(f"Image Progress: {completed}/{len(pages)} pages completed")
+            
+            def prepare_page(page_id, page_data, page_index):
                 """
-                Generate image for a single page
-                注意：只传递 page_id（字符串），不传递 ORM 对象，避免跨线程会话问题
+                准备单页的生成参数：更新页面状态、读取描述、构建提示词
+                在任务线程中执行，返回 agenerate_image 的参数
                 """
-                # 关键修复：在子线程中也需要应用上下文
-                with app.app_context():
+                logger.debug(f"Starting image generation for page {page_id}, index {page_index}")
+                page_obj = Page.query.get(page_id)
+                if not page_obj:
+                    raise ValueError(f"Page {page_id} not found")
+                
+                # Update page status
+                page_obj.status = 'GENERATING'
+                db.session.commit()
+                logger.debug(f"Page {page_id} status updated to GENERATING")
+                
+                return build_image_request(
+                    ai_service, file_service, project_id, page_obj,
+                    outline, page_data, page_index,
+                    use_template=use_template, aspect_ratio=aspect_ratio,
+                    resolution=resolution, extra_requirements=extra_requirements,
+                    language=language
+                )
+            
+            def iter_jobs():
+                """惰性准备页面：只有在途调用数低于 max_workers 时才准备下一页"""
+                for page_index, (page, page_data) in enumerate(zip(pages, pages_data), 1):
                     try:
-                        logger.debug(f"Starting image generation for page {page_id}, index {page_index}")
-                        # Get page from database in this thread
-                        page_obj = Page.query.get(page_id)
-                        if not page_obj:
-                            raise ValueError(f"Page {page_id} not found")
-                        
-                        # Update page status
-                        page_obj.status = 'GENERATING'
-                        db.session.commit()
-                        logger.debug(f"Page {page_id} status updated to GENERATING")
-                        
-                        # Get description content
-                        desc_content = page_obj.get_description_content()
-                        if not desc_content:
-                            raise ValueError("No description content for page")
-                        
-                        # 获取描述文本（可能是 text 字段或 text_content 数组）
-                        desc_text = desc_content.get('text', '')
-                        if not desc_text and desc_content.get('text_content'):
-                            # 如果 text 字段不存在，尝试从 text_content 数组获取
-                            text_content = desc_content.get('text_content', [])
-                            if isinstance(text_content, list):
-                                desc_text = '\n'.join(text_content)
-                            else:
-                                desc_text = str(text_content)
-                        
-                        logger.debug(f"Got description text for page {page_id}: {desc_text[:100]}...")
-                        
-                        # 从当前页面的描述内容中提取图片 URL
-                        page_additional_ref_images = []
-                        has_material_images = False
-                        
-                        # 从描述文本中提取图片
-                        if desc_text:
-                            image_urls = ai_service.extract_image_urls_from_markdown(desc_text)
-                            if image_urls:
-                                logger.info(f"Found {len(image_urls)} image(s) in page {page_id} description")
-                                page_additional_ref_images = image_urls
-                                has_material_images = True
-                        
-                        # 在子线程中动态获取模板路径，确保使用最新模板
-                        page_ref_image_path = None
-                        if use_template:
-                            page_ref_image_path = file_service.get_template_path(project_id)
-                            # 注意：如果有风格描述，即使没有模板图片也允许生成
-                            # 这个检查已经在 controller 层完成，这里不再检查
-                        
-                        # Generate image prompt
-                        prompt = ai_service.generate_image_prompt(
-                            outline, page_data, desc_text, page_index,
-                            has_material_images=has_material_images,
-                            extra_requirements=extra_requirements,
-                            language=language,
-                            has_template=use_template
-                        )
-                        logger.debug(f"Generated image prompt for page {page_id}")
-                        
-                        # Generate image
-                        logger.info(f"🎨 Calling AI service to generate image for page {page_index}/{len(pages)}...")
-                        image = ai_service.generate_image(
-                            prompt, page_ref_image_path, aspect_ratio, resolution,
-                            additional_ref_images=page_additional_ref_images if page_additional_ref_images else None
-                        )
-                        logger.info(f"✅ Image generated successfully for page {page_index}")
-                        
-                        if not image:
-                            raise ValueError("Failed to generate image")
-                        
-                        # 优化：直接在子线程中计算版本号并保存到最终位置
-                        # 每个页面独立，使用数据库事务保证版本号原子性，避免临时文件
-                        image_path, next_version = save_image_with_version(
-                            image, project_id, page_id, file_service, page_obj=page_obj
-                        )
-                        
-                        return (page_id, image_path, None)
-                        
+                        yield page.id, page_index, prepare_page(page.id, page_data, page_index)
                     except Exception as e:
                         import traceback
-                        error_detail = traceback.format_exc()
-                        logger.error(f"Failed to generate image for page {page_id}: {error_detail}")
-                        return (page_id, None, str(e))
-            
-            # Use ThreadPoolExecutor for parallel generation
-            # 关键：提前提取 page.id，不要传递 ORM 对象到子线程
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = [
-                    executor.submit(generate_single_image, page.id, page_data, i)
-                    for i, (page, page_data) in enumerate(zip(pages, pages_data), 1)
-                ]
-                
-                # Process results as they complete
-                for future in as_completed(futures):
-                    page_id, image_path, error = future.result()
-                    
-                    db.session.expire_all()
-                    
-                    # Update page in database (主要是为了更新失败状态)
-                    page = Page.query.get(page_id)
-                    if page:
-                        if error:
-                            page.status = 'FAILED'
-                            failed += 1
-                            db.session.commit()
-                        else:
-                            # 图片已在子线程中保存并创建版本记录，这里只需要更新计数
-                            completed += 1
-                            # 刷新页面对象以获取最新状态
-                            db.session.refresh(page)
+                        logger.error(f"Failed to generate image for page {page.id}: {traceback.format_exc()}")
+                        db.session.rollback()
+                        record_result(page.id, str(e))
+            
+            async def generate_single_image(job):
+                """在生成执行器的事件循环上调用模型，只做模型调用，不访问数据库"""
+                _, page_index, kwargs = job
+                logger.info(f"🎨 Calling AI service to generate image for page {page_index}/{len(pages)}...")
+                return await ai_service.agenerate_image(**kwargs)
+            
+            # 所有图片请求在共享的事件循环上并发等待，max_workers 限制本任务同时在途的调用数
+            # 关键：提前提取 page.id，不要把 ORM 对象传给协程
+            for (page_id, page_index, _), future in get_generation_executor().map_unordered(
+                generate_single_image, iter_jobs(), limit=max_workers
+            ):
+                error = None
+                try:
+                    image = future.result()
+                    if not image:
+                        raise ValueError("Failed to generate image")
+                    logger.info(f"✅ Image generated successfully for page {page_index}")
                     
-                    # Update task progress
-                    task = Task.query.get(task_id)
-                    if task:
-                        task.update_progress(completed=completed, failed=failed)
-                        db.session.commit()
-                        logger.info(f"Image Progress: {completed}/{len(pages)} pages completed")
+                    # 计算版本号并保存到最终位置（使用数据库事务保证版本号原子性）
+                    save_image_with_version(
+                        image, project_id, page_id, file_service, page_obj=Page.query.get(page_id)
+                    )
+                except Exception as e:
+                    import traceback
+                    logger.error(f"Failed to generate image for page {page_id}: {traceback.format_exc()}")
+                    db.session.rollback()
+                    error = str(e)
+                
+                record_result(page_id, error)
             
             # Mark task as completed
             task = Task.query.get(task_id)
@@ -473,6 +566,254 @@ def generate_images_task(task_id: str, project_id: str, ai_service, file_service
                 db.session.commit()
 
 
+def generate_deck_task(task_id: str, project_id: str, ai_service, file_service,
+                       project_context, use_template: bool = True,
+                       description_workers: int = 5, image_workers: int = 8,
+                       aspect_ratio: str = "16:9", resolution: str = "2K", app=None,
+                       extra_requirements: str = None, language: str = None):
+    """
+    Background task for pipelined deck generation (outline -> descriptions -> images)
+    
+    每个页面独立地经过 大纲 → 描述 → 图片 三个阶段，不再等待上一阶段的所有页面：
+    - 流式大纲中某页一完成就创建页面，并加入描述队列
+    - 描述完成后立即构建图片提示词，加入图片队列
+    - 描述、图片两个阶段各有等待队列和在途上限（description_workers / image_workers）
+    
+    模型调用在 GenerationExecutor 上执行，完成回调和大纲线程都把事件投递到任务线程的队列中，
+    数据库读写只在任务线程中进行。每页进入新阶段时通过 TaskEventBroker 发布 page 事件
+    （stage: outline / description / image / completed，失败时带 error），任务结束时发布 done。
+    
+    Note: app instance MUST be passed from the request context
+    
+    Args:
+        project_context: ProjectContext，creation_type 为 outline 时解析大纲文本，否则从 idea 生成
+        description_workers: 同时在途的描述调用数上限
+        image_workers: 同时在途的图片调用数上限
+        language: Output language (zh, en, ja, auto)
+    """
+    if app is None:
+        raise ValueError("Flask app instance must be provided")
+    
+    broker = get_task_event_broker()
+    executor = get_generation_executor()
+    
+    with app.app_context():
+        try:
+            task = Task.query.get(task_id)
+            if not task:
+                return
+            
+            task.status = 'PROCESSING'
+            db.session.commit()
+            
+            # Delete existing pages (using ORM session to trigger cascades)
+            for old_page in Page.query.filter_by(project_id=project_id).all():
+                db.session.delete(old_page)
+            db.session.commit()
+            
+            if project_context.creation_type == 'outline':
+                outline_stream = ai_service.parse_outline_text_stream
+            else:
+                outline_stream = ai_service.generate_outline_stream
+            
+            # 大纲线程和模型调用的完成回调都投递到这里，由任务线程按到达顺序处理
+            events = queue.Queue()
+            
+            def produce_outline():
+                """provider 的流式接口是同步的，在独立线程中消费"""
+                with app.app_context():
+                    try:
+                        for event in outline_stream(project_context, language=language):
+                            events.put((event['type'], event))
+                    except Exception as e:
+                        import traceback
+                        logger.error(f"Outline stream failed for task {task_id}: {traceback.format_exc()}")
+                        events.put(('outline_error', str(e)))
+                    finally:
+                        events.put(('outline_end', None))
+            
+            progress = {"total": 0, "completed": 0, "failed": 0, "described": 0}
+            outline_so_far = []
+            pages_info = {}  # page_id -> (page_data, page_index)
+            description_queue = deque()  # (page_id, outline)
+            image_queue = deque()  # (page_id, agenerate_image kwargs)
+            running = {'description': 0, 'image': 0}
+            limits = {'description': max(1, description_workers), 'image': max(1, image_workers)}
+            
+            def save_progress():
+                task = Task.query.get(task_id)
+                if task:
+                    task.set_progress(dict(progress))
+                    db.session.commit()
+            
+            def publish(page, stage, error=None):
+                data = {'page': page.to_dict(), 'stage': stage}
+                if error:
+                    data['error'] = error
+                broker.publish(task_id, 'page', data)
+            
+            def fail_page(page_id, stage, error):
+                db.session.rollback()
+                progress['failed'] += 1
+                page = Page.query.get(page_id)
+                if page:
+                    page.status = 'FAILED'
+                    db.session.commit()
+                    publish(page, stage, error)
+                save_progress()
+            
+            def submit(stage, page_id, fn, *args, **kwargs):
+                running[stage] += 1
+                future = executor.submit(fn, *args, **kwargs)
+                future.add_done_callback(lambda f: events.put((stage, (page_id, f))))
+            
+            def pump():
+                """各阶段在途调用数低于上限时，从队列中取出页面开始生成"""
+                while description_queue and running['description'] < limits['description']:
+                    page_id, outline = description_queue.popleft()
+                    page_data, page_index = pages_info[page_id]
+                    submit('description', page_id, ai_service.agenerate_page_description,
+                           project_context, outline, page_data, page_index, language=language)
+                while image_queue and running['image'] < limits['image']:
+                    page_id, image_kwargs = image_queue.popleft()
+                    submit('image', page_id, ai_service.agenerate_image, **image_kwargs)
+            
+            def on_page(event):
+                page_data = event['page']
+                page = Page(
+                    project_id=project_id,
+                    order_index=event['index'],
+                    part=page_data.get('part'),
+                    status='DRAFT'
+                )
+                page.set_outline_content({
+                    'title': page_data.get('title'),
+                    'points': page_data.get('points', [])
+                })
+                db.session.add(page)
+                db.session.commit()
+                
+                outline_so_far.append(page_data)
+                pages_info[page.id] = (page_data, event['index'] + 1)
+                progress['total'] += 1
+                save_progress()
+                publish(page, 'outline')
+                # 描述使用到该页为止的大纲
+                description_queue.append((page.id, list(outline_so_far)))
+            
+            def on_description(page_id, future):
+                stage = 'description'
+                try:
+                    desc_text = future.result()
+                    db.session.expire_all()
+                    page = Page.query.get(page_id)
+                    if not page:
+                        raise ValueError(f"Page {page_id} not found")
+                    page.set_description_content({
+                        "text": desc_text,
+                        "generated_at": datetime.utcnow().isoformat()
+                    })
+                    page.status = 'DESCRIPTION_GENERATED'
+                    db.session.commit()
+                    progress['described'] += 1
+                    save_progress()
+                    publish(page, stage)
+                    
+                    stage = 'image'
+                    page_data, page_index = pages_info[page_id]
+                    image_kwargs = build_image_request(
+                        ai_service, file_service, project_id, page,
+                        list(outline_so_far), page_data, page_index,
+                        use_template=use_template, aspect_ratio=aspect_ratio,
+                        resolution=resolution, extra_requirements=extra_requirements,
+                        language=language
+                    )
+                    page.status = 'GENERATING'
+                    db.session.commit()
+                    publish(page, stage)
+                    image_queue.append((page_id, image_kwargs))
+                except Exception as e:
+                    import traceback
+                    logger.error(f"Failed to generate {stage} for page {page_id}: {traceback.format_exc()}")
+                    fail_page(page_id, stage, str(e))
+            
+            def on_image(page_id, future):
+                try:
+                    image = future.result()
+                    if not image:
+                        raise ValueError("Failed to generate image")
+                    db.session.expire_all()
+                    page = Page.query.get(page_id)
+                    save_image_with_version(image, project_id, page_id, file_service, page_obj=page)
+                    progress['completed'] += 1
+                    save_progress()
+                    publish(page, 'completed')
+                    logger.info(f"Deck Progress: {progress['completed']}/{progress['total']} pages completed")
+                except Exception as e:
+                    import traceback
+                    logger.error(f"Failed to generate image for page {page_id}: {traceback.format_exc()}")
+                    fail_page(page_id, 'image', str(e))
+            
+            save_progress()
+            threading.Thread(target=propagate_context(produce_outline), name='deck-outline', daemon=True).start()
+            
+            outline_done = False
+            outline_error = None
+            while not outline_done or description_queue or image_queue or any(running.values()):
+                kind, payload = events.get()
+                if kind == 'page':
+                    on_page(payload)
+                elif kind == 'outline':
+                    broker.publish(task_id, 'outline', {'total': progress['total']})
+                elif kind == 'outline_error':
+                    outline_error = payload
+                elif kind == 'outline_end':
+                    outline_done = True
+                elif kind == 'description':
+                    running['description'] -= 1
+                    on_description(*payload)
+                elif kind == 'image':
+                    running['image'] -= 1
+                    on_image(*payload)
+                pump()
+            
+            if outline_error and not progress['total']:
+                raise ValueError(outline_error)
+            
+            task = Task.query.get(task_id)
+            if task:
+                task.status = 'FAILED' if outline_error else 'COMPLETED'
+                task.error_message = outline_error
+                task.completed_at = datetime.utcnow()
+                db.session.commit()
+                logger.info(f"Task {task_id} {task.status} - {progress['completed']} pages generated, "
+                            f"{progress['failed']} failed")
+            
+            # Update project status
+            from models import Project
+            project = Project.query.get(project_id)
+            if project and not outline_error and progress['failed'] == 0:
+                project.status = 'COMPLETED'
+                db.session.commit()
+                logger.info(f"Project {project_id} status updated to COMPLETED")
+        
+        except Exception as e:
+            db.session.rollback()
+            # Mark task as failed
+            task = Task.query.get(task_id)
+            if task:
+                task.status = 'FAILED'
+                task.error_message = str(e)
+                task.completed_at = datetime.utcnow()
+                db.session.commit()
+        
+        finally:
+            task = Task.query.get(task_id)
+            if task:
+                broker.publish(task_id, 'done', task.to_dict())
+            broker.close(task_id)
+
+
 def generate_single_page_image_task(task_id: str, project_id: str, page_id: str, 
                                     ai_service, file_service, outline: List[Dict],
                                     use_template: bool = True, aspect_ratio: str = "16:9",
@@ -812,6 +1153,7 @@ def export_editable_pptx_with_recursive_analysis_task(
     max_workers: int = 4,
     export_extractor_method: str = 'hybrid',
     export_inpaint_method: str = 'hybrid',
+    export_enhance_threshold: float = None,
     app=None
 ):
     """
@@ -835,6 +1177,7 @@ def export_editable_pptx_with_recursive_analysis_task(
         max_workers: 并发处理数
         export_extractor_method: 组件提取方法 ('mineru' 或 'hybrid')
         export_inpaint_method: 背景修复方法 ('generative', 'baidu', 'hybrid')
+        export_enhance_threshold: 混合修复的画质门限（None 使用默认值）
         app: Flask应用实例
     """
     logger.info(f"🚀 Task {task_id} started: export_editable_pptx_with_recursive_analysis (project={project_id}, depth={max_depth}, workers={max_workers}, extractor={export_extractor_method}, inpaint={export_inpaint_method})")
@@ -947,7 +1290,8 @@ def export_editable_pptx_with_recursive_analysis_task(
             
             # Step 2: 创建文字属性提取器
             from services.image_editability import TextAttributeExtractorFactory
-            text_attribute_extractor = TextAttributeExtractorFactory.create_caption_model_extractor()
+            # 文本颜色优先用本地像素估算，只有低置信度的元素才调用 caption model
+            text_attribute_extractor = TextAttributeExtractorFactory.create_text_attribute_registry().get_extractor('text')
             progress_callback("准备", "文字属性提取器已初始化", 5)
             
             # Step 3: 调用导出方法（使用项目的导出设置）
@@ -964,7 +1308,8 @@ def export_editable_pptx_with_recursive_analysis_task(
                 text_attribute_extractor=text_attribute_extractor,
                 progress_callback=progress_callback,
                 export_extractor_method=export_extractor_method,
-                export_inpaint_method=export_inpaint_method
+                export_inpaint_method=export_inpaint_method,
+                export_enhance_threshold=export_enhance_threshold
             )
             
             logger.info(f"✓ 可编辑PPTX已创建: {output_path}")
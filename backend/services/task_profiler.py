@@ -0,0 +1,350 @@
+"""
+Task Profiler - 后台任务的性能分析
+
+对单个任务开启（请求头 X-Task-Profile / 查询参数 profile，或配置 TASK_PROFILING 对所有任务开启），
+任务结束后把结果写入 Task.profile：
+
+- 时间线：ExportService.report_progress 的步骤（版面分析、样式提取、构建PPTX、保存文件……）
+  以及任务中结束的所有 span（流水线阶段 stage.*、每次外部调用 category.provider、
+  可编辑化递归等，来自 services.tracing），每项带调用路径、开始时间、耗时和线程
+- 可选的 profiler 输出：cProfile（标准库）或 pyinstrument（需单独安装），只分析任务线程，
+  结果文件保存在项目目录的 profiles/ 下
+- 内存：tracemalloc 的 Python 分配峰值（进程级，多个任务同时分析时为共同峰值）和进程 RSS 峰值
+
+时间线可以 JSON 下载，或转成 folded stacks（flamegraph.pl / speedscope 可直接打开）。
+火焰图的值是各路径的墙钟耗时（毫秒）；并行的子调用耗时会叠加，可能超过父节点。
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import current_app, has_app_context, has_request_context, request
+
+from services.tracing import current_span_stack, record_spans
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+except ImportError:
+    PyinstrumentProfiler = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Task-Profile'
+SAMPLERS = ('none', 'cprofile', 'pyinstrument')
+# 单个任务最多保留的 span 数，超出部分只计数
+MAX_SPANS = 5000
+
+_active_profiler: ContextVar[Optional['TaskProfiler']] = ContextVar('task_profiler', default=None)
+
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_owned = False  # tracemalloc 是否由这里启动（外部已启动时结束后不关闭）
+
+
+def _start_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0:
+            _tracemalloc_owned = not tracemalloc.is_tracing()
+            if _tracemalloc_owned:
+                tracemalloc.start()
+            else:
+                tracemalloc.reset_peak()
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc() -> int:
+    """返回期间的分配峰值（字节）"""
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+        return peak
+
+
+def _max_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    # Linux 单位为 KB，macOS 为字节
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(max_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def requested_profile_mode() -> Optional[str]:
+    """
+    当前请求要求的分析模式
+
+    Returns:
+        None 表示不分析；否则为 profiler 名（none 表示只记录时间线和内存）
+    """
+    value = None
+    if has_request_context():
+        value = request.headers.get(PROFILE_HEADER) or request.args.get('profile')
+    config = current_app.config if has_app_context() else {}
+    default_sampler = (config.get('TASK_PROFILER_SAMPLER') or 'none').lower()
+
+    if value is None:
+        return default_sampler if config.get('TASK_PROFILING') else None
+    value = value.strip().lower()
+    if value in ('', '0', 'false', 'off', 'no'):
+        return None
+    if value in SAMPLERS:
+        return value
+    return default_sampler
+
+
+class TaskProfiler:
+    """一个任务的性能分析，在任务线程中以 with 使用"""
+
+    def __init__(self, task_id: str, task_name: str, sampler: str = 'none', track_memory: bool = True,
+                 app=None, output_folder: Optional[str] = None):
+        self.task_id = task_id
+        self.task_name = task_name
+        self.sampler = sampler if sampler in SAMPLERS else 'none'
+        self.track_memory = track_memory
+        self.app = app
+        self.output_folder = output_folder
+        self.steps: List[Dict[str, Any]] = []
+        self.spans: List[Dict[str, Any]] = []
+        self.dropped_spans = 0
+        self._lock = threading.Lock()
+        self._started = None
+        self._started_at = None
+        self._duration = None
+        self._profiler = None
+        self._recording = None
+        self._token = None
+        self.memory: Dict[str, Any] = {}
+        self.sampler_output: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+
+    def _offset_ms(self, timestamp: float) -> float:
+        return round((timestamp - self._started) * 1000, 3)
+
+    # ---- 时间线 ----
+
+    def step(self, name: str):
+        """进入一个步骤（与当前步骤同名时忽略）；上一个步骤随之结束"""
+        now = time.perf_counter()
+        with self._lock:
+            if self.steps and self.steps[-1]['name'] == name and self.steps[-1]['_end'] is None:
+                return
+            if self.steps and self.steps[-1]['_end'] is None:
+                self.steps[-1]['_end'] = now
+            self.steps.append({
+                'name': name,
+                '_start': now,
+                '_end': None,
+                '_ancestors': tuple(span_name for span_name, _ in current_span_stack()),
+            })
+
+    def _step_at(self, timestamp: float) -> Optional[Dict[str, Any]]:
+        for step in reversed(self.steps):
+            if step['_start'] <= timestamp:
+                return step if step['_end'] is None or timestamp < step['_end'] else None
+        return None
+
+    def _path(self, ancestors: Tuple[str, ...], start: float) -> Tuple[str, ...]:
+        """调用路径：任务名 + 祖先 span，所在步骤插在步骤开始时已激活的 span 之后"""
+        step = self._step_at(start)
+        if step is not None and ancestors[:len(step['_ancestors'])] == step['_ancestors']:
+            prefix = step['_ancestors']
+            return (self.task_name,) + prefix + (step['name'],) + ancestors[len(prefix):]
+        return (self.task_name,) + ancestors
+
+    def record_span(self, name: str, ancestors, start: float, end: float,
+                    attributes: Dict[str, Any], error):
+        """span 记录器接口（见 services.tracing.record_spans）"""
+        with self._lock:
+            if len(self.spans) >= MAX_SPANS:
+                self.dropped_spans += 1
+                return
+            self.spans.append({
+                'name': name,
+                'path': self._path(tuple(span_name for span_name, _ in ancestors), start) + (name,),
+                'start_ms': self._offset_ms(start),
+                'duration_ms': round((end - start) * 1000, 3),
+                'thread': threading.current_thread().name,
+                'attributes': attributes,
+                'status': 'error' if error else 'ok',
+            })
+
+    # ---- 生命周期 ----
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        self._started_at = datetime.utcnow()
+        if self.track_memory:
+            _start_tracemalloc()
+            self.memory['max_rss_start_mb'] = _max_rss_mb()
+        self._start_sampler()
+        self._token = _active_profiler.set(self)
+        self._recording = record_spans(self)
+        self._recording.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._recording.__exit__(None, None, None)
+        _active_profiler.reset(self._token)
+        end = time.perf_counter()
+        self._duration = end - self._started
+        with self._lock:
+            if self.steps and self.steps[-1]['_end'] is None:
+                self.steps[-1]['_end'] = end
+        self._stop_sampler()
+        if self.track_memory:
+            self.memory['tracemalloc_peak_mb'] = round(_stop_tracemalloc() / (1024 * 1024), 1)
+            self.memory['max_rss_mb'] = _max_rss_mb()
+        if exc is not None:
+            self.error = f'{type(exc).__name__}: {exc}'
+        return False
+
+    def _start_sampler(self):
+        if self.sampler == 'pyinstrument' and PyinstrumentProfiler is None:
+            logger.warning("pyinstrument is not installed, falling back to cProfile")
+            self.sampler = 'cprofile'
+        if self.sampler == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.sampler == 'pyinstrument':
+            self._profiler = PyinstrumentProfiler()
+            self._profiler.start()
+
+    def _stop_sampler(self):
+        if self._profiler is None:
+            return
+        try:
+            if self.sampler == 'cprofile':
+                self._profiler.disable()
+                stream = io.StringIO()
+                stats = pstats.Stats(self._profiler, stream=stream)
+                stats.sort_stats('cumulative').print_stats(40)
+                self.sampler_output = {'type': 'cprofile', 'summary': stream.getvalue()}
+                if self.output_folder:
+                    path = os.path.join(self.output_folder, f'{self.task_id}.prof')
+                    os.makedirs(self.output_folder, exist_ok=True)
+                    stats.dump_stats(path)
+                    self.sampler_output['file'] = path
+            else:
+                self._profiler.stop()
+                self.sampler_output = {'type': 'pyinstrument', 'summary': self._profiler.output_text()}
+                if self.output_folder:
+                    path = os.path.join(self.output_folder, f'{self.task_id}.html')
+                    os.makedirs(self.output_folder, exist_ok=True)
+                    with open(path, 'w', encoding='utf-8') as f:
+                        f.write(self._profiler.output_html())
+                    self.sampler_output['file'] = path
+        except Exception as e:
+            logger.warning(f"Failed to collect profiler output for task {self.task_id}: {e}")
+        finally:
+            self._profiler = None
+
+    # ---- 结果 ----
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            steps = [{
+                'name': step['name'],
+                'path': [self.task_name, *step['_ancestors'], step['name']],
+                'start_ms': self._offset_ms(step['_start']),
+                'duration_ms': round((step['_end'] - step['_start']) * 1000, 3) if step['_end'] else None,
+            } for step in self.steps]
+            spans = [{**item, 'path': list(item['path'])} for item in self.spans]
+        return {
+            'task_id': self.task_id,
+            'task_name': self.task_name,
+            'started_at': self._started_at.isoformat() if self._started_at else None,
+            'duration_ms': round(self._duration * 1000, 3) if self._duration is not None else None,
+            'error': self.error,
+            'steps': steps,
+            'spans': spans,
+            'dropped_spans': self.dropped_spans,
+            'memory': self.memory,
+            'sampler': self.sampler_output,
+        }
+
+    def save(self):
+        """把结果写入 Task.profile"""
+        if self.app is None:
+            logger.warning(f"No application for task {self.task_id}, profile discarded")
+            return
+        from models import db, Task
+        with self.app.app_context():
+            try:
+                task = db.session.get(Task, self.task_id)
+                if task is None:
+                    return
+                task.set_profile(self.to_dict())
+                db.session.commit()
+                logger.info(f"Saved profile for task {self.task_id} ({len(self.spans)} spans)")
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f"Failed to save profile for task {self.task_id}: {e}")
+
+
+def create_task_profiler(task_id: str, task_name: str) -> Optional[TaskProfiler]:
+    """按当前请求和配置创建任务的 profiler（未要求分析时返回 None）"""
+    sampler = requested_profile_mode()
+    if sampler is None:
+        return None
+    app = current_app._get_current_object() if has_app_context() else None
+    output_folder = None
+    if app is not None and has_request_context() and request.view_args:
+        project_id = request.view_args.get('project_id')
+        if project_id:
+            output_folder = os.path.join(app.config['UPLOAD_FOLDER'], project_id, 'profiles')
+    track_memory = app.config.get('TASK_PROFILER_TRACK_MEMORY', True) if app is not None else True
+    return TaskProfiler(task_id, task_name, sampler=sampler, track_memory=track_memory,
+                        app=app, output_folder=output_folder)
+
+
+def profile_step(name: str):
+    """在当前任务的性能分析中进入一个步骤（未在分析时忽略）"""
+    profiler = _active_profiler.get()
+    if profiler is not None:
+        profiler.step(name)
+
+
+def to_folded_stacks(profile: Dict[str, Any]) -> str:
+    """
+    把时间线转成 folded stacks（"a;b;c 毫秒"，每行一个路径的自身耗时）
+
+    步骤作为路径中的一层；步骤和 span 的自身耗时为总耗时减去直接子节点耗时（不小于 0）
+    """
+    totals: Dict[Tuple[str, ...], float] = {}
+    task_name = profile.get('task_name') or 'task'
+    if profile.get('duration_ms'):
+        totals[(task_name,)] = profile['duration_ms']
+
+    for item in profile.get('spans', []) + profile.get('steps', []):
+        path = tuple(item['path'])
+        totals[path] = totals.get(path, 0) + (item['duration_ms'] or 0)
+
+    children: Dict[Tuple[str, ...], float] = {}
+    for path, total in totals.items():
+        if len(path) > 1:
+            children[path[:-1]] = children.get(path[:-1], 0) + total
+
+    lines = []
+    for path, total in sorted(totals.items()):
+        own = max(total - children.get(path, 0), 0)
+        if own >= 1:
+            lines.append(f"{';'.join(frame.replace(';', ',') for frame in path)} {int(round(own))}")
+    return '\n'.join(lines) + '\n'
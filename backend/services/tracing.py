@@ -0,0 +1,345 @@
+"""
+Tracing - 可选的调用链追踪
+
+span() / start_span() 在未启用时是空操作；启用后有两种后端：
+
+- otlp / console：使用 OpenTelemetry SDK（需安装 opentelemetry-sdk，otlp 还需要
+  opentelemetry-exporter-otlp），span 导出到 OTLP collector 或标准输出
+- file：内置实现，不依赖 OpenTelemetry，每个结束的 span 以一行 JSON 追加到文件，
+  适合本地排查和测试
+
+两种后端都通过 contextvars 维护父子关系，线程池中的子 span 需要配合
+usage_tracker.propagate_context 使用。
+
+与后端无关，record_spans(recorder) 范围内结束的 span 还会交给 recorder
+（任务性能分析用它记录时间线）。
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+try:
+    from opentelemetry import context as otel_context
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_context = None
+    otel_trace = None
+
+_current_span: ContextVar[Optional['_FileSpan']] = ContextVar('trace_current_span', default=None)
+_span_recorder: ContextVar[Optional[Any]] = ContextVar('trace_span_recorder', default=None)
+# 记录器范围内已激活的 span：((名称, perf_counter 开始时间), ...)
+_recorded_stack: ContextVar[Tuple[Tuple[str, float], ...]] = ContextVar('trace_recorded_stack', default=())
+
+
+def _clean_attributes(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    """去掉 None，非基础类型转为字符串（OpenTelemetry 只接受基础类型属性）"""
+    return {
+        key: value if isinstance(value, (str, bool, int, float)) else str(value)
+        for key, value in attributes.items() if value is not None
+    }
+
+
+class _NoopSpan:
+    """未启用追踪时的占位 span"""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def activate(self):
+        pass
+
+    def deactivate(self):
+        pass
+
+    def end(self, error: Union[BaseException, bool, None] = None):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _FileSpan:
+    """内置 span，结束时交给 FileSpanSink 写入"""
+
+    def __init__(self, sink: 'FileSpanSink', name: str, attributes: Dict[str, Any]):
+        parent = _current_span.get()
+        self._sink = sink
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = _clean_attributes(attributes)
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes.update(_clean_attributes({key: value}))
+
+    def activate(self):
+        self._token = _current_span.set(self)
+
+    def deactivate(self):
+        if self._token is not None:
+            _current_span.reset(self._token)
+            self._token = None
+
+    def end(self, error: Union[BaseException, bool, None] = None):
+        self._sink.write({
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_time': self.start_time,
+            'duration_ms': round((time.perf_counter() - self._started) * 1000, 3),
+            'status': 'error' if error else 'ok',
+            'error': f'{type(error).__name__}: {error}' if isinstance(error, BaseException) else None,
+            'attributes': self.attributes,
+        })
+
+
+class _OtelSpan:
+    """OpenTelemetry span 的薄包装，统一 activate/deactivate/end 接口"""
+
+    def __init__(self, tracer, name: str, attributes: Dict[str, Any]):
+        self._span = tracer.start_span(name, attributes=_clean_attributes(attributes))
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        if value is not None:
+            self._span.set_attribute(key, _clean_attributes({key: value})[key])
+
+    def activate(self):
+        self._token = otel_context.attach(otel_trace.set_span_in_context(self._span))
+
+    def deactivate(self):
+        if self._token is not None:
+            otel_context.detach(self._token)
+            self._token = None
+
+    def end(self, error: Union[BaseException, bool, None] = None):
+        if isinstance(error, BaseException):
+            self._span.record_exception(error)
+        if error:
+            self._span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR, str(error)))
+        self._span.end()
+
+
+class _RecordedSpan:
+    """包装导出用的 span，结束时同时交给 span 记录器"""
+
+    def __init__(self, inner, recorder, name: str, attributes: Dict[str, Any]):
+        self._inner = inner
+        self._recorder = recorder
+        self.name = name
+        self.attributes = _clean_attributes(attributes)
+        self.ancestors = _recorded_stack.get()
+        self.start = time.perf_counter()
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        self._inner.set_attribute(key, value)
+        self.attributes.update(_clean_attributes({key: value}))
+
+    def activate(self):
+        self._inner.activate()
+        self._token = _recorded_stack.set(self.ancestors + ((self.name, self.start),))
+
+    def deactivate(self):
+        if self._token is not None:
+            _recorded_stack.reset(self._token)
+            self._token = None
+        self._inner.deactivate()
+
+    def end(self, error: Union[BaseException, bool, None] = None):
+        self._inner.end(error)
+        try:
+            self._recorder.record_span(self.name, self.ancestors, self.start, time.perf_counter(),
+                                       self.attributes, error)
+        except Exception as e:
+            logger.warning(f"Span recorder failed: {e}")
+
+
+class FileSpanSink:
+    """把结束的 span 逐行追加为 JSON"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+class Tracer:
+    """按配置创建 span 的入口"""
+
+    def __init__(self):
+        self._file_sink: Optional[FileSpanSink] = None
+        self._otel_tracer = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._file_sink is not None or self._otel_tracer is not None
+
+    def configure(self, exporter: str, file_path: Optional[str] = None):
+        """
+        配置追踪后端
+
+        Args:
+            exporter: ''/none（关闭）、file、console、otlp
+            file_path: exporter 为 file 时写入的文件
+        """
+        exporter = (exporter or '').strip().lower()
+        self._file_sink = None
+        self._otel_tracer = None
+
+        if exporter in ('', 'none'):
+            return
+        if exporter == 'file':
+            self._file_sink = FileSpanSink(file_path or 'traces.jsonl')
+            logger.info(f"Tracing enabled, writing spans to {self._file_sink.path}")
+            return
+        if exporter in ('console', 'otlp'):
+            self._otel_tracer = self._create_otel_tracer(exporter)
+            return
+        logger.warning(f"Unknown TRACING_EXPORTER '{exporter}', tracing disabled")
+
+    def _create_otel_tracer(self, exporter: str):
+        if otel_trace is None:
+            logger.warning("opentelemetry is not installed, tracing disabled")
+            return None
+        try:
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+            if exporter == 'otlp':
+                from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+                span_exporter = OTLPSpanExporter()
+            else:
+                span_exporter = ConsoleSpanExporter()
+        except ImportError as e:
+            logger.warning(f"OpenTelemetry SDK/exporter unavailable ({e}), tracing disabled")
+            return None
+
+        provider = TracerProvider(resource=Resource.create({'service.name': 'banana-slides'}))
+        provider.add_span_processor(BatchSpanProcessor(span_exporter))
+        otel_trace.set_tracer_provider(provider)
+        logger.info(f"Tracing enabled with OpenTelemetry {exporter} exporter")
+        return otel_trace.get_tracer('banana-slides')
+
+    def start_span(self, name: str, **attributes):
+        """创建 span（不会自动设为当前 span，需要时调用 activate/deactivate）"""
+        if self._file_sink is not None:
+            exported = _FileSpan(self._file_sink, name, attributes)
+        elif self._otel_tracer is not None:
+            exported = _OtelSpan(self._otel_tracer, name, attributes)
+        else:
+            exported = _NOOP_SPAN
+        recorder = _span_recorder.get()
+        if recorder is None:
+            return exported
+        return _RecordedSpan(exported, recorder, name, attributes)
+
+
+_tracer = Tracer()
+
+
+def configure_tracing(exporter: str, file_path: Optional[str] = None):
+    """按配置启用追踪（create_app 中调用）"""
+    _tracer.configure(exporter, file_path)
+
+
+def tracing_enabled() -> bool:
+    return _tracer.enabled
+
+
+@contextmanager
+def record_spans(recorder):
+    """
+    在 with 块内（以及经 propagate_context 传递到的线程中）把结束的 span 交给 recorder
+
+    recorder.record_span(name, ancestors, start, end, attributes, error) 中 ancestors 为
+    ((名称, 开始时间), ...)，时间均为 time.perf_counter() 的值
+    """
+    token = _span_recorder.set(recorder)
+    try:
+        yield
+    finally:
+        _span_recorder.reset(token)
+
+
+def current_span_stack() -> Tuple[Tuple[str, float], ...]:
+    """记录器范围内当前已激活的 span"""
+    return _recorded_stack.get()
+
+
+def start_span(name: str, **attributes):
+    """创建 span，由调用方负责 activate/deactivate/end（用于生成器等无法使用 with 的场景）"""
+    return _tracer.start_span(name, **attributes)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    在 with 块内创建并激活一个 span，块内异常会标记到 span 上
+
+    Example:
+        with span('export.pptx', project_id=project_id) as current:
+            current.set_attribute('pages', len(pages))
+    """
+    current = _tracer.start_span(name, **attributes)
+    current.activate()
+    error = None
+    try:
+        yield current
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        current.deactivate()
+        current.end(error)
+
+
+def traced(name: str, attributes: Optional[Callable[..., Dict[str, Any]]] = None):
+    """
+    用 span 包装函数（同步或异步）
+
+    Args:
+        name: span 名
+        attributes: 以被包装函数的参数调用，返回 span 属性
+    """
+    def decorator(fn):
+        def open_span(args, kwargs):
+            return span(name, **(attributes(*args, **kwargs) if attributes else {}))
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with open_span(args, kwargs):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with open_span(args, kwargs):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,491 @@
+"""
+Usage Tracker - 外部调用（文本/图片生成、OCR、修复、文件解析）的用量统计
+
+每次调用记录次数、失败数、耗时直方图和 token 数，按项目和任务归属：
+
+- provider 方法用 @track_usage(category, provider) 装饰（同步、异步和生成器函数均可），
+  响应中的 token 用量通过 record_response_usage / record_tokens 记到当前调用上
+- AIService 方法用 @usage_operation(name) 标注业务操作（如 generate_outline），
+  其中发生的 provider 调用都以该操作名归类；没有标注时，外层被跟踪的调用
+  （如可编辑化的提取器）以 "category:provider" 作为内层调用的操作名
+- 项目和任务归属保存在 contextvars 中：请求中按 URL 的 project_id 设置，
+  后台任务由 TaskManager 设置；自建线程池的任务需要用 propagate_context 包装
+
+统计先在内存中聚合，flush() 时累加到 usage_stats 表（任务结束、查询用量接口时触发，
+另有后台线程按 USAGE_FLUSH_INTERVAL 定期写入）。每次调用同时计入 /metrics 指标，
+启用追踪时还会生成一个 "category.provider" span。
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from services.metrics import observe_provider_call
+from services.tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+# 耗时直方图的桶上界（秒），最后还有一个 +Inf 桶
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_scope: contextvars.ContextVar[Tuple[Optional[str], Optional[str]]] = contextvars.ContextVar(
+    'usage_scope', default=(None, None)
+)
+_operation: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('usage_operation', default=None)
+_current_call: contextvars.ContextVar[Optional['_Call']] = contextvars.ContextVar('usage_call', default=None)
+
+
+@contextmanager
+def usage_scope(project_id: Optional[str] = None, task_id: Optional[str] = None):
+    """
+    在此范围内发生的调用归属到指定项目/任务
+
+    未指定的字段沿用外层范围的值
+    """
+    current_project_id, current_task_id = _scope.get()
+    token = _scope.set((project_id or current_project_id, task_id or current_task_id))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def current_scope() -> Tuple[Optional[str], Optional[str]]:
+    """当前的 (project_id, task_id)"""
+    return _scope.get()
+
+
+def propagate_context(fn: Callable) -> Callable:
+    """
+    把当前 contextvars（用量归属、操作名等）带到线程池中执行的函数
+
+    ThreadPoolExecutor 不会复制调用方的上下文，提交前用它包装：
+        executor.submit(propagate_context(fn), *args)
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # 每次调用使用副本，同一个包装函数可以在多个线程中并发执行
+        return context.copy().run(fn, *args, **kwargs)
+
+    return wrapper
+
+
+def usage_operation(name: str):
+    """
+    标注业务操作名，其中的 provider 调用按该操作名统计（同步、异步和生成器函数均可）
+
+    已经处在某个操作中时沿用外层的操作名（如 edit_image 内部调用 generate_image）
+    """
+    def decorator(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                yield from _with_operation(fn(*args, **kwargs), _operation.get() or name)
+            return generator_wrapper
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                token = _operation.set(_operation.get() or name)
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    _operation.reset(token)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            operation = _operation.get() or name
+            token = _operation.set(operation)
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                _operation.reset(token)
+            # 返回生成器的方法（如流式生成），迭代时同样带上操作名
+            return _with_operation(result, operation) if inspect.isgenerator(result) else result
+        return wrapper
+
+    return decorator
+
+
+def _with_operation(generator, operation: str):
+    """迭代生成器，只在其执行期间设置操作名，不影响消费方"""
+    try:
+        while True:
+            token = _operation.set(operation)
+            try:
+                item = next(generator)
+            except StopIteration:
+                return
+            finally:
+                _operation.reset(token)
+            yield item
+    finally:
+        generator.close()
+
+
+class _Call:
+    """一次被跟踪的调用"""
+
+    def __init__(self, category: str, provider: str, operation: str, model: Optional[str]):
+        self.category = category
+        self.provider = provider
+        self.operation = operation
+        self.model = model
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cached_tokens = 0
+        self.started = time.perf_counter()
+        self._tokens = None
+        project_id, task_id = _scope.get()
+        self.span = start_span(
+            f'{category}.{provider}', operation=operation, model=model, project_id=project_id, task_id=task_id
+        )
+
+    def activate(self):
+        self.span.activate()
+        self._tokens = (
+            _current_call.set(self),
+            _operation.set(_operation.get() or f'{self.category}:{self.provider}')
+        )
+
+    def deactivate(self):
+        call_token, operation_token = self._tokens
+        _operation.reset(operation_token)
+        _current_call.reset(call_token)
+        self.span.deactivate()
+
+    def finish(self, error: bool):
+        get_usage_tracker().record(
+            self.category, self.provider, self.operation,
+            latency=time.perf_counter() - self.started,
+            model=self.model,
+            input_tokens=self.input_tokens,
+            output_tokens=self.output_tokens,
+            cached_tokens=self.cached_tokens,
+            error=error
+        )
+        self.span.set_attribute('input_tokens', self.input_tokens)
+        self.span.set_attribute('output_tokens', self.output_tokens)
+        self.span.end(error)
+
+
+def track_usage(category: str, provider: Union[str, Callable[[Any], str]], model_attr: str = 'model',
+                failed: Optional[Callable[[Any], bool]] = None):
+    """
+    跟踪 provider 方法的调用次数、耗时和 token 用量
+
+    Args:
+        category: 调用类别，如 text / image / ocr / inpaint / parse / caption
+        provider: provider 名称，或根据实例返回名称的函数
+        model_attr: 实例上保存模型名的属性
+        failed: 通过返回值（而不是异常）报告失败的方法，用它判断一次调用是否失败
+    """
+    def decorator(fn):
+        def begin(args) -> _Call:
+            instance = args[0] if args else None
+            name = provider(instance) if callable(provider) else provider
+            model = getattr(instance, model_attr, None)
+            return _Call(category, name, _operation.get() or fn.__name__,
+                         model if isinstance(model, str) else None)
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                call = begin(args)
+                generator = fn(*args, **kwargs)
+                error = False
+                try:
+                    while True:
+                        # 上下文只在生成器执行期间生效，不影响消费方
+                        call.activate()
+                        try:
+                            item = next(generator)
+                        except StopIteration:
+                            return
+                        finally:
+                            call.deactivate()
+                        yield item
+                except GeneratorExit:
+                    raise
+                except BaseException:
+                    error = True
+                    raise
+                finally:
+                    generator.close()
+                    call.finish(error)
+            return generator_wrapper
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                call = begin(args)
+                call.activate()
+                error = False
+                try:
+                    result = await fn(*args, **kwargs)
+                    error = bool(failed and failed(result))
+                    return result
+                except BaseException:
+                    error = True
+                    raise
+                finally:
+                    call.deactivate()
+                    call.finish(error)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            call = begin(args)
+            call.activate()
+            error = False
+            try:
+                result = fn(*args, **kwargs)
+                error = bool(failed and failed(result))
+                return result
+            except BaseException:
+                error = True
+                raise
+            finally:
+                call.deactivate()
+                call.finish(error)
+        return wrapper
+
+    return decorator
+
+
+def record_tokens(input_tokens: int = 0, output_tokens: int = 0, cached_tokens: int = 0):
+    """把 token 用量记到当前被跟踪的调用上（不在跟踪范围内时忽略）"""
+    call = _current_call.get()
+    if call is None:
+        return
+    call.input_tokens += input_tokens or 0
+    call.output_tokens += output_tokens or 0
+    call.cached_tokens += cached_tokens or 0
+
+
+def record_response_usage(response):
+    """
+    从模型响应中读取 token 用量并记到当前调用上
+
+    支持 GenAI（usage_metadata，思考 token 计入输出）和 OpenAI（usage）两种格式
+    """
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is not None:
+        record_tokens(
+            getattr(usage, 'prompt_token_count', None) or 0,
+            (getattr(usage, 'candidates_token_count', None) or 0)
+            + (getattr(usage, 'thoughts_token_count', None) or 0),
+            getattr(usage, 'cached_content_token_count', None) or 0
+        )
+        return
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        details = getattr(usage, 'prompt_tokens_details', None)
+        record_tokens(
+            getattr(usage, 'prompt_tokens', None) or 0,
+            getattr(usage, 'completion_tokens', None) or 0,
+            getattr(details, 'cached_tokens', None) or 0
+        )
+
+
+def _new_entry() -> Dict[str, Any]:
+    return {
+        'calls': 0,
+        'errors': 0,
+        'input_tokens': 0,
+        'output_tokens': 0,
+        'cached_tokens': 0,
+        'total_latency_ms': 0.0,
+        'max_latency_ms': 0.0,
+        'latency_buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+    }
+
+
+def merge_entry(target: Dict[str, Any], entry: Dict[str, Any]):
+    """把一条聚合累加到另一条上"""
+    for field in ('calls', 'errors', 'input_tokens', 'output_tokens', 'cached_tokens', 'total_latency_ms'):
+        target[field] += entry[field]
+    target['max_latency_ms'] = max(target['max_latency_ms'], entry['max_latency_ms'])
+    target['latency_buckets'] = [a + b for a, b in zip(target['latency_buckets'], entry['latency_buckets'])]
+
+
+class UsageTracker:
+    """
+    调用用量的内存聚合，定期累加到数据库
+
+    聚合键为 (project_id, task_id, category, provider, model, operation)
+    """
+
+    KEY_FIELDS = ('project_id', 'task_id', 'category', 'provider', 'model', 'operation')
+
+    def __init__(self):
+        self._pending: Dict[tuple, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._app = None
+        self._flusher: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def init_app(self, app):
+        """绑定 Flask 应用：后台线程 flush 时使用其应用上下文，请求按 URL 中的 project_id 归属"""
+        from flask import g, request
+
+        self._app = app
+
+        @app.before_request
+        def _enter_project_scope():
+            project_id = (request.view_args or {}).get('project_id')
+            if project_id:
+                g.usage_scope_token = _scope.set((project_id, None))
+
+        @app.teardown_request
+        def _exit_project_scope(exc):
+            token = g.pop('usage_scope_token', None)
+            if token is not None:
+                try:
+                    _scope.reset(token)
+                except ValueError:
+                    # 流式响应可能在另一个上下文中结束
+                    pass
+
+        interval = app.config.get('USAGE_FLUSH_INTERVAL', 0)
+        if interval and interval > 0 and self._flusher is None:
+            # 请求中发生的调用（如同步生成大纲）由后台线程定期写入
+            self._flusher = threading.Thread(
+                target=self._flush_periodically, args=(interval,), name='usage-flush', daemon=True
+            )
+            self._flusher.start()
+
+    def _flush_periodically(self, interval: float):
+        while not self._stopped.wait(interval):
+            if self.has_pending():
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.warning(f"Periodic usage flush failed: {e}")
+
+    def record(self, category: str, provider: str, operation: str, latency: float,
+               model: Optional[str] = None, input_tokens: int = 0, output_tokens: int = 0,
+               cached_tokens: int = 0, error: bool = False,
+               project_id: Optional[str] = None, task_id: Optional[str] = None):
+        """
+        记录一次调用
+
+        Args:
+            latency: 耗时（秒）
+            project_id, task_id: 默认取当前 usage_scope
+        """
+        scope_project_id, scope_task_id = _scope.get()
+        key = (project_id or scope_project_id, task_id or scope_task_id, category, provider, model, operation)
+        latency_ms = latency * 1000
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), len(LATENCY_BUCKETS))
+
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                entry = self._pending[key] = _new_entry()
+            entry['calls'] += 1
+            entry['errors'] += 1 if error else 0
+            entry['input_tokens'] += input_tokens
+            entry['output_tokens'] += output_tokens
+            entry['cached_tokens'] += cached_tokens
+            entry['total_latency_ms'] += latency_ms
+            entry['max_latency_ms'] = max(entry['max_latency_ms'], latency_ms)
+            entry['latency_buckets'][bucket] += 1
+
+        observe_provider_call(category, provider, operation, latency, error,
+                              input_tokens, output_tokens, cached_tokens)
+
+    def has_pending(self) -> bool:
+        with self._lock:
+            return bool(self._pending)
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """尚未写入数据库的聚合"""
+        with self._lock:
+            return [
+                {**dict(zip(self.KEY_FIELDS, key)), **entry, 'latency_buckets': list(entry['latency_buckets'])}
+                for key, entry in self._pending.items()
+            ]
+
+    def flush(self) -> int:
+        """
+        把内存中的聚合累加到 usage_stats 表
+
+        使用独立的数据库会话，不会提交调用方会话中的改动；写入失败时聚合保留到下次 flush
+
+        Returns:
+            写入的聚合条数
+        """
+        from flask import has_app_context
+
+        if has_app_context():
+            return self._flush()
+        if self._app is None:
+            return 0
+        with self._app.app_context():
+            return self._flush()
+
+    def _flush(self) -> int:
+        from sqlalchemy.orm import Session
+        from models import db, Task, UsageStat
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            try:
+                with Session(db.engine) as session:
+                    # 后台线程中只知道任务时，按任务补全项目
+                    task_ids = {key[1] for key in pending if key[1] and not key[0]}
+                    task_projects = dict(
+                        session.query(Task.id, Task.project_id).filter(Task.id.in_(task_ids)).all()
+                    ) if task_ids else {}
+
+                    now = datetime.utcnow()
+                    for key, entry in pending.items():
+                        fields = dict(zip(self.KEY_FIELDS, key))
+                        if not fields['project_id'] and fields['task_id']:
+                            fields['project_id'] = task_projects.get(fields['task_id'])
+                        stat = session.query(UsageStat).filter_by(**fields).first()
+                        if stat is None:
+                            stat = UsageStat(**fields)
+                            session.add(stat)
+                        stat.add(entry)
+                        stat.updated_at = now
+                    session.commit()
+            except Exception as e:
+                logger.warning(f"Failed to persist usage stats, keeping them in memory: {e}")
+                with self._lock:
+                    for key, entry in pending.items():
+                        merge_entry(self._pending.setdefault(key, _new_entry()), entry)
+                return 0
+
+            return len(pending)
+
+
+_instance: Optional[UsageTracker] = None
+_instance_lock = threading.Lock()
+
+
+def get_usage_tracker() -> UsageTracker:
+    """获取全局共享的 UsageTracker 实例"""
+    global _instance
+
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = UsageTracker()
+    return _instance
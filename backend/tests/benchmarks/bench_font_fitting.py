@@ -0,0 +1,125 @@
+"""
+字体大小拟合基准测试
+
+对比 PPTXBuilder.calculate_font_size 的旧实现（从 200pt 线性递减、每个字号都用
+ImageFont.getbbox 测量每一行）与新实现（二分查找 + 参考字号下的字符宽度表 + 记忆化）。
+
+语料默认使用合成的 MinerU 文本元素（中英文混排、标题/正文/列表等不同 bbox），
+也可以通过 --content-list 传入真实的 MinerU *_content_list.json。
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from PIL import ImageFont  # noqa: E402
+
+from utils.pptx_builder import PPTXBuilder  # noqa: E402
+
+
+SAMPLE_LINES = [
+    "人工智能驱动的演示文稿生成",
+    "Quarterly revenue grew 23% year over year",
+    "• 降低 40% 的人工排版时间",
+    "• Support for 16:9 and 4:3 aspect ratios",
+    "数据来源：2025 年行业白皮书",
+    "Banana Slides – AI native PPT generator",
+    "第三部分：技术架构与实现细节",
+]
+
+
+def synthetic_corpus(size: int, seed: int = 42):
+    """生成类似 MinerU 输出的文本元素: (bbox, text)"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        n_lines = rng.choice([1, 1, 1, 2, 3, 5])
+        text = '\n'.join(rng.choice(SAMPLE_LINES) for _ in range(n_lines))
+        x0, y0 = rng.randint(0, 1200), rng.randint(0, 900)
+        width = rng.randint(120, 1600)
+        height = rng.randint(24, 60) * n_lines
+        corpus.append(([x0, y0, x0 + width, y0 + height], text))
+    return corpus
+
+
+def content_list_corpus(path: str, slide_width: int = 1920, slide_height: int = 1080):
+    """从 MinerU content_list.json 读取文本元素（bbox 为 0-1000 归一化坐标）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+    corpus = []
+    for item in items:
+        if item.get('type') != 'text' or not item.get('text') or not item.get('bbox'):
+            continue
+        x0, y0, x1, y1 = item['bbox']
+        corpus.append(([x0 * slide_width / 1000, y0 * slide_height / 1000,
+                        x1 * slide_width / 1000, y1 * slide_height / 1000], item['text']))
+    return corpus
+
+
+def legacy_calculate_font_size(bbox, text, font_path, font_cache, dpi=96):
+    """优化前的实现：线性扫描字号，每个字号测量每一行"""
+    usable_width_pt = (bbox[2] - bbox[0]) / dpi * 72
+    usable_height_pt = (bbox[3] - bbox[1]) / dpi * 72
+    for font_size in range(PPTXBuilder.MAX_FONT_SIZE, PPTXBuilder.MIN_FONT_SIZE - 1, -1):
+        total_lines = 0
+        for line in text.split('\n'):
+            if not line:
+                total_lines += 1
+                continue
+            if font_path:
+                font = font_cache.get(font_size)
+                if font is None:
+                    font = font_cache[font_size] = ImageFont.truetype(font_path, font_size)
+                left, _, right, _ = font.getbbox(line)
+                line_width_pt = right - left
+            else:
+                cjk = sum(1 for c in line if '一' <= c <= '鿿' or '぀' <= c <= 'ヿ' or '가' <= c <= '힯')
+                line_width_pt = (cjk + (len(line) - cjk) * 0.5) * font_size
+            total_lines += max(1, -(-int(line_width_pt) // max(1, int(usable_width_pt))))
+        if total_lines * font_size <= usable_height_pt:
+            return float(font_size)
+    return float(PPTXBuilder.MIN_FONT_SIZE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--font', help='字体文件路径（默认使用 PPTXBuilder.FONT_PATH，不存在时使用估算模式）')
+    parser.add_argument('--content-list', help='MinerU *_content_list.json 路径')
+    parser.add_argument('--size', type=int, default=300, help='合成语料的元素数量')
+    parser.add_argument('--repeat', type=int, default=2, help='重复构建次数（模拟多次导出同一套模板）')
+    args = parser.parse_args()
+
+    if args.font:
+        PPTXBuilder.FONT_PATH = args.font
+    font_path = PPTXBuilder.FONT_PATH if os.path.exists(PPTXBuilder.FONT_PATH) else None
+
+    corpus = content_list_corpus(args.content_list) if args.content_list else synthetic_corpus(args.size)
+    print(f"corpus: {len(corpus)} text elements, font: {font_path or 'estimation mode'}")
+
+    legacy_cache = {}
+    start = time.perf_counter()
+    legacy_sizes = [legacy_calculate_font_size(b, t, font_path, legacy_cache)
+                    for _ in range(args.repeat) for b, t in corpus]
+    legacy_time = time.perf_counter() - start
+
+    builder = PPTXBuilder()
+    PPTXBuilder._fit_font_size.cache_clear()
+    start = time.perf_counter()
+    new_sizes = [builder.calculate_font_size(b, t) for _ in range(args.repeat) for b, t in corpus]
+    new_time = time.perf_counter() - start
+
+    diffs = [abs(a - b) for a, b in zip(legacy_sizes, new_sizes)]
+    print(f"legacy linear scan : {legacy_time * 1000:9.1f} ms")
+    print(f"binary + width table: {new_time * 1000:9.1f} ms  ({legacy_time / max(new_time, 1e-9):.1f}x faster)")
+    print(f"size difference    : max {max(diffs):.1f}pt, mean {sum(diffs) / len(diffs):.2f}pt")
+    print(f"fit cache          : {PPTXBuilder._fit_font_size.cache_info()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+图像处理后端基准测试
+
+在同一张合成幻灯片上分别用 Pillow 和 pyvips（如已安装）执行 utils.image_ops 的
+解码、LANCZOS 缩放、裁剪、PNG/JPEG 编码和 base64 编码，输出各后端的平均耗时。
+pillow-simd 是 Pillow 的替换安装，运行时会显示为 pillow-simd 后端。
+
+可以通过 --image 传入真实的幻灯片图片。
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import numpy as np  # noqa: E402
+from PIL import Image, ImageDraw  # noqa: E402
+
+from utils import image_ops  # noqa: E402
+
+
+def synthetic_slide(width: int, height: int, seed: int = 42) -> Image.Image:
+    """渐变背景 + 色块 + 少量噪声的幻灯片，接近生成图片的压缩特性"""
+    rng = np.random.default_rng(seed)
+    xs = np.linspace(0, 1, width, dtype=np.float32)[None, :, None]
+    ys = np.linspace(0, 1, height, dtype=np.float32)[:, None, None]
+    base = 40 + 160 * xs * np.array([1.0, 0.6, 0.3]) + 50 * ys * np.array([0.2, 0.5, 1.0])
+    noise = rng.normal(0, 3, size=(height, width, 3))
+    image = Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8), 'RGB')
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = int(rng.integers(0, width - 300)), int(rng.integers(0, height - 80))
+        draw.rectangle([x, y, x + int(rng.integers(80, 300)), y + int(rng.integers(20, 80))],
+                       fill=tuple(int(v) for v in rng.integers(0, 256, 3)))
+    return image
+
+
+def timed(fn, repeat):
+    fn()  # 预热
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def run_suite(image: Image.Image, repeat: int):
+    png_bytes = image_ops.encode(image, 'PNG')
+    jpeg_bytes = image_ops.encode(image, 'JPEG', quality=95)
+    half = (image.width // 2, image.height // 2)
+    box = (image.width // 4, image.height // 4, image.width * 3 // 4, image.height * 3 // 4)
+    return {
+        'decode png': timed(lambda: image_ops.decode(png_bytes), repeat),
+        'decode jpeg': timed(lambda: image_ops.decode(jpeg_bytes), repeat),
+        'resize 1/2 lanczos': timed(lambda: image_ops.resize(image, half), repeat),
+        'fit_within 2048': timed(lambda: image_ops.fit_within(image, 2048), repeat),
+        'crop center': timed(lambda: image_ops.crop(image, box), repeat),
+        'encode png': timed(lambda: image_ops.encode(image, 'PNG'), repeat),
+        'encode jpeg q95': timed(lambda: image_ops.encode(image, 'JPEG', quality=95), repeat),
+        'base64 jpeg q95': timed(lambda: image_ops.to_base64(image, 'JPEG', quality=95), repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--image', help='幻灯片图片路径（默认使用合成图片）')
+    parser.add_argument('--width', type=int, default=3840)
+    parser.add_argument('--height', type=int, default=2160)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    image = Image.open(args.image).convert('RGB') if args.image else synthetic_slide(args.width, args.height)
+    print(f"image: {image.width}x{image.height}")
+
+    backends = [image_ops.BACKEND_PILLOW]
+    if image_ops.pyvips is not None:
+        backends.append(image_ops.BACKEND_PYVIPS)
+    else:
+        print("pyvips 未安装，只测试 Pillow（pip install pyvips 后可对比）")
+
+    results = {}
+    for backend in backends:
+        image_ops.set_backend(backend)
+        results[image_ops.describe_backend()] = run_suite(image, args.repeat)
+
+    names = list(results)
+    print(f"{'operation':<20}" + ''.join(f"{name:>28}" for name in names))
+    for op in results[names[0]]:
+        row = f"{op:<20}"
+        for name in names:
+            row += f"{results[name][op] * 1000:>25.1f} ms"
+        print(row)
+
+    image_ops.set_backend(None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+掩码生成基准测试
+
+对比 create_mask_from_bboxes 的旧实现（ImageDraw 逐个绘制矩形、逐个输出 bbox 日志）
+与新实现（坐标数组上统一扩展/裁剪 + NumPy 切片填充 + 复用缓冲区），
+以及 visualize_mask_overlay 旧的逐像素循环与向量化版本。
+
+默认使用 4K（3840x2160）画面和数百个文字行大小的 bbox。
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import numpy as np  # noqa: E402
+from PIL import Image, ImageDraw, ImageFilter  # noqa: E402
+
+from utils.mask_utils import create_mask_from_bboxes, dilate_mask, visualize_mask_overlay  # noqa: E402
+
+
+def synthetic_bboxes(count: int, width: int, height: int, seed: int = 42):
+    """生成类似 OCR 文字行的 bbox（部分越界，部分使用字典格式）"""
+    rng = random.Random(seed)
+    bboxes = []
+    for _ in range(count):
+        x1, y1 = rng.randint(-20, width - 40), rng.randint(-20, height - 20)
+        x2, y2 = x1 + rng.randint(40, 900), y1 + rng.randint(16, 90)
+        if rng.random() < 0.2:
+            bboxes.append({'x': x1, 'y': y1, 'width': x2 - x1, 'height': y2 - y1})
+        else:
+            bboxes.append((x1, y1, x2, y2))
+    return bboxes
+
+
+def legacy_create_mask(image_size, bboxes, expand_pixels=0):
+    """优化前的实现：ImageDraw 逐个绘制，并为每个 bbox 格式化一行日志"""
+    mask = Image.new('RGB', image_size, (0, 0, 0))
+    draw = ImageDraw.Draw(mask)
+    log_lines = []
+    for i, bbox in enumerate(bboxes):
+        if isinstance(bbox, dict):
+            x1, y1 = bbox['x'], bbox['y']
+            x2, y2 = x1 + bbox['width'], y1 + bbox['height']
+        else:
+            x1, y1, x2, y2 = bbox
+        if expand_pixels > 0:
+            x1, y1 = max(0, x1 - expand_pixels), max(0, y1 - expand_pixels)
+            x2, y2 = min(image_size[0], x2 + expand_pixels), min(image_size[1], y2 + expand_pixels)
+        x1, y1 = max(0, min(x1, image_size[0])), max(0, min(y1, image_size[1]))
+        x2, y2 = max(0, min(x2, image_size[0])), max(0, min(y2, image_size[1]))
+        if x2 <= x1 or y2 <= y1:
+            continue
+        draw.rectangle([x1, y1, x2, y2], fill=(255, 255, 255))
+        log_lines.append(f"  [{i+1}] ({x1}, {y1}, {x2}, {y2}) 尺寸: {x2 - x1}x{y2 - y1}")
+    return mask
+
+
+def legacy_overlay(original_image, mask_image, alpha=0.5):
+    """优化前的实现：逐像素读取掩码并写入半透明层"""
+    original_rgba = original_image.convert('RGBA')
+    mask_rgba = Image.new('RGBA', original_image.size, (0, 0, 0, 0))
+    mask_array = mask_image.load()
+    mask_rgba_array = mask_rgba.load()
+    for y in range(mask_image.size[1]):
+        for x in range(mask_image.size[0]):
+            pixel = mask_array[x, y]
+            if sum(pixel) / len(pixel) > 200:
+                mask_rgba_array[x, y] = (0, 0, 0, int(128 * alpha))
+    return Image.alpha_composite(original_rgba, mask_rgba).convert('RGB')
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--width', type=int, default=3840)
+    parser.add_argument('--height', type=int, default=2160)
+    parser.add_argument('--boxes', type=int, default=400, help='bbox 数量')
+    parser.add_argument('--expand', type=int, default=10, help='expand_pixels')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--overlay-size', type=int, default=960,
+                        help='可视化叠加对比使用的画面宽度（旧实现为逐像素循环，4K 下需要数十秒）')
+    args = parser.parse_args()
+
+    size = (args.width, args.height)
+    bboxes = synthetic_bboxes(args.boxes, *size)
+    print(f"mask: {size[0]}x{size[1]}, {len(bboxes)} bboxes, expand {args.expand}px")
+
+    legacy_time, legacy_mask = timed(lambda: legacy_create_mask(size, bboxes, args.expand), args.repeat)
+    new_time, new_mask = timed(lambda: create_mask_from_bboxes(size, bboxes, expand_pixels=args.expand),
+                               args.repeat)
+    identical = np.array_equal(np.asarray(legacy_mask), np.asarray(new_mask))
+    print(f"ImageDraw mask      : {legacy_time * 1000:9.1f} ms")
+    print(f"NumPy mask          : {new_time * 1000:9.1f} ms  ({legacy_time / max(new_time, 1e-9):.1f}x faster)"
+          f"  identical={identical}")
+
+    feather = 8
+    blend = np.asarray(new_mask.convert('L'))
+    legacy_time, legacy_dilated = timed(
+        lambda: np.asarray(Image.fromarray(blend).filter(ImageFilter.MaxFilter(2 * feather + 1))), args.repeat)
+    new_time, new_dilated = timed(lambda: dilate_mask(blend, feather), args.repeat)
+    print(f"MaxFilter({2 * feather + 1})        : {legacy_time * 1000:9.1f} ms")
+    print(f"separable dilation  : {new_time * 1000:9.1f} ms  ({legacy_time / max(new_time, 1e-9):.1f}x faster)"
+          f"  identical={np.array_equal(legacy_dilated, new_dilated)}")
+
+    overlay_size = (args.overlay_size, args.overlay_size * args.height // args.width)
+    scale = overlay_size[0] / args.width
+    small_boxes = [b if isinstance(b, tuple) else (b['x'], b['y'], b['x'] + b['width'], b['y'] + b['height'])
+                   for b in bboxes]
+    small_boxes = [tuple(int(v * scale) for v in b) for b in small_boxes]
+    image = Image.new('RGB', overlay_size, (90, 140, 200))
+    mask = create_mask_from_bboxes(overlay_size, small_boxes)
+    legacy_time, legacy_result = timed(lambda: legacy_overlay(image, mask), 1)
+    new_time, new_result = timed(lambda: visualize_mask_overlay(image, mask), args.repeat)
+    print(f"overlay ({overlay_size[0]}x{overlay_size[1]}) loop : {legacy_time * 1000:9.1f} ms")
+    print(f"overlay vectorized  : {new_time * 1000:9.1f} ms  ({legacy_time / max(new_time, 1e-9):.1f}x faster)"
+          f"  identical={np.array_equal(np.asarray(legacy_result), np.asarray(new_result))}")
+
+
+if __name__ == '__main__':
+    main()
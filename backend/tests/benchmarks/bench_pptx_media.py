@@ -0,0 +1,90 @@
+"""
+PPTX 媒体去重基准测试
+
+构造模板化的演示文稿：每页都有相同的背景、Logo，以及若干张按页重新保存的子元素裁剪
+（内容相同、文件不同，其中一半带有轻微的重新编码差异）。分别用 slide.shapes.add_picture
+逐个添加和 PPTXBuilder 的媒体注册表添加，输出构建耗时和文件大小。
+"""
+
+import argparse
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+from pptx.util import Inches  # noqa: E402
+
+from utils.pptx_builder import PPTXBuilder  # noqa: E402
+
+
+def noisy_image(width: int, height: int, seed: int) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8), 'RGB')
+
+
+def make_assets(workdir: Path, pages: int, crops: int, width: int, height: int):
+    """返回每页的 (背景路径, Logo 路径, [裁剪路径])"""
+    background, logo = workdir / 'background.png', workdir / 'logo.png'
+    noisy_image(width, height, 1).save(background, compress_level=1)
+    noisy_image(200, 80, 2).save(logo, compress_level=1)
+
+    crop_images = [noisy_image(320, 180, 10 + i) for i in range(crops)]
+    layout = []
+    for page in range(pages):
+        page_crops = []
+        for i, crop in enumerate(crop_images):
+            path = workdir / f'page{page}_crop{i}.png'
+            if i % 2:
+                # 重新编码产生的 ±1 像素差异
+                jitter = np.random.default_rng(page * 100 + i).integers(-1, 2, size=(180, 320, 3))
+                crop = Image.fromarray(np.clip(np.asarray(crop, dtype=np.int16) + jitter, 0, 255).astype(np.uint8))
+            crop.save(path, compress_level=1)
+            page_crops.append(path)
+        layout.append((background, logo, page_crops))
+    return layout
+
+
+def build(layout, mode: str):
+    builder = PPTXBuilder(merge_similar_images=(mode == 'registry+merge'))
+    builder.create_presentation()
+    for background, logo, crops in layout:
+        slide = builder.add_blank_slide()
+        pictures = [(background, 0, 0, builder.prs.slide_width, builder.prs.slide_height),
+                    (logo, Inches(0.2), Inches(0.2), Inches(1.5), Inches(0.6))]
+        pictures += [(crop, Inches(1 + i % 4 * 2), Inches(1.5 + i // 4 * 1.2), Inches(1.8), Inches(1))
+                     for i, crop in enumerate(crops)]
+        for path, left, top, width, height in pictures:
+            if mode == 'add_picture':
+                slide.shapes.add_picture(str(path), left, top, width, height)
+            else:
+                builder.add_picture(slide, str(path), left, top, width, height)
+    buffer = io.BytesIO()
+    builder.prs.save(buffer)
+    return buffer.getbuffer().nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=30)
+    parser.add_argument('--crops', type=int, default=8)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        layout = make_assets(Path(tmp), args.pages, args.crops, args.width, args.height)
+        print(f"{args.pages} pages x ({args.crops} crops + background + logo), background {args.width}x{args.height}")
+        for mode in ('add_picture', 'registry', 'registry+merge'):
+            start = time.perf_counter()
+            size = build(layout, mode)
+            elapsed = time.perf_counter() - start
+            print(f"{mode:<16}: {elapsed * 1000:8.1f} ms   {size / 1024 / 1024:7.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
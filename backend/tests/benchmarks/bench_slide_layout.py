@@ -0,0 +1,99 @@
+"""
+可编辑 PPTX 文本框排版基准测试
+
+构造多页、每页大量文本元素的 EditableImage，对比串行构建
+（ExportService._add_editable_elements_to_slide）和 SlideRenderer 进程池排版 + 单线程组装的耗时。
+进程池的启动时间单独统计（服务运行时进程池常驻复用）。
+"""
+
+import argparse
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from services.export_service import ExportService  # noqa: E402
+from services.image_editability.data_models import BBox, EditableElement, EditableImage  # noqa: E402
+from services.image_editability.text_attribute_extractors import TextStyleResult  # noqa: E402
+from services.slide_renderer import SlideRenderer  # noqa: E402
+from utils.pptx_builder import PPTXBuilder  # noqa: E402
+
+WORDS = "演示文稿 自动生成 可编辑 文本框 字体 大小 slide layout export quarterly revenue growth".split()
+
+
+def make_pages(pages: int, texts: int, seed: int = 0):
+    rng = random.Random(seed)
+    result, styles = [], {}
+    for page in range(pages):
+        elements = []
+        for i in range(texts):
+            x, y = rng.randint(0, 1500), rng.randint(0, 950)
+            bbox = BBox(x0=x, y0=y, x1=x + rng.randint(120, 420), y1=y + rng.randint(24, 120))
+            element_id = f'p{page}_t{i}'
+            elements.append(EditableElement(
+                element_id=element_id, element_type='title' if i == 0 else 'text', bbox=bbox, bbox_global=bbox,
+                content=' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 24))),
+            ))
+            if i % 3 == 0:
+                styles[element_id] = TextStyleResult(font_color_rgb=(20, 40, 80), is_bold=i % 2 == 0)
+        result.append(EditableImage(image_id=f'page{page}', image_path='', width=1920, height=1080,
+                                    elements=elements))
+    return result, styles
+
+
+def build_serial(pages, styles):
+    builder = PPTXBuilder(merge_similar_images=False)
+    builder.create_presentation()
+    for page in pages:
+        slide = builder.add_blank_slide()
+        ExportService._add_editable_elements_to_slide(builder, slide, page.elements, text_styles_cache=styles)
+
+
+def build_parallel(pages, styles, renderer):
+    builder = PPTXBuilder(merge_similar_images=False)
+    builder.create_presentation()
+    page_operations = [ExportService._plan_editable_elements(page.elements, text_styles_cache=styles)
+                       for page in pages]
+    rendered = iter(renderer.render_text_elements(
+        [op.render_args() for operations in page_operations for op in operations]
+    ))
+    for operations in page_operations:
+        slide = builder.add_blank_slide()
+        slide.shapes.turbo_add_enabled = True
+        ExportService._apply_slide_operations(builder, slide, operations,
+                                              rendered=[next(rendered) for _ in operations])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=30)
+    parser.add_argument('--texts', type=int, default=60, help='每页文本元素数')
+    parser.add_argument('--processes', type=int, nargs='+', default=[2, 4])
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    pages, styles = make_pages(args.pages, args.texts)
+    print(f"{args.pages} pages x {args.texts} text elements")
+
+    PPTXBuilder._fit_font_size.cache_clear()
+    start = time.perf_counter()
+    build_serial(pages, styles)
+    print(f"serial           : {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    for processes in args.processes:
+        renderer = SlideRenderer(max_processes=processes)
+        start = time.perf_counter()
+        renderer.render_text_elements([{'text': 'warm up', 'bbox': [0, 0, 100, 20]}] * renderer.MIN_PARALLEL_ELEMENTS)
+        warmup = time.perf_counter() - start
+        start = time.perf_counter()
+        build_parallel(pages, styles, renderer)
+        elapsed = time.perf_counter() - start
+        renderer.shutdown()
+        print(f"{processes} processes      : {elapsed * 1000:8.1f} ms   (pool start {warmup * 1000:.0f} ms)")
+
+
+if __name__ == '__main__':
+    main()
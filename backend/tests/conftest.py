@@ -157,6 +157,20 @@ def sample_image_file():
     return img_bytes
 
 
+@pytest.fixture
+def gradient_slide():
+    """生成水平线性渐变（灰度 40→200）幻灯片图片的工厂，每次调用返回新的 RGB 图片"""
+    import numpy as np
+    from PIL import Image
+
+    def make(width=800, height=450):
+        xs = np.linspace(40, 200, width, dtype=np.float32)
+        pixels = np.repeat(np.repeat(xs[None, :, None], height, axis=0), 3, axis=2)
+        return Image.fromarray(pixels.astype(np.uint8), 'RGB')
+
+    return make
+
+
 # =====================================
 # 测试工具函数
 # =====================================
@@ -0,0 +1,69 @@
+"""
+AsyncPoller 单元测试
+
+验证退避轮询、暂时性错误重试和超时行为
+"""
+
+import pytest
+
+from services.async_poller import AsyncPoller, BackoffPolicy, PollTimeoutError
+
+
+FAST_POLICY = BackoffPolicy(initial_interval=0.01, max_interval=0.05, multiplier=2, jitter=0)
+
+
+@pytest.fixture
+def poller():
+    p = AsyncPoller(max_check_workers=2)
+    yield p
+    p.shutdown()
+
+
+class TestBackoffPolicy:
+    """退避策略测试"""
+
+    def test_intervals_grow_and_cap(self):
+        policy = BackoffPolicy(initial_interval=1, max_interval=5, multiplier=2, jitter=0)
+        gen = policy.intervals()
+        assert [next(gen) for _ in range(5)] == [1, 2, 4, 5, 5]
+
+
+class TestAsyncPoller:
+    """轮询器测试"""
+
+    def test_returns_value_when_done(self, poller):
+        calls = []
+
+        def check():
+            calls.append(1)
+            return len(calls) >= 3, 'result'
+
+        assert poller.wait(check, timeout=5, policy=FAST_POLICY) == 'result'
+        assert len(calls) == 3
+
+    def test_retries_transient_errors(self, poller):
+        calls = []
+
+        def check():
+            calls.append(1)
+            if len(calls) < 2:
+                raise ConnectionError('flaky')
+            return True, 42
+
+        assert poller.wait(check, timeout=5, policy=FAST_POLICY, retry_on=(ConnectionError,)) == 42
+
+    def test_propagates_other_errors(self, poller):
+        def check():
+            raise ValueError('boom')
+
+        with pytest.raises(ValueError):
+            poller.wait(check, timeout=5, policy=FAST_POLICY)
+
+    def test_timeout(self, poller):
+        with pytest.raises(PollTimeoutError):
+            poller.wait(lambda: (False, None), timeout=0.1, policy=FAST_POLICY)
+        assert poller.pending_count == 0
+
+    def test_many_jobs_share_one_loop(self, poller):
+        futures = [poller.submit(lambda i=i: (True, i), timeout=5, policy=FAST_POLICY) for i in range(50)]
+        assert sorted(f.result() for f in futures) == list(range(50))
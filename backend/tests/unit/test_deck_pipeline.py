@@ -0,0 +1,127 @@
+"""
+流水线整套生成单元测试
+
+验证任务事件的回放与推送，以及 generate_deck_task 中每页独立经过大纲、描述、图片三个阶段
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+from PIL import Image
+
+from services.task_events import TaskEventBroker
+
+
+class TestTaskEventBroker:
+    """任务事件发布/订阅测试"""
+
+    def test_replays_history_and_stops_on_close(self):
+        broker = TaskEventBroker()
+        broker.publish('t1', 'page', {'index': 0})
+
+        received = []
+        subscriber = threading.Thread(target=lambda: received.extend(broker.subscribe('t1', timeout=5)))
+        subscriber.start()
+        time.sleep(0.05)
+        broker.publish('t1', 'page', {'index': 1})
+        broker.close('t1')
+        subscriber.join(timeout=5)
+
+        assert received == [('page', {'index': 0}), ('page', {'index': 1})]
+        # 任务结束后订阅只回放历史
+        assert list(broker.subscribe('t1')) == received
+        assert list(broker.subscribe('unknown')) == []
+
+    def test_closed_topics_expire(self):
+        broker = TaskEventBroker(max_closed=2)
+        for task_id in ('a', 'b', 'c'):
+            broker.publish(task_id, 'done', {})
+            broker.close(task_id)
+
+        assert not broker.has_events('a')
+        assert broker.has_events('c')
+
+
+class _FakeDeckAIService:
+    """流式大纲逐页缓慢返回，描述与图片很快完成"""
+
+    PAGES = [{'title': f'p{i}', 'points': []} for i in range(4)]
+
+    def generate_outline_stream(self, project_context, language=None):
+        for i, page in enumerate(self.PAGES):
+            time.sleep(0.15)
+            yield {'type': 'page', 'index': i, 'page': page}
+        yield {'type': 'outline', 'outline': self.PAGES}
+
+    async def agenerate_page_description(self, project_context, outline, page_outline, page_index, language='zh'):
+        await asyncio.sleep(0.01)
+        if page_outline['title'] == 'p3':
+            raise ValueError('quota exceeded')
+        return f"desc {page_outline['title']} ({len(outline)} pages known)"
+
+    def extract_image_urls_from_markdown(self, text):
+        return []
+
+    def generate_image_prompt(self, outline, page, desc_text, page_index, **kwargs):
+        return desc_text
+
+    async def agenerate_image(self, prompt, ref_image_path=None, **kwargs):
+        await asyncio.sleep(0.01)
+        return Image.new('RGB', (16, 9), 'white')
+
+
+class _FakeFileService:
+    def get_template_path(self, project_id):
+        return None
+
+    def save_generated_image_async(self, image, project_id, page_id, image_format=None, version_number=None):
+        future = Future()
+        future.set_result(None)
+        return f'{project_id}/pages/{page_id}_v{version_number}.png', future
+
+
+def test_generate_deck_task_pipelines_each_page(app):
+    from models import db, Page, Project, Task
+    from services.ai_service import ProjectContext
+    from services.task_manager import generate_deck_task
+    from services.task_events import get_task_event_broker
+
+    with app.app_context():
+        project = Project(creation_type='idea', idea_prompt='deck')
+        db.session.add(project)
+        db.session.flush()
+        task = Task(project_id=project.id, task_type='GENERATE_DECK')
+        db.session.add(task)
+        db.session.commit()
+        project_id, task_id = project.id, task.id
+        project_context = ProjectContext(project)
+
+    generate_deck_task(
+        task_id, project_id, _FakeDeckAIService(), _FakeFileService(), project_context,
+        use_template=False, description_workers=2, image_workers=2, app=app
+    )
+
+    events = list(get_task_event_broker().subscribe(task_id))
+    names = [name for name, _ in events]
+    stages = {}
+    for name, data in events:
+        if name == 'page':
+            stages.setdefault(data['page']['outline_content']['title'], []).append(data['stage'])
+
+    assert stages['p0'] == ['outline', 'description', 'image', 'completed']
+    assert stages['p3'] == ['outline', 'description']
+    # 第一页在大纲生成完之前就已经完成了图片
+    first_done = next(i for i, (name, data) in enumerate(events)
+                      if name == 'page' and data['stage'] == 'completed')
+    assert first_done < names.index('outline')
+    assert names[-1] == 'done'
+
+    with app.app_context():
+        pages = Page.query.filter_by(project_id=project_id).order_by(Page.order_index).all()
+        assert [p.status for p in pages] == ['COMPLETED'] * 3 + ['FAILED']
+        assert pages[0].get_description_content()['text'] == 'desc p0 (1 pages known)'
+        task = Task.query.get(task_id)
+        assert task.status == 'COMPLETED'
+        assert task.get_progress() == {'total': 4, 'completed': 3, 'failed': 1, 'described': 3}
@@ -0,0 +1,163 @@
+"""
+流水线描述生成单元测试
+
+验证投机描述任务的并发上限与丢弃、SSE 流水线接口，以及大纲被修改后的结果核对
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from services.ai_providers.text.base import TextProvider
+from services.ai_service import AIService
+from services.description_pipeline import DescriptionPipeline, outline_signature
+from services.generation_executor import GenerationExecutor
+
+OUTLINE = [
+    {'part': '开场', 'pages': [
+        {'title': '封面', 'points': ['标题']},
+        {'title': '目录', 'points': []},
+    ]},
+    {'title': '总结', 'points': ['谢谢']},
+]
+
+
+@pytest.fixture
+def executor():
+    e = GenerationExecutor(max_in_flight=16, blocking_workers=2)
+    yield e
+    e.shutdown()
+
+
+class _PipelineTextProvider(TextProvider):
+    """流式返回预设大纲；非流式调用返回页面描述"""
+
+    def generate_text(self, prompt, thinking_budget=1000):
+        return '页面描述'
+
+    def generate_text_stream(self, prompt, thinking_budget=1000):
+        text = json.dumps(OUTLINE, ensure_ascii=False)
+        for i in range(0, len(text), 7):
+            yield text[i:i + 7]
+
+
+def _sse_messages(response):
+    return [
+        (block.split('\n')[0][len('event: '):], json.loads(block.split('\n')[1][len('data: '):]))
+        for block in response.get_data(as_text=True).strip().split('\n\n')
+    ]
+
+
+class TestDescriptionPipeline:
+    """投机描述任务登记测试"""
+
+    def test_limit_and_shared_signature(self, executor):
+        pipeline = DescriptionPipeline(executor)
+        running = {'current': 0, 'peak': 0}
+
+        async def describe(title):
+            running['current'] += 1
+            running['peak'] = max(running['peak'], running['current'])
+            await asyncio.sleep(0.02)
+            running['current'] -= 1
+            return f'desc {title}'
+
+        futures = [
+            pipeline.start('p1', {'title': f't{i}', 'points': []}, lambda i=i: describe(f't{i}'), limit=2)
+            for i in range(6)
+        ]
+        # 签名相同的页面共享同一个任务
+        assert pipeline.start('p1', {'title': 't0'}, lambda: describe('dup'), limit=2) is futures[0]
+
+        assert [f.result(timeout=5) for f in futures] == [f'desc t{i}' for i in range(6)]
+        assert running['peak'] == 2
+        assert pipeline.take('p1', {'title': 't3', 'points': []}) is futures[3]
+        assert pipeline.take('p1', {'title': 't3', 'points': []}) is None
+
+    def test_discard_cancels_queued_jobs(self, executor):
+        pipeline = DescriptionPipeline(executor)
+        gate = asyncio.Event()
+
+        async def blocked():
+            await gate.wait()
+            return 'late'
+
+        first = pipeline.start('p1', {'title': 'a'}, blocked, limit=1)
+        queued = pipeline.start('p1', {'title': 'b'}, blocked, limit=1)
+
+        assert pipeline.discard('p1', keep={outline_signature({'title': 'a'})}) == 1
+        assert queued.cancelled()
+        assert pipeline.pending_count('p1') == 1
+
+        executor._loop.call_soon_threadsafe(gate.set)
+        assert first.result(timeout=5) == 'late'
+
+    def test_unused_finished_jobs_are_evicted(self, executor):
+        pipeline = DescriptionPipeline(executor, result_ttl=0)
+        gate = asyncio.Event()
+
+        async def done():
+            return 'desc'
+
+        async def blocked():
+            await gate.wait()
+            return 'late'
+
+        finished = pipeline.start('p1', {'title': 'a'}, done)
+        assert finished.result(timeout=5) == 'desc'
+        running = pipeline.start('p2', {'title': 'b'}, blocked)
+
+        # 下次登记时清理超过保留时间的已完成任务，未完成的任务保留
+        pipeline.start('p2', {'title': 'c'}, done).result(timeout=5)
+        assert pipeline.take('p1', {'title': 'a'}) is None
+        assert 'p1' not in pipeline._jobs
+        assert pipeline.pending_count('p2') == 1
+
+        executor._loop.call_soon_threadsafe(gate.set)
+        assert running.result(timeout=5) == 'late'
+
+
+def test_generate_outline_pipelines_descriptions(client, sample_project, monkeypatch):
+    service = AIService(text_provider=_PipelineTextProvider(), image_provider=object())
+    monkeypatch.setattr('controllers.project_controller.get_ai_service', lambda: service)
+
+    response = client.post(
+        f"/api/projects/{sample_project['project_id']}/generate/outline",
+        json={'pipeline_descriptions': True}, headers={'Accept': 'text/event-stream'}
+    )
+
+    messages = _sse_messages(response)
+    names = [name for name, _ in messages]
+    assert names.index('outline_saved') < names.index('description')
+    assert names.count('description') == 3
+    assert names[-1] == 'done'
+    assert [p['description_content']['text'] for p in messages[-1][1]['pages']] == ['页面描述'] * 3
+
+    project = client.get(f"/api/projects/{sample_project['project_id']}").get_json()['data']
+    assert project['status'] == 'DESCRIPTIONS_GENERATED'
+
+
+def test_stale_description_is_discarded(app):
+    from controllers.project_controller import _apply_speculative_description
+    from models import db, Page, Project
+
+    with app.app_context():
+        project = Project(creation_type='idea', idea_prompt='pipeline')
+        db.session.add(project)
+        db.session.flush()
+        page = Page(project_id=project.id, order_index=0)
+        page.set_outline_content({'title': '封面', 'points': ['标题']})
+        db.session.add(page)
+        db.session.commit()
+        signature = outline_signature({'title': '封面', 'points': ['标题']})
+
+        # 用户在描述生成期间修改了标题
+        page.set_outline_content({'title': '新封面', 'points': ['标题']})
+        db.session.commit()
+        assert _apply_speculative_description(project.id, signature, '旧描述') == []
+
+        updated = _apply_speculative_description(
+            project.id, outline_signature({'title': '新封面', 'points': ['标题']}), '新描述'
+        )
+        assert [p.get_description_content()['text'] for p in updated] == ['新描述']
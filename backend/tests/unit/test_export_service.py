@@ -0,0 +1,157 @@
+"""
+ExportService 单元测试
+
+验证文本样式的分层提取策略（不调用真实模型）
+"""
+
+from services.export_service import ExportService, ExportWarnings
+from services.image_editability.data_models import BBox, EditableElement, EditableImage
+from services.image_editability.text_attribute_extractors import TextStyleResult
+
+
+class FakeExtractor:
+    """记录调用次数的假提取器：批量调用只返回部分元素，其中一个颜色缺失"""
+
+    def __init__(self):
+        self.batch_calls = []
+        self.single_calls = []
+
+    def extract_batch_with_full_image(self, full_image, text_elements, **kwargs):
+        self.batch_calls.append([e['element_id'] for e in text_elements])
+        results = {}
+        for elem in text_elements:
+            eid = elem['element_id']
+            if eid == 'missing':
+                continue
+            results[eid] = TextStyleResult(
+                font_color_rgb=(10, 20, 30),
+                is_bold=True,
+                confidence=0.3 if eid == 'low' else 0.9,
+            )
+        return results
+
+    def extract(self, image, text_content=None, **kwargs):
+        self.single_calls.append(text_content)
+        return TextStyleResult(font_color_rgb=(255, 0, 0), confidence=0.9)
+
+
+def _make_page(tmp_path, element_ids):
+    elements = []
+    for i, eid in enumerate(element_ids):
+        crop = tmp_path / f'{eid}.png'
+        crop.write_bytes(b'png')
+        bbox = BBox(x0=0, y0=i * 10, x1=100, y1=i * 10 + 8)
+        elements.append(EditableElement(
+            element_id=eid, element_type='text', bbox=bbox, bbox_global=bbox,
+            content=f'text {eid}', image_path=str(crop),
+        ))
+    return EditableImage(image_id='page', image_path=str(tmp_path / 'page.png'),
+                         width=100, height=100, elements=elements)
+
+
+class TestTieredTextStyleExtraction:
+    """分层样式提取测试"""
+
+    def test_falls_back_only_for_missing_or_low_confidence(self, tmp_path):
+        ids = ['a', 'b', 'low', 'missing', 'c']
+        page = _make_page(tmp_path, ids)
+        extractor = FakeExtractor()
+        warnings = ExportWarnings()
+
+        results, failed = ExportService._batch_extract_text_styles_hybrid(
+            editable_images=[page],
+            text_attribute_extractor=extractor,
+            max_workers=2,
+            batch_size=2,
+            warnings=warnings,
+        )
+
+        assert sorted(results) == sorted(ids)
+        assert failed == []
+        assert [len(c) for c in extractor.batch_calls] == [2, 2, 1]
+        assert sorted(extractor.single_calls) == ['text low', 'text missing']
+
+        # 低置信度：颜色来自裁剪识别，布局来自批量识别
+        assert results['low'].font_color_rgb == (255, 0, 0)
+        assert results['low'].is_bold is True
+        assert results['a'].font_color_rgb == (10, 20, 30)
+
+        assert warnings.style_extraction_calls == {'baseline': 6, 'batch': 3, 'fallback': 2, 'total': 5}
+        assert not warnings.has_warnings()
+
+
+class TestParallelSlideConstruction:
+    """文本框并行排版测试"""
+
+    def test_rendered_slide_matches_serial_build(self, tmp_path):
+        from lxml import etree
+
+        from services.slide_renderer import SlideRenderer
+        from utils.pptx_builder import PPTXBuilder
+
+        page = _make_page(tmp_path, ['a', 'b', 'c'])
+        page.elements[0].element_type = 'title'
+        styles = {'b': TextStyleResult(font_color_rgb=(10, 20, 30), is_bold=True)}
+        builder = PPTXBuilder(merge_similar_images=False)
+        builder.create_presentation()
+
+        serial = builder.add_blank_slide()
+        ExportService._add_editable_elements_to_slide(builder, serial, page.elements, text_styles_cache=styles)
+
+        renderer = SlideRenderer(max_processes=2)
+        renderer.MIN_PARALLEL_ELEMENTS = 0
+        try:
+            operations = ExportService._plan_editable_elements(page.elements, text_styles_cache=styles)
+            rendered = renderer.render_text_elements([op.render_args() for op in operations])
+        finally:
+            renderer.shutdown()
+        parallel = builder.add_blank_slide()
+        ExportService._apply_slide_operations(builder, parallel, operations, rendered=rendered)
+
+        assert [op.kind for op in operations] == ['text', 'text', 'text']
+        assert etree.tostring(parallel.shapes._spTree) == etree.tostring(serial.shapes._spTree)
+
+    def test_shape_xml_fallback_matches_private_api(self, tmp_path, monkeypatch):
+        from lxml import etree
+        from PIL import Image
+
+        from utils import pptx_builder
+        from utils.pptx_builder import PPTXBuilder
+
+        background = tmp_path / 'bg.png'
+        Image.new('RGB', (16, 9)).save(background)
+        xml = PPTXBuilder.render_text_element_xml('标题 Title', [10, 10, 400, 60])
+        builder = PPTXBuilder(merge_similar_images=False)
+        builder.create_presentation()
+
+        slides = []
+        for private_api in (True, False):
+            monkeypatch.setattr(pptx_builder, '_HAS_SHAPE_XML_API', private_api)
+            slide = builder.add_blank_slide()
+            builder.add_background_image(slide, str(background))
+            shapes = [builder.add_shape_xml(slide, xml) for _ in range(2)]
+            assert [shape.shape_id for shape in shapes] == [3, 4]
+            slides.append(etree.tostring(slide.shapes.element))
+
+        assert slides[0] == slides[1]
+
+    def test_spawned_workers_do_not_build_the_app(self):
+        """spawn 子进程会以 __mp_main__ 重新导入入口模块（python app.py 启动时即 app.py）"""
+        import subprocess
+        import sys
+        from pathlib import Path
+
+        backend_dir = Path(__file__).resolve().parents[2]
+        script = (
+            "import __main__, multiprocessing\n"
+            "from concurrent.futures import ProcessPoolExecutor\n"
+            "__main__.__file__ = 'app.py'\n"
+            "check = \"any(type(o).__name__ == 'Flask' for o in __import__('gc').get_objects())\"\n"
+            "with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:\n"
+            "    print(pool.submit(eval, check).result())\n"
+        )
+        result = subprocess.run([sys.executable, '-c', script], cwd=backend_dir, capture_output=True,
+                                text=True, timeout=120)
+
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip().splitlines()[-1] == 'False'
@@ -0,0 +1,234 @@
+"""
+FileParserService 单元测试
+
+验证 MinerU 结果 ZIP 的选择性解压（不调用真实 MinerU 服务）
+"""
+
+import io
+import zipfile
+
+import pytest
+
+from services.file_parser_service import FileParserService
+
+
+@pytest.fixture
+def parser(tmp_path):
+    return FileParserService(mineru_token='mock-token', upload_folder=str(tmp_path))
+
+
+def _make_zip(files: dict) -> zipfile.ZipFile:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as z:
+        for name, data in files.items():
+            z.writestr(name, data)
+    buf.seek(0)
+    return zipfile.ZipFile(buf)
+
+
+class TestResultZipExtraction:
+    """MinerU 结果解压测试"""
+
+    def test_extracts_only_referenced_images(self, parser, tmp_path):
+        z = _make_zip({
+            'full.md': '# 标题\n![](images/used.jpg)\n<img src="images/table.png">',
+            'layout.json': '{"pdf_info": [{"image_path": "layout_img.jpg"}]}',
+            'images/used.jpg': b'1',
+            'images/table.png': b'2',
+            'images/layout_img.jpg': b'3',
+            'images/unused.jpg': b'4',
+        })
+
+        md_path, md_content = parser._extract_result_zip(z, 'abc12345')
+
+        root = tmp_path / 'mineru_files' / 'abc12345'
+        assert md_path == 'full.md'
+        assert md_content.startswith('# 标题')
+        assert (root / 'layout.json').exists()
+        assert sorted(p.name for p in (root / 'images').iterdir()) == ['layout_img.jpg', 'table.png', 'used.jpg']
+
+    def test_rejects_path_traversal(self, parser, tmp_path):
+        z = _make_zip({'full.md': 'text', '../escape.txt': 'x'})
+
+        parser._extract_result_zip(z, 'abc12345')
+
+        assert not (tmp_path / 'mineru_files' / 'escape.txt').exists()
+
+
+class TestParseResultCache:
+    """内容哈希解析缓存测试"""
+
+    def test_identical_file_resolves_from_cache(self, client, tmp_path, monkeypatch):
+        from models import db, ParsedFileCache
+
+        pdf = tmp_path / 'brand.pdf'
+        pdf.write_bytes(b'%PDF-1.4 brand guidelines')
+        (tmp_path / 'mineru_files' / 'ext00001').mkdir(parents=True)
+
+        parser = FileParserService(mineru_token='mock-token', upload_folder=str(tmp_path))
+        content_hash = parser.compute_content_hash(str(pdf))
+        db.session.add(ParsedFileCache(content_hash=content_hash, extract_id='ext00001',
+                                       mineru_batch_id='batch-1', markdown_content='# cached'))
+        db.session.commit()
+
+        def fail_upload(*args, **kwargs):
+            raise AssertionError('MinerU should not be called on a cache hit')
+        monkeypatch.setattr(parser, '_get_upload_url', fail_upload)
+
+        assert parser.parse_file(str(pdf), 'brand.pdf') == ('batch-1', '# cached', 'ext00001', None, 0)
+
+    def test_release_returns_extract_id_when_unreferenced(self, client):
+        from models import db, ParsedFileCache
+
+        db.session.add(ParsedFileCache(content_hash='a' * 64, extract_id='ext00002', markdown_content='x'))
+        db.session.commit()
+
+        ParsedFileCache.acquire('a' * 64)
+        ParsedFileCache.acquire('a' * 64)
+        assert ParsedFileCache.release('a' * 64) is None
+        assert ParsedFileCache.release('a' * 64) == 'ext00002'
+        db.session.commit()
+        assert ParsedFileCache.query.get('a' * 64) is None
+
+    def test_release_only_deletes_once(self, client):
+        from models import db, ParsedFileCache
+
+        db.session.add(ParsedFileCache(content_hash='b' * 64, extract_id='ext00004', markdown_content='x'))
+        db.session.commit()
+
+        ParsedFileCache.acquire('b' * 64)
+        db.session.commit()
+        assert ParsedFileCache.release('b' * 64) == 'ext00004'
+        # 重复释放（例如并发删除同一参考文件）不会再次返回提取目录
+        assert ParsedFileCache.release('b' * 64) is None
+        assert ParsedFileCache.acquire('b' * 64) is None
+        db.session.commit()
+
+    def test_async_parse_returns_before_mineru_finishes(self, client, tmp_path, monkeypatch):
+        import threading
+        from concurrent.futures import Future
+
+        pdf = tmp_path / 'deck.pdf'
+        pdf.write_bytes(b'%PDF-1.4 deck')
+        (tmp_path / 'mineru_files' / 'ext00003').mkdir(parents=True)
+        parser = FileParserService(mineru_token='mock-token', upload_folder=str(tmp_path))
+        monkeypatch.setattr(parser, '_get_upload_url', lambda filename: ('batch-2', 'http://upload', None))
+        monkeypatch.setattr(parser, '_upload_file', lambda file_path, upload_url: None)
+        monkeypatch.setattr(parser, '_download_markdown', lambda zip_url: ('# parsed', 'ext00003', None))
+        poll = Future()
+        monkeypatch.setattr(parser, '_start_polling', lambda batch_id, max_wait_time: poll)
+
+        result = parser.parse_file_async(str(pdf), 'deck.pdf')
+        assert not result.done()
+
+        # 轮询在其他线程结束后，剩余步骤在后台完成并写入解析缓存
+        threading.Thread(target=poll.set_result, args=(('http://zip', None),)).start()
+        assert result.result(timeout=10) == ('batch-2', '# parsed', 'ext00003', None, 0)
+        assert parser._lookup_parse_cache(parser.compute_content_hash(str(pdf)))[2] == 'ext00003'
+
+    @pytest.mark.parametrize('use_async', [False, True])
+    def test_mineru_poll_usage_recorded_once(self, client, tmp_path, monkeypatch, use_async):
+        import uuid
+        from concurrent.futures import Future
+        from services.usage_tracker import get_usage_tracker, usage_scope
+
+        pdf = tmp_path / 'deck.pdf'
+        pdf.write_bytes(b'%PDF-1.4 ' + uuid.uuid4().bytes)
+        (tmp_path / 'mineru_files' / 'ext00005').mkdir(parents=True)
+        parser = FileParserService(mineru_token='mock-token', upload_folder=str(tmp_path))
+        monkeypatch.setattr(parser, '_get_upload_url', lambda filename: ('batch-3', 'http://upload', None))
+        monkeypatch.setattr(parser, '_upload_file', lambda file_path, upload_url: None)
+        monkeypatch.setattr(parser, '_download_markdown', lambda zip_url: ('# parsed', 'ext00005', None))
+        poll = Future()
+        poll.set_result(('http://zip', None))
+        monkeypatch.setattr(parser, '_start_polling', lambda batch_id, max_wait_time: poll)
+
+        project_id = str(uuid.uuid4())
+        with usage_scope(project_id=project_id):
+            if use_async:
+                parser.parse_file_async(str(pdf), 'deck.pdf').result(timeout=10)
+            else:
+                parser.parse_file(str(pdf), 'deck.pdf')
+
+        # 同步与异步解析都只记录一次 MinerU 轮询
+        calls = [item['calls'] for item in get_usage_tracker().pending()
+                 if item['project_id'] == project_id and item['category'] == 'parse']
+        assert calls == [1]
+
+
+class TestImageCaptioning:
+    """图片描述去重与批量生成测试"""
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        from services.file_parser_service import caption_cache
+        caption_cache.clear()
+        yield
+        caption_cache.clear()
+
+    def test_duplicate_images_captioned_once_with_batch_fallback(self, tmp_path, monkeypatch):
+        from PIL import Image
+
+        parser = FileParserService(mineru_token='mock-token', upload_folder=str(tmp_path), caption_batch_size=4)
+        logo = Image.new('RGB', (64, 64), 'red')
+        logo.paste(Image.new('RGB', (32, 64), 'white'), (32, 0))
+        photo = Image.new('RGB', (64, 64), 'blue')
+        photo.paste(Image.new('RGB', (64, 32), 'yellow'), (0, 32))
+        images = {'/logo1': logo, '/logo2': logo.copy(), '/photo': photo}
+        monkeypatch.setattr(parser, '_load_caption_image', lambda url: images.get(url))
+
+        batch_calls = []
+        single_calls = []
+
+        def fake_batch(batch_images):
+            batch_calls.append(len(batch_images))
+            return ['公司标志', '']  # second image missing -> per-image fallback
+
+        def fake_single(image):
+            single_calls.append(image)
+            return '风景照片'
+
+        monkeypatch.setattr(parser, '_generate_batch_captions', fake_batch)
+        monkeypatch.setattr(parser, '_caption_image', fake_single)
+
+        captions, failed = parser._generate_captions_parallel(['/logo1', '/photo', '/logo2', '/missing'])
+
+        assert captions == ['公司标志', '风景照片', '公司标志', '']
+        assert failed == 1
+        assert batch_calls == [2]
+        assert len(single_calls) == 1
+
+        # Second document with the same images resolves entirely from cache
+        monkeypatch.setattr(parser, '_generate_batch_captions', lambda imgs: pytest.fail('cache miss'))
+        captions, failed = parser._generate_captions_parallel(['/photo', '/logo1'])
+        assert captions == ['风景照片', '公司标志']
+        assert failed == 0
+
+    def test_parse_indexed_captions(self):
+        from services.file_parser_service import parse_indexed_captions
+
+        text = '```json\n[{"index": 2, "caption": "图表"}, {"index": 1, "caption": "标志"}, {"index": 9, "caption": "x"}]\n```'
+        assert parse_indexed_captions(text, 3) == ['标志', '图表', '']
+        assert parse_indexed_captions('not json', 2) == ['', '']
+
+    def test_cache_does_not_share_captions_across_lookalike_images(self, tmp_path, monkeypatch):
+        from PIL import Image
+        from services.file_parser_service import perceptual_hash
+
+        parser = FileParserService(mineru_token='mock-token', upload_folder=str(tmp_path))
+        logo = Image.new('RGB', (64, 64), 'red')
+        logo.paste(Image.new('RGB', (32, 64), 'white'), (32, 0))
+        # 另一份文档里的不同图片，dHash 相同但像素不同
+        other = Image.new('RGB', (64, 64), (200, 0, 0))
+        other.paste(Image.new('RGB', (32, 64), (240, 240, 240)), (32, 0))
+        assert perceptual_hash(logo) == perceptual_hash(other)
+        images = {'/a/logo': logo, '/b/other': other, '/b/logo': logo.copy()}
+        monkeypatch.setattr(parser, '_load_caption_image', lambda url: images.get(url))
+
+        monkeypatch.setattr(parser, '_caption_image', lambda image: '甲公司标志')
+        assert parser._generate_captions_parallel(['/a/logo']) == (['甲公司标志'], 0)
+
+        monkeypatch.setattr(parser, '_caption_image', lambda image: '乙公司标志')
+        assert parser._generate_captions_parallel(['/b/other']) == (['乙公司标志'], 0)
+        # 像素完全相同的图片仍然命中缓存
+        assert parser._generate_captions_parallel(['/b/logo']) == (['甲公司标志'], 0)
@@ -0,0 +1,170 @@
+"""
+GenerationExecutor 单元测试
+
+验证异步调用的并发上限、按完成顺序的批量处理，以及 provider 默认异步接口
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+from PIL import Image
+
+from services.ai_providers.text.base import TextProvider
+from services.generation_executor import GenerationExecutor
+
+
+@pytest.fixture
+def executor():
+    e = GenerationExecutor(max_in_flight=64, blocking_workers=2)
+    yield e
+    e.shutdown()
+
+
+class _Tracker:
+    """记录同时在途的协程数"""
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+
+    async def call(self, value, delay=0.05):
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+        try:
+            await asyncio.sleep(delay)
+            return value * 2
+        finally:
+            self.current -= 1
+
+
+class _SyncOnlyProvider(TextProvider):
+    def generate_text(self, prompt, thinking_budget=1000):
+        return f"{prompt}:{threading.current_thread().name}"
+
+
+class TestGenerationExecutor:
+    """生成执行器测试"""
+
+    def test_many_calls_in_flight_on_one_thread(self, executor):
+        tracker = _Tracker()
+        threads_before = threading.active_count()
+
+        start = time.monotonic()
+        futures = [executor.submit(tracker.call, i) for i in range(60)]
+        results = [f.result(timeout=5) for f in futures]
+
+        assert results == [i * 2 for i in range(60)]
+        assert tracker.peak == 60
+        assert time.monotonic() - start < 1.0
+        assert threading.active_count() == threads_before
+        assert executor.in_flight_count == 0
+
+    def test_global_in_flight_limit(self):
+        executor = GenerationExecutor(max_in_flight=4, blocking_workers=1)
+        try:
+            tracker = _Tracker()
+            futures = [executor.submit(tracker.call, i, delay=0.01) for i in range(20)]
+            assert [f.result(timeout=5) for f in futures] == [i * 2 for i in range(20)]
+            assert tracker.peak == 4
+        finally:
+            executor.shutdown()
+
+    def test_map_unordered_limits_batch_and_consumes_lazily(self, executor):
+        tracker = _Tracker()
+        prepared = []
+
+        def items():
+            for i in range(10):
+                prepared.append(i)
+                # 准备下一项时，在途调用数不超过 limit
+                assert tracker.current <= 3
+                yield i
+
+        results = {
+            item: future.result()
+            for item, future in executor.map_unordered(tracker.call, items(), limit=3)
+        }
+
+        assert results == {i: i * 2 for i in range(10)}
+        assert prepared == list(range(10))
+        assert tracker.peak == 3
+
+    def test_exception_propagates_through_future(self, executor):
+        async def fail():
+            raise ValueError('quota exceeded')
+
+        with pytest.raises(ValueError, match='quota exceeded'):
+            executor.run(fail)
+
+    def test_sync_provider_falls_back_to_blocking_pool(self, executor):
+        result = executor.run(_SyncOnlyProvider().agenerate_text, 'hello')
+
+        assert result.startswith('hello:generation-blocking')
+
+
+class _FakeImageAIService:
+    """只实现 generate_images_task 用到的接口"""
+
+    def __init__(self):
+        self.tracker = _Tracker()
+
+    def flatten_outline(self, outline):
+        return outline
+
+    def extract_image_urls_from_markdown(self, text):
+        return []
+
+    def generate_image_prompt(self, outline, page, desc_text, page_index, **kwargs):
+        return desc_text
+
+    async def agenerate_image(self, prompt, ref_image_path=None, **kwargs):
+        await self.tracker.call(0, delay=0.02)
+        return Image.new('RGB', (16, 9), 'white')
+
+
+class _FakeFileService:
+    def get_template_path(self, project_id):
+        return None
+
+    def save_generated_image_async(self, image, project_id, page_id, image_format=None, version_number=None):
+        future = Future()
+        future.set_result(None)
+        return f'{project_id}/pages/{page_id}_v{version_number}.png', future
+
+
+def test_generate_images_task_uses_executor(app):
+    from models import db, Page, Project, Task
+    from services.task_manager import generate_images_task
+
+    with app.app_context():
+        project = Project(creation_type='idea', idea_prompt='executor')
+        db.session.add(project)
+        db.session.flush()
+        for i in range(6):
+            page = Page(project_id=project.id, order_index=i)
+            # 最后一页没有描述，应当失败而不影响其他页面
+            if i < 5:
+                page.set_description_content({'text': f'page {i}'})
+            db.session.add(page)
+        task = Task(project_id=project.id, task_type='GENERATE_IMAGES')
+        db.session.add(task)
+        db.session.commit()
+        project_id, task_id = project.id, task.id
+
+    ai_service = _FakeImageAIService()
+    generate_images_task(
+        task_id, project_id, ai_service, _FakeFileService(),
+        outline=[{'title': f'p{i}'} for i in range(6)], use_template=False,
+        max_workers=3, app=app
+    )
+
+    with app.app_context():
+        pages = Page.query.filter_by(project_id=project_id).order_by(Page.order_index).all()
+        assert [p.status for p in pages] == ['COMPLETED'] * 5 + ['FAILED']
+        task = Task.query.get(task_id)
+        assert task.status == 'COMPLETED'
+        assert task.get_progress() == {'total': 6, 'completed': 5, 'failed': 1}
+    assert ai_service.tracker.peak == 3
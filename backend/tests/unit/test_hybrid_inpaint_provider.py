@@ -0,0 +1,81 @@
+"""
+HybridInpaintProvider 单元测试
+
+验证百度修复结果的缺陷度量决定是否调用生成式画质提升
+"""
+
+from PIL import ImageDraw
+
+from services.image_editability import InpaintProvider
+
+
+def test_measure_repair_defect_flags_seams_and_strokes(gradient_slide):
+    from services.image_editability.helpers import measure_repair_defect
+
+    bbox = (200, 100, 400, 130)
+    clean = measure_repair_defect(gradient_slide(), [bbox])
+    assert clean['regions'] == 1 and clean['defect'] <= 2
+
+    patched = gradient_slide()
+    ImageDraw.Draw(patched).rectangle([200, 100, 399, 129], fill=(128, 128, 128))
+    assert measure_repair_defect(patched, [bbox])['seam'] > clean['seam'] + 10
+
+    stroked = gradient_slide()
+    for x in range(210, 390, 12):
+        ImageDraw.Draw(stroked).line([(x, 105), (x, 125)], fill=(0, 0, 0), width=2)
+    assert measure_repair_defect(stroked, [bbox])['texture'] > clean['texture'] + 10
+
+
+class StubBaiduProvider(InpaintProvider):
+    """返回预设修复结果的百度提供者"""
+
+    def __init__(self, repaired):
+        self.repaired = repaired
+
+    def inpaint_regions(self, image, bboxes, types=None, **kwargs):
+        return self.repaired.copy()
+
+
+class TestHybridEnhancementGate:
+    """混合修复的画质提升门限测试"""
+
+    def _provider(self, repaired, monkeypatch, threshold=None):
+        from services.image_editability import HybridInpaintProvider
+
+        provider = HybridInpaintProvider(StubBaiduProvider(repaired), generative_provider=object(),
+                                         enhance_threshold=threshold)
+        calls = []
+
+        def fake_enhance(image, **kwargs):
+            calls.append(1)
+            return image.copy()
+
+        monkeypatch.setattr(provider, '_enhance_image_quality', fake_enhance)
+        return provider, calls
+
+    def test_clean_repair_skips_enhancement(self, monkeypatch, gradient_slide):
+        provider, calls = self._provider(gradient_slide(), monkeypatch)
+
+        result = provider.inpaint_regions(gradient_slide(), [(200, 100, 400, 130)])
+
+        assert calls == []
+        assert result.info['inpaint_metrics']['enhanced'] is False
+
+    def test_leftover_strokes_trigger_enhancement(self, monkeypatch, gradient_slide):
+        repaired = gradient_slide()
+        draw = ImageDraw.Draw(repaired)
+        for x in range(210, 390, 12):
+            draw.line([(x, 105), (x, 125)], fill=(0, 0, 0), width=2)
+        provider, calls = self._provider(repaired, monkeypatch)
+
+        result = provider.inpaint_regions(gradient_slide(), [(200, 100, 400, 130)])
+
+        assert calls == [1]
+        assert result.info['inpaint_metrics']['enhanced'] is True
+
+    def test_zero_threshold_always_enhances(self, monkeypatch, gradient_slide):
+        provider, calls = self._provider(gradient_slide(), monkeypatch, threshold=0)
+
+        provider.inpaint_regions(gradient_slide(), [(200, 100, 400, 130)])
+
+        assert calls == [1]
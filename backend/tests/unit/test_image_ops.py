@@ -0,0 +1,100 @@
+"""
+image_ops 单元测试
+
+验证 Pillow 后端的编解码、格式推断、pyvips 不可用时的回退，以及 CMYK 图像转为 sRGB
+"""
+
+import base64
+
+import pytest
+from PIL import Image
+
+from utils import image_ops
+
+
+@pytest.fixture
+def pillow_backend():
+    image_ops.set_backend('pillow')
+    yield
+    image_ops.set_backend(None)
+
+
+class TestImageOps:
+    """图像处理后端测试"""
+
+    def test_encode_decode_roundtrip(self, pillow_backend):
+        image = Image.new('RGB', (64, 48), (10, 200, 30))
+
+        decoded = image_ops.decode(base64.b64decode(image_ops.to_base64(image, 'PNG')))
+
+        assert decoded.size == (64, 48)
+        assert decoded.getpixel((5, 5)) == (10, 200, 30)
+
+    def test_save_infers_format_from_extension(self, pillow_backend, tmp_path):
+        path = tmp_path / 'page.jpg'
+
+        image_ops.save(Image.new('RGB', (32, 32), (255, 0, 0)), path)
+
+        with Image.open(path) as saved:
+            assert saved.format == 'JPEG'
+
+    def test_save_and_encode_accept_genai_images(self, pillow_backend, tmp_path):
+        from google.genai import types
+
+        png = image_ops.encode(Image.new('RGB', (16, 8), (0, 0, 255)), 'PNG')
+        genai_image = types.Image(image_bytes=png, mime_type='image/png')
+
+        image_ops.save(genai_image, tmp_path / 'page.webp')
+        with Image.open(tmp_path / 'page.webp') as saved:
+            assert saved.format == 'WEBP' and saved.size == (16, 8)
+        assert image_ops.decode(image_ops.encode(genai_image, 'JPEG')).size == (16, 8)
+
+        with pytest.raises(TypeError):
+            image_ops.encode(object())
+
+    def test_resize_and_fit_within(self, pillow_backend):
+        image = Image.new('RGB', (4000, 2000))
+
+        assert image_ops.resize(image, (100, 50)).size == (100, 50)
+        assert image_ops.fit_within(image, 1000).size == (1000, 500)
+        assert image_ops.fit_within(image, 5000) is image
+
+    def test_requested_pyvips_falls_back_when_missing(self, monkeypatch):
+        monkeypatch.setattr(image_ops, 'pyvips', None)
+
+        assert image_ops.set_backend('pyvips') == image_ops.BACKEND_PILLOW
+        image_ops.set_backend(None)
+
+    def test_cmyk_vips_image_converted_to_srgb(self):
+        import numpy as np
+
+        class FakeVipsImage:
+            """只提供 _vips_to_pil 用到的属性的 pyvips 图像替身"""
+
+            def __init__(self, array, interpretation):
+                self.array = array
+                self.interpretation = interpretation
+                self.format = 'uchar'
+                self.height, self.width, self.bands = array.shape
+                self.converted_to = None
+
+            def colourspace(self, space):
+                self.converted_to = space
+                rgb = 255 - self.array[:, :, :3]  # 以无黑版的 C/M/Y 近似 RGB
+                return FakeVipsImage(np.ascontiguousarray(rgb), space)
+
+            def write_to_memory(self):
+                return self.array.tobytes()
+
+        cyan = np.zeros((2, 3, 4), dtype=np.uint8)
+        cyan[:, :, 0] = 255
+        cmyk = FakeVipsImage(cyan, 'cmyk')
+
+        image = image_ops._vips_to_pil(cmyk)
+
+        assert cmyk.converted_to == 'srgb'
+        assert image.mode == 'RGB'
+        assert image.getpixel((0, 0)) == (0, 255, 255)
+
+        rgba = image_ops._vips_to_pil(FakeVipsImage(cyan, 'srgb'))
+        assert rgba.mode == 'RGBA'
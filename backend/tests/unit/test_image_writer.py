@@ -0,0 +1,126 @@
+"""
+ImageWriter 单元测试
+
+验证编码配置、落盘写入，以及图片写入失败时不提交版本记录
+"""
+
+from concurrent.futures import Future
+
+import pytest
+from PIL import Image
+
+from services.image_writer import ImageWriter, get_encoding_profile
+
+
+class TestImageWriter:
+    """图片写入测试"""
+
+    def test_profiles(self):
+        assert get_encoding_profile(image_format='jpeg').extension == 'jpg'
+        assert get_encoding_profile('webp-lossless').params['lossless'] is True
+        assert get_encoding_profile('unknown').name == 'png'
+
+    def test_inline_write_is_complete_and_leaves_no_temp_files(self, tmp_path):
+        path = tmp_path / 'page_v1.webp'
+        image = Image.new('RGBA', (64, 32), (10, 20, 30, 255))
+
+        ImageWriter(max_processes=0).write(image, path, get_encoding_profile('webp-lossless'))
+
+        with Image.open(path) as saved:
+            assert saved.format == 'WEBP'
+            assert saved.convert('RGB').getpixel((3, 3)) == (10, 20, 30)
+        assert [p.name for p in tmp_path.iterdir()] == ['page_v1.webp']
+
+    def test_jpeg_profile_drops_alpha(self, tmp_path):
+        path = tmp_path / 'preview.jpg'
+
+        ImageWriter(max_processes=0).write(Image.new('RGBA', (16, 16)), path, get_encoding_profile('jpeg'))
+
+        with Image.open(path) as saved:
+            assert saved.mode == 'RGB'
+
+    def test_cancelled_pool_task_written_inline(self, tmp_path):
+        writer = ImageWriter(max_processes=0)
+        pool_future, future = Future(), Future()
+        pool_future.cancel()
+        path = tmp_path / 'page_v1.png'
+
+        writer._on_pool_done(pool_future, future, (Image.new('RGB', (8, 8)), str(path), 'PNG', {}), None)
+
+        assert future.result(timeout=5) == str(path)
+        assert path.exists()
+
+    def test_stale_reset_keeps_replacement_pool(self):
+        class FakeExecutor:
+            def __init__(self):
+                self.shut_down = False
+
+            def shutdown(self, wait=True, cancel_futures=False):
+                self.shut_down = True
+
+        writer = ImageWriter(max_processes=1)
+        broken, fresh = FakeExecutor(), FakeExecutor()
+        writer._executor = broken
+        writer._reset_executor(broken)
+        writer._executor = fresh
+        # 旧进程池上晚到的回调不会关闭新的进程池
+        writer._reset_executor(broken)
+
+        assert broken.shut_down and not fresh.shut_down
+        assert writer._executor is fresh
+
+
+class FailingFileService:
+    """图片写入失败的 FileService"""
+
+    def save_generated_image_async(self, image, project_id, page_id, image_format=None, version_number=None):
+        future = Future()
+        future.set_exception(OSError('disk full'))
+        return f'{project_id}/pages/{page_id}_v{version_number}.png', future
+
+
+def test_version_not_committed_when_write_fails(app):
+    from models import PageImageVersion
+    from services.task_manager import save_image_with_version
+
+    with app.app_context():
+        with pytest.raises(OSError):
+            save_image_with_version(Image.new('RGB', (8, 8)), 'project', 'page', FailingFileService())
+
+        assert PageImageVersion.query.filter_by(page_id='page').count() == 0
+
+
+def test_genai_image_saved_with_version(app, tmp_path, monkeypatch):
+    from google.genai import types
+    from models import PageImageVersion
+    from services import image_writer
+    from services.ai_providers.image.genai_provider import GenAIImageProvider
+    from services.file_service import FileService
+    from services.task_manager import save_image_with_version
+    from utils import image_ops
+
+    monkeypatch.setattr(image_writer, '_writer_instance', ImageWriter(max_processes=0))
+    png = image_ops.encode(Image.new('RGB', (24, 16), (200, 10, 10)), 'PNG')
+
+    class Part:
+        text = None
+
+        def as_image(self):
+            return types.Image(image_bytes=png, mime_type='image/png')
+
+    class Response:
+        parts = [Part()]
+
+    image = GenAIImageProvider._extract_image(Response())
+    assert isinstance(image, Image.Image)
+
+    with app.app_context():
+        # 直接传入 SDK 的 types.Image 也能保存
+        for generated in (image, Part().as_image()):
+            image_path, version = save_image_with_version(generated, 'project', 'genai-page',
+                                                          FileService(str(tmp_path)))
+            with Image.open(tmp_path / image_path) as saved:
+                assert saved.size == (24, 16)
+
+        assert version == 2
+        assert PageImageVersion.query.filter_by(page_id='genai-page').count() == 2
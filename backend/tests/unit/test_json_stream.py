@@ -0,0 +1,107 @@
+"""
+流式生成单元测试
+
+验证增量 JSON 解析、AIService 的流式大纲事件以及 SSE 接口
+"""
+
+import json
+
+from services.ai_providers.text.base import TextProvider
+from services.ai_service import AIService
+from utils.json_stream import IncrementalJSONParser
+
+OUTLINE = [
+    {'part': '开场', 'pages': [
+        {'title': '封面 [v2]', 'points': ['标题', '副标题 "引号"']},
+        {'title': '目录', 'points': []},
+    ]},
+    {'title': '总结', 'points': ['谢谢']},
+]
+
+
+def _chunks(text, size=7):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class _ChunkedTextProvider(TextProvider):
+    """按固定大小分块返回预设文本的 provider"""
+
+    def __init__(self, text):
+        self.text = text
+
+    def generate_text(self, prompt, thinking_budget=1000):
+        return self.text
+
+    def generate_text_stream(self, prompt, thinking_budget=1000):
+        yield from _chunks(self.text)
+
+
+def _outline_selector(path):
+    return len(path) == 1 or (len(path) == 3 and path[1] == 'pages')
+
+
+class TestIncrementalJSONParser:
+    """增量 JSON 解析测试"""
+
+    def test_emits_values_as_they_complete(self):
+        parser = IncrementalJSONParser(_outline_selector)
+        text = '```json\n' + json.dumps(OUTLINE, ensure_ascii=False) + '\n```'
+
+        events = []
+        for chunk in _chunks(text, 3):
+            events.extend(parser.feed(chunk))
+
+        assert [path for path, _, _ in events] == [(0, 'pages', 0), (0, 'pages', 1), (0,), (1,)]
+        assert events[0][1] == OUTLINE[0]['pages'][0]
+        assert events[0][2] == {'part': '开场'}
+        assert parser.done and parser.value == OUTLINE
+
+    def test_page_emitted_before_array_closes(self):
+        parser = IncrementalJSONParser(lambda path: len(path) == 1)
+
+        assert parser.feed('[{"title": "A", "points": ["x]"]}, ') == [((0,), {'title': 'A', 'points': ['x]']}, {})]
+        assert parser.feed('"plain') == []
+        assert parser.feed(' \\"text\\""]') == [((1,), 'plain "text"', {})]
+        assert parser.value == [{'title': 'A', 'points': ['x]']}, 'plain "text"']
+
+
+class TestOutlineStream:
+    """AIService 流式大纲测试"""
+
+    def test_outline_events(self):
+        provider = _ChunkedTextProvider(json.dumps(OUTLINE, ensure_ascii=False))
+        service = AIService(text_provider=provider, image_provider=object())
+
+        events = list(service._stream_outline('prompt'))
+
+        pages = [e for e in events if e['type'] == 'page']
+        assert [p['index'] for p in pages] == [0, 1, 2]
+        assert pages[0]['page'] == {**OUTLINE[0]['pages'][0], 'part': '开场'}
+        assert [p['page'] for p in pages] == service.flatten_outline(OUTLINE)
+        assert events[-1] == {'type': 'outline', 'outline': OUTLINE}
+
+    def test_generate_outline_endpoint_streams_sse(self, client, sample_project, monkeypatch):
+        provider = _ChunkedTextProvider(json.dumps(OUTLINE, ensure_ascii=False))
+        service = AIService(text_provider=provider, image_provider=object())
+        monkeypatch.setattr('controllers.project_controller.get_ai_service', lambda: service)
+
+        response = client.post(
+            f"/api/projects/{sample_project['project_id']}/generate/outline",
+            json={}, headers={'Accept': 'text/event-stream'}
+        )
+
+        assert response.mimetype == 'text/event-stream'
+        messages = [
+            (block.split('\n')[0][len('event: '):], json.loads(block.split('\n')[1][len('data: '):]))
+            for block in response.get_data(as_text=True).strip().split('\n\n')
+        ]
+        names = [name for name, _ in messages]
+        assert names.count('page') == 3
+        assert names[-1] == 'done'
+        done = messages[-1][1]
+        assert [p['outline_content']['title'] for p in done['pages']] == ['封面 [v2]', '目录', '总结']
+        assert done['pages'][0]['part'] == '开场'
+
+        project = client.get(f"/api/projects/{sample_project['project_id']}").get_json()['data']
+        assert project['status'] == 'OUTLINE_GENERATED'
+        assert len(project['pages']) == 3
@@ -0,0 +1,67 @@
+"""
+latex_utils 单元测试
+
+验证符号替换、上下标转换以及 XSLT / 转换结果的缓存
+"""
+
+from utils import latex_utils
+from utils.latex_utils import convert_latex_for_pptx, is_simple_latex, latex_to_text
+
+IDENTITY_XSL = b"""<?xml version="1.0"?>
+<xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">
+  <xsl:template match="@*|node()"><xsl:copy><xsl:apply-templates select="@*|node()"/></xsl:copy></xsl:template>
+</xsl:stylesheet>
+"""
+
+
+class TestLatexToText:
+    """LaTeX 转文本测试"""
+
+    def test_symbols_and_scripts(self):
+        assert latex_to_text(r'\alpha^2 + \beta_{ij} \leq 10\%') == 'α² + βᵢⱼ ≤ 10%'
+        assert latex_to_text(r'\text{area} = \pi r^{2}') == 'area = π r²'
+
+    def test_longest_symbol_wins(self):
+        assert latex_to_text(r'a_1 \cdots a_n') == 'a₁ ⋯ aₙ'
+        assert latex_to_text(r'\int_0^1 \infty') == '∫₀¹ ∞'
+
+    def test_empty_script_group(self):
+        assert latex_to_text('x_{} + y^{}') == 'x + y'
+
+    def test_is_simple_latex(self):
+        assert is_simple_latex(r'10\% \times \alpha^2')
+        assert not is_simple_latex(r'\frac{1}{2}')
+
+
+class TestOmmlConversion:
+    """MathML 转 OMML 缓存测试"""
+
+    def test_stylesheet_compiled_once_per_thread(self, tmp_path, monkeypatch):
+        xsl_path = tmp_path / 'MML2OMML.xsl'
+        xsl_path.write_bytes(IDENTITY_XSL)
+        monkeypatch.setattr(latex_utils, 'MML2OMML_XSL_PATH', str(xsl_path))
+
+        from lxml import etree
+        compiled = []
+        real_xslt = etree.XSLT
+        monkeypatch.setattr(etree, 'XSLT', lambda tree: compiled.append(1) or real_xslt(tree))
+
+        first = latex_utils.mathml_to_omml('<math><mi>x</mi></math>')
+        second = latex_utils.mathml_to_omml('<math><mi>y</mi></math>')
+
+        assert compiled == [1]
+        assert first == '<math><mi>x</mi></math>'
+        assert second == '<math><mi>y</mi></math>'
+
+    def test_missing_stylesheet_returns_none(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(latex_utils, 'MML2OMML_XSL_PATH', str(tmp_path / 'missing.xsl'))
+
+        assert latex_utils.mathml_to_omml('<math><mi>x</mi></math>') is None
+
+    def test_conversion_cached_by_latex(self):
+        convert_latex_for_pptx.cache_clear()
+
+        assert convert_latex_for_pptx(r'\alpha^2') == ('α²', None)
+        convert_latex_for_pptx(r'\alpha^2')
+
+        assert convert_latex_for_pptx.cache_info().hits == 1
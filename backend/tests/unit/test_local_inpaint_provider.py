@@ -0,0 +1,67 @@
+"""
+LocalInpaintProvider 单元测试
+
+验证简单背景本地填充、复杂背景交给远程提供者
+"""
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from services.image_editability import InpaintProvider, LocalInpaintProvider
+
+
+class RecordingProvider(InpaintProvider):
+    """记录收到的 bbox 的远程提供者"""
+
+    def __init__(self):
+        self.bboxes = None
+
+    def inpaint_regions(self, image, bboxes, types=None, **kwargs):
+        self.bboxes = list(bboxes)
+        return image
+
+
+class TestLocalInpaintProvider:
+    """本地快速修复测试"""
+
+    def test_text_on_gradient_filled_locally(self, gradient_slide):
+        image = gradient_slide()
+        ImageDraw.Draw(image).rectangle([200, 100, 400, 130], fill=(255, 0, 0))
+        remote = RecordingProvider()
+
+        result = LocalInpaintProvider(remote).inpaint_regions(image, [(200, 100, 401, 131)])
+
+        assert remote.bboxes is None
+        expected = np.asarray(gradient_slide(), dtype=np.int16)[95:136, 195:406]
+        filled = np.asarray(result, dtype=np.int16)[95:136, 195:406]
+        assert np.abs(filled - expected).max() <= 2
+
+    def test_textured_background_sent_to_remote(self, gradient_slide):
+        image = gradient_slide()
+        noise = np.random.default_rng(0).integers(0, 256, size=(200, 300, 3), dtype=np.uint8)
+        image.paste(Image.fromarray(noise), (400, 200))
+        remote = RecordingProvider()
+
+        LocalInpaintProvider(remote).inpaint_regions(
+            image, [(100, 50, 300, 80), (500, 300, 600, 330)], types=['text', 'text']
+        )
+
+        assert remote.bboxes == [(500, 300, 600, 330)]
+
+
+    def test_without_remote_only_simple_regions_filled(self, gradient_slide):
+        image = gradient_slide()
+        ImageDraw.Draw(image).rectangle([100, 50, 300, 80], fill=(255, 0, 0))
+        noise = np.random.default_rng(0).integers(0, 256, size=(200, 300, 3), dtype=np.uint8)
+        image.paste(Image.fromarray(noise), (400, 200))
+        before = np.asarray(image, dtype=np.int16)
+
+        result = LocalInpaintProvider().inpaint_regions(
+            image, [(100, 50, 301, 81), (500, 300, 600, 330)]
+        )
+
+        after = np.asarray(result, dtype=np.int16)
+        expected = np.asarray(gradient_slide(), dtype=np.int16)[45:86, 95:306]
+        assert np.abs(after[45:86, 95:306] - expected).max() <= 2
+        # 没有远程提供者时复杂区域保持原样
+        assert np.array_equal(after[298:332, 498:602], before[298:332, 498:602])
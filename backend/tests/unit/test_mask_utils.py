@@ -0,0 +1,52 @@
+"""
+mask_utils 单元测试
+
+验证 NumPy 掩码生成与 ImageDraw 绘制结果一致、可分离膨胀与 MaxFilter 一致
+"""
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+from utils.mask_utils import create_inverse_mask_from_bboxes, create_mask_from_bboxes, dilate_mask
+
+
+class TestCreateMaskFromBboxes:
+    """掩码生成测试"""
+
+    def test_matches_image_draw_rectangles(self):
+        expected = Image.new('RGB', (120, 80), (0, 0, 0))
+        draw = ImageDraw.Draw(expected)
+        draw.rectangle([0, 0, 25, 20], fill=(255, 255, 255))       # (-5, -5, 20, 15) 扩展 5px 后裁剪
+        draw.rectangle([35, 25, 85, 50], fill=(255, 255, 255))     # 字典格式 + 扩展
+        draw.rectangle([105, 65, 120, 80], fill=(255, 255, 255))   # 超出右下角
+
+        mask = create_mask_from_bboxes(
+            (120, 80),
+            [(-5, -5, 20, 15), {'x': 40, 'y': 30, 'width': 40, 'height': 15}, (110, 70, 200, 200)],
+            expand_pixels=5,
+        )
+
+        assert np.array_equal(np.asarray(mask), np.asarray(expected))
+
+    def test_shrink_skips_collapsed_boxes(self):
+        mask = create_mask_from_bboxes((50, 50), [(10, 10, 14, 14), (20, 20, 40, 30)], expand_pixels=-3)
+
+        filled = np.asarray(mask.convert('L')) > 0
+        assert not filled[10:15, 10:15].any()
+        assert filled[23:28, 23:38].all()
+
+    def test_inverse_mask_swaps_colors(self):
+        mask = create_inverse_mask_from_bboxes((40, 30), [(5, 5, 10, 10)])
+
+        assert mask.getpixel((7, 7)) == (0, 0, 0)
+        assert mask.getpixel((30, 20)) == (255, 255, 255)
+
+
+class TestDilateMask:
+    """可分离膨胀测试"""
+
+    def test_matches_max_filter(self):
+        mask = (np.random.default_rng(0).random((60, 90)) > 0.97).astype(np.uint8) * 255
+        expected = np.asarray(Image.fromarray(mask).filter(ImageFilter.MaxFilter(7)))
+
+        assert np.array_equal(dilate_mask(mask, 3), expected)
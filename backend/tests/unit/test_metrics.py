@@ -0,0 +1,118 @@
+"""
+运行指标与追踪单元测试
+
+验证 Prometheus 文本输出、/metrics 接口中的各类指标，以及 file 追踪后端的 span 父子关系
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.metrics import MetricsRegistry, record_cache_lookup, stage
+from services.tracing import configure_tracing, span, traced
+from services.usage_tracker import propagate_context, track_usage
+
+
+class _FakeOCR:
+    model = None
+
+    @track_usage('ocr', 'fake_ocr')
+    def recognize(self, fail=False):
+        if fail:
+            raise RuntimeError('ocr failed')
+        return []
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    counter = registry.counter('demo_calls_total', 'Demo calls', ['outcome'])
+    histogram = registry.histogram('demo_seconds', 'Demo latency', ['stage'], buckets=(1, 5))
+    counter.inc(outcome='success')
+    counter.inc(2, outcome='success')
+    histogram.observe(0.5, stage='build')
+    histogram.observe(3, stage='build')
+
+    text = registry.render()
+    assert '# TYPE demo_calls_total counter' in text
+    assert 'demo_calls_total{outcome="success"} 3' in text
+    assert 'demo_seconds_bucket{stage="build",le="1"} 1' in text
+    assert 'demo_seconds_bucket{stage="build",le="5"} 2' in text
+    assert 'demo_seconds_bucket{stage="build",le="+Inf"} 2' in text
+    assert 'demo_seconds_count{stage="build"} 2' in text
+
+    with pytest.raises(ValueError):
+        counter.inc(status='x')
+
+
+def test_metrics_endpoint_reports_pipeline_metrics(client, sample_project, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'METRICS_ENABLED', True)
+    ocr = _FakeOCR()
+    ocr.recognize()
+    with pytest.raises(RuntimeError):
+        ocr.recognize(fail=True)
+    with stage('build'):
+        pass
+    record_cache_lookup('test_cache', True)
+    record_cache_lookup('test_cache', False)
+    record_cache_lookup('test_cache', True)
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+
+    assert 'bananappt_provider_calls_total{category="ocr",provider="fake_ocr",outcome="success"}' in text
+    assert 'bananappt_provider_calls_total{category="ocr",provider="fake_ocr",outcome="error"}' in text
+    assert 'bananappt_provider_call_duration_seconds_count{category="ocr",provider="fake_ocr",operation="recognize"} ' in text
+    assert 'bananappt_stage_duration_seconds_count{stage="build"}' in text
+    assert 'bananappt_cache_hit_ratio{cache="test_cache"} 0.6666666666666666' in text
+    assert 'bananappt_task_queue_depth{state="queued"} 0' in text
+    # sample_project 通过 API 创建项目，至少提交过一次
+    commits = next(line for line in text.splitlines() if line.startswith('bananappt_db_commits_total '))
+    assert float(commits.split()[1]) >= 1
+
+
+def test_metrics_endpoint_can_be_disabled_and_token_protected(client, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'METRICS_ENABLED', False)
+    assert client.get('/metrics').status_code == 404
+
+    monkeypatch.setitem(client.application.config, 'METRICS_ENABLED', True)
+    monkeypatch.setitem(client.application.config, 'METRICS_TOKEN', 'scrape-secret')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'}).status_code == 200
+
+
+def test_file_tracing_links_spans_across_threads(tmp_path):
+    trace_file = tmp_path / 'traces.jsonl'
+    configure_tracing('file', str(trace_file))
+    try:
+        @traced('export.demo', lambda pages: {'pages': pages})
+        def export(pages):
+            with stage('extract'):
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    list(executor.map(propagate_context(lambda _: _FakeOCR().recognize()), range(pages)))
+            with pytest.raises(ValueError):
+                with span('export.save'):
+                    raise ValueError('disk full')
+
+        export(2)
+    finally:
+        configure_tracing('')
+
+    spans = [json.loads(line) for line in trace_file.read_text(encoding='utf-8').splitlines()]
+    by_name = {}
+    for item in spans:
+        by_name.setdefault(item['name'], []).append(item)
+
+    root = by_name['export.demo'][0]
+    assert root['parent_id'] is None and root['attributes'] == {'pages': 2}
+    extract = by_name['stage.extract'][0]
+    assert extract['parent_id'] == root['span_id']
+    ocr_spans = by_name['ocr.fake_ocr']
+    assert len(ocr_spans) == 2
+    assert all(item['parent_id'] == extract['span_id'] for item in ocr_spans)
+    assert {item['trace_id'] for item in spans} == {root['trace_id']}
+    save = by_name['export.save'][0]
+    assert save['status'] == 'error' and 'disk full' in save['error']
@@ -0,0 +1,98 @@
+"""
+PPTXBuilder 字号拟合单元测试
+
+验证二分查找 + 字符宽度表 + lru_cache 的实现与原来从 MAX_FONT_SIZE 线性递减的实现
+选出相同的字号（中英文、多行、不同 bbox）
+"""
+
+import os
+
+import pytest
+from PIL import ImageFont
+
+from utils.pptx_builder import PPTXBuilder
+
+TEXTS = [
+    "人工智能驱动的演示文稿生成",
+    "Quarterly revenue grew 23% year over year",
+    "• 降低 40% 的人工排版时间\n• Support for 16:9 and 4:3 aspect ratios",
+    "第三部分：技术架构与实现细节\n\n数据来源：2025 年行业白皮书",
+    "Banana Slides – AI native PPT generator",
+    "标题",
+    "A",
+]
+
+# [x0, y0, x1, y1] 像素，覆盖标题、正文、窄列和极小的框
+BBOXES = [
+    [0, 0, 1600, 120],
+    [100, 200, 900, 260],
+    [0, 0, 300, 400],
+    [50, 50, 170, 74],
+    [0, 0, 40, 20],
+    [0, 0, 1920, 1080],
+]
+
+
+def _legacy_font_size(bbox, text, font_path=None, dpi=96):
+    """原实现：从 MAX_FONT_SIZE 逐个字号递减，每个字号重新测量每一行"""
+    usable_width_pt = (bbox[2] - bbox[0]) / dpi * 72
+    usable_height_pt = (bbox[3] - bbox[1]) / dpi * 72
+    for font_size in range(PPTXBuilder.MAX_FONT_SIZE, PPTXBuilder.MIN_FONT_SIZE - 1, -1):
+        total_lines = 0
+        for line in text.split('\n'):
+            if not line:
+                total_lines += 1
+                continue
+            if font_path:
+                left, _, right, _ = ImageFont.truetype(font_path, font_size).getbbox(line)
+                line_width_pt = right - left
+            else:
+                cjk = sum(1 for c in line if '一' <= c <= '鿿' or '぀' <= c <= 'ヿ' or '가' <= c <= '힯')
+                line_width_pt = (cjk + (len(line) - cjk) * 0.5) * font_size
+            total_lines += max(1, -(-int(line_width_pt) // int(usable_width_pt)))
+        if total_lines * font_size <= usable_height_pt:
+            return float(font_size)
+    return float(PPTXBuilder.MIN_FONT_SIZE)
+
+
+@pytest.fixture
+def builder():
+    PPTXBuilder._fit_font_size.cache_clear()
+    yield PPTXBuilder()
+    PPTXBuilder._fit_font_size.cache_clear()
+
+
+def test_estimated_fit_matches_linear_search(builder, monkeypatch):
+    monkeypatch.setattr(PPTXBuilder, 'FONT_PATH', '/nonexistent/font.ttf')
+
+    for text in TEXTS:
+        for bbox in BBOXES:
+            assert builder.calculate_font_size(bbox, text) == _legacy_font_size(bbox, text), (text, bbox)
+            # 第二次命中 lru_cache，结果不变
+            assert builder.calculate_font_size(bbox, text) == _legacy_font_size(bbox, text)
+    assert PPTXBuilder._fit_font_size.cache_info().hits >= len(TEXTS) * len(BBOXES)
+
+
+@pytest.fixture
+def font_path(monkeypatch):
+    """精确测量用的字体：优先使用 NotoSansSC，未安装时使用测试自带的 Lato"""
+    path = PPTXBuilder.FONT_PATH
+    if not os.path.exists(path):
+        path = os.path.join(os.path.dirname(__file__), '..', 'fixtures', 'fonts', 'Lato-Regular.ttf')
+    monkeypatch.setattr(PPTXBuilder, 'FONT_PATH', path)
+    # 参考字体和字符宽度表按类缓存，换字体后需要重新加载
+    monkeypatch.setattr(PPTXBuilder, '_reference_font', None)
+    monkeypatch.setattr(PPTXBuilder, '_reference_font_failed', False)
+    monkeypatch.setattr(PPTXBuilder, '_advance_widths', {})
+    PPTXBuilder._fit_font_size.cache_clear()
+    return path
+
+
+def test_precise_fit_matches_linear_search(builder, font_path):
+    assert PPTXBuilder._get_reference_font() is not None
+
+    # 原实现按每个字号的字形包围盒测量，新实现按参考字号的前进宽度缩放，换行边界处可能差一两个字号
+    for text in TEXTS[:4]:
+        for bbox in BBOXES[:4]:
+            legacy = _legacy_font_size(bbox, text, font_path)
+            assert abs(builder.calculate_font_size(bbox, text) - legacy) <= 2, (text, bbox)
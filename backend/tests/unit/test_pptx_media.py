@@ -0,0 +1,103 @@
+"""
+PPTXMediaRegistry 单元测试
+
+验证重复图片只嵌入一次、感知相同图片的可选合并
+"""
+
+import io
+import zipfile
+
+import numpy as np
+from PIL import Image, ImageDraw
+from pptx import Presentation
+
+from utils.pptx_builder import PPTXBuilder
+
+
+def _slide_image(seed=0):
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, size=(90, 160, 3), dtype=np.uint8)
+    return Image.fromarray(pixels, 'RGB')
+
+
+def _build(paths, merge_similar=False):
+    builder = PPTXBuilder(merge_similar_images=merge_similar)
+    builder.create_presentation()
+    for path in paths:
+        builder.add_background_image(builder.add_blank_slide(), str(path))
+    buffer = io.BytesIO()
+    builder.prs.save(buffer)
+    with zipfile.ZipFile(io.BytesIO(buffer.getvalue())) as archive:
+        media = [name for name in archive.namelist() if name.startswith('ppt/media/')]
+    return builder, buffer, media
+
+
+class TestPPTXMediaRegistry:
+    """幻灯片级媒体去重测试"""
+
+    def test_same_file_embedded_once(self, tmp_path):
+        path = tmp_path / 'bg.png'
+        _slide_image().save(path)
+
+        builder, buffer, media = _build([path] * 5)
+
+        assert len(media) == 1
+        assert builder.media.stats['files_read'] == 1
+        prs = Presentation(buffer)
+        assert all(len(slide.shapes) == 1 for slide in prs.slides)
+        assert prs.slides[4].shapes[0].width == prs.slide_width
+
+    def test_byte_identical_copies_share_part(self, tmp_path):
+        paths = [tmp_path / 'a.png', tmp_path / 'b.png']
+        for path in paths:
+            _slide_image().save(path)
+
+        _, _, media = _build(paths)
+
+        assert len(media) == 1
+
+    def test_reencoded_copy_merged_only_when_enabled(self, tmp_path):
+        png, copy = tmp_path / 'logo.png', tmp_path / 'logo_copy.png'
+        image = _slide_image()
+        image.save(png, compress_level=1)
+        # 轻微的像素差异（重新编码的副本）
+        shifted = np.asarray(image, dtype=np.int16) + 3
+        Image.fromarray(np.clip(shifted, 0, 255).astype(np.uint8), 'RGB').save(copy)
+
+        assert len(_build([png, copy])[2]) == 2
+        builder, _, media = _build([png, copy], merge_similar=True)
+        assert len(media) == 1
+        assert builder.media.stats['similar_reuses'] == 1
+
+    def test_small_content_change_not_merged(self, tmp_path):
+        base, edited = tmp_path / 'base.png', tmp_path / 'edited.png'
+        image = Image.new('RGB', (640, 360), (240, 240, 240))
+        image.save(base)
+        ImageDraw.Draw(image).rectangle([300, 170, 310, 176], fill=(0, 0, 0))
+        image.save(edited)
+
+        _, _, media = _build([base, edited], merge_similar=True)
+
+        assert len(media) == 2
+
+    def test_webp_converted_to_png(self, tmp_path):
+        path = tmp_path / 'page.webp'
+        _slide_image().save(path, lossless=True)
+
+        _, _, media = _build([path, path])
+
+        assert len(media) == 1
+        assert media[0].endswith('.png')
+
+    def test_public_api_fallback_still_shares_part(self, tmp_path, monkeypatch):
+        from utils import pptx_builder
+
+        monkeypatch.setattr(pptx_builder, '_HAS_PICTURE_PART_API', False)
+        path = tmp_path / 'page.webp'
+        _slide_image().save(path, lossless=True)
+
+        _, buffer, media = _build([path] * 3)
+
+        assert len(media) == 1
+        assert media[0].endswith('.png')
+        assert all(len(slide.shapes) == 1 for slide in Presentation(buffer).slides)
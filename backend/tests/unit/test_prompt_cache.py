@@ -0,0 +1,145 @@
+"""
+Prompt 前缀缓存单元测试
+
+验证页面描述 prompt 的共享前缀，以及 GenAI 显式上下文缓存的创建、复用和命中统计
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from config import get_config
+from services.ai_providers.text import GenAITextProvider, prompt_cache_scope, prompt_cache_stats
+from services.ai_service import AIService, ProjectContext
+
+OUTLINE = [{'title': '封面', 'points': []}, {'title': '背景', 'points': ['现状', '问题']}]
+
+
+class _FakeModels:
+    def __init__(self):
+        self.calls = []
+
+    def generate_content(self, model, contents, config):
+        self.calls.append((contents, config.cached_content))
+        cached = 100 if config.cached_content else 0
+        return SimpleNamespace(
+            text='描述',
+            usage_metadata=SimpleNamespace(prompt_token_count=120, cached_content_token_count=cached)
+        )
+
+
+class _FakeCaches:
+    def __init__(self):
+        self.created = []
+
+    def create(self, model, config):
+        self.created.append(config.contents)
+        return SimpleNamespace(name=f'cachedContents/{len(self.created)}')
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    monkeypatch.setattr(get_config(), 'GENAI_CONTEXT_CACHE_TTL', 600)
+    monkeypatch.setattr(get_config(), 'GENAI_CONTEXT_CACHE_MIN_TOKENS', 10)
+    provider = GenAITextProvider(api_key='test-key')
+    provider.client = SimpleNamespace(models=_FakeModels(), caches=_FakeCaches())
+    prompt_cache_stats.reset()
+    yield provider
+    prompt_cache_stats.reset()
+
+
+def test_page_prompts_share_one_prefix():
+    context = ProjectContext({'idea_prompt': '介绍新能源汽车', 'creation_type': 'idea'})
+
+    first = AIService._build_page_description_prompt(context, OUTLINE, OUTLINE[0], 1, 'zh')
+    second = AIService._build_page_description_prompt(context, OUTLINE, OUTLINE[1], 2, 'zh')
+
+    # 前缀是同一个对象（只拼接一次），页面相关内容都在后缀中
+    assert first[0] is second[0]
+    assert '介绍新能源汽车' in first[0] and '背景' in first[0]
+    assert '第 2 页' in second[1] and "'现状'" in second[1]
+
+
+def test_genai_reuses_context_cache_for_shared_prefix(provider):
+    prefix = '共享的参考资料与大纲。' * 10
+
+    for suffix in ('第 1 页', '第 2 页'):
+        assert provider.generate_text_with_prefix(prefix, suffix) == '描述'
+
+    assert provider.client.caches.created == [[prefix]]
+    assert provider.client.models.calls == [('第 1 页', 'cachedContents/1'), ('第 2 页', 'cachedContents/1')]
+    stats = prompt_cache_stats.snapshot()['genai']
+    assert stats['calls'] == 2
+    assert stats['cached_ratio'] == pytest.approx(100 / 120)
+
+
+def test_genai_falls_back_when_cache_creation_fails(provider):
+    def fail(model, config):
+        raise RuntimeError('caching not supported by proxy')
+
+    provider.client.caches.create = fail
+
+    provider.generate_text_with_prefix('共享前缀' * 10, '第 1 页')
+    provider.generate_text_with_prefix('共享前缀' * 10, '第 2 页')
+
+    assert provider.client.models.calls == [
+        ('共享前缀' * 10 + '第 1 页', None), ('共享前缀' * 10 + '第 2 页', None)
+    ]
+
+
+def test_scope_counts_only_its_own_calls(provider):
+    prefix = '共享的参考资料与大纲。' * 10
+
+    provider.generate_text_with_prefix(prefix, '其他任务')
+    with prompt_cache_scope() as task_stats:
+        provider.generate_text_with_prefix(prefix, '第 1 页')
+        provider.generate_text_with_prefix(prefix, '第 2 页')
+
+    assert task_stats.snapshot()['genai']['calls'] == 2
+    assert prompt_cache_stats.snapshot()['genai']['calls'] == 3
+
+
+def test_cache_creation_only_blocks_its_own_prefix(provider):
+    import threading
+
+    slow_prefix, fast_prefix = '慢前缀。' * 20, '快前缀。' * 20
+    entered, release = threading.Event(), threading.Event()
+    created = []
+
+    def create(model, config):
+        if config.contents == [slow_prefix]:
+            entered.set()
+            release.wait(timeout=10)
+        created.append(config.contents[0])
+        return SimpleNamespace(name=f'cachedContents/{len(created)}')
+
+    provider.client.caches.create = create
+    slow = [threading.Thread(target=provider._context_cache_for, args=(slow_prefix,)) for _ in range(2)]
+    for thread in slow:
+        thread.start()
+    assert entered.wait(timeout=10)
+
+    # 另一个前缀不需要等待慢前缀的缓存创建
+    assert provider._context_cache_for(fast_prefix) == 'cachedContents/1'
+    release.set()
+    for thread in slow:
+        thread.join(timeout=10)
+
+    assert created == [fast_prefix, slow_prefix]
+
+
+def test_expired_prefix_keeps_lock_while_recreating(provider):
+    import threading
+
+    busy_prefix, idle_prefix, new_prefix = '忙前缀。' * 20, '闲前缀。' * 20, '新前缀。' * 20
+    provider._context_caches[busy_prefix] = ('cachedContents/old-busy', 0)
+    provider._context_caches[idle_prefix] = ('cachedContents/old-idle', 0)
+    busy_lock = provider._prefix_locks.setdefault(busy_prefix, threading.Lock())
+    provider._prefix_locks.setdefault(idle_prefix, threading.Lock())
+
+    # 另一线程正持有 busy_prefix 的锁重建缓存，清理过期条目时不能换掉它的锁
+    with busy_lock:
+        provider._context_cache_for(new_prefix)
+        assert provider._prefix_locks.get(busy_prefix) is busy_lock
+    assert idle_prefix not in provider._prefix_locks
+    assert busy_prefix not in provider._context_caches
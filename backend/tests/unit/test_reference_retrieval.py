@@ -0,0 +1,86 @@
+"""
+参考文件检索单元测试
+
+验证 markdown 分块、BM25 检索，以及 prompt 中参考文件内容的预算控制
+"""
+
+from config import Config
+from services.ai_service import ProjectContext
+from services.prompts import get_page_description_prompt
+from services.reference_retrieval import (
+    chunk_markdown, estimate_tokens, get_reference_index, select_reference_context, tokenize
+)
+
+SECTIONS = {
+    '市场分析': '新能源汽车销量持续增长。' * 40,
+    '电池技术': '固态电池能量密度更高，安全性更好。' * 40,
+    '充电网络': '超充站覆盖率决定了用户的补能体验。' * 40,
+}
+DOCUMENT = '# 行业报告\n\n概述段落。\n\n' + ''.join(
+    f'## {title}\n\n{body}\n\n![图表](/files/mineru/report/{i}.png)\n\n'
+    for i, (title, body) in enumerate(SECTIONS.items())
+)
+
+
+def test_tokenize_mixes_words_and_cjk_bigrams():
+    assert tokenize('固态电池 GPU-2') == ['固', '态', '固态', '电', '态电', '池', '电池', 'gpu', '2']
+
+
+def test_chunks_keep_heading_path_and_size_limit():
+    chunks = chunk_markdown(DOCUMENT, max_tokens=200)
+
+    assert chunks[0].heading == '行业报告'
+    assert {c.heading for c in chunks[1:]} == {f'行业报告 > {t}' for t in SECTIONS}
+    assert all(c.tokens <= 200 for c in chunks)
+    assert ''.join(c.text for c in chunks).count('/files/mineru/report/') == 3
+
+
+def test_search_returns_relevant_chunks_within_budget():
+    index = get_reference_index(DOCUMENT)
+
+    chunks = index.search('固态电池的安全性', max_tokens=500)
+
+    assert chunks and all(c.heading.endswith('电池技术') for c in chunks)
+    assert sum(c.tokens for c in chunks) <= 500
+    # 同一内容只建立一次索引
+    assert get_reference_index(DOCUMENT) is index
+
+
+def test_small_files_are_inlined():
+    files = [{'filename': 'a.md', 'content': '简短的参考内容'}]
+    assert select_reference_context(files, '任意', max_tokens=1000) is None
+
+
+def test_page_prompt_includes_only_relevant_excerpts(monkeypatch):
+    monkeypatch.setattr(Config, 'REFERENCE_CONTEXT_MAX_TOKENS', 600, raising=False)
+    context = ProjectContext(
+        {'idea_prompt': '新能源汽车', 'creation_type': 'idea'},
+        [{'filename': 'report.md', 'content': DOCUMENT}]
+    )
+
+    prompt = get_page_description_prompt(
+        context, outline=[], page_outline={'title': '充电网络', 'points': ['超充站']}, page_index=3
+    )
+
+    # 摘要在共享前缀中，与当前页相关的片段在后缀中
+    assert '<summary>' in prompt[:prompt.index('</uploaded_files>')]
+    excerpts = prompt[prompt.index('<reference_excerpts>'):prompt.index('</reference_excerpts>')]
+    assert '超充站覆盖率' in excerpts
+    assert '固态电池能量密度' not in excerpts
+    assert estimate_tokens(prompt) < estimate_tokens(DOCUMENT) / 2
+
+
+def test_page_prompt_reads_budget_from_app_config(app, monkeypatch):
+    monkeypatch.setattr(Config, 'REFERENCE_CONTEXT_MAX_TOKENS', 0, raising=False)
+    monkeypatch.setitem(app.config, 'REFERENCE_CONTEXT_MAX_TOKENS', 600)
+    context = ProjectContext(
+        {'idea_prompt': '新能源汽车', 'creation_type': 'idea'},
+        [{'filename': 'report.md', 'content': DOCUMENT}]
+    )
+
+    with app.app_context():
+        prompt = get_page_description_prompt(
+            context, outline=[], page_outline={'title': '充电网络', 'points': ['超充站']}, page_index=3
+        )
+
+    assert '<reference_excerpts>' in prompt
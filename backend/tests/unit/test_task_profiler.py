@@ -0,0 +1,97 @@
+"""
+任务性能分析单元测试
+
+验证按请求头开启的任务分析：步骤时间线使用 report_progress 的步骤名，
+span 挂在所属步骤下，结果写入 Task.profile 并可按 JSON / folded stacks / profiler 文件下载
+"""
+
+from services.export_service import ExportService
+from services.image_editability.data_models import BBox, EditableElement, EditableImage
+from services.image_editability.text_attribute_extractors import TextStyleResult
+from services.task_manager import task_manager
+from services.usage_tracker import track_usage
+
+
+class _FakeStyleExtractor:
+    model = 'fake-caption'
+
+    @track_usage('text_style', 'fake_caption')
+    def extract_batch_with_full_image(self, full_image, text_elements, **kwargs):
+        return {elem['element_id']: TextStyleResult(font_color_rgb=(0, 0, 0), confidence=0.9)
+                for elem in text_elements}
+
+    def extract(self, image, text_content=None, **kwargs):
+        return TextStyleResult(confidence=0.9)
+
+
+def _make_page(tmp_path):
+    elements = []
+    for i, eid in enumerate(['a', 'b']):
+        crop = tmp_path / f'{eid}.png'
+        crop.write_bytes(b'png')
+        bbox = BBox(x0=0, y0=i * 10, x1=100, y1=i * 10 + 8)
+        elements.append(EditableElement(element_id=eid, element_type='text', bbox=bbox, bbox_global=bbox,
+                                        content=f'text {eid}', image_path=str(crop)))
+    return EditableImage(image_id='page', image_path=str(tmp_path / 'page.png'),
+                         width=100, height=100, elements=elements)
+
+
+def export_editable_task(task_id, page, output_file):
+    ExportService.create_editable_pptx_with_recursive_analysis(
+        editable_images=[page],
+        output_file=output_file,
+        text_attribute_extractor=_FakeStyleExtractor(),
+        max_workers=1,
+    )
+
+
+def _run_task(app, project_id, headers, tmp_path):
+    from models import Task, db
+
+    task = Task(project_id=project_id, task_type='EXPORT_EDITABLE_PPTX')
+    db.session.add(task)
+    db.session.commit()
+    with app.test_request_context(f'/api/projects/{project_id}/tasks/{task.id}', headers=headers):
+        task_manager.submit_task(task.id, export_editable_task, _make_page(tmp_path), str(tmp_path / 'out.pptx'))
+        future = task_manager.active_tasks.get(task.id)
+    if future is not None:
+        future.result(timeout=60)
+    return task.id
+
+
+def test_profiled_export_records_step_timeline(app, client, sample_project, tmp_path):
+    project_id = sample_project['project_id']
+    task_id = _run_task(app, project_id, {'X-Task-Profile': 'cprofile'}, tmp_path)
+
+    response = client.get(f'/api/projects/{project_id}/tasks/{task_id}')
+    assert response.get_json()['data']['has_profile'] is True
+
+    profile = client.get(f'/api/projects/{project_id}/tasks/{task_id}/profile').get_json()['data']
+    assert [step['name'] for step in profile['steps']] == ['准备', '样式提取', '构建PPTX', '保存文件', '完成']
+    assert profile['memory']['tracemalloc_peak_mb'] >= 0
+    assert profile['sampler']['type'] == 'cprofile'
+
+    paths = {tuple(span['path']) for span in profile['spans']}
+    root = ('export_editable_task', 'export.editable_pptx')
+    assert root in paths
+    assert root + ('样式提取', 'stage.style', 'text_style.fake_caption') in paths
+    assert root + ('构建PPTX', 'stage.build', 'stage.fit_text') in paths
+    assert root + ('保存文件', 'stage.save') in paths
+
+    folded = client.get(f'/api/projects/{project_id}/tasks/{task_id}/profile?format=folded')
+    assert folded.status_code == 200
+    for line in folded.get_data(as_text=True).splitlines():
+        stack, value = line.rsplit(' ', 1)
+        assert stack.startswith('export_editable_task') and int(value) >= 1
+
+    raw = client.get(f'/api/projects/{project_id}/tasks/{task_id}/profile?format=profiler')
+    assert raw.status_code == 200
+    assert raw.headers['Content-Disposition'].endswith(f'{task_id}.prof')
+
+
+def test_tasks_are_not_profiled_by_default(app, client, sample_project, tmp_path):
+    project_id = sample_project['project_id']
+    task_id = _run_task(app, project_id, {}, tmp_path)
+
+    assert client.get(f'/api/projects/{project_id}/tasks/{task_id}').get_json()['data']['has_profile'] is False
+    assert client.get(f'/api/projects/{project_id}/tasks/{task_id}/profile').status_code == 404
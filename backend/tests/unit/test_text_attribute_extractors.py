@@ -0,0 +1,55 @@
+"""
+文字属性提取器单元测试
+
+验证本地像素颜色估算及低置信度回退（不调用真实模型）
+"""
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from services.image_editability import PixelColorTextAttributeExtractor, TextStyleResult
+
+
+class RecordingExtractor:
+    """记录调用的回退提取器"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def extract(self, image, text_content=None, **kwargs):
+        self.calls += 1
+        return TextStyleResult(font_color_rgb=(1, 2, 3), confidence=0.9, metadata={'source': 'caption_model'})
+
+
+def _text_crop(text_color, background):
+    img = Image.new('RGB', (160, 40), background)
+    draw = ImageDraw.Draw(img)
+    for x in range(10, 150, 14):
+        draw.rectangle([x, 10, x + 6, 30], fill=text_color)
+    return img
+
+
+class TestPixelColorTextAttributeExtractor:
+    """像素颜色提取测试"""
+
+    def test_solid_background_resolves_locally(self):
+        fallback = RecordingExtractor()
+        extractor = PixelColorTextAttributeExtractor(fallback)
+
+        result = extractor.extract(_text_crop((200, 30, 40), (250, 250, 250)), 'Title')
+
+        assert result.font_color_rgb == (200, 30, 40)
+        assert result.confidence >= 0.6
+        assert result.metadata['source'] == 'pixel'
+        assert fallback.calls == 0
+
+    def test_noisy_background_escalates_to_model(self):
+        fallback = RecordingExtractor()
+        extractor = PixelColorTextAttributeExtractor(fallback)
+        noise = np.random.default_rng(0).integers(0, 256, size=(40, 160, 3), dtype=np.uint8)
+
+        result = extractor.extract(Image.fromarray(noise), 'Title')
+
+        assert fallback.calls == 1
+        assert result.font_color_rgb == (1, 2, 3)
+        assert 'pixel_confidence' in result.metadata
@@ -0,0 +1,72 @@
+"""
+TiledInpainter 单元测试
+
+验证图块划分、并发修复和羽化拼接（不调用真实修复服务）
+"""
+
+from PIL import Image
+
+from services.ai_providers.image import BaiduInpaintingProvider, TiledInpainter
+from utils.mask_utils import create_mask_from_bboxes
+
+
+def _fill_tile(calls):
+    def inpaint_tile(tile, tile_mask, box):
+        calls.append(box)
+        return Image.new('RGB', tile.size, (0, 255, 0))
+    return inpaint_tile
+
+
+class TestTiledInpainter:
+    """分块修复测试"""
+
+    def test_only_dirty_regions_are_sent(self):
+        image = Image.new('RGB', (1920, 1080), (255, 255, 255))
+        mask = create_mask_from_bboxes(image.size, [(100, 100, 400, 140), (1500, 900, 1800, 950)])
+        calls = []
+
+        result = TiledInpainter(padding=32, min_tile_size=128).inpaint(image, mask, _fill_tile(calls))
+
+        assert len(calls) == 2
+        for x0, y0, x1, y1 in calls:
+            assert (x1 - x0) * (y1 - y0) < 1920 * 1080 * 0.05
+        assert result.size == image.size
+        assert result.getpixel((250, 120)) == (0, 255, 0)
+        assert result.getpixel((1000, 500)) == (255, 255, 255)
+
+    def test_nearby_regions_share_a_tile(self):
+        mask = create_mask_from_bboxes((800, 600), [(100, 100, 300, 120), (100, 130, 300, 150)])
+
+        tiles = TiledInpainter(padding=32).compute_tiles(mask)
+
+        assert len(tiles) == 1
+
+    def test_large_mask_uses_single_full_image_call(self):
+        image = Image.new('RGB', (400, 300), (255, 255, 255))
+        mask = create_mask_from_bboxes(image.size, [(20, 20, 380, 280)])
+        calls = []
+
+        TiledInpainter().inpaint(image, mask, _fill_tile(calls))
+
+        assert calls == [(0, 0, 400, 300)]
+
+    def test_failed_tile_returns_none(self):
+        image = Image.new('RGB', (800, 600))
+        mask = create_mask_from_bboxes(image.size, [(100, 100, 200, 120)])
+
+        assert TiledInpainter().inpaint(image, mask, lambda tile, m, box: None) is None
+
+    def test_baidu_rectangles_translated_to_tile(self, monkeypatch):
+        provider = BaiduInpaintingProvider('token')
+        sent = []
+
+        def fake_inpaint(image, rectangles):
+            sent.append((image.size, rectangles))
+            return image.copy()
+
+        monkeypatch.setattr(provider, 'inpaint', fake_inpaint)
+        provider.inpaint_bboxes(Image.new('RGB', (1920, 1080)), [(600, 500, 700, 520)], expand_pixels=0)
+
+        (size, rectangles), = sent
+        assert size[0] < 1920 and size[1] < 1080
+        assert rectangles[0]['width'] == 100 and rectangles[0]['height'] == 20
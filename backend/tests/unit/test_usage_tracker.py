@@ -0,0 +1,144 @@
+"""
+调用用量统计单元测试
+
+验证 provider 调用的次数、耗时、token 按项目/任务/操作聚合，以及写入数据库和用量查询接口
+"""
+
+import asyncio
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from services.usage_tracker import (
+    get_usage_tracker, propagate_context, record_response_usage, track_usage, usage_operation, usage_scope
+)
+
+
+class _FakeProvider:
+    model = 'fake-model'
+
+    def _response(self, prompt_tokens, output_tokens):
+        return SimpleNamespace(usage_metadata=SimpleNamespace(
+            prompt_token_count=prompt_tokens, candidates_token_count=output_tokens,
+            thoughts_token_count=5, cached_content_token_count=0
+        ))
+
+    @track_usage('text', 'fake')
+    def generate_text(self, prompt):
+        if prompt == 'fail':
+            raise ValueError('quota exceeded')
+        record_response_usage(self._response(100, 20))
+        return 'ok'
+
+    @track_usage('text', 'fake')
+    async def agenerate_text(self, prompt):
+        await asyncio.sleep(0)
+        record_response_usage(self._response(50, 10))
+        return 'ok'
+
+    @track_usage('text', 'fake')
+    def generate_text_stream(self, prompt):
+        yield 'a'
+        yield 'b'
+        record_response_usage(self._response(30, 2))
+
+
+class _FakeService:
+    def __init__(self):
+        self.provider = _FakeProvider()
+
+    @usage_operation('generate_outline')
+    def generate_outline(self):
+        return self.provider.generate_text('outline')
+
+    @usage_operation('generate_page_description')
+    async def agenerate_page_description(self):
+        return await self.provider.agenerate_text('page')
+
+    @usage_operation('generate_outline_stream')
+    def generate_outline_stream(self):
+        return self.provider.generate_text_stream('outline')
+
+
+def _pending_for(project_id):
+    return {
+        (item['task_id'], item['operation']): item
+        for item in get_usage_tracker().pending() if item['project_id'] == project_id
+    }
+
+
+def test_calls_are_aggregated_per_scope_and_operation():
+    project_id = str(uuid.uuid4())
+    service = _FakeService()
+
+    with usage_scope(project_id=project_id):
+        service.generate_outline()
+        with usage_scope(task_id='task-1'):
+            asyncio.run(service.agenerate_page_description())
+            assert list(service.generate_outline_stream()) == ['a', 'b']
+            with pytest.raises(ValueError):
+                service.provider.generate_text('fail')
+
+    pending = _pending_for(project_id)
+    outline = pending[(None, 'generate_outline')]
+    assert (outline['calls'], outline['errors']) == (1, 0)
+    assert (outline['input_tokens'], outline['output_tokens']) == (100, 25)
+    assert outline['model'] == 'fake-model'
+    assert sum(outline['latency_buckets']) == 1
+
+    assert pending[('task-1', 'generate_page_description')]['input_tokens'] == 50
+    assert pending[('task-1', 'generate_outline_stream')]['output_tokens'] == 7
+    # 没有业务操作名时以 provider 方法名归类，异常计为失败
+    assert pending[('task-1', 'generate_text')]['errors'] == 1
+
+
+def test_propagate_context_carries_scope_into_thread_pools():
+    project_id = str(uuid.uuid4())
+    provider = _FakeProvider()
+
+    with usage_scope(project_id=project_id, task_id='task-2'):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(propagate_context(provider.generate_text), ['a', 'b', 'c']))
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(provider.generate_text, 'lost').result()
+
+    assert _pending_for(project_id)[('task-2', 'generate_text')]['calls'] == 3
+
+
+def test_usage_endpoint_reports_persisted_stats(client, sample_project):
+    from models import Task, UsageStat, db
+
+    project_id = sample_project['project_id']
+    task = Task(project_id=project_id, task_type='GENERATE_IMAGES')
+    db.session.add(task)
+    db.session.commit()
+
+    tracker = get_usage_tracker()
+    # 后台任务只知道任务 ID，写入时按任务补全项目
+    with usage_scope(task_id=task.id):
+        tracker.record('image', 'genai', 'generate_image', latency=3.0, input_tokens=200, output_tokens=1000)
+        tracker.record('image', 'genai', 'generate_image', latency=40.0, error=True)
+    tracker.flush()
+    with usage_scope(task_id=task.id):
+        tracker.record('image', 'genai', 'generate_image', latency=0.1, input_tokens=100)
+
+    response = client.get(f'/api/projects/{project_id}/usage')
+    assert response.status_code == 200
+    data = response.get_json()['data']
+
+    assert UsageStat.query.filter_by(project_id=project_id).count() == 1
+    assert data['totals']['calls'] == 3
+    assert data['totals']['errors'] == 1
+    assert data['totals']['input_tokens'] == 300
+    assert data['by_task'][0]['task_id'] == task.id
+    item = data['items'][0]
+    assert item['category'] == 'image' and item['operation'] == 'generate_image'
+    assert item['max_latency_ms'] == pytest.approx(40000)
+    # 0.1s、3s、40s 分别落在 ≤0.25s、≤5s、≤60s 的桶中
+    buckets = dict(zip(data['latency_buckets'] + ['+Inf'], item['latency_buckets']))
+    assert (buckets[0.25], buckets[5], buckets[60]) == (1, 1, 1)
+
+    summary = client.get('/api/usage').get_json()['data']
+    assert any(row['operation'] == 'generate_image' and row['calls'] >= 3 for row in summary['items'])
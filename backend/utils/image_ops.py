@@ -0,0 +1,267 @@
+"""
+图像处理后端抽象
+统一封装解码、缩放、裁剪、编码和 base64 编码，调用方不直接依赖具体的图像库
+
+后端选择（IMAGE_OPS_BACKEND，默认 auto）：
+- pyvips: 安装了 pyvips（及 libvips）时优先使用，LANCZOS 缩放、PNG/JPEG 编解码更快且会释放 GIL
+- pillow: 回退到 Pillow；如果安装的是 pillow-simd（`pip install pillow-simd` 替换 Pillow），
+  缩放和颜色转换会自动走 SIMD 路径，无需额外处理
+
+对外仍然使用 PIL.Image 作为图像对象，pyvips 只在单次操作内部使用，
+遇到 pyvips 不支持的模式/参数时逐次回退到 Pillow。
+"""
+import base64
+import io
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import numpy as np
+import PIL
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyvips
+except (ImportError, OSError):  # 未安装 pyvips 或缺少 libvips 动态库
+    pyvips = None
+
+BACKEND_AUTO = 'auto'
+BACKEND_PYVIPS = 'pyvips'
+BACKEND_PILLOW = 'pillow'
+
+# pyvips 支持直接互转的 PIL 模式 -> 通道数
+_VIPS_MODES = {'L': 1, 'RGB': 3, 'RGBA': 4}
+_BANDS_TO_MODE = {bands: mode for mode, bands in _VIPS_MODES.items()}
+
+_backend: Optional[str] = None
+
+
+def is_pillow_simd() -> bool:
+    """当前安装的 Pillow 是否为 pillow-simd（版本号带 .postN 后缀）"""
+    return '.post' in PIL.__version__
+
+
+def _configured_backend() -> str:
+    """读取 IMAGE_OPS_BACKEND 配置（优先 Flask app.config，其次环境变量）"""
+    try:
+        from flask import current_app, has_app_context
+        if has_app_context() and current_app.config.get('IMAGE_OPS_BACKEND'):
+            return str(current_app.config['IMAGE_OPS_BACKEND']).lower()
+    except ImportError:
+        pass
+    return os.getenv('IMAGE_OPS_BACKEND', BACKEND_AUTO).lower()
+
+
+def set_backend(name: Optional[str]) -> str:
+    """
+    设置图像处理后端
+
+    Args:
+        name: 'auto' / 'pyvips' / 'pillow'；None 表示重新读取配置
+
+    Returns:
+        实际生效的后端名称
+    """
+    global _backend
+    requested = (name or _configured_backend()).lower()
+    if requested not in (BACKEND_AUTO, BACKEND_PYVIPS, BACKEND_PILLOW):
+        logger.warning(f"未知的图像处理后端: {requested}，使用 auto")
+        requested = BACKEND_AUTO
+
+    if requested == BACKEND_PYVIPS and pyvips is None:
+        logger.warning("IMAGE_OPS_BACKEND=pyvips 但 pyvips 不可用，回退到 Pillow")
+    _backend = BACKEND_PYVIPS if requested != BACKEND_PILLOW and pyvips is not None else BACKEND_PILLOW
+    logger.info(f"图像处理后端: {describe_backend()}")
+    return _backend
+
+
+def get_backend() -> str:
+    """当前生效的后端：'pyvips' 或 'pillow'（首次调用时按配置解析）"""
+    if _backend is None:
+        set_backend(None)
+    return _backend
+
+
+def describe_backend() -> str:
+    """后端描述，用于日志和基准测试输出"""
+    if _backend == BACKEND_PYVIPS:
+        return f"pyvips {pyvips.__version__} (libvips {pyvips.version(0)}.{pyvips.version(1)})"
+    return f"{'pillow-simd' if is_pillow_simd() else 'Pillow'} {PIL.__version__}"
+
+
+def _use_vips(image: Optional[Image.Image] = None) -> bool:
+    return get_backend() == BACKEND_PYVIPS and (image is None or image.mode in _VIPS_MODES)
+
+
+def _pil_to_vips(image: Image.Image) -> 'pyvips.Image':
+    array = np.ascontiguousarray(np.asarray(image))
+    height, width = array.shape[:2]
+    return pyvips.Image.new_from_memory(array.data, width, height, _VIPS_MODES[image.mode], 'uchar')
+
+
+def _vips_to_pil(vimage: 'pyvips.Image') -> Image.Image:
+    if vimage.interpretation == 'cmyk':
+        # CMYK JPEG 同样是 4 通道，按 RGBA 读取会得到错误的颜色；先转为 sRGB（有内嵌 ICC 时使用该配置）
+        vimage = vimage.colourspace('srgb')
+    if vimage.format != 'uchar' or vimage.bands not in _BANDS_TO_MODE:
+        # 16 位、灰度 + alpha 等情况交给 Pillow 处理，避免截断精度
+        raise ValueError(f"不支持的 pyvips 图像: format={vimage.format}, bands={vimage.bands}")
+    mode = _BANDS_TO_MODE[vimage.bands]
+    array = np.ndarray(buffer=vimage.write_to_memory(), dtype=np.uint8,
+                       shape=(vimage.height, vimage.width, vimage.bands))
+    return Image.fromarray(array[:, :, 0] if mode == 'L' else array, mode)
+
+
+# ============== 解码 ==============
+
+def decode(data: Union[bytes, bytearray, memoryview]) -> Image.Image:
+    """
+    从内存中的图片数据解码（PNG/JPEG/WebP 等）
+
+    Returns:
+        已完成解码的 PIL Image（不依赖传入的字节数据）
+    """
+    if _use_vips():
+        try:
+            return _vips_to_pil(pyvips.Image.new_from_buffer(bytes(data), '', access='sequential'))
+        except Exception as e:  # pyvips 无法解码或无法直接转换的图片（如 GIF 动图、16 位 PNG）交给 Pillow
+            logger.debug(f"pyvips 解码失败，回退到 Pillow: {e}")
+
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+def load(path: Union[str, Path]) -> Image.Image:
+    """从文件读取并完整解码图片（需要惰性读取尺寸等元信息时仍应使用 Image.open）"""
+    with open(path, 'rb') as f:
+        return decode(f.read())
+
+
+def to_pil(image) -> Image.Image:
+    """
+    转为 PIL Image：PIL Image 原样返回，图片字节或带 image_bytes 的对象
+    （如 google.genai 的 types.Image）解码
+
+    Raises:
+        TypeError: 无法识别的图片对象
+    """
+    if isinstance(image, Image.Image):
+        return image
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return decode(image)
+    data = getattr(image, 'image_bytes', None)
+    if data:
+        return decode(data)
+    raise TypeError(f"无法转换为 PIL Image: {type(image).__name__}")
+
+
+# ============== 几何变换 ==============
+
+def resize(
+    image: Image.Image,
+    size: Tuple[int, int],
+    resample: int = Image.Resampling.LANCZOS
+) -> Image.Image:
+    """
+    缩放到指定尺寸
+
+    只有 LANCZOS 会走 pyvips（lanczos3 卷积核），其他插值方式直接使用 Pillow。
+    """
+    size = (int(size[0]), int(size[1]))
+    if image.size == size:
+        return image.copy()
+
+    if resample == Image.Resampling.LANCZOS and _use_vips(image):
+        vimage = _pil_to_vips(image)
+        resized = vimage.resize(size[0] / image.width, vscale=size[1] / image.height, kernel='lanczos3')
+        if (resized.width, resized.height) == size:
+            return _vips_to_pil(resized)
+        logger.debug(f"pyvips 缩放尺寸取整不一致 {(resized.width, resized.height)} != {size}，回退到 Pillow")
+
+    return image.resize(size, resample)
+
+
+def fit_within(
+    image: Image.Image,
+    max_size: int,
+    resample: int = Image.Resampling.LANCZOS
+) -> Image.Image:
+    """按长边等比缩小到 max_size 以内，已满足时原样返回"""
+    longest = max(image.size)
+    if longest <= max_size:
+        return image
+    ratio = max_size / longest
+    return resize(image, (int(image.width * ratio), int(image.height * ratio)), resample)
+
+
+def crop(image: Image.Image, box: Tuple[int, int, int, int]) -> Image.Image:
+    """
+    裁剪为独立图像（语义与 Image.crop 相同，超出范围的部分补黑）
+
+    裁剪只是内存拷贝，两个后端代价相同，直接使用 Pillow，避免来回转换。
+    """
+    return image.crop(tuple(int(v) for v in box))
+
+
+# ============== 编码 ==============
+
+def _vips_save_options(fmt: str, params: dict) -> Optional[Tuple[str, dict]]:
+    """把 Pillow 的保存参数映射为 pyvips 参数，无法映射时返回 None"""
+    if fmt == 'PNG' and set(params) <= {'compress_level', 'optimize'}:
+        return '.png', {'compression': int(params.get('compress_level', 9 if params.get('optimize') else 6))}
+    if fmt in ('JPEG', 'JPG') and set(params) <= {'quality', 'optimize'}:
+        return '.jpg', {'Q': int(params.get('quality', 75)), 'optimize_coding': bool(params.get('optimize', False))}
+    if fmt == 'WEBP' and set(params) <= {'quality', 'lossless'}:
+        return '.webp', {'Q': int(params.get('quality', 80)), 'lossless': bool(params.get('lossless', False))}
+    return None
+
+
+def encode(image: Image.Image, fmt: str = 'PNG', **params) -> bytes:
+    """
+    编码为图片字节
+
+    Args:
+        image: PIL Image（其他图片对象先经 to_pil 转换）
+        fmt: 'PNG' / 'JPEG' / 'WEBP' 等 Pillow 格式名
+        **params: Pillow 的保存参数（如 quality、optimize、compress_level）
+
+    Returns:
+        编码后的字节
+    """
+    image = to_pil(image)
+    fmt = fmt.upper()
+    if _use_vips(image) and not (fmt in ('JPEG', 'JPG') and image.mode == 'RGBA'):
+        options = _vips_save_options(fmt, params)
+        if options is not None:
+            suffix, vips_params = options
+            return _pil_to_vips(image).write_to_buffer(suffix, **vips_params)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **params)
+    return buffer.getvalue()
+
+
+def to_base64(image: Image.Image, fmt: str = 'PNG', **params) -> str:
+    """编码并转为 base64 字符串（不带 data URI 前缀）"""
+    return base64.b64encode(encode(image, fmt, **params)).decode('utf-8')
+
+
+def save(image: Image.Image, path: Union[str, Path], fmt: Optional[str] = None, **params) -> None:
+    """
+    保存到文件，未指定格式时按扩展名推断（与 Image.save 一致）
+    """
+    image = to_pil(image)
+    path = Path(path)
+    if fmt is None:
+        fmt = Image.registered_extensions().get(path.suffix.lower())
+        if fmt is None:
+            raise ValueError(f"无法根据扩展名确定图片格式: {path}")
+
+    if get_backend() == BACKEND_PILLOW:
+        image.save(str(path), format=fmt, **params)
+        return
+    path.write_bytes(encode(image, fmt, **params))
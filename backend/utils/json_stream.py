@@ -0,0 +1,137 @@
+"""
+增量 JSON 解析工具
+
+流式生成大纲、描述时，模型逐块返回 JSON 文本。这里逐字符扫描已收到的文本，
+在某个值（对象、数组或字符串）完整闭合时立即解析并产出，而不必等待整个响应结束。
+
+只跟踪嵌套结构与字符串边界，不做完整的语法校验；根值闭合后以 json.loads 的结果为准。
+根值之前的内容（如 ```json 代码块标记）和根值之后的内容都会被忽略。
+"""
+import json
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+# 值在根结构中的位置，例如 (2, 'pages', 0) 表示第 3 个元素的 pages 数组的第 1 项
+JSONPath = Tuple[Union[int, str], ...]
+# (路径, 解析后的值, 祖先对象中已出现的字符串字段)
+CompletedValue = Tuple[JSONPath, Any, Dict[str, Any]]
+
+
+@dataclass
+class _Container:
+    kind: str                     # '{' 或 '['
+    start: int                    # 在文本中的起始位置
+    key: Optional[str] = None     # 对象：当前字段名
+    index: int = 0                # 数组：当前元素下标
+    expect_key: bool = True       # 对象：下一个字符串是字段名还是值
+    scalars: Dict[str, Any] = field(default_factory=dict)  # 对象：已完成的字符串字段
+
+    @property
+    def slot(self) -> Union[int, str, None]:
+        return self.index if self.kind == '[' else self.key
+
+
+class IncrementalJSONParser:
+    """
+    逐块喂入 JSON 文本，返回新完成的、路径满足 select 的值
+
+    Usage:
+        >>> parser = IncrementalJSONParser(lambda path: len(path) == 1)
+        >>> parser.feed('[{"title": "A"}, {"ti')
+        [((0,), {'title': 'A'}, {})]
+        >>> parser.feed('tle": "B"}]')
+        [((1,), {'title': 'B'}, {})]
+        >>> parser.value
+        [{'title': 'A'}, {'title': 'B'}]
+    """
+
+    def __init__(self, select: Callable[[JSONPath], bool]):
+        """
+        Args:
+            select: 判断某个路径上的值完成时是否需要产出
+        """
+        self._select = select
+        self._text = ''
+        self._pos = 0
+        self._stack: List[_Container] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._started = False
+        self.done = False
+        self.value: Any = None
+
+    def feed(self, chunk: str) -> List[CompletedValue]:
+        """喂入一段文本，返回其中新完成的值"""
+        self._text += chunk
+        completed: List[CompletedValue] = []
+        text = self._text
+
+        while self._pos < len(text) and not self.done:
+            pos, c = self._pos, text[self._pos]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._on_string(text[self._string_start:pos + 1], completed)
+                continue
+
+            if not self._started:
+                # 跳过根值之前的内容（如代码块标记）
+                if c in '[{':
+                    self._started = True
+                    self._stack.append(_Container(kind=c, start=pos))
+                continue
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif c in '[{':
+                self._stack.append(_Container(kind=c, start=pos))
+            elif c in ']}':
+                container = self._stack.pop()
+                raw = text[container.start:pos + 1]
+                if not self._stack:
+                    self.done = True
+                    self.value = json.loads(raw)
+                else:
+                    self._emit(self._current_path(), raw, completed)
+            elif c == ':':
+                self._stack[-1].expect_key = False
+            elif c == ',':
+                top = self._stack[-1]
+                if top.kind == '{':
+                    top.expect_key = True
+                    top.key = None
+                else:
+                    top.index += 1
+
+        return completed
+
+    def _current_path(self) -> JSONPath:
+        """栈顶容器中当前位置（即刚完成的值）的路径"""
+        return tuple(container.slot for container in self._stack)
+
+    def _on_string(self, raw: str, completed: List[CompletedValue]):
+        top = self._stack[-1]
+        if top.kind == '{' and top.expect_key:
+            top.key = json.loads(raw)
+            return
+        if top.kind == '{':
+            top.scalars[top.key] = json.loads(raw)
+        self._emit(self._current_path(), raw, completed)
+
+    def _emit(self, path: JSONPath, raw: str, completed: List[CompletedValue]):
+        if not self._select(path):
+            return
+        context: Dict[str, Any] = {}
+        # 外层对象中已出现的字符串字段（如页面所属 part 的名称）
+        for container in self._stack:
+            if container.kind == '{':
+                context.update(container.scalars)
+        completed.append((path, json.loads(raw), context))
@@ -6,8 +6,11 @@ LaTeX 工具模块 - 处理 LaTeX 公式转换
 2. LaTeX 转 MathML
 3. MathML 转 OMML（用于 PPTX）
 """
+import os
 import re
 import logging
+import threading
+from functools import lru_cache
 from typing import Optional, Tuple
 
 logger = logging.getLogger(__name__)
@@ -75,6 +78,31 @@ SUBSCRIPT_MAP = {
     'i': 'ᵢ', 'j': 'ⱼ', 'n': 'ₙ', 'm': 'ₘ',
 }
 
+# 转义字符和符号合并为一个替换表，编译成一个交替正则，一次扫描完成全部替换
+# 按长度降序排列，保证最长匹配优先（如 \cdots 不会被 \cdot 截断）
+_REPLACEMENTS = {**LATEX_ESCAPES, **LATEX_SYMBOLS}
+_REPLACEMENT_PATTERN = re.compile(
+    '|'.join(re.escape(key) for key in sorted(_REPLACEMENTS, key=len, reverse=True))
+)
+_SUPERSCRIPT_PATTERN = re.compile(r'\^{([^{}]*)}|\^([0-9a-zA-Z])')
+_SUBSCRIPT_PATTERN = re.compile(r'_{([^{}]*)}|_([0-9a-zA-Z])')
+_STYLE_COMMAND_PATTERN = re.compile(r'\\(?:text|mathrm|mathbf|mathit|mathbb|mathcal){([^{}]*)}')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# MML2OMML.xsl 样式表路径
+MML2OMML_XSL_PATH = os.path.join(os.path.dirname(__file__), 'MML2OMML.xsl')
+
+# 转换结果缓存的条目数（按 LaTeX 字符串缓存）
+CONVERSION_CACHE_SIZE = 2048
+
+# lxml 的 XSLT 对象不能在线程间共享，每个线程编译一次
+_xslt_local = threading.local()
+
+
+def _replace_symbols(latex: str) -> str:
+    """一次扫描替换全部转义字符和符号"""
+    return _REPLACEMENT_PATTERN.sub(lambda m: _REPLACEMENTS[m.group(0)], latex)
+
 
 def is_simple_latex(latex: str) -> bool:
     """
@@ -88,21 +116,14 @@ def is_simple_latex(latex: str) -> bool:
     # 移除所有已知的简单模式
     test = latex
     
-    # 移除转义字符
-    for escape in LATEX_ESCAPES:
-        test = test.replace(escape, '')
-    
-    # 移除符号
-    for symbol in LATEX_SYMBOLS:
-        test = test.replace(symbol, '')
+    # 移除转义字符和符号
+    test = _REPLACEMENT_PATTERN.sub('', test)
     
     # 移除简单上下标 ^{...} 或 ^x
-    test = re.sub(r'\^{[^{}]*}', '', test)
-    test = re.sub(r'\^[0-9a-zA-Z]', '', test)
+    test = _SUPERSCRIPT_PATTERN.sub('', test)
     
     # 移除简单下标 _{...} 或 _x
-    test = re.sub(r'_{[^{}]*}', '', test)
-    test = re.sub(r'_[0-9a-zA-Z]', '', test)
+    test = _SUBSCRIPT_PATTERN.sub('', test)
     
     # 如果剩余的都是普通字符，则是简单 LaTeX
     remaining = test.strip()
@@ -123,36 +144,29 @@ def latex_to_text(latex: str) -> str:
     Returns:
         转换后的文本
     """
-    result = latex
-    
-    # 1. 处理转义字符
-    for escape, char in LATEX_ESCAPES.items():
-        result = result.replace(escape, char)
-    
-    # 2. 处理符号
-    for symbol, char in LATEX_SYMBOLS.items():
-        result = result.replace(symbol, char)
+    # 1. 处理转义字符和符号
+    result = _replace_symbols(latex)
     
-    # 3. 处理上标 ^{...} 或 ^x
+    # 2. 处理上标 ^{...} 或 ^x
     def convert_superscript(match):
-        content = match.group(1) if match.group(1) else match.group(2)
+        content = match.group(1) if match.group(1) is not None else match.group(2)
         return ''.join(SUPERSCRIPT_MAP.get(c, c) for c in content)
     
-    result = re.sub(r'\^{([^{}]*)}|\^([0-9a-zA-Z])', convert_superscript, result)
+    result = _SUPERSCRIPT_PATTERN.sub(convert_superscript, result)
     
-    # 4. 处理下标 _{...} 或 _x
+    # 3. 处理下标 _{...} 或 _x
     def convert_subscript(match):
-        content = match.group(1) if match.group(1) else match.group(2)
+        content = match.group(1) if match.group(1) is not None else match.group(2)
         return ''.join(SUBSCRIPT_MAP.get(c, c) for c in content)
     
-    result = re.sub(r'_{([^{}]*)}|_([0-9a-zA-Z])', convert_subscript, result)
+    result = _SUBSCRIPT_PATTERN.sub(convert_subscript, result)
     
-    # 5. 移除剩余的 LaTeX 命令（如 \text{}, \mathrm{} 等）
-    result = re.sub(r'\\(?:text|mathrm|mathbf|mathit|mathbb|mathcal){([^{}]*)}', r'\1', result)
+    # 4. 移除剩余的 LaTeX 命令（如 \text{}, \mathrm{} 等）
+    result = _STYLE_COMMAND_PATTERN.sub(r'\1', result)
     
-    # 6. 清理多余的空格和花括号
+    # 5. 清理多余的空格和花括号
     result = result.replace('{', '').replace('}', '')
-    result = re.sub(r'\s+', ' ', result).strip()
+    result = _WHITESPACE_PATTERN.sub(' ', result).strip()
     
     return result
 
@@ -176,6 +190,29 @@ def latex_to_mathml(latex: str) -> Optional[str]:
         return None
 
 
+def _get_omml_transform():
+    """
+    获取当前线程编译好的 MML2OMML XSLT（每个线程只解析、编译一次样式表）
+    
+    Returns:
+        etree.XSLT，样式表不存在时返回 None
+    """
+    from lxml import etree
+    
+    transforms = getattr(_xslt_local, 'transforms', None)
+    if transforms is None:
+        transforms = _xslt_local.transforms = {}
+    
+    transform = transforms.get(MML2OMML_XSL_PATH)
+    if transform is None:
+        if not os.path.exists(MML2OMML_XSL_PATH):
+            logger.warning(f"MML2OMML.xsl not found at {MML2OMML_XSL_PATH}")
+            return None
+        transform = etree.XSLT(etree.parse(MML2OMML_XSL_PATH))
+        transforms[MML2OMML_XSL_PATH] = transform
+    return transform
+
+
 def mathml_to_omml(mathml: str) -> Optional[str]:
     """
     将 MathML 转换为 OMML (Office Math Markup Language)
@@ -190,22 +227,15 @@ def mathml_to_omml(mathml: str) -> Optional[str]:
     """
     try:
         from lxml import etree
-        import os
-        
-        # MML2OMML.xsl 样式表路径
-        xsl_path = os.path.join(os.path.dirname(__file__), 'MML2OMML.xsl')
         
-        if not os.path.exists(xsl_path):
-            logger.warning(f"MML2OMML.xsl not found at {xsl_path}")
+        # 加载 XSLT（按线程缓存）
+        transform = _get_omml_transform()
+        if transform is None:
             return None
         
         # 解析 MathML
         mathml_tree = etree.fromstring(mathml.encode('utf-8'))
         
-        # 加载 XSLT
-        xslt_tree = etree.parse(xsl_path)
-        transform = etree.XSLT(xslt_tree)
-        
         # 转换
         omml_tree = transform(mathml_tree)
         return etree.tostring(omml_tree, encoding='unicode')
@@ -218,10 +248,13 @@ def mathml_to_omml(mathml: str) -> Optional[str]:
         return None
 
 
+@lru_cache(maxsize=CONVERSION_CACHE_SIZE)
 def convert_latex_for_pptx(latex: str) -> Tuple[str, Optional[str]]:
     """
     为 PPTX 转换 LaTeX 公式
     
+    结果按 LaTeX 字符串缓存，同一套演示文稿中重复出现的公式只转换一次
+    
     Args:
         latex: LaTeX 字符串
     
@@ -3,8 +3,13 @@
 用于从边界框（bbox）生成黑白掩码图像
 """
 import logging
+import threading
 from typing import List, Tuple, Union, Callable
-from PIL import Image, ImageDraw
+
+import numpy as np
+from PIL import Image
+
+from utils import image_ops
 
 logger = logging.getLogger(__name__)
 
@@ -106,6 +111,123 @@ def _iterative_merge(
     return normalized
 
 
+# 掩码填充缓冲区（按线程复用，避免每次修复都重新分配整张图大小的数组）
+_mask_buffers = threading.local()
+
+
+def _get_mask_buffer(width: int, height: int) -> np.ndarray:
+    """获取当前线程可复用的 (height, width) uint8 缓冲区，并清零"""
+    buffer = getattr(_mask_buffers, 'buffer', None)
+    if buffer is None or buffer.shape != (height, width):
+        buffer = np.zeros((height, width), dtype=np.uint8)
+        _mask_buffers.buffer = buffer
+    else:
+        buffer.fill(0)
+    return buffer
+
+
+def _bboxes_to_array(bboxes: List[Union[Tuple, List, dict]]) -> np.ndarray:
+    """解析各种格式的 bbox，返回 (N, 4) 的 float64 坐标数组，无法识别的 bbox 会被跳过"""
+    coords = []
+    for bbox in bboxes:
+        try:
+            coords.append(normalize_bbox(bbox))
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"无法识别的 bbox 格式: {bbox}")
+    if not coords:
+        return np.empty((0, 4), dtype=np.float64)
+    return np.asarray(coords, dtype=np.float64)
+
+
+def fill_bbox_mask(
+    image_size: Tuple[int, int],
+    bboxes: List[Union[Tuple[int, int, int, int], dict]],
+    expand_pixels: int = 0
+) -> np.ndarray:
+    """
+    把边界框填充到 (height, width) 的 uint8 数组中（1=掩码区域，0=背景）
+
+    坐标的扩展/收缩、裁剪和有效性检查都在坐标数组上一次完成：
+    矩形按 expand_pixels 做方形膨胀的结果仍是矩形，直接移动边界即可，不需要逐像素膨胀。
+    右下角与 ImageDraw.rectangle 一致为闭区间。
+
+    注意：返回的是线程内复用的缓冲区，下一次调用会被覆盖，需要保留时请 copy()。
+
+    Args:
+        image_size: 图像尺寸 (width, height)
+        bboxes: 边界框列表，格式同 create_mask_from_bboxes
+        expand_pixels: 扩展像素数，负数表示向内收缩
+
+    Returns:
+        (height, width) 的 uint8 数组
+    """
+    width, height = image_size
+    mask = _get_mask_buffer(width, height)
+
+    coords = _bboxes_to_array(bboxes)
+    if not len(coords):
+        return mask
+
+    if expand_pixels > 0:
+        coords[:, :2] -= expand_pixels
+        coords[:, 2:] += expand_pixels
+    elif expand_pixels < 0:
+        shrink = -expand_pixels
+        coords[:, :2] += shrink
+        coords[:, 2:] -= shrink
+        shrunk_valid = (coords[:, 2] > coords[:, 0]) & (coords[:, 3] > coords[:, 1])
+        if not shrunk_valid.all():
+            logger.warning(f"{int((~shrunk_valid).sum())} 个 bbox 收缩后无效，跳过")
+        coords = coords[shrunk_valid]
+
+    # 确保坐标在图像范围内，并去掉无效的 bbox
+    np.clip(coords[:, 0::2], 0, width, out=coords[:, 0::2])
+    np.clip(coords[:, 1::2], 0, height, out=coords[:, 1::2])
+    valid = (coords[:, 2] > coords[:, 0]) & (coords[:, 3] > coords[:, 1])
+    if not valid.all():
+        logger.warning(f"{int((~valid).sum())} 个 bbox 最终坐标无效，跳过")
+
+    # ImageDraw 对浮点坐标向下取整；闭区间右下角 +1 转为切片上界
+    boxes = np.floor(coords[valid]).astype(np.int64)
+    boxes[:, 2:] += 1
+    for x1, y1, x2, y2 in boxes.tolist():
+        mask[y1:y2, x1:x2] = 1
+
+    logger.debug(f"填充了 {len(boxes)} 个bbox的mask，覆盖 {int(mask.sum())} 像素")
+    return mask
+
+
+def dilate_mask(mask: np.ndarray, radius: int) -> np.ndarray:
+    """
+    可分离的方形膨胀（灰度最大值滤波），等价于 ImageFilter.MaxFilter(2 * radius + 1)
+
+    先沿行、再沿列取滑动窗口最大值，每个方向只需 radius 次整块 np.maximum，
+    比 PIL 的二维 MaxFilter 快一个数量级。
+
+    Args:
+        mask: 二维数组
+        radius: 膨胀半径（像素），<= 0 时原样返回副本
+
+    Returns:
+        与输入同形状、同类型的新数组
+    """
+    result = np.array(mask, copy=True)
+    if radius <= 0:
+        return result
+
+    for axis in (0, 1):
+        source = result.copy()
+        length = source.shape[axis]
+        for offset in range(1, min(radius, length - 1) + 1):
+            head = [slice(None)] * 2
+            tail = [slice(None)] * 2
+            head[axis] = slice(0, length - offset)
+            tail[axis] = slice(offset, length)
+            np.maximum(result[tuple(head)], source[tuple(tail)], out=result[tuple(head)])
+            np.maximum(result[tuple(tail)], source[tuple(head)], out=result[tuple(tail)])
+    return result
+
+
 def create_mask_from_bboxes(
     image_size: Tuple[int, int],
     bboxes: List[Union[Tuple[int, int, int, int], dict]],
@@ -130,90 +252,19 @@ def create_mask_from_bboxes(
         PIL Image 对象，RGB 模式的掩码图像
     """
     try:
-        # 创建黑色背景图像
-        mask = Image.new('RGB', image_size, background_color)
-        draw = ImageDraw.Draw(mask)
-        
         logger.info(f"创建掩码图像，尺寸: {image_size}, bbox数量: {len(bboxes)}")
-        
-        # 绘制每个 bbox 为白色区域
-        bbox_list = []  # 用于记录所有bbox坐标
-        for i, bbox in enumerate(bboxes):
-            # 解析不同格式的 bbox
-            if isinstance(bbox, dict):
-                if 'x1' in bbox and 'y1' in bbox and 'x2' in bbox and 'y2' in bbox:
-                    # 格式: {"x1": x1, "y1": y1, "x2": x2, "y2": y2}
-                    x1 = bbox['x1']
-                    y1 = bbox['y1']
-                    x2 = bbox['x2']
-                    y2 = bbox['y2']
-                elif 'x' in bbox and 'y' in bbox and 'width' in bbox and 'height' in bbox:
-                    # 格式: {"x": x, "y": y, "width": w, "height": h}
-                    x1 = bbox['x']
-                    y1 = bbox['y']
-                    x2 = x1 + bbox['width']
-                    y2 = y1 + bbox['height']
-                else:
-                    logger.warning(f"无法识别的 bbox 字典格式: {bbox}")
-                    continue
-            elif isinstance(bbox, (tuple, list)) and len(bbox) == 4:
-                # 格式: (x1, y1, x2, y2)
-                x1, y1, x2, y2 = bbox
-            else:
-                logger.warning(f"无法识别的 bbox 格式: {bbox}")
-                continue
-            
-            # 记录原始坐标
-            x1_orig, y1_orig, x2_orig, y2_orig = x1, y1, x2, y2
-            
-            # 应用扩展或收缩
-            if expand_pixels > 0:
-                # 扩展
-                x1 = max(0, x1 - expand_pixels)
-                y1 = max(0, y1 - expand_pixels)
-                x2 = min(image_size[0], x2 + expand_pixels)
-                y2 = min(image_size[1], y2 + expand_pixels)
-            elif expand_pixels < 0:
-                # 收缩（向内收缩）
-                shrink = abs(expand_pixels)
-                x1 = x1 + shrink
-                y1 = y1 + shrink
-                x2 = x2 - shrink
-                y2 = y2 - shrink
-                # 确保收缩后仍然有效（宽度和高度必须大于0）
-                if x2 <= x1 or y2 <= y1:
-                    logger.warning(f"bbox {i+1} 收缩后无效: ({x1}, {y1}, {x2}, {y2})，跳过")
-                    continue
-            
-            # 确保坐标在图像范围内
-            x1 = max(0, min(x1, image_size[0]))
-            y1 = max(0, min(y1, image_size[1]))
-            x2 = max(0, min(x2, image_size[0]))
-            y2 = max(0, min(y2, image_size[1]))
-            
-            # 再次检查有效性
-            if x2 <= x1 or y2 <= y1:
-                logger.warning(f"bbox {i+1} 最终坐标无效: ({x1}, {y1}, {x2}, {y2})，跳过")
-                continue
-            
-            # 绘制矩形
-            draw.rectangle([x1, y1, x2, y2], fill=mask_color)
-            width = x2 - x1
-            height = y2 - y1
-            if expand_pixels > 0:
-                bbox_list.append(f"  [{i+1}] 原始: ({x1_orig}, {y1_orig}, {x2_orig}, {y2_orig}) -> 扩展后: ({x1}, {y1}, {x2}, {y2}) 尺寸: {width}x{height}")
-            elif expand_pixels < 0:
-                bbox_list.append(f"  [{i+1}] 原始: ({x1_orig}, {y1_orig}, {x2_orig}, {y2_orig}) -> 收缩后: ({x1}, {y1}, {x2}, {y2}) 尺寸: {width}x{height}")
-            else:
-                bbox_list.append(f"  [{i+1}] ({x1}, {y1}, {x2}, {y2}) 尺寸: {width}x{height}")
-            logger.debug(f"bbox {i+1}: ({x1}, {y1}, {x2}, {y2}) 尺寸: {width}x{height}")
-        
-        # 输出所有bbox的详细信息
-        if bbox_list:
-            logger.info(f"添加了 {len(bbox_list)} 个bbox的mask:")
-            for bbox_info in bbox_list:
-                logger.info(bbox_info)
-        
+
+        filled = fill_bbox_mask(image_size, bboxes, expand_pixels=expand_pixels)
+
+        # 每个通道用查找表把 0/1 映射为背景色/掩码色再合并（point 会复制数据，缓冲区可以继续复用）
+        # 黑白等灰度配色时三个通道相同，只需映射一次
+        index = Image.fromarray(filled, 'L')
+        bands = {}
+        for bg, fg in zip(background_color, mask_color):
+            if (bg, fg) not in bands:
+                bands[(bg, fg)] = index.point([bg, fg] + [0] * 254)
+        mask = Image.merge('RGB', [bands[pair] for pair in zip(background_color, mask_color)])
+
         logger.info(f"掩码图像创建完成")
         return mask
         
@@ -291,7 +342,7 @@ def visualize_mask_overlay(
         # 确保两个图像尺寸相同
         if original_image.size != mask_image.size:
             logger.warning(f"图像尺寸不匹配，调整掩码尺寸: {mask_image.size} -> {original_image.size}")
-            mask_image = mask_image.resize(original_image.size, Image.LANCZOS)
+            mask_image = image_ops.resize(mask_image, original_image.size)
         
         # 转换为 RGBA
         if original_image.mode != 'RGBA':
@@ -299,25 +350,12 @@ def visualize_mask_overlay(
         else:
             original_rgba = original_image.copy()
         
-        # 创建黑色半透明掩码用于可视化
-        mask_rgba = Image.new('RGBA', original_image.size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(mask_rgba)
-        
-        # 遍历掩码图像，将白色区域绘制为黑色半透明
-        mask_array = mask_image.load()
-        mask_rgba_array = mask_rgba.load()
-        
-        for y in range(mask_image.size[1]):
-            for x in range(mask_image.size[0]):
-                pixel = mask_array[x, y]
-                # 如果是白色（或接近白色），设置为黑色半透明
-                if isinstance(pixel, tuple):
-                    brightness = sum(pixel) / len(pixel)
-                else:
-                    brightness = pixel
-                
-                if brightness > 200:  # 接近白色
-                    mask_rgba_array[x, y] = (0, 0, 0, int(128 * alpha))
+        # 白色（或接近白色）的掩码区域绘制为黑色半透明
+        mask_array = np.asarray(mask_image.convert('L') if mask_image.mode == '1' else mask_image)
+        brightness = mask_array.mean(axis=2) if mask_array.ndim == 3 else mask_array
+        overlay = np.zeros((original_image.size[1], original_image.size[0], 4), dtype=np.uint8)
+        overlay[..., 3] = np.where(brightness > 200, int(128 * alpha), 0)
+        mask_rgba = Image.fromarray(overlay, 'RGBA')
         
         # 叠加
         result = Image.alpha_composite(original_rgba, mask_rgba)
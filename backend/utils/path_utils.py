@@ -9,6 +9,26 @@ from typing import Optional
 logger = logging.getLogger(__name__)
 
 
+def _get_upload_folder(project_root: Optional[Path] = None) -> Path:
+    """
+    获取上传目录：显式传入 project_root 时使用 {project_root}/uploads，
+    否则优先使用 Flask 配置中的 UPLOAD_FOLDER，最后回退到项目根目录下的 uploads
+    """
+    if project_root is not None:
+        return Path(project_root) / 'uploads'
+    
+    try:
+        from flask import current_app, has_app_context
+        if has_app_context() and current_app.config.get('UPLOAD_FOLDER'):
+            return Path(current_app.config['UPLOAD_FOLDER'])
+    except ImportError:
+        pass
+    
+    # Navigate to project root (assuming this file is in backend/utils/)
+    current_file = Path(__file__).resolve()
+    return current_file.parent.parent.parent / 'uploads'
+
+
 def convert_mineru_path_to_local(mineru_path: str, project_root: Optional[Path] = None) -> Optional[Path]:
     """
     将 /files/mineru/{extract_id}/{rel_path} 格式的路径转换为本地文件系统路径
@@ -27,15 +47,8 @@ def convert_mineru_path_to_local(mineru_path: str, project_root: Optional[Path]
         # Remove '/files/mineru/' prefix
         rel_path = mineru_path.replace('/files/mineru/', '')
         
-        # Get project root if not provided
-        if project_root is None:
-            # Navigate to project root (assuming this file is in backend/utils/)
-            current_file = Path(__file__).resolve()
-            backend_dir = current_file.parent.parent
-            project_root = backend_dir.parent
-        
-        # Construct full path: {project_root}/uploads/mineru_files/{rel_path}
-        local_path = project_root / 'uploads' / 'mineru_files' / rel_path
+        # Construct full path: {upload_folder}/mineru_files/{rel_path}
+        local_path = _get_upload_folder(project_root) / 'mineru_files' / rel_path
         
         return local_path
     except Exception as e:
@@ -2,19 +2,40 @@
 PPTX Builder - utilities for creating editable PPTX files
 Based on OpenDCAI/DataFlow-Agent's implementation
 """
+import io
 import os
+import hashlib
 import logging
+import threading
+from functools import lru_cache
 from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
+import numpy as np
 from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.enum.text import PP_ALIGN
 from pptx.dml.color import RGBColor
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml import parse_xml
+from pptx.parts.image import Image as PptxImage, ImagePart
+from pptx.shapes.shapetree import SlideShapes
 from PIL import Image, ImageFont, ImageDraw
 from html.parser import HTMLParser
+from lxml import etree
+
+from utils import image_ops
 
 logger = logging.getLogger(__name__)
 
+# Private SlideShapes helpers used to add a picture for an existing image part. They are stable
+# across python-pptx 1.0.x (pinned in pyproject); other versions fall back to the public API.
+_HAS_PICTURE_PART_API = all(
+    hasattr(SlideShapes, name)
+    for name in ('_add_pic_from_image_part', '_recalculate_extents', '_shape_factory')
+)
+# Same for inserting pre-rendered shape XML (add_shape_xml)
+_HAS_SHAPE_XML_API = all(hasattr(SlideShapes, name) for name in ('_next_shape_id', '_shape_factory'))
+
 
 class HTMLTableParser(HTMLParser):
     """Parse HTML table into row/column data"""
@@ -63,6 +84,131 @@ class HTMLTableParser(HTMLParser):
         return parser.table_data
 
 
+class PPTXMediaRegistry:
+    """
+    Deduplicated image parts for one presentation
+
+    python-pptx re-reads and re-hashes the file on every add_picture() call and then scans
+    every part in the package for a matching SHA1. Decks that repeat the same background,
+    logo or template crop on each slide pay that cost per slide. The registry reads and
+    hashes each file once, keeps its own SHA1 -> ImagePart index and relates the existing
+    part to every slide that uses it.
+
+    With merge_similar=True, an image with the same pixel size as an already embedded image
+    reuses that image's part when no pixel differs by more than SIMILAR_MAX_DIFF (re-encoded
+    copies, crops of the same template region). Candidates are found by a thumbnail
+    comparison and then verified at full resolution, so small content changes never merge.
+    """
+
+    # Thumbnail edge used to find merge candidates
+    THUMBNAIL_SIZE = 32
+    # Max per-channel difference (0-255) of any pixel for two images to count as identical
+    SIMILAR_MAX_DIFF = 16
+
+    def __init__(self, prs: Presentation, merge_similar: bool = False):
+        self.prs = prs
+        self.merge_similar = merge_similar
+        self._by_file: Dict[Tuple[str, int, int], Any] = {}
+        self._by_sha1: Dict[str, Any] = {}
+        # {(width, height): [(thumbnail, image_path, image_part)]} for merge_similar
+        self._candidates: Dict[Tuple[int, int], List[Tuple[np.ndarray, str, Any]]] = {}
+        self.stats = {'files_read': 0, 'parts_created': 0, 'exact_reuses': 0, 'similar_reuses': 0}
+
+    @staticmethod
+    def _file_key(image_path: str) -> Tuple[str, int, int]:
+        stat = os.stat(image_path)
+        return os.path.realpath(image_path), stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _pixels(image: Image.Image) -> np.ndarray:
+        return np.asarray(image.convert('RGBA'), dtype=np.int16)
+
+    @classmethod
+    def _thumbnail(cls, image: Image.Image) -> np.ndarray:
+        size = (cls.THUMBNAIL_SIZE, cls.THUMBNAIL_SIZE)
+        return cls._pixels(image.resize(size, Image.Resampling.BOX))
+
+    def _find_similar(self, image: Image.Image, thumbnail: np.ndarray):
+        pixels = None
+        for other_thumbnail, other_path, image_part in self._candidates.get(image.size, []):
+            # BOX thumbnails are area means: images within the threshold always have thumbnails within it
+            if np.abs(thumbnail - other_thumbnail).max() > self.SIMILAR_MAX_DIFF:
+                continue
+            if pixels is None:
+                pixels = self._pixels(image)
+            other_pixels = self._pixels(image_ops.load(other_path))
+            if np.abs(pixels - other_pixels).max() <= self.SIMILAR_MAX_DIFF:
+                return image_part
+        return None
+
+    def _read_blob(self, image_path: str) -> Tuple[bytes, Optional[Image.Image]]:
+        """
+        Read the bytes to embed; WebP (GENERATED_IMAGE_PROFILE=webp-lossless) is not supported
+        by PowerPoint and is converted to PNG. The decoded image is returned when needed later.
+        """
+        self.stats['files_read'] += 1
+        if image_path.lower().endswith('.webp'):
+            image = image_ops.load(image_path)
+            return image_ops.encode(image, 'PNG'), image
+        with open(image_path, 'rb') as f:
+            return f.read(), None
+
+    def get_image_part(self, image_path: str):
+        """
+        Return the ImagePart holding image_path, creating it on first use
+
+        Raises:
+            OSError: the file cannot be read
+        """
+        file_key = self._file_key(image_path)
+        image_part = self._by_file.get(file_key)
+        if image_part is not None:
+            self.stats['exact_reuses'] += 1
+            return image_part
+
+        blob, image = self._read_blob(image_path)
+        sha1 = hashlib.sha1(blob).hexdigest()
+        image_part = self._by_sha1.get(sha1)
+        if image_part is not None:
+            self.stats['exact_reuses'] += 1
+        else:
+            if self.merge_similar:
+                if image is None:
+                    image = image_ops.decode(blob)
+                thumbnail = self._thumbnail(image)
+                image_part = self._find_similar(image, thumbnail)
+                if image_part is not None:
+                    self.stats['similar_reuses'] += 1
+                    logger.debug(f"Reusing perceptually identical image part for {image_path}")
+            if image_part is None:
+                pptx_image = PptxImage.from_blob(blob, os.path.basename(image_path))
+                image_part = ImagePart.new(self.prs.part.package, pptx_image)
+                self.stats['parts_created'] += 1
+                if self.merge_similar:
+                    self._candidates.setdefault(image.size, []).append((thumbnail, image_path, image_part))
+            self._by_sha1[sha1] = image_part
+
+        self._by_file[file_key] = image_part
+        return image_part
+
+    def add_picture(self, slide, image_path: str, left, top, width, height):
+        """
+        Add a picture shape for image_path, sharing the image part with other slides
+
+        Same result as slide.shapes.add_picture(image_path, left, top, width, height).
+        """
+        image_part = self.get_image_part(image_path)
+        shapes = slide.shapes
+        if not _HAS_PICTURE_PART_API:
+            # Public API: python-pptx finds the already related part by SHA1, so it is still shared
+            return shapes.add_picture(io.BytesIO(image_part.blob), left, top, width, height)
+        rId = slide.part.relate_to(image_part, RT.IMAGE)
+        # Same steps as SlideShapes.add_picture() minus the per-call package scan
+        pic = shapes._add_pic_from_image_part(image_part, rId, left, top, width, height)
+        shapes._recalculate_extents()
+        return shapes._shape_factory(pic)
+
+
 class PPTXBuilder:
     """Builder class for creating editable PPTX files from structured content"""
     
@@ -87,23 +233,63 @@ class PPTXBuilder:
     # 项目内置字体（Noto Sans CJK SC，支持中日韩文字）
     FONT_PATH = os.path.join(os.path.dirname(__file__), "..", "fonts", "NotoSansSC-Regular.ttf")
     
-    # Font cache: {size_pt: ImageFont}
-    _font_cache: Dict[float, ImageFont.FreeTypeFont] = {}
+    # Glyph advance widths are measured once at this size and scaled linearly for other sizes
+    REFERENCE_FONT_SIZE = 100
+    
+    # Memoized font-fitting results: (text, usable width, usable height) -> size
+    FONT_FIT_CACHE_SIZE = 8192
+    
+    # Advance-width table: {char: width in points at 1pt font size}
+    _advance_widths: Dict[str, float] = {}
+    _reference_font: Optional[ImageFont.FreeTypeFont] = None
+    _reference_font_failed = False
+    _font_lock = threading.Lock()
     
     @classmethod
-    def _get_font(cls, size_pt: float) -> Optional[ImageFont.FreeTypeFont]:
-        """Get font object for given size (with caching)"""
-        # Round to 0.5pt for cache efficiency
-        cache_key = round(size_pt * 2) / 2
-        
-        if cache_key not in cls._font_cache:
-            try:
-                cls._font_cache[cache_key] = ImageFont.truetype(cls.FONT_PATH, int(size_pt))
-            except Exception as e:
-                logger.warning(f"Failed to load font {cls.FONT_PATH}: {e}")
+    def _get_reference_font(cls) -> Optional[ImageFont.FreeTypeFont]:
+        """Load the font once at REFERENCE_FONT_SIZE (None if unavailable)"""
+        if cls._reference_font is None and not cls._reference_font_failed:
+            with cls._font_lock:
+                if cls._reference_font is None and not cls._reference_font_failed:
+                    try:
+                        cls._reference_font = ImageFont.truetype(cls.FONT_PATH, cls.REFERENCE_FONT_SIZE)
+                    except Exception as e:
+                        logger.warning(f"Failed to load font {cls.FONT_PATH}: {e}")
+                        cls._reference_font_failed = True
+        return cls._reference_font
+    
+    @classmethod
+    def _char_width_em(cls, char: str) -> Optional[float]:
+        """Advance width of a character at 1pt, measured once per character"""
+        width = cls._advance_widths.get(char)
+        if width is None:
+            font = cls._get_reference_font()
+            if font is None:
                 return None
-        
-        return cls._font_cache[cache_key]
+            width = font.getlength(char) / cls.REFERENCE_FONT_SIZE
+            cls._advance_widths[char] = width
+        return width
+    
+    @staticmethod
+    def _estimate_char_width_em(char: str) -> float:
+        """Fallback width estimate at 1pt: CJK glyphs are full-width, others half-width"""
+        if '\u4e00' <= char <= '\u9fff' or '\u3040' <= char <= '\u30ff' or '\uac00' <= char <= '\ud7af':
+            return 1.0
+        return 0.5
+    
+    @classmethod
+    def _line_width_em(cls, line: str, use_precise: bool) -> float:
+        """Width of a line at 1pt font size (precise advance widths or estimation)"""
+        if use_precise:
+            total = 0.0
+            for char in line:
+                width = cls._char_width_em(char)
+                if width is None:
+                    break
+                total += width
+            else:
+                return total
+        return sum(cls._estimate_char_width_em(char) for char in line)
     
     @classmethod
     def _measure_text_width(cls, text: str, font_size_pt: float) -> Optional[float]:
@@ -117,38 +303,81 @@ class PPTXBuilder:
         Returns:
             Text width in points, or None if measurement failed
         """
-        font = cls._get_font(font_size_pt)
-        if font is None:
+        if cls._get_reference_font() is None:
             return None
+        return cls._line_width_em(text, use_precise=True) * font_size_pt
+    
+    @staticmethod
+    @lru_cache(maxsize=FONT_FIT_CACHE_SIZE)
+    def _fit_font_size(text: str, usable_width_pt: float, usable_height_pt: float, use_precise: bool) -> float:
+        """
+        Find the largest integer font size whose wrapped text fits the box (binary search)
         
-        try:
-            # Get text bounding box: (left, top, right, bottom)
-            bbox = font.getbbox(text)
-            width_px = bbox[2] - bbox[0]
-            # Font is loaded at size=font_size_pt, so pixel width ≈ point width
-            return width_px
-        except Exception as e:
-            logger.warning(f"Failed to measure text: {e}")
-            return None
+        Required height grows monotonically with font size (each line needs at least as many
+        wrapped rows, and each row is taller), so binary search over [MIN, MAX] is exact.
+        """
+        builder = PPTXBuilder
+        line_widths = [builder._line_width_em(line, use_precise) for line in text.split('\n')]
+        wrap_width = max(1, int(usable_width_pt))
+        
+        def fits(font_size: int) -> bool:
+            # Same whole-point wrap arithmetic as the former linear scan, so both pick the same size
+            # Line height ratio: 1.0 for tight bbox
+            required_lines = sum(
+                max(1, -(-int(width * font_size) // wrap_width)) if width else 1
+                for width in line_widths
+            )
+            return required_lines * font_size <= usable_height_pt
+        
+        lo, hi = int(builder.MIN_FONT_SIZE), int(builder.MAX_FONT_SIZE)
+        if not fits(lo):
+            return float(builder.MIN_FONT_SIZE)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if fits(mid):
+                lo = mid
+            else:
+                hi = mid - 1
+        return float(lo)
     
-    def __init__(self, slide_width_inches: float = None, slide_height_inches: float = None):
+    def __init__(self, slide_width_inches: float = None, slide_height_inches: float = None,
+                 merge_similar_images: Optional[bool] = None):
         """
         Initialize PPTX builder
         
         Args:
             slide_width_inches: Slide width in inches (default: 10)
             slide_height_inches: Slide height in inches (default: 5.625)
+            merge_similar_images: Embed perceptually identical images only once
+                (default: PPTX_MERGE_SIMILAR_IMAGES config)
         """
         self.slide_width_inches = slide_width_inches or self.DEFAULT_SLIDE_WIDTH_INCHES
         self.slide_height_inches = slide_height_inches or self.DEFAULT_SLIDE_HEIGHT_INCHES
+        if merge_similar_images is None:
+            merge_similar_images = self._configured_merge_similar()
+        self.merge_similar_images = merge_similar_images
         self.prs = None
+        self.media = None
         self.current_slide = None
         
+    @staticmethod
+    def _configured_merge_similar() -> bool:
+        """Read PPTX_MERGE_SIMILAR_IMAGES (Flask app.config first, then Config)"""
+        try:
+            from flask import current_app, has_app_context
+            if has_app_context() and 'PPTX_MERGE_SIMILAR_IMAGES' in current_app.config:
+                return bool(current_app.config['PPTX_MERGE_SIMILAR_IMAGES'])
+        except ImportError:
+            pass
+        from config import get_config
+        return bool(getattr(get_config(), 'PPTX_MERGE_SIMILAR_IMAGES', False))
+    
     def create_presentation(self) -> Presentation:
         """Create a new presentation with configured dimensions"""
         self.prs = Presentation()
         self.prs.slide_width = Inches(self.slide_width_inches)
         self.prs.slide_height = Inches(self.slide_height_inches)
+        self.media = PPTXMediaRegistry(self.prs, merge_similar=self.merge_similar_images)
         return self.prs
     
     def setup_presentation_size(self, width_pixels: int, height_pixels: int, dpi: int = None):
@@ -217,6 +446,81 @@ class PPTXBuilder:
         self.current_slide = self.prs.slides.add_slide(blank_layout)
         return self.current_slide
     
+    def add_picture(self, slide, image_path: str, left, top, width, height):
+        """
+        Add a picture through the media registry (each image file is embedded once)
+        
+        Args:
+            slide: Target slide
+            image_path: Path to image file (PNG/JPEG/WebP)
+            left, top, width, height: Position and size (EMU / Length)
+        """
+        return self.media.add_picture(slide, image_path, left, top, width, height)
+    
+    def add_background_image(self, slide, image_path: str):
+        """Add an image stretched over the whole slide"""
+        return self.add_picture(slide, image_path, 0, 0, self.prs.slide_width, self.prs.slide_height)
+    
+    # Per-thread scratch slide used by render_text_element_xml()
+    _scratch = threading.local()
+    
+    @classmethod
+    def render_text_element_xml(cls, text: str, bbox: List[int], **kwargs) -> bytes:
+        """
+        Render a text element to standalone `p:sp` XML
+        
+        The textbox XML only depends on the text, bbox and style, not on the target slide,
+        so it can be produced in worker processes and inserted later with add_shape_xml().
+        
+        Args:
+            text, bbox, **kwargs: Same as add_text_element()
+        
+        Returns:
+            Serialized `p:sp` element
+        """
+        builder = getattr(cls._scratch, 'builder', None)
+        if builder is None:
+            builder = cls(merge_similar_images=False)
+            builder.add_blank_slide()
+            cls._scratch.builder = builder
+        
+        slide = builder.current_slide
+        sp_tree = slide.shapes.element
+        try:
+            builder.add_text_element(slide, text, bbox, **kwargs)
+            return etree.tostring(list(sp_tree.iter_shape_elms())[-1])
+        finally:
+            for sp in list(sp_tree.iter_shape_elms()):
+                sp_tree.remove(sp)
+    
+    def add_shape_xml(self, slide, shape_xml: bytes):
+        """
+        Append a shape rendered by render_text_element_xml() to slide
+        
+        The shape gets the next free id and the name add_textbox() would have given it,
+        so the result is identical to calling add_text_element() on the slide directly.
+        """
+        sp = parse_xml(shape_xml)
+        shapes = slide.shapes
+        sp_tree = shapes.element
+        if _HAS_SHAPE_XML_API:
+            shape_id = shapes._next_shape_id
+        else:
+            # Public equivalent of _next_shape_id: one past the largest id used on the slide
+            used_ids = [int(value) for value in sp_tree.xpath('//@id') if value.isdigit()]
+            shape_id = max(used_ids, default=0) + 1
+        c_nv_pr = sp.xpath('./p:nvSpPr/p:cNvPr')[0]
+        c_nv_pr.set('id', str(shape_id))
+        c_nv_pr.set('name', f"TextBox {shape_id - 1}")
+        ext_lst = sp_tree.xpath('./p:extLst')
+        if ext_lst:
+            ext_lst[0].addprevious(sp)
+        else:
+            sp_tree.append(sp)
+        if _HAS_SHAPE_XML_API:
+            return shapes._shape_factory(sp)
+        return next(shape for shape in shapes if shape.shape_id == shape_id)
+    
     def pixels_to_inches(self, pixels: float, dpi: int = None) -> float:
         """
         Convert pixels to inches
@@ -267,53 +571,11 @@ class PPTXBuilder:
         
         text_length = len(text)
         
-        # Line height ratio: 1.0 for tight bbox
-        line_height_ratio = 1.0
-        
-        # Try precise measurement first (check if font file exists)
-        use_precise = os.path.exists(self.FONT_PATH)
-        
-        # Binary search: find largest font size that fits
-        best_size = self.MIN_FONT_SIZE
+        # Precise measurement when the font file exists, estimation otherwise
+        use_precise = os.path.exists(self.FONT_PATH) and self._get_reference_font() is not None
         
-        for font_size in range(int(self.MAX_FONT_SIZE), int(self.MIN_FONT_SIZE) - 1, -1):
-            font_size = float(font_size)
-            
-            # For text with explicit newlines, calculate each line's width separately
-            lines = text.split('\n')
-            total_required_lines = 0
-            
-            for line in lines:
-                if not line:
-                    total_required_lines += 1
-                    continue
-                    
-                # Measure line width (precise or estimated)
-                if use_precise:
-                    line_width_pt = self._measure_text_width(line, font_size)
-                    if line_width_pt is None:
-                        use_precise = False
-                
-                if not use_precise:
-                    # Fallback: estimate based on character count
-                    cjk_count = sum(1 for c in line if '\u4e00' <= c <= '\u9fff' or '\u3040' <= c <= '\u30ff' or '\uac00' <= c <= '\ud7af')
-                    non_cjk_count = len(line) - cjk_count
-                    line_width_pt = (cjk_count * 1.0 + non_cjk_count * 0.5) * font_size
-                
-                # How many lines does this explicit line need (auto-wrap)?
-                lines_needed = max(1, -(-int(line_width_pt) // int(usable_width_pt)))
-                total_required_lines += lines_needed
-            
-            required_lines = total_required_lines
-            
-            # Calculate total height needed
-            line_height_pt = font_size * line_height_ratio
-            total_height_pt = required_lines * line_height_pt
-            
-            # Check if it fits
-            if total_height_pt <= usable_height_pt:
-                best_size = font_size
-                break
+        # Binary search over sizes, memoized by (text, box size)
+        best_size = self._fit_font_size(text, round(usable_width_pt, 2), round(usable_height_pt, 2), use_precise)
         
         if best_size == self.MIN_FONT_SIZE and text_length > 3:
             logger.warning(f"Text may overflow: '{text[:50]}...' in bbox {width_px}x{height_px}px")
@@ -515,7 +777,7 @@ class PPTXBuilder:
         
         try:
             # Add image
-            slide.shapes.add_picture(image_path, left, top, width, height)
+            self.add_picture(slide, image_path, left, top, width, height)
             logger.debug(f"Added image: {image_path} at bbox {bbox}")
         except Exception as e:
             logger.error(f"Failed to add image {image_path}: {str(e)}")
@@ -648,7 +910,7 @@ class PPTXBuilder:
             output_dir.mkdir(parents=True, exist_ok=True)
         
         self.prs.save(output_path)
-        logger.info(f"Saved presentation to: {output_path}")
+        logger.info(f"Saved presentation to: {output_path} (media: {self.media.stats})")
     
     def get_presentation(self) -> Presentation:
         """Get the current presentation object"""
@@ -1,8 +1,12 @@
 """
 Unified response format utilities
 """
-from flask import jsonify
-from typing import Any, Dict, Optional
+import json
+import logging
+from flask import Response, jsonify, request, stream_with_context
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
 
 
 def success_response(data: Any = None, message: str = "Success", status_code: int = 200):
@@ -69,3 +73,56 @@ def ai_service_error(message: str = "AI service error"):
 def rate_limit_error(message: str = "Rate limit exceeded"):
     return error_response("RATE_LIMIT_EXCEEDED", message, 429)
 
+
+# Server-Sent Events
+def wants_event_stream() -> bool:
+    """客户端是否请求流式响应（Accept: text/event-stream 或 ?stream=true）"""
+    if request.args.get('stream', '').lower() == 'true':
+        return True
+    return 'text/event-stream' in request.headers.get('Accept', '')
+
+
+def sse_event(event: str, data: Any) -> str:
+    """格式化一条 SSE 消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events: Iterable[Tuple[str, Any]],
+                 error_code: str = "AI_SERVICE_ERROR",
+                 on_error: Optional[Callable[[], Any]] = None):
+    """
+    Generate a streaming response with Server-Sent Events
+    
+    Args:
+        events: (event name, data) 迭代器，在请求上下文中惰性执行
+        error_code: 迭代过程中抛出异常时，error 事件使用的错误码
+        on_error: 异常时的清理回调（如 db.session.rollback）
+    
+    Returns:
+        Flask streaming response; errors are reported as an `error` event
+        with the same payload shape as error_response
+    """
+    def generate():
+        try:
+            for event, data in events:
+                yield sse_event(event, data)
+        except Exception as e:
+            logger.error(f"Streaming response failed: {str(e)}", exc_info=True)
+            if on_error:
+                on_error()
+            yield sse_event('error', {
+                "success": False,
+                "error": {
+                    "code": error_code,
+                    "message": str(e)
+                }
+            })
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
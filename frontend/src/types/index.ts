@@ -71,6 +71,7 @@ export interface Project {
   // 导出设置
   export_extractor_method?: ExportExtractorMethod; // 组件提取方法
   export_inpaint_method?: ExportInpaintMethod; // 背景图获取方法
+  export_enhance_threshold?: number | null; // 混合修复的画质门限（为空使用默认值，0 表示总是画质提升）
   status: ProjectStatus;
   pages: Page[];
   created_at: string;